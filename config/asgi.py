@@ -3,6 +3,12 @@ ASGI config for config project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The real-time endpoints (/events/stream/, /events/poll/) are answered by
+pages.realtime.EventsApp in front of Django, so an open connection doesn't
+tie up a thread or sit in the middleware stack. Run it with an ASGI worker, e.g.:
+
+    gunicorn config.asgi:application -k uvicorn_worker.UvicornWorker
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -13,4 +19,9 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after the app registry is ready
+from pages.realtime import EventsApp  # noqa: E402
+
+application = EventsApp(django_application)
@@ -0,0 +1,106 @@
+"""
+Gunicorn settings (start.sh in the Dockerfile runs `gunicorn -c config/gunicorn.conf.py`).
+
+STARTUP:
+--------
+- preload_app: the master imports Django, the URLconf and every view once,
+  then runs pages/warmup.py (templates compiled, search index built,
+  homepage sections cached) before forking. Workers start ready, import
+  nothing, and share that memory copy-on-write instead of each building
+  their own copy. gc.freeze() then puts everything allocated so far out of
+  the collector's reach. Collections in the workers don't write to, and so
+  copy, those shared pages.
+- GUNICORN_PRELOAD=0 loads the app in each worker instead, and each worker
+  warms itself after loading. Use it for `kill -HUP` code reloads. With
+  preload, new code needs a restart, because the master already holds the
+  old code.
+- Heavy libraries (Pillow, NumPy) aren't imported at startup at all; see
+  pages/warmup.py.
+- More than one worker needs a cache they share (settings.CACHES). With
+  the default per-process LocMemCache the default is 1 worker, and startup
+  fails if WEB_CONCURRENCY asks for more.
+
+WORKERS AND REAL-TIME PUSH:
+---------------------------
+The default REALTIME_BROKER (pages.realtime.InProcessBroker) only delivers
+an event to SSE and long-poll clients held by the worker that published it.
+So under ASGI:
+- with the in-process broker, the default is 1 worker, and startup fails if
+  WEB_CONCURRENCY asks for more;
+- with REALTIME_BROKER naming a cross-process broker (e.g. Redis pub/sub),
+  the default is 2 workers.
+WSGI is the fallback for deployments without push. Its sync workers serve
+the long-poll endpoint too, but several of them share events only through a
+cross-process broker.
+
+ENVIRONMENT:
+------------
+    PORT                port to bind (default 8000)
+    SERVER_INTERFACE    asgi (default; uvicorn workers, real-time push) or wsgi (sync workers)
+    WEB_CONCURRENCY     worker processes (default 1 with LocMemCache; otherwise 4 for wsgi, and for
+                        asgi 1, or 2 with a shared REALTIME_BROKER)
+    REALTIME_BROKER     see above and config/settings.py
+    GUNICORN_PRELOAD    1 (default) or 0
+
+Measure with `python manage.py bench_startup`.
+"""
+
+import gc
+import os
+import time
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+from django.conf import settings  # noqa: E402
+
+
+IN_PROCESS_BROKER = 'pages.realtime.InProcessBroker'
+
+# Fragment/facet invalidation needs a cache every worker shares (config/settings.py CACHES)
+shared_cache = not settings.CACHES['default']['BACKEND'].endswith('.locmem.LocMemCache')
+
+bind = f'0.0.0.0:{os.environ.get("PORT", "8000")}'
+
+if os.environ.get('SERVER_INTERFACE', 'asgi') == 'wsgi':
+    wsgi_app = 'config.wsgi:application'
+    workers = int(os.environ.get('WEB_CONCURRENCY', 4 if shared_cache else 1))
+else:
+    wsgi_app = 'config.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+    # Push events reach only the connections of the worker that published them
+    # unless the broker is shared between processes
+    shared_broker = settings.REALTIME_BROKER != IN_PROCESS_BROKER
+    workers = int(os.environ.get('WEB_CONCURRENCY', 2 if shared_broker and shared_cache else 1))
+    if workers > 1 and not shared_broker:
+        raise RuntimeError(
+            f'{IN_PROCESS_BROKER} only fans out inside one process: with {workers} ASGI workers, '
+            'events published in one would never reach streams held by another. '
+            'Set REALTIME_BROKER to a cross-process broker or WEB_CONCURRENCY=1.'
+        )
+
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') != '0'
+
+if workers > 1 and not shared_cache:
+    raise RuntimeError(
+        f'{settings.CACHES["default"]["BACKEND"]} is per process: with {workers} workers, invalidation in one '
+        'would leave the others serving stale pages. Use a shared CACHE_BACKEND or WEB_CONCURRENCY=1.'
+    )
+
+
+def _warm(log):
+    from pages import warmup
+
+    started = time.perf_counter()
+    timings = warmup.run()
+    log.info('Warmed up in %.2fs: %s', time.perf_counter() - started, timings)
+
+
+def when_ready(server):
+    # The preloaded app is imported by now; workers are forked after this returns
+    if server.cfg.preload_app:
+        _warm(server.log)
+        gc.freeze()
+
+
+def post_worker_init(worker):
+    if not worker.cfg.preload_app:
+        _warm(worker.log)
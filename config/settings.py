@@ -30,6 +30,7 @@ When you're ready to use PostgreSQL:
 
 from pathlib import Path
 import os
+import tempfile
 
 # python-decouple reads from .env file
 # Docs: https://github.com/HBNetwork/python-decouple
@@ -85,7 +86,19 @@ INSTALLED_APPS = [
     'pages',
 ]
 
+# ======================================================================================
+# PROFILING (see pages/profiling.py)
+# ======================================================================================
+# Per-URL wall time, queries, template time and cache hit rates, served to
+# staff at /panel/performance/. With PROFILING_ENFORCE_BUDGETS a view over
+# its query budget raises, which fails the test that requested it.
+
+PROFILING = config('PROFILING', default=DEBUG, cast=bool)
+PROFILING_ENFORCE_BUDGETS = config('PROFILING_ENFORCE_BUDGETS', default=False, cast=bool)
+
 MIDDLEWARE = [
+    # First, so its wall time covers the rest of the stack (a no-op unless PROFILING)
+    'pages.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     # WhiteNoise: Serves static files in production (must be after SecurityMiddleware)
     # Docs: https://whitenoise.readthedocs.io/
@@ -100,16 +113,31 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'config.urls'
 
+# Templates are parsed once per process by pages/templating.py's cached
+# loader, which also binds literal {% include %}s to the compiled component,
+# and pages/warmup.py compiles all of them at startup. With
+# TEMPLATE_STRIP_WHITESPACE the loader also collapses the templates'
+# indentation (smaller HTML, same rendering; see that module).
+TEMPLATE_STRIP_WHITESPACE = config('TEMPLATE_STRIP_WHITESPACE', default=False, cast=bool)
+
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # Same as DjangoTemplates, plus render timing for pages/profiling.py
+        'BACKEND': 'pages.profiling.ProfiledTemplates' if PROFILING else 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': [
+                ('pages.templating.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ], TEMPLATE_STRIP_WHITESPACE),
+            ],
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'pages.context_processors.notifications',
+                'pages.context_processors.cart',
             ],
         },
     },
@@ -145,6 +173,58 @@ else:
         }
     }
 
+# Tests on SQLite use a file instead of the shared in-memory database: the
+# write-behind flush threads and the concurrent checkout tests open their own
+# connections, and an in-memory database fails them ("table is locked")
+# instead of waiting for the lock.
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    DATABASES['default'].setdefault('TEST', {}).setdefault(
+        'NAME', os.path.join(tempfile.gettempdir(), 'watchbazar-test.sqlite3')
+    )
+
+
+# ======================================================================================
+# CACHE CONFIGURATION
+# ======================================================================================
+# The cache behind page fragments, facet counts and counters. Invalidation
+# works by bumping version tokens and deleting keys, so every worker process
+# must see the same cache: a per-process cache would keep serving the old
+# entries in the other workers (some are stored without expiry).
+# - Production: Redis or Memcached, shared by all workers, e.g.
+#   CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+#   CACHE_LOCATION=redis://localhost:6379/1
+# - Default: per-process memory (LocMemCache). Only correct with ONE worker
+#   process; config/gunicorn.conf.py then defaults to one worker and refuses
+#   to start more.
+# The database cache would be shared, but it turns every cache read and
+# write (page fragments, view-count dedupe keys, sessions) into SQL, so it
+# is not used as a default.
+# Docs: https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='watchbazar'),
+        'TIMEOUT': 300,
+        'OPTIONS': {'MAX_ENTRIES': config('CACHE_MAX_ENTRIES', default=50_000, cast=int)},
+    }
+}
+
+# Sessions are read from the cache and written through to the database, so
+# pages that only read the session (cart badge, flash messages) cost no query.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+
+# ======================================================================================
+# REAL-TIME PUSH (SSE / long-poll, see pages/realtime.py)
+# ======================================================================================
+# The in-process broker only reaches connections held by the same worker, so
+# config/gunicorn.conf.py runs a single ASGI worker with it. For several
+# workers, point this at a shared broker class exposing the same methods
+# (publish/subscribe/unsubscribe/since/last_id).
+
+REALTIME_BROKER = config('REALTIME_BROKER', default='pages.realtime.InProcessBroker')
+
 
 # ======================================================================================
 # PASSWORD VALIDATION
@@ -166,6 +246,9 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# @login_required sends visitors to the site's own login page (which also merges their cart)
+LOGIN_URL = 'login'
+
 
 # ======================================================================================
 # INTERNATIONALIZATION
@@ -197,6 +280,22 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
 
+# ======================================================================================
+# MEDIA (listing photos, see pages/images.py)
+# ======================================================================================
+# Uploads are stored with the default FileSystemStorage under MEDIA_ROOT;
+# in production mount a volume there and serve MEDIA_URL from the web server.
+
+MEDIA_URL = '/media/'
+MEDIA_ROOT = config('MEDIA_ROOT', default=str(BASE_DIR / 'media'))
+
+# Stream every upload to a temporary file instead of buffering small ones in memory
+FILE_UPLOAD_HANDLERS = ['django.core.files.uploadhandler.TemporaryFileUploadHandler']
+
+# Processes per web worker rendering WebP/JPEG variants; 0 renders inline
+IMAGE_WORKERS = config('IMAGE_WORKERS', default=2, cast=int)
+
+
 # ======================================================================================
 # DEFAULT PRIMARY KEY FIELD TYPE
 # ======================================================================================
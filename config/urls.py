@@ -14,6 +14,8 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
+from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path
 from pages import views
@@ -58,12 +60,17 @@ urlpatterns = [
     # ==========================================================================
     path('offers/', views.my_offers, name='my_offers'),
     path('offers/received/', views.offers_received, name='offers_received'),
+    path('offers/<int:offer_id>/<slug:action>/', views.offer_action, name='offer_action'),
+    path('watches/<int:watch_id>/offer/', views.make_offer, name='make_offer'),
     
     # ==========================================================================
     # CART & ORDERS
     # ==========================================================================
-    path('cart/', views.cart, name='cart'),
-    path('checkout/', views.checkout, name='checkout'),
+    path('cart/', views.cart_view, name='cart'),
+    path('cart/add/<int:watch_id>/', views.add_to_cart, name='add_to_cart'),
+    path('cart/remove/<int:watch_id>/', views.cart_remove, name='cart_remove'),
+    path('cart/clear/', views.cart_clear, name='cart_clear'),
+    path('checkout/', views.checkout_view, name='checkout'),
     path('orders/', views.my_orders, name='my_orders'),
     path('orders/<int:order_id>/', views.order_detail, name='order_detail'),
     
@@ -71,6 +78,7 @@ urlpatterns = [
     # WISHLIST
     # ==========================================================================
     path('wishlist/', views.wishlist, name='wishlist'),
+    path('wishlist/toggle/<int:watch_id>/', views.wishlist_toggle, name='wishlist_toggle'),
     
     # ==========================================================================
     # DASHBOARDS
@@ -78,6 +86,7 @@ urlpatterns = [
     path('dashboard/', views.buyer_dashboard, name='buyer_dashboard'),
     path('dashboard/seller/', views.seller_dashboard, name='seller_dashboard'),
     path('dashboard/listings/', views.my_listings, name='my_listings'),
+    path('dashboard/listings/import/', views.watch_import, name='watch_import'),
     path('dashboard/settings/', views.account_settings, name='account_settings'),
     
     # ==========================================================================
@@ -100,11 +109,21 @@ urlpatterns = [
     path('panel/', views.admin_dashboard, name='admin_dashboard'),
     path('panel/sellers/', views.admin_seller_onboarding, name='admin_seller_onboarding'),
     path('panel/listings/', views.admin_listings_approval, name='admin_listings_approval'),
+    path('panel/listings/moderate/', views.api_moderate_listings, name='api_moderate_listings'),
     path('panel/delivery/', views.admin_delivery_management, name='admin_delivery_management'),
+    path('panel/orders/<int:order_id>/status/', views.api_order_transition, name='api_order_transition'),
+    path('panel/performance/', views.performance_stats, name='performance_stats'),
     
     # ==========================================================================
     # API ENDPOINTS
     # ==========================================================================
     path('api/notifications/<int:notification_id>/read/', views.api_mark_notification_read, name='api_mark_notification_read'),
     path('api/notifications/mark-all-read/', views.api_mark_all_notifications_read, name='api_mark_all_notifications_read'),
+    path('api/search/autocomplete/', views.api_search_autocomplete, name='api_search_autocomplete'),
+    path('events/stream/', views.events_stream, name='events_stream'),
+    path('events/poll/', views.events_poll, name='events_poll'),
+    path('events/board/', views.events_board, name='events_board'),
 ]
+
+# Uploaded listing photos; in production the web server serves MEDIA_URL
+urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
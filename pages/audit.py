@@ -0,0 +1,169 @@
+"""
+Admin activity log (`admin_activity_log`) with a write-behind buffer.
+========================================================================================
+
+WHY:
+----
+Every admin panel request is audited. Writing the row inside the request
+would add an INSERT (and a commit) to each of them.
+
+HOW IT WORKS:
+-------------
+- `record()` builds the row in memory (admin, action, entity, IP address,
+  user agent, time of the action) and appends it to this worker's buffer.
+  No query runs in the request.
+- A background thread writes the buffer every FLUSH_INTERVAL seconds, or
+  sooner once FLUSH_MAX_ROWS are waiting, as one bulk INSERT per FLUSH_CHUNK
+  rows. A failed flush (any error) puts its rows back; past MAX_PENDING rows
+  the oldest are dropped (and logged) rather than growing without bound.
+- The buffer is flushed at interpreter exit (gunicorn's graceful shutdown).
+  A forked worker starts with an empty buffer and its own thread, and a
+  flusher thread that died is restarted. That machinery is shared with
+  pages/counters.py (pages/writebehind.py).
+- Decisions that must commit together with their audit rows (listing
+  moderation, pages/moderation.py) insert them in their own transaction with
+  `entry()` + bulk_create instead of going through the buffer.
+
+READING:
+--------
+`entries(start, end, ...)` always takes a time range. Every audit query is a
+range scan of the (created_at, id) index, and on a table partitioned by
+month in PostgreSQL it only touches the partitions inside the range. Ranges
+are capped at MAX_RANGE; pages are keyset-paginated (pages/pagination.py).
+
+USAGE:
+    audit.record(request, 'seller_verify', 'seller', seller.pk, 'Documents checked')
+
+    @audited('view_dashboard')
+    def admin_dashboard(request): ...
+"""
+
+import atexit
+import logging
+from datetime import timedelta
+from functools import wraps
+
+from django.utils import timezone
+
+from .models import AdminActivityLog
+from .writebehind import WriteBehindBuffer
+
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = 2.0
+FLUSH_MAX_ROWS = 200
+FLUSH_CHUNK = 500
+MAX_PENDING = 10_000
+MAX_RANGE = timedelta(days=93)
+
+
+def client_details(request):
+    """(ip address, user agent) of the request, for a log row"""
+    if request is None:
+        return None, ''
+    return request.META.get('REMOTE_ADDR') or None, request.META.get('HTTP_USER_AGENT', '')
+
+
+def entry(admin, action_type, entity_type='', entity_id=None, description='', request=None, at=None):
+    """An unsaved AdminActivityLog row"""
+    ip_address, user_agent = client_details(request)
+    return AdminActivityLog(
+        admin_id=getattr(admin, 'pk', admin),
+        action_type=action_type,
+        entity_type=entity_type,
+        entity_id=entity_id,
+        description=description,
+        ip_address=ip_address,
+        user_agent=user_agent,
+        created_at=at or timezone.now(),
+    )
+
+
+class AuditBuffer(WriteBehindBuffer):
+    """Per-worker queue of log rows waiting for a bulk INSERT"""
+
+    thread_name = 'audit-flush'
+
+    def __init__(self, interval=FLUSH_INTERVAL, max_rows=FLUSH_MAX_ROWS, max_pending=MAX_PENDING):
+        super().__init__(interval, max_rows)
+        self.max_pending = max_pending
+
+    def _empty(self):
+        return []
+
+    def _restore(self, rows):
+        self._pending[:0] = rows
+        dropped = len(self._pending) - self.max_pending
+        if dropped > 0:
+            del self._pending[:dropped]
+            logger.error('Audit log buffer full; dropped the %d oldest rows', dropped)
+
+    def add(self, row):
+        self._ensure_thread()
+        with self._lock:
+            self._pending.append(row)
+            size = len(self._pending)
+        self._added(size)
+
+    def pending(self):
+        with self._lock:
+            return len(self._pending)
+
+    def _write(self, rows):
+        AdminActivityLog.objects.bulk_create(rows, batch_size=FLUSH_CHUNK)
+        return len(rows)
+
+
+buffer = AuditBuffer()
+atexit.register(buffer.flush_at_exit)
+
+
+# =============================================================================
+# WRITING
+# =============================================================================
+
+def record(request, action_type, entity_type='', entity_id=None, description=''):
+    """Queue one audit row for the request's admin (no query)"""
+    buffer.add(entry(request.user, action_type, entity_type, entity_id, description, request=request))
+
+
+def audited(action_type, entity_type='page'):
+    """View decorator: audit every request a staff user makes to the view"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.user.is_authenticated and request.user.is_staff:
+                record(request, action_type, entity_type, description=request.get_full_path()[:500])
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# =============================================================================
+# READING
+# =============================================================================
+
+def entries(start, end=None, admin=None, action_type=None, entity_type=None, entity_id=None):
+    """
+    Log rows with start <= created_at < end (default: now), newest first.
+    The range is capped at MAX_RANGE before `end`.
+    """
+    end = end or timezone.now()
+    start = max(start, end - MAX_RANGE)
+    rows = AdminActivityLog.objects.filter(created_at__gte=start, created_at__lt=end)
+    if admin is not None:
+        rows = rows.filter(admin=admin)
+    if action_type:
+        rows = rows.filter(action_type=action_type)
+    if entity_type:
+        rows = rows.filter(entity_type=entity_type)
+    if entity_id is not None:
+        rows = rows.filter(entity_id=entity_id)
+    return rows.order_by('-created_at', '-id')
+
+
+def recent_activity(hours=24, limit=10):
+    """Latest admin actions (page views left out) for the dashboard feed"""
+    start = timezone.now() - timedelta(hours=hours)
+    return list(entries(start).exclude(entity_type='page').select_related('admin')[:limit])
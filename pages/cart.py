@@ -0,0 +1,314 @@
+"""
+Shopping cart: one stored list per visitor, no cart line tables.
+========================================================================================
+
+HOW IT WORKS:
+-------------
+- A cart is a compact list of [product id, quantity, price seen, method]
+  ("delivery" or "meeting"), stored whole:
+    anonymous visitor   in the session (request.session['cart'])
+    logged-in user      in the shared cache under `cart:user:<id>`, and
+                        behind it a SavedCart row (one per user), so the
+                        cart follows them across devices and logouts.
+- A logged-in change writes the cache only. The user's id goes into a
+  write-behind buffer (`CartBuffer`, pages/writebehind.py) that saves the
+  changed carts to SavedCart in one batch every PERSIST_INTERVAL seconds,
+  taking each cart's latest lines from the cache at that moment. A burst
+  of add/remove/revalidate costs no database writes on the request path.
+- Reads come from the cache; on a miss, this worker's unsaved copy in the
+  buffer, then the SavedCart row.
+- On login the session cart is merged into the user's cart (`merge()`,
+  called from login_view) and the session copy is dropped.
+- `items()` loads the products behind a cart with one `in_bulk` query
+  (brand and primary photo included) and flags items whose price moved or
+  which are no longer for sale.
+- `revalidate()` re-reads price, status and approval for every item in a
+  single query. It drops listings that are SOLD, RESERVED or otherwise
+  off the catalog, and updates each remaining item's seen price. Checkout
+  runs it before showing totals.
+- The navbar count (`count()`) comes from the stored list; no query
+  while the cached copy is warm.
+
+A cache eviction or flush costs one read of the SavedCart row. The buffer
+keeps its own copy until it is saved, so a cart is never lost with the
+cache; a hard kill of the worker can lose its last PERSIST_INTERVAL of
+changes (a graceful shutdown flushes them).
+
+USAGE:
+    shopping_cart = cart.Cart(request)
+    shopping_cart.add(product, method='delivery')
+    shopping_cart.items()
+"""
+
+import atexit
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import transaction
+
+from . import images
+from .models import Product, SavedCart
+from .writebehind import WriteBehindBuffer
+
+
+SESSION_KEY = 'cart'
+CART_TIMEOUT = 30 * 24 * 60 * 60
+MAX_ITEMS = 50
+METHODS = ('delivery', 'meeting')
+DELIVERY_FEE = Decimal('800')
+PERSIST_INTERVAL = 10.0
+PERSIST_MAX_USERS = 500
+
+# Positions in a stored line
+PRODUCT, QUANTITY, PRICE_SEEN, METHOD = range(4)
+
+
+def _cache_key(user_id):
+    return f'cart:user:{user_id}'
+
+
+class CartBuffer(WriteBehindBuffer):
+    """Per-worker buffer of logged-in carts changed since their SavedCart row was written"""
+
+    thread_name = 'cart-persist'
+
+    def __init__(self, interval=PERSIST_INTERVAL, max_users=PERSIST_MAX_USERS):
+        super().__init__(interval, max_users)
+
+    def _empty(self):
+        return {}  # user id -> lines as last changed in this worker
+
+    def _restore(self, batch):
+        for user_id, lines in batch.items():
+            # A change made since the failed write is newer
+            self._pending.setdefault(user_id, lines)
+
+    def put(self, user_id, lines):
+        self._ensure_thread()
+        with self._lock:
+            self._pending[user_id] = [list(line) for line in lines]
+            size = len(self._pending)
+        self._added(size)
+
+    def pending(self, user_id):
+        with self._lock:
+            lines = self._pending.get(user_id)
+        return None if lines is None else [list(line) for line in lines]
+
+    def _write(self, batch):
+        # The cache holds the latest cart even when another worker changed it after this one
+        cached = cache.get_many([_cache_key(user_id) for user_id in batch])
+        latest = {user_id: cached.get(_cache_key(user_id), lines) for user_id, lines in batch.items()}
+        emptied = [user_id for user_id, lines in latest.items() if not lines]
+        with transaction.atomic():
+            if emptied:
+                SavedCart.objects.filter(user_id__in=emptied).delete()
+            SavedCart.objects.bulk_create(
+                [SavedCart(user_id=user_id, lines=lines) for user_id, lines in latest.items() if lines],
+                update_conflicts=True, unique_fields=['user'], update_fields=['lines', 'updated_at'],
+            )
+        return len(latest)
+
+
+buffer = CartBuffer()
+atexit.register(buffer.flush_at_exit)
+
+
+@dataclass
+class CartItem:
+    """One cart line with its product loaded"""
+
+    product: Product
+    quantity: int
+    price_seen: Decimal
+    transaction_method: str
+
+    # Names used by templates/orders/cart.html and checkout.html
+    @property
+    def id(self):
+        return self.product.pk
+
+    @property
+    def watch(self):
+        return self.product
+
+    @property
+    def price(self):
+        return self.product.price
+
+    @property
+    def subtotal(self):
+        return self.product.price * self.quantity
+
+    @property
+    def price_changed(self):
+        return self.product.price != self.price_seen
+
+    @property
+    def available(self):
+        return self.product.is_live
+
+
+@dataclass
+class Revalidation:
+    """What `revalidate()` changed"""
+
+    removed: list        # product ids no longer for sale (or deleted)
+    repriced: list       # (product id, old price, new price)
+
+    def __bool__(self):
+        return bool(self.removed or self.repriced)
+
+
+class Cart:
+    """The current visitor's cart (session) or user's cart (cache, saved behind to SavedCart)"""
+
+    def __init__(self, request):
+        self.request = request
+        self.user_id = request.user.pk if request.user.is_authenticated else None
+        self.lines = self._load()
+
+    def _load(self):
+        if self.user_id is None:
+            return list(self.request.session.get(SESSION_KEY, []))
+        key = _cache_key(self.user_id)
+        lines = cache.get(key)
+        if lines is None:
+            lines = buffer.pending(self.user_id)
+            if lines is None:
+                lines = SavedCart.objects.filter(user_id=self.user_id).values_list('lines', flat=True).first() or []
+            cache.set(key, lines, CART_TIMEOUT)
+        return lines
+
+    def _save(self):
+        if self.user_id is None:
+            self.request.session[SESSION_KEY] = self.lines
+            return
+        cache.set(_cache_key(self.user_id), self.lines, CART_TIMEOUT)
+        buffer.put(self.user_id, self.lines)
+
+    def _line(self, product_id):
+        return next((line for line in self.lines if line[PRODUCT] == product_id), None)
+
+    # -------------------------------------------------------------------------
+    # Changes
+    # -------------------------------------------------------------------------
+
+    def add(self, product, quantity=1, method='delivery'):
+        """Add `product` (or update its line); returns False if the cart is full"""
+        method = method if method in METHODS else METHODS[0]
+        quantity = max(1, min(quantity, product.pieces or 1))
+        line = self._line(product.pk)
+        if line is None:
+            if len(self.lines) >= MAX_ITEMS:
+                return False
+            self.lines.append([product.pk, quantity, str(product.price), method])
+        else:
+            line[QUANTITY], line[PRICE_SEEN], line[METHOD] = quantity, str(product.price), method
+        self._save()
+        return True
+
+    def remove(self, product_id):
+        before = len(self.lines)
+        self.lines = [line for line in self.lines if line[PRODUCT] != product_id]
+        if len(self.lines) != before:
+            self._save()
+        return len(self.lines) != before
+
+    def clear(self):
+        self.lines = []
+        self._save()
+
+    def merge(self, lines):
+        """Fold `lines` (e.g. the pre-login session cart) into this cart"""
+        for incoming in lines:
+            line = self._line(incoming[PRODUCT])
+            if line is None:
+                if len(self.lines) < MAX_ITEMS:
+                    self.lines.append(list(incoming))
+            else:
+                # Same watch in both: the more recent (incoming) choice wins
+                line[QUANTITY] = max(line[QUANTITY], incoming[QUANTITY])
+                line[PRICE_SEEN], line[METHOD] = incoming[PRICE_SEEN], incoming[METHOD]
+        self._save()
+
+    # -------------------------------------------------------------------------
+    # Reading
+    # -------------------------------------------------------------------------
+
+    def count(self):
+        return sum(line[QUANTITY] for line in self.lines)
+
+    def product_ids(self):
+        return [line[PRODUCT] for line in self.lines]
+
+    def items(self):
+        """CartItems in the order added, products loaded with one query"""
+        if not self.lines:
+            return []
+        products = (
+            Product.objects.select_related('brand')
+            .prefetch_related(images.primary_image_prefetch())
+            .in_bulk(self.product_ids())
+        )
+        return [
+            CartItem(products[line[PRODUCT]], line[QUANTITY], Decimal(line[PRICE_SEEN]), line[METHOD])
+            for line in self.lines
+            if line[PRODUCT] in products
+        ]
+
+    def revalidate(self):
+        """
+        Recheck every item's price and availability in one query: drop
+        listings that are no longer for sale and take the current price.
+        """
+        if not self.lines:
+            return Revalidation([], [])
+        current = {
+            pk: (price, status, approval)
+            for pk, price, status, approval in Product.objects.filter(pk__in=self.product_ids()).values_list(
+                'pk', 'price', 'status', 'approval_status',
+            )
+        }
+        removed, repriced, kept = [], [], []
+        for line in self.lines:
+            row = current.get(line[PRODUCT])
+            if row is None or row[1] != Product.Status.ACTIVE or row[2] != Product.ApprovalStatus.APPROVED:
+                removed.append(line[PRODUCT])
+                continue
+            if Decimal(line[PRICE_SEEN]) != row[0]:
+                repriced.append((line[PRODUCT], Decimal(line[PRICE_SEEN]), row[0]))
+                line[PRICE_SEEN] = str(row[0])
+            kept.append(line)
+        result = Revalidation(removed, repriced)
+        if result:
+            self.lines = kept
+            self._save()
+        return result
+
+
+def totals(items):
+    """Order summary figures for the cart and checkout pages"""
+    subtotal = sum((item.subtotal for item in items), Decimal('0'))
+    # Each store ships its own order (pages/checkout.py)
+    shipping_stores = {item.product.store_id for item in items if item.transaction_method == 'delivery'}
+    delivery_fee = DELIVERY_FEE * len(shipping_stores)
+    return {
+        'subtotal': subtotal,
+        'delivery_fee': delivery_fee,
+        'discount': Decimal('0'),
+        'total': subtotal + delivery_fee,
+    }
+
+
+def session_lines(request):
+    """The session (anonymous) cart, read before login rotates the session"""
+    return list(request.session.get(SESSION_KEY, []))
+
+
+def merge_after_login(request, lines):
+    """Move the pre-login session cart into the now logged-in user's cart"""
+    request.session.pop(SESSION_KEY, None)
+    if lines:
+        Cart(request).merge(lines)
@@ -0,0 +1,426 @@
+"""
+Catalog query engine for the watch browse page.
+========================================================================================
+
+HOW IT WORKS:
+-------------
+- Facet counts (brand, condition, movement, price bucket, box/papers, category)
+  live in the `catalog_facet_counts` table (FacetCount). They are adjusted by
+  signal handlers whenever a listing enters, leaves or changes inside the live
+  catalog (ACTIVE + APPROVED), so a browse request never runs COUNT ... GROUP BY.
+- The whole facet table is read with one query and kept in the cache until
+  the next change, so most requests read facets with zero queries.
+- `browse()` returns the filtered, paginated page *and* the facet counts in
+  one call. When the filter maps onto a single facet value (or no filter at
+  all), the total for the paginator comes from the index as well.
+- Pages are keyset-paginated (pages/pagination.py), so deep pages cost the
+  same as the first one.
+
+Bulk updates (`QuerySet.update()`) skip model signals. Use `bulk_update_products()`
+for those, or run `python manage.py rebuild_catalog_index` after a raw import.
+"""
+
+from collections import Counter
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.text import slugify
+
+from . import images, render_cache, search
+from .models import Brand, FacetCount, Product, ProductCategory
+from .pagination import CursorPaginator, InvalidCursor
+
+
+# =============================================================================
+# FACET DEFINITIONS
+# =============================================================================
+
+FACETS_CACHE_KEY = 'catalog:facets'
+
+# Matches the quick filters in templates/watches/watch_list.html
+PRICE_BUCKETS = [
+    ('0-50k', 'Under 50k', Decimal('0'), Decimal('50000')),
+    ('50k-100k', '50k-100k', Decimal('50000'), Decimal('100000')),
+    ('100k-250k', '100k-250k', Decimal('100000'), Decimal('250000')),
+    ('250k+', '250k+', Decimal('250000'), None),
+]
+
+# The browse page offers three condition groups instead of the raw enum
+CONDITION_GROUPS = {
+    'new': [Product.Condition.NEW],
+    'pre-owned': [c for c in Product.Condition.values if c != Product.Condition.NEW],
+}
+VINTAGE_BEFORE_YEAR = 1990
+
+# browse sort -> (label, pages.pagination.SORT_KEYS key)
+SORT_OPTIONS = {
+    'latest': ('Latest', 'newest'),
+    'price_low': ('Price: Low to High', 'price_low'),
+    'price_high': ('Price: High to Low', 'price_high'),
+    'popular': ('Most Popular', 'popular'),
+}
+DEFAULT_SORT = 'latest'
+PAGE_SIZE = 24
+
+# Listing fields that decide which facet rows a product counts towards
+INDEXED_FIELDS = (
+    'status', 'approval_status', 'brand_id', 'category_id', 'condition',
+    'movement_type', 'price', 'has_box', 'has_papers',
+)
+
+
+def live_products():
+    """Listings visible on the public catalog"""
+    return Product.objects.filter(
+        status=Product.Status.ACTIVE,
+        approval_status=Product.ApprovalStatus.APPROVED,
+    )
+
+
+def price_bucket(price):
+    """Return the PRICE_BUCKETS key a price falls into"""
+    price = Decimal(price)
+    for key, _label, low, high in PRICE_BUCKETS:
+        if price >= low and (high is None or price < high):
+            return key
+    return PRICE_BUCKETS[0][0]
+
+
+def facet_keys(values):
+    """
+    The (facet, value) rows a listing counts towards.
+
+    `values` is a dict of INDEXED_FIELDS; an empty list means the listing is
+    not live and counts towards nothing.
+    """
+    if (values.get('status') != Product.Status.ACTIVE
+            or values.get('approval_status') != Product.ApprovalStatus.APPROVED):
+        return []
+    keys = [('total', 'all'), ('condition', values['condition'])]
+    keys.append(('price', price_bucket(values['price'])))
+    if values.get('brand_id'):
+        keys.append(('brand', str(values['brand_id'])))
+    if values.get('category_id'):
+        keys.append(('category', str(values['category_id'])))
+    if values.get('movement_type'):
+        keys.append(('movement', values['movement_type'].strip().lower()))
+    if values.get('has_box'):
+        keys.append(('has_box', 'yes'))
+    if values.get('has_papers'):
+        keys.append(('has_papers', 'yes'))
+    return keys
+
+
+def snapshot(product):
+    """INDEXED_FIELDS of an in-memory product"""
+    return {name: getattr(product, name) for name in INDEXED_FIELDS}
+
+
+# =============================================================================
+# INDEX MAINTENANCE
+# =============================================================================
+
+def _label_for(facet, value, product=None):
+    """Human label stored next to a newly created facet row"""
+    if facet == 'brand':
+        if product is not None and product.brand_id == int(value):
+            return product.brand.brand_name
+        return Brand.objects.filter(pk=value).values_list('brand_name', flat=True).first() or ''
+    if facet == 'category':
+        if product is not None and product.category_id == int(value):
+            return product.category.category_name
+        return ProductCategory.objects.filter(pk=value).values_list('category_name', flat=True).first() or ''
+    if facet == 'condition':
+        return Product.Condition(value).label
+    if facet == 'price':
+        return next(label for key, label, _low, _high in PRICE_BUCKETS if key == value)
+    if facet == 'movement':
+        return value.title()
+    return value
+
+
+def apply_deltas(deltas, product=None):
+    """Add a Counter of {(facet, value): delta} to the facet table"""
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    with transaction.atomic():
+        for (facet, value), delta in deltas.items():
+            updated = FacetCount.objects.filter(facet=facet, value=value).update(count=F('count') + delta)
+            if not updated:
+                row, _ = FacetCount.objects.get_or_create(
+                    facet=facet, value=value,
+                    defaults={'label': _label_for(facet, value, product)},
+                )
+                FacetCount.objects.filter(pk=row.pk).update(count=F('count') + delta)
+        transaction.on_commit(_live_catalog_changed)
+
+
+def _live_catalog_changed():
+    from . import homepage  # homepage builds on this module
+
+    cache.delete(FACETS_CACHE_KEY)
+    homepage.mark_stale()
+
+
+def index_change(before, after, product=None):
+    """Move a listing's counts from its `before` facet rows to its `after` rows"""
+    deltas = Counter(facet_keys(after or {}))
+    deltas.subtract(Counter(facet_keys(before or {})))
+    apply_deltas(deltas, product)
+
+
+def bulk_update_products(queryset, **changes):
+    """
+    `queryset.update(**changes)` that keeps the facet index in step.
+
+    Reads the indexed columns of the affected rows once, runs the UPDATE and
+    applies the combined facet deltas in a single pass. Also drops the cached
+    detail pages of the affected listings.
+    """
+    # update() skips auto_now; bump it so search.sync() in other workers sees the change
+    changes.setdefault('updated_at', timezone.now())
+    with transaction.atomic():
+        rows = list(queryset.select_for_update().values('pk', *INDEXED_FIELDS))
+        if not rows:
+            return 0
+        updated = Product.objects.filter(pk__in=[row['pk'] for row in rows]).update(**changes)
+        deltas = Counter()
+        for row in rows:
+            after = {**row, **{name: changes[name] for name in INDEXED_FIELDS if name in changes}}
+            deltas.update(facet_keys(after))
+            deltas.subtract(facet_keys(row))
+        apply_deltas(deltas)
+        product_ids = [row['pk'] for row in rows]
+        transaction.on_commit(lambda: render_cache.invalidate_watches(product_ids))
+    return updated
+
+
+def rebuild_index():
+    """Recompute the facet table from scratch (bulk, one scan of products)"""
+    deltas = Counter()
+    for row in live_products().values(*INDEXED_FIELDS).iterator(chunk_size=2000):
+        deltas.update(facet_keys(row))
+    brand_names = dict(Brand.objects.values_list('pk', 'brand_name'))
+    category_names = dict(ProductCategory.objects.values_list('pk', 'category_name'))
+    rows = []
+    for (facet, value), count in deltas.items():
+        if facet == 'brand':
+            label = brand_names.get(int(value), '')
+        elif facet == 'category':
+            label = category_names.get(int(value), '')
+        else:
+            label = _label_for(facet, value)
+        rows.append(FacetCount(facet=facet, value=value, label=label, count=count))
+    with transaction.atomic():
+        FacetCount.objects.all().delete()
+        FacetCount.objects.bulk_create(rows, batch_size=1000)
+        transaction.on_commit(_live_catalog_changed)
+    return len(rows)
+
+
+def rename_facet_label(facet, value, label):
+    """Keep a denormalized brand/category label in step with its source row"""
+    if FacetCount.objects.filter(facet=facet, value=str(value)).exclude(label=label).update(label=label):
+        transaction.on_commit(_live_catalog_changed)
+
+
+# =============================================================================
+# READING FACETS
+# =============================================================================
+
+@dataclass
+class FacetValue:
+    value: str
+    label: str
+    count: int
+
+    # Names used by templates/watches/watch_list.html
+    @property
+    def name(self):
+        return self.label
+
+    @property
+    def slug(self):
+        return slugify(self.label)
+
+
+def facet_counts():
+    """All facet counts as {facet: [FacetValue, ...]} (cached, one query on miss)"""
+    facets = cache.get(FACETS_CACHE_KEY)
+    if facets is None:
+        facets = {}
+        for facet, value, label, count in (
+            FacetCount.objects.filter(count__gt=0).values_list('facet', 'value', 'label', 'count')
+        ):
+            facets.setdefault(facet, []).append(FacetValue(value, label, count))
+        price_order = [key for key, *_ in PRICE_BUCKETS]
+        for facet, values in facets.items():
+            if facet == 'price':
+                values.sort(key=lambda fv: price_order.index(fv.value))
+            else:
+                values.sort(key=lambda fv: (-fv.count, fv.label))
+        cache.set(FACETS_CACHE_KEY, facets, None)
+    return facets
+
+
+# =============================================================================
+# QUERYING
+# =============================================================================
+
+def _decimal(raw):
+    try:
+        value = Decimal(raw)
+    except (InvalidOperation, TypeError, ValueError):
+        return None
+    return value if value >= 0 else None
+
+
+@dataclass
+class CatalogQuery:
+    """Browse filters parsed from the query string"""
+
+    q: str = ''
+    brands: list = field(default_factory=list)
+    categories: list = field(default_factory=list)
+    condition: str = ''
+    movements: list = field(default_factory=list)
+    price_min: Decimal = None
+    price_max: Decimal = None
+    has_box: bool = False
+    has_papers: bool = False
+    sort: str = DEFAULT_SORT
+
+    @classmethod
+    def from_request(cls, params):
+        sort = params.get('sort', DEFAULT_SORT)
+        condition = params.get('condition', '')
+        return cls(
+            q=params.get('q', '').strip(),
+            brands=[b for b in params.getlist('brand') if b],
+            categories=[c for c in params.getlist('category') if c],
+            condition=condition if condition in CONDITION_GROUPS or condition == 'vintage' else '',
+            movements=[m.lower() for m in params.getlist('movement') if m],
+            price_min=_decimal(params.get('price_min')),
+            price_max=_decimal(params.get('price_max')),
+            has_box=params.get('has_box') in ('1', 'true', 'on'),
+            has_papers=params.get('has_papers') in ('1', 'true', 'on'),
+            sort=sort if sort in SORT_OPTIONS else DEFAULT_SORT,
+        )
+
+    def price_bucket_key(self):
+        """The PRICE_BUCKETS key exactly covered by price_min/price_max, if any"""
+        for key, _label, low, high in PRICE_BUCKETS:
+            if (self.price_min or Decimal('0')) == low and self.price_max == high:
+                return key
+        return None
+
+    def indexed_key(self, facets):
+        """
+        The single facet row whose count equals this query's result size, or
+        None when the filter combination is not covered by the index.
+        """
+        constraints = []
+        if self.q or self.condition == 'vintage' or len(self.categories) > 1 or len(self.brands) > 1:
+            return None
+        if self.brands:
+            match = [fv for fv in facets.get('brand', []) if fv.label == self.brands[0]]
+            constraints.append(('brand', match[0].value) if match else None)
+        if self.categories:
+            match = [fv for fv in facets.get('category', []) if fv.slug == self.categories[0]]
+            constraints.append(('category', match[0].value) if match else None)
+        if self.condition:
+            constraints.append(('condition', Product.Condition.NEW) if self.condition == 'new' else None)
+        if self.movements:
+            constraints.append(('movement', self.movements[0]) if len(self.movements) == 1 else None)
+        if self.price_min is not None or self.price_max is not None:
+            bucket = self.price_bucket_key()
+            constraints.append(('price', bucket) if bucket else None)
+        if self.has_box:
+            constraints.append(('has_box', 'yes'))
+        if self.has_papers:
+            constraints.append(('has_papers', 'yes'))
+        if not constraints:
+            return ('total', 'all')
+        return constraints[0] if len(constraints) == 1 else None
+
+    def filter(self, queryset, facets):
+        if self.q:
+            queryset = queryset.filter(pk__in=search.search_ids(self.q))
+        if self.brands:
+            queryset = queryset.filter(brand__brand_name__in=self.brands)
+        if self.categories:
+            ids = [fv.value for fv in facets.get('category', []) if fv.slug in self.categories]
+            queryset = queryset.filter(category_id__in=ids)
+        if self.condition == 'vintage':
+            queryset = queryset.filter(year_manufactured__lt=VINTAGE_BEFORE_YEAR)
+        elif self.condition:
+            queryset = queryset.filter(condition__in=CONDITION_GROUPS[self.condition])
+        if self.movements:
+            movement_q = Q()
+            for movement in self.movements:
+                movement_q |= Q(movement_type__iexact=movement)
+            queryset = queryset.filter(movement_q)
+        if self.price_min is not None:
+            queryset = queryset.filter(price__gte=self.price_min)
+        if self.price_max is not None:
+            queryset = queryset.filter(price__lt=self.price_max)
+        if self.has_box:
+            queryset = queryset.filter(has_box=True)
+        if self.has_papers:
+            queryset = queryset.filter(has_papers=True)
+        return queryset
+
+    def active_filters(self):
+        """Chips shown above the results"""
+        chips = []
+        if self.q:
+            chips.append({'key': 'q', 'label': 'Search', 'value': self.q})
+        chips += [{'key': 'brand', 'label': 'Brand', 'value': b} for b in self.brands]
+        chips += [{'key': 'category', 'label': 'Category', 'value': c} for c in self.categories]
+        if self.condition:
+            chips.append({'key': 'condition', 'label': 'Condition', 'value': self.condition})
+        chips += [{'key': 'movement', 'label': 'Movement', 'value': m} for m in self.movements]
+        if self.price_min is not None:
+            chips.append({'key': 'price_min', 'label': 'Min price', 'value': self.price_min})
+        if self.price_max is not None:
+            chips.append({'key': 'price_max', 'label': 'Max price', 'value': self.price_max})
+        if self.has_box:
+            chips.append({'key': 'has_box', 'label': 'Box', 'value': 'yes'})
+        if self.has_papers:
+            chips.append({'key': 'has_papers', 'label': 'Papers', 'value': 'yes'})
+        return chips
+
+
+@dataclass
+class CatalogResult:
+    query: CatalogQuery
+    page: object
+    paginator: CursorPaginator
+    facets: dict
+
+
+def browse(params, cursor=None, per_page=PAGE_SIZE):
+    """Filtered, keyset-paginated listings plus facet counts for the browse page"""
+    query = CatalogQuery.from_request(params)
+    facets = facet_counts()
+    queryset = (
+        query.filter(live_products(), facets)
+        .select_related('brand', 'seller', 'store')
+        .prefetch_related(images.primary_image_prefetch())
+    )
+
+    count = None
+    key = query.indexed_key(facets)
+    if key is not None:
+        count = next((fv.count for fv in facets.get(key[0], []) if fv.value == key[1]), 0)
+    paginator = CursorPaginator(queryset, SORT_OPTIONS[query.sort][1], per_page=per_page, count=count)
+    try:
+        page = paginator.page(cursor)
+    except InvalidCursor:
+        page = paginator.page()
+    return CatalogResult(query=query, page=page, paginator=paginator, facets=facets)
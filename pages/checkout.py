@@ -0,0 +1,284 @@
+"""
+Checkout: turn a cart into orders without selling a watch twice.
+========================================================================================
+
+HOW IT WORKS:
+-------------
+Every listing is one of a kind, so `place_order()` does everything in one
+transaction:
+
+1. Insert one PENDING order per store in the cart. Each order carries the
+   client's idempotency key, and (customer, checkout_key, store) is unique.
+   A retry of the same checkout waits on that index behind the first
+   attempt, then finds its orders instead of placing new ones.
+2. Lock the listings with `SELECT ... FOR UPDATE SKIP LOCKED`. A listing
+   that another buyer's checkout holds is skipped, and so is one that is no
+   longer ACTIVE + APPROVED. Either way it counts as taken straight away;
+   we never queue behind another buyer. On SQLite (no row locks) the order
+   INSERT in step 1 already holds the database write lock, so the same read
+   is exact there too.
+3. If any listing was taken, or its price moved since the cart was shown,
+   roll everything back (CheckoutError). Otherwise move the listings to
+   RESERVED (catalog.bulk_update_products keeps the facet counts right) and
+   insert the order items and one PENDING payment per order.
+
+Order numbers are random (WB-<date>-<10 hex>), so there's no shared
+sequence row to fight over. The unique index catches the
+one-in-a-trillion clash.
+
+A reservation lasts as long as PAYMENT_WINDOW gives the payment method:
+- Cash is paid at the meeting or on delivery, so its hold has no deadline.
+- Bank transfers and wallets must be confirmed in time.
+`release_expired()` (python manage.py release_reservations, from cron every
+minute) cancels the unpaid orders whose hold ran out. Cancelling an order
+puts its watches back on the catalog. Confirming it (payment received, or
+the seller accepting a cash order) marks them SOLD. Both go through
+order_states, wired in pages/signals.py.
+
+USAGE:
+    placed = checkout.place_order(request.user, shopping_cart.items(), key, payment_method='bank')
+    checkout.confirm_payment(order, transaction_id='FT123', by=request.user)
+"""
+
+import secrets
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from . import catalog, order_states
+from .cart import DELIVERY_FEE
+from .models import Order, OrderItem, Payment, Product
+
+
+# payment method -> how long its listings stay reserved without payment (None: until settled)
+PAYMENT_WINDOW = {
+    'cash': None,
+    'bank': timedelta(hours=24),
+    'jazzcash': timedelta(minutes=15),
+}
+MAX_KEY_LENGTH = 64
+SWEEP_BATCH = 500
+
+
+class CheckoutError(Exception):
+    """The cart can't be ordered as shown; nothing was saved"""
+
+    def __init__(self, message, product_ids=()):
+        super().__init__(message)
+        self.product_ids = list(product_ids)
+
+
+class Unavailable(CheckoutError):
+    """Listings sold, reserved by another checkout, or taken off the catalog"""
+
+
+class PriceChanged(CheckoutError):
+    """Listings whose price moved after the cart was shown"""
+
+
+@dataclass
+class Placement:
+    orders: list
+    created: bool        # False: an earlier attempt with the same key placed them
+
+
+def new_key():
+    """Idempotency key for a checkout form"""
+    return secrets.token_hex(16)
+
+
+def order_number(now=None):
+    now = now or timezone.now()
+    return f'WB-{now:%y%m%d}-{secrets.token_hex(5).upper()}'
+
+
+def placed_orders(customer, key):
+    """Orders an earlier checkout with `key` placed"""
+    return list(Order.objects.filter(customer=customer, checkout_key=key).order_by('pk'))
+
+
+# =============================================================================
+# PLACING ORDERS
+# =============================================================================
+
+def place_order(customer, items, key, payment_method='cash', notes='', payment_reference='', agreed_prices=None):
+    """
+    Order the cart `items` (pages/cart.CartItem) for `customer`, one order per
+    store. Retries with the same `key` return the first attempt's orders.
+    Raises Unavailable or PriceChanged if the cart can't be ordered as shown.
+
+    `agreed_prices` ({product id: price}) overrides the listing price for
+    watches bought through an accepted offer (pages/offers.py).
+    """
+    key = (key or '').strip()[:MAX_KEY_LENGTH] or new_key()
+    if payment_method not in PAYMENT_WINDOW:
+        raise ValueError(f'Unknown payment method {payment_method!r}')
+    existing = placed_orders(customer, key)
+    if existing:
+        return Placement(existing, created=False)
+    if not items:
+        raise CheckoutError('The cart is empty')
+
+    try:
+        with transaction.atomic():
+            prices = {item.product.pk: item.price for item in items}
+            prices.update(agreed_prices or {})
+            orders = _create_orders(customer, items, prices, key, notes)
+            _reserve(items, payment_method, negotiated=set(agreed_prices or ()))
+            _add_items_and_payments(orders, items, prices, payment_method, payment_reference)
+    except IntegrityError:
+        # The same checkout was placed concurrently and committed first
+        existing = placed_orders(customer, key)
+        if not existing:
+            raise
+        return Placement(existing, created=False)
+    return Placement(list(orders.values()), created=True)
+
+
+def _by_store(items):
+    grouped = defaultdict(list)
+    for item in items:
+        grouped[item.product.store_id].append(item)
+    return grouped
+
+
+def _create_orders(customer, items, prices, key, notes):
+    """Step 1: the orders themselves (takes the idempotency key's index entry)"""
+    orders = {}
+    for store_id, store_items in _by_store(items).items():
+        subtotal = sum((prices[item.product.pk] * item.quantity for item in store_items), Decimal('0'))
+        shipping = DELIVERY_FEE if any(item.transaction_method == 'delivery' for item in store_items) else Decimal('0')
+        orders[store_id] = Order.objects.create(
+            customer=customer, store_id=store_id, order_number=order_number(), checkout_key=key,
+            subtotal=subtotal, shipping_cost=shipping, total_amount=subtotal + shipping, customer_notes=notes,
+        )
+    return orders
+
+
+def _reserve(items, payment_method, negotiated=()):
+    """Step 2: lock and reserve every listing, or raise without changing any"""
+    wanted = {item.product.pk: item for item in items}
+    candidates = catalog.live_products().filter(pk__in=list(wanted))
+    if connection.features.has_select_for_update_skip_locked:
+        candidates = candidates.select_for_update(skip_locked=True)
+    else:
+        candidates = candidates.select_for_update()
+    current = dict(candidates.values_list('pk', 'price'))
+
+    taken = [pk for pk in wanted if pk not in current]
+    if taken:
+        raise Unavailable('Some watches in your cart have just been sold or reserved', taken)
+    repriced = [pk for pk, price in current.items() if pk not in negotiated and price != wanted[pk].price]
+    if repriced:
+        raise PriceChanged('Some prices in your cart have changed', repriced)
+
+    window = PAYMENT_WINDOW[payment_method]
+    catalog.bulk_update_products(
+        Product.objects.filter(pk__in=list(current)),
+        status=Product.Status.RESERVED,
+        reserved_until=timezone.now() + window if window else None,
+    )
+
+
+def _add_items_and_payments(orders, items, prices, payment_method, payment_reference):
+    """Step 3: order items (name and price as purchased) and one payment per order"""
+    OrderItem.objects.bulk_create([
+        OrderItem(
+            order=orders[item.product.store_id], product=item.product, product_name=str(item.product)[:255],
+            product_price=prices[item.product.pk], quantity=item.quantity,
+            subtotal=prices[item.product.pk] * item.quantity,
+        )
+        for item in items
+    ])
+    for order in orders.values():
+        Payment.objects.create(
+            order=order, amount=order.total_amount, currency=order.currency, payment_gateway=payment_method,
+            gateway_response={'reference': payment_reference} if payment_reference else None,
+        )
+
+
+# =============================================================================
+# SETTLING ORDERS
+# =============================================================================
+
+def confirm_payment(order, transaction_id='', by=None):
+    """
+    Payment received for a PENDING order: complete the payment and confirm
+    the order, which marks its watches SOLD. Raises
+    order_states.InvalidTransition if the order was cancelled meanwhile.
+    """
+    with transaction.atomic():
+        order = order_states.transition(order, Order.Status.CONFIRMED, by=by, note='Payment received')
+        for payment in order.payments.filter(payment_status__in=[Payment.Status.PENDING, Payment.Status.PROCESSING]):
+            payment.payment_status = Payment.Status.COMPLETED
+            payment.payment_completed_at = timezone.now()
+            payment.transaction_id = transaction_id or None
+            payment.save()
+    return order
+
+
+def order_status_changed(order, change):
+    """Status hook (pages/signals.py): confirmed orders sell their watches, cancelled ones release them"""
+    _before, after = change
+    if after not in (Order.Status.CONFIRMED, Order.Status.CANCELLED):
+        return
+    product_ids = list(OrderItem.objects.filter(order=order).values_list('product_id', flat=True))
+    if not product_ids:
+        return
+    if after == Order.Status.CONFIRMED:
+        catalog.bulk_update_products(
+            Product.objects.filter(pk__in=product_ids, status=Product.Status.RESERVED),
+            status=Product.Status.SOLD, reserved_until=None,
+        )
+        return
+    catalog.bulk_update_products(
+        Product.objects.filter(pk__in=product_ids, status__in=[Product.Status.RESERVED, Product.Status.SOLD]),
+        status=Product.Status.ACTIVE, reserved_until=None,
+    )
+    # Saved one by one: store rollups follow payment_status (pages/signals.py)
+    for payment in Payment.objects.filter(order=order, payment_status=Payment.Status.PENDING):
+        payment.payment_status = Payment.Status.CANCELLED
+        payment.save(update_fields=['payment_status', 'updated_at'])
+
+
+def release_expired(now=None, limit=SWEEP_BATCH):
+    """
+    Cancel unpaid orders whose reservation ran out (their watches go back on
+    the catalog). Returns the number of orders cancelled.
+    """
+    now = now or timezone.now()
+    expired = list(
+        Product.objects.filter(status=Product.Status.RESERVED, reserved_until__lte=now)
+        .values_list('pk', flat=True)[:limit]
+    )
+    if not expired:
+        return 0
+    order_ids = list(
+        Order.objects.filter(order_status=Order.Status.PENDING, items__product__in=expired)
+        .values_list('pk', flat=True).distinct()
+    )
+    cancelled = 0
+    for order_id in order_ids:
+        with transaction.atomic():
+            # Paid while we were sweeping: leave it alone
+            order = Order.objects.select_for_update().filter(pk=order_id, order_status=Order.Status.PENDING).first()
+            if order is None:
+                continue
+            order_states.transition(order, Order.Status.CANCELLED, note='Payment not received in time')
+            cancelled += 1
+    # Holds left without a pending order (the order was deleted)
+    held = set(
+        OrderItem.objects.filter(product__in=expired, order__order_status=Order.Status.PENDING)
+        .values_list('product_id', flat=True)
+    )
+    orphans = [pk for pk in expired if pk not in held]
+    if orphans:
+        catalog.bulk_update_products(
+            Product.objects.filter(pk__in=orphans, status=Product.Status.RESERVED, reserved_until__lte=now),
+            status=Product.Status.ACTIVE, reserved_until=None,
+        )
+    return cancelled
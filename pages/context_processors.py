@@ -0,0 +1,22 @@
+"""
+Template context shared by every page.
+
+Registered in TEMPLATES['OPTIONS']['context_processors'] (config/settings.py).
+"""
+
+from . import cart as carts, notify
+
+
+def notifications(request):
+    """Navbar badge count, read from the cache (see pages/notify.py)"""
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return {}
+    return {'unread_notifications_count': notify.unread_count(user.pk)}
+
+
+def cart(request):
+    """Navbar cart badge, from the stored cart (see pages/cart.py; cached, no query when warm)"""
+    if not hasattr(request, 'session'):
+        return {}
+    return {'cart_count': carts.Cart(request).count()}
@@ -0,0 +1,139 @@
+"""
+Write-behind counters for products.view_count and products.favorite_count.
+========================================================================================
+
+WHY:
+----
+An UPDATE per page view takes a row lock on the product, so a popular
+listing turns every visitor into a writer queueing behind the others.
+
+HOW IT WORKS:
+-------------
+- `incr()` adds to an in-memory buffer in the current worker (no query).
+- A background thread flushes the buffer every FLUSH_INTERVAL seconds, or
+  sooner once FLUSH_MAX_KEYS listings are pending. Each flush is one
+  `UPDATE ... SET view_count = view_count + CASE id WHEN ... END` per column
+  per chunk, with ids sorted so concurrent flushes lock rows in the same order.
+- The buffer is flushed at interpreter exit (gunicorn's graceful shutdown),
+  so a restart loses at most the last interval on a hard kill. A failed flush
+  (any error) puts its deltas back into the buffer, and a flusher thread that
+  died is restarted (pages/writebehind.py).
+- View flushes also credit each store's daily rollup (pages/rollups.py).
+- Views are counted once per visitor per listing per VIEW_DEDUPE_WINDOW,
+  using an atomic `cache.add()` in the shared cache.
+- `current()` adds this worker's pending delta to the stored value, so
+  counts shown right after a toggle already include it.
+"""
+
+import atexit
+import hashlib
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.db.models.functions import Greatest
+
+from .writebehind import WriteBehindBuffer
+
+
+COUNTED_FIELDS = ('view_count', 'favorite_count')
+FLUSH_INTERVAL = 5.0
+FLUSH_MAX_KEYS = 500
+FLUSH_CHUNK = 500
+VIEW_DEDUPE_WINDOW = 30 * 60
+
+
+class CounterBuffer(WriteBehindBuffer):
+    """Per-worker buffer of pending counter deltas"""
+
+    thread_name = 'counter-flush'
+
+    def __init__(self, interval=FLUSH_INTERVAL, max_keys=FLUSH_MAX_KEYS):
+        super().__init__(interval, max_keys)
+
+    def _empty(self):
+        return defaultdict(int)  # (product id, field) -> delta
+
+    def _restore(self, batch):
+        for key, delta in batch.items():
+            self._pending[key] += delta
+
+    def incr(self, product_id, field, delta=1):
+        if field not in COUNTED_FIELDS:
+            raise ValueError(f'{field} is not a buffered counter')
+        # Checked here: a bad delta would fail every flush it is retried in
+        delta = int(delta)
+        self._ensure_thread()
+        with self._lock:
+            self._pending[(product_id, field)] += delta
+            size = len(self._pending)
+        self._added(size)
+
+    def pending(self, product_id, field):
+        with self._lock:
+            return self._pending.get((product_id, field), 0)
+
+    def _write(self, pending):
+        by_field = defaultdict(dict)
+        for (product_id, field), delta in pending.items():
+            if delta:
+                by_field[field][product_id] = delta
+        if not by_field:
+            return 0
+
+        from . import rollups
+        from .models import Product
+
+        touched = 0
+        with transaction.atomic():
+            for field, deltas in by_field.items():
+                items = sorted(deltas.items())
+                for start in range(0, len(items), FLUSH_CHUNK):
+                    chunk = items[start:start + FLUSH_CHUNK]
+                    increment = Case(
+                        *[When(pk=product_id, then=Value(delta)) for product_id, delta in chunk],
+                        default=Value(0), output_field=IntegerField(),
+                    )
+                    touched += Product.objects.filter(pk__in=[pk for pk, _ in chunk]).update(
+                        **{field: Greatest(F(field) + increment, Value(0))}
+                    )
+            # Per-store daily views for the seller dashboard
+            rollups.add_views(by_field.get('view_count', {}))
+        return touched
+
+
+buffer = CounterBuffer()
+atexit.register(buffer.flush_at_exit)
+
+
+# =============================================================================
+# PUBLIC API
+# =============================================================================
+
+def incr(product_id, field, delta=1):
+    buffer.incr(product_id, field, delta)
+
+
+def current(product, field):
+    """Stored value plus this worker's pending delta"""
+    return max(getattr(product, field) + buffer.pending(product.pk, field), 0)
+
+
+def _visitor_key(request):
+    if request.user.is_authenticated:
+        return f'u{request.user.pk}'
+    session_key = getattr(request, 'session', None) and request.session.session_key
+    if session_key:
+        return f's{session_key}'
+    raw = f"{request.META.get('REMOTE_ADDR', '')}|{request.META.get('HTTP_USER_AGENT', '')}"
+    return 'a' + hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+
+def record_view(request, product_id):
+    """Count a detail page view once per visitor per VIEW_DEDUPE_WINDOW"""
+    key = f'counters:viewed:{product_id}:{_visitor_key(request)}'
+    if cache.add(key, 1, VIEW_DEDUPE_WINDOW):
+        incr(product_id, 'view_count')
+        return True
+    return False
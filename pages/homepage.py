@@ -0,0 +1,156 @@
+"""
+Homepage sections, pre-rendered off the request path.
+========================================================================================
+
+HOW IT WORKS:
+-------------
+- The three catalog-driven sections of the homepage are rendered to HTML by
+  `build()` from templates/home/*.html:
+    featured       most wished-for live listings
+    new_arrivals   latest live listings
+    brands         brands with the most live listings (catalog facet counts)
+  They are stored together as one shared-cache entry with the time it was
+  built and an ETag.
+- `sections()` hands that entry to the home view without touching the
+  database. An anonymous visitor's homepage therefore costs no queries.
+  The sessions used for the cart badge are read through the cache; see
+  SESSION_ENGINE in config/settings.py.
+- Stale-while-revalidate: the entry is fresh for FRESH_FOR seconds. After
+  that it is still served, and the first worker to notice (an atomic
+  `cache.add()` lock) rebuilds it in a background thread. Only a cold cache
+  builds inline, on the first request after a flush or deploy.
+- Schedule and events:
+    - `python manage.py refresh_homepage` (cron, every few minutes) rebuilds
+      the entry ahead of visitors.
+    - A listing entering, leaving or moving inside the live catalog
+      (pages/catalog.py), or an edit to a listing, its seller or its brand
+      (pages/signals.py), calls `mark_stale()`, so the next visit refreshes
+      the sections.
+- The entry's ETag becomes the home view's ETag for anonymous visitors, so
+  repeat visits get a 304. The ETag also covers the visitor's cart badge
+  and CSRF cookie. No Last-Modified is sent: the build time doesn't change
+  with the cart or the cookie, so a client revalidating by date alone could
+  get a 304 for a page it has never seen. Pages with pending flash messages
+  are never answered with a 304. Logged-in pages carry per-user navbar bits
+  and are always rendered.
+"""
+
+import hashlib
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.db import DatabaseError, connection
+from django.template.loader import render_to_string
+
+from . import cart as carts, catalog, images
+
+
+logger = logging.getLogger(__name__)
+
+ENTRY_KEY = 'home:sections'
+FRESH_KEY = 'home:fresh'
+LOCK_KEY = 'home:refreshing'
+FRESH_FOR = 5 * 60
+ENTRY_TIMEOUT = 24 * 60 * 60
+LOCK_TIMEOUT = 60
+SECTION_SIZE = 4
+BRAND_COUNT = 6
+
+
+# =============================================================================
+# BUILDING
+# =============================================================================
+
+def _listings():
+    return (
+        catalog.live_products()
+        .select_related('brand', 'seller')
+        .prefetch_related(images.primary_image_prefetch())
+    )
+
+
+def _section_context():
+    return {
+        'featured': {'featured_watches': list(_listings().order_by('-favorite_count', '-id')[:SECTION_SIZE])},
+        'new_arrivals': {'new_arrivals': list(_listings().order_by('-created_at', '-id')[:SECTION_SIZE])},
+        'brands': {'popular_brands': catalog.facet_counts().get('brand', [])[:BRAND_COUNT]},
+    }
+
+
+def build():
+    """Render every section and store the entry; returns it"""
+    html = {
+        name: render_to_string(f'home/{name}.html', context)
+        for name, context in _section_context().items()
+    }
+    entry = {
+        'html': html,
+        'built_at': time.time(),
+        'etag': hashlib.md5(''.join(html[name] for name in sorted(html)).encode()).hexdigest()[:16],
+    }
+    cache.set(ENTRY_KEY, entry, ENTRY_TIMEOUT)
+    # Expires on its own after FRESH_FOR; the entry is then served stale while it's rebuilt
+    cache.set(FRESH_KEY, True, FRESH_FOR)
+    return entry
+
+
+def mark_stale():
+    """The live catalog changed: the next visit refreshes the sections"""
+    cache.delete(FRESH_KEY)
+
+
+def _refresh_in_background():
+    if not cache.add(LOCK_KEY, True, LOCK_TIMEOUT):
+        return      # another worker is already on it
+
+    def run():
+        try:
+            build()
+        except DatabaseError:
+            logger.exception('Homepage refresh failed; serving the previous sections')
+        finally:
+            cache.delete(LOCK_KEY)
+            # This thread owns its own connection
+            connection.close()
+
+    threading.Thread(target=run, name='homepage-refresh', daemon=True).start()
+
+
+# =============================================================================
+# SERVING
+# =============================================================================
+
+def _entry(request):
+    """The stored entry (one cache round trip), memoized on the request"""
+    entry = getattr(request, '_home_entry', None)
+    if entry is None:
+        found = cache.get_many([ENTRY_KEY, FRESH_KEY])
+        entry = found.get(ENTRY_KEY)
+        if entry is None:
+            entry = build()
+        elif FRESH_KEY not in found:
+            _refresh_in_background()
+        request._home_entry = entry
+    return entry
+
+
+def sections(request):
+    """{'featured': html, 'new_arrivals': html, 'brands': html} for home.html"""
+    return _entry(request)['html']
+
+
+def _conditional(request):
+    """Anonymous visitor without pending flash messages"""
+    return not request.user.is_authenticated and not len(get_messages(request))
+
+
+def etag(request):
+    """ETag for the home view, or None (always render)"""
+    if not _conditional(request):
+        return None
+    visitor = f'{carts.Cart(request).count()}:{request.COOKIES.get(settings.CSRF_COOKIE_NAME, "")}'
+    return f'{_entry(request)["etag"]}-{hashlib.md5(visitor.encode()).hexdigest()[:8]}'
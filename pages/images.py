@@ -0,0 +1,271 @@
+"""
+Listing photo pipeline.
+========================================================================================
+
+WHY:
+----
+Grids used to load full-size originals (often several MB each). Browsers now
+pick the smallest variant that fits from a srcset, and get a blurred
+placeholder while it loads.
+
+HOW IT WORKS:
+-------------
+- Uploads stream to temporary files on disk (FILE_UPLOAD_HANDLERS in
+  settings). A request never holds a whole photo in memory.
+- `add_to_listing()` checks each file's header only (format, pixel count,
+  size). It moves the temporary file into storage (a rename with
+  FileSystemStorage) and creates the `images` row (PENDING) and its
+  `product_images` link.
+- After commit, each photo is queued on a process pool (IMAGE_WORKERS
+  processes, started with `spawn`) that runs pages/imaging.render_variants:
+  WebP and JPEG at each width in imaging.VARIANT_WIDTHS, plus a blurred
+  placeholder. Resizing is CPU-bound, so it runs in separate processes and
+  outside the request.
+- When a job finishes, its callback records the variants, dimensions,
+  placeholder and `thumbnail_url` (smallest JPEG). It then drops the listing's
+  cached detail page.
+- Templates use `image.webp_srcset`, `image.jpeg_srcset`, `image.placeholder`
+  and `image.card_url`. Until the variants exist they fall back to the
+  original.
+
+Photos left PENDING by a restart are picked up by
+`python manage.py process_images`.
+
+Pillow (and pages/imaging.py) is imported on first use, by an upload or a
+render. Web workers that only show photos never load it.
+"""
+
+import logging
+import multiprocessing
+import posixpath
+import threading
+import uuid
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import Max, Prefetch
+
+from . import render_cache
+from .models import Image, ProductImage
+
+
+logger = logging.getLogger(__name__)
+
+MAX_IMAGES_PER_LISTING = 10
+MAX_UPLOAD_SIZE = 5 * 1024 * 1024
+MAX_PIXELS = 50_000_000
+UPLOAD_DIR = 'listings'
+
+# Pillow format -> stored extension
+ALLOWED_FORMATS = {'JPEG': '.jpg', 'PNG': '.png', 'WEBP': '.webp'}
+
+
+class ImageRejected(Exception):
+    """An upload that isn't an acceptable listing photo"""
+
+
+def inspect(upload):
+    """(format, width, height) read from the file header; raises ImageRejected"""
+    import PIL.Image
+
+    if upload.size > MAX_UPLOAD_SIZE:
+        raise ImageRejected(f'{upload.name} is larger than {MAX_UPLOAD_SIZE // (1024 * 1024)} MB.')
+    try:
+        with PIL.Image.open(upload) as image:
+            image_format, (width, height) = image.format, image.size
+    except (OSError, SyntaxError, PIL.Image.DecompressionBombError) as exc:
+        raise ImageRejected(f'{upload.name} is not an image we can read.') from exc
+    finally:
+        upload.seek(0)
+    if image_format not in ALLOWED_FORMATS:
+        raise ImageRejected(f'{upload.name}: only JPEG, PNG and WebP photos are accepted.')
+    if width * height > MAX_PIXELS:
+        raise ImageRejected(f'{upload.name} is too large ({width}x{height}).')
+    return image_format, width, height
+
+
+def _stem(storage_name):
+    return posixpath.splitext(posixpath.basename(storage_name))[0]
+
+
+def _renderer():
+    """pages.imaging.render_variants, imported (with Pillow) on first use"""
+    from . import imaging
+    return imaging.render_variants
+
+
+def add_to_listing(product, uploads, user):
+    """
+    Store `uploads` as the listing's next photos and queue their variants
+    after commit. The first photo of a listing without one becomes primary.
+    Every file is checked before any is stored.
+    """
+    checked = [(upload, inspect(upload)) for upload in uploads]
+    images = []
+    with transaction.atomic():
+        links = ProductImage.objects.filter(product=product)
+        last = links.aggregate(last=Max('display_order'))['last']
+        start = 0 if last is None else last + 1
+        needs_primary = not links.filter(is_primary=True).exists()
+        for position, (upload, (image_format, width, height)) in enumerate(checked, start=start):
+            name = default_storage.save(
+                f'{UPLOAD_DIR}/{product.pk}/{uuid.uuid4().hex}{ALLOWED_FORMATS[image_format]}', upload,
+            )
+            image = Image.objects.create(
+                image_url=default_storage.url(name), storage_name=name, alt_text=str(product)[:255],
+                image_order=position, uploaded_by=user, width=width, height=height,
+            )
+            ProductImage.objects.create(
+                product=product, image=image, display_order=position,
+                is_primary=needs_primary and position == start,
+            )
+            images.append(image)
+        transaction.on_commit(lambda: schedule(images))
+    return images
+
+
+def primary_image_prefetch():
+    """Prefetch for listing grids: fills product.primary_image with one query per page"""
+    return Prefetch(
+        'product_images',
+        queryset=ProductImage.objects.filter(is_primary=True).select_related('image'),
+        to_attr='primary_image_links',
+    )
+
+
+# =============================================================================
+# RENDERING
+# =============================================================================
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    """This process's worker pool, or None when IMAGE_WORKERS is 0 (render inline)"""
+    global _pool
+    workers = getattr(settings, 'IMAGE_WORKERS', 2)
+    if workers <= 0:
+        return None
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # spawn: workers only import pages.imaging, never a copy of this process's threads
+                _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+    return _pool
+
+
+def _discard_pool(pool):
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _submit(storage_name):
+    pool = _get_pool()
+    job = (_renderer(), default_storage.path(storage_name), _stem(storage_name))
+    try:
+        return pool.submit(*job)
+    except BrokenProcessPool:
+        # A worker died (e.g. OOM-killed): start a fresh pool once
+        _discard_pool(pool)
+        return _get_pool().submit(*job)
+
+
+def schedule(images):
+    """Render variants in the pool (inline when IMAGE_WORKERS is 0)"""
+    for image in images:
+        if _get_pool() is None:
+            process(image)
+            continue
+        try:
+            future = _submit(image.storage_name)
+        except Exception:
+            logger.exception('Could not queue image %s; process_images will pick it up', image.pk)
+            continue
+        future.add_done_callback(partial(_on_done, image.pk, image.storage_name))
+
+
+def _on_done(image_id, storage_name, future):
+    # Runs on the pool's management thread, which has its own connection
+    try:
+        result = future.result()
+    except CancelledError:
+        return  # pool shut down: stays PENDING
+    except Exception:
+        logger.exception('Rendering variants for image %s failed', image_id)
+        Image.objects.filter(pk=image_id).update(status=Image.Status.FAILED)
+    else:
+        record(image_id, storage_name, result)
+    finally:
+        connection.close()
+
+
+def process(image):
+    """Render and record one image's variants in this process; returns True on success"""
+    try:
+        result = _renderer()(default_storage.path(image.storage_name), _stem(image.storage_name))
+    except Exception:
+        logger.exception('Rendering variants for image %s failed', image.pk)
+        Image.objects.filter(pk=image.pk).update(status=Image.Status.FAILED)
+        return False
+    record(image.pk, image.storage_name, result)
+    return True
+
+
+def record(image_id, storage_name, result):
+    """Save a render result on the images row and drop affected cached pages"""
+    directory = posixpath.dirname(storage_name)
+    variants = [
+        {
+            'format': variant['format'],
+            'width': variant['width'],
+            'height': variant['height'],
+            'url': default_storage.url(posixpath.join(directory, variant['name'])),
+        }
+        for variant in result['variants']
+    ]
+    jpegs = [variant for variant in variants if variant['format'] == 'jpeg']
+    Image.objects.filter(pk=image_id).update(
+        status=Image.Status.READY,
+        width=result['width'],
+        height=result['height'],
+        variants=variants,
+        placeholder=result['placeholder'],
+        thumbnail_url=jpegs[0]['url'] if jpegs else '',
+    )
+    render_cache.invalidate_watches(
+        ProductImage.objects.filter(image_id=image_id).values_list('product_id', flat=True)
+    )
+
+
+def process_batch(images, workers=None):
+    """Render `images` in parallel and wait for all of them; returns (ready, failed)"""
+    images = list(images)
+    workers = workers or getattr(settings, 'IMAGE_WORKERS', 2) or 1
+    ready = failed = 0
+    render = _renderer()
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        futures = [
+            (image, pool.submit(
+                render, default_storage.path(image.storage_name), _stem(image.storage_name),
+            ))
+            for image in images
+        ]
+        for image, future in futures:
+            try:
+                result = future.result()
+            except Exception:
+                logger.exception('Rendering variants for image %s failed', image.pk)
+                Image.objects.filter(pk=image.pk).update(status=Image.Status.FAILED)
+                failed += 1
+            else:
+                record(image.pk, image.storage_name, result)
+                ready += 1
+    return ready, failed
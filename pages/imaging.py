@@ -0,0 +1,103 @@
+"""
+Responsive image variants, rendered in pool worker processes.
+========================================================================================
+
+This module only imports Pillow, so spawned workers start without setting up
+Django. It reads one original from disk and writes, next to it:
+
+    <stem>-<width>.webp   WebP at each width
+    <stem>-<width>.jpg    JPEG at each width (for browsers without WebP)
+
+It returns the variant list and a tiny blurred JPEG as a data: URI for the
+placeholder. pages/images.py records the result in the database.
+"""
+
+import base64
+import io
+import os
+
+from PIL import Image, ImageFilter, ImageOps
+
+
+VARIANT_WIDTHS = (320, 640, 1024, 1600)
+PLACEHOLDER_WIDTH = 16
+ORIENTATION_TAG = 0x0112
+ROTATED = {5, 6, 7, 8}  # EXIF orientations that swap width and height
+
+FORMATS = {
+    # format name -> (extension, Pillow format, save options)
+    'webp': ('webp', 'WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('jpg', 'JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def variant_widths(original_width, widths=VARIANT_WIDTHS):
+    """Requested widths that fit, plus the original's own width when below the largest"""
+    fitting = [width for width in sorted(widths) if width <= original_width]
+    if original_width < max(widths) and original_width not in fitting:
+        fitting.append(original_width)
+    return fitting
+
+
+def _flatten(image):
+    """RGB, with any transparency composited onto white"""
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        rgba = image.convert('RGBA')
+        background = Image.new('RGB', rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def _save(image, path, pillow_format, options):
+    # Write then rename, so a reader never sees a half-written file
+    partial = f'{path}.part'
+    image.save(partial, pillow_format, **options)
+    os.replace(partial, path)
+
+
+def placeholder(image):
+    """A ~16px wide blurred JPEG as a data: URI (a few hundred bytes)"""
+    height = max(round(image.height * PLACEHOLDER_WIDTH / image.width), 1)
+    tiny = image.resize((PLACEHOLDER_WIDTH, height), Image.Resampling.BILINEAR).filter(ImageFilter.GaussianBlur(1))
+    buffer = io.BytesIO()
+    tiny.save(buffer, 'JPEG', quality=50)
+    return 'data:image/jpeg;base64,' + base64.b64encode(buffer.getvalue()).decode('ascii')
+
+
+def render_variants(source_path, stem, widths=VARIANT_WIDTHS):
+    """
+    Write the variants of `source_path` into its directory as
+    `<stem>-<width>.<ext>` and describe them:
+
+        {'width': ..., 'height': ...,
+         'variants': [{'format', 'width', 'height', 'name'}, ...],
+         'placeholder': 'data:image/jpeg;base64,...'}
+    """
+    output_dir = os.path.dirname(source_path)
+    with Image.open(source_path) as original:
+        full_width, full_height = original.size
+        if original.getexif().get(ORIENTATION_TAG) in ROTATED:
+            full_width, full_height = full_height, full_width
+        # JPEG: let the decoder downscale by up to 8x instead of decoding every pixel
+        largest = max(widths)
+        original.draft('RGB', (largest, largest))
+        image = _flatten(ImageOps.exif_transpose(original))
+
+    variants = []
+    for width in sorted(variant_widths(image.width, widths), reverse=True):
+        height = max(round(image.height * width / image.width), 1)
+        resized = image if width == image.width else image.resize(
+            (width, height), Image.Resampling.LANCZOS, reducing_gap=3.0,
+        )
+        for image_format, (extension, pillow_format, options) in FORMATS.items():
+            name = f'{stem}-{width}.{extension}'
+            _save(resized, os.path.join(output_dir, name), pillow_format, options)
+            variants.append({'format': image_format, 'width': width, 'height': height, 'name': name})
+    variants.sort(key=lambda variant: (variant['format'], variant['width']))
+    return {
+        'width': full_width,
+        'height': full_height,
+        'variants': variants,
+        'placeholder': placeholder(image),
+    }
@@ -0,0 +1,176 @@
+"""
+Conversation inbox read model.
+========================================================================================
+
+HOW IT WORKS:
+-------------
+- InboxEntry (`chat_inbox`) holds one row per participant per conversation:
+  the other participant, the listing, the latest message snippet and sender,
+  `last_message_at` and that participant's unread count.
+- Both rows are created with the conversation and moved by every new message
+  (post_save signals, pages/signals.py) in the same transaction as the INSERT,
+  with one UPDATE over the two rows:
+    every row          snippet, sender, last_message_at
+    recipient's row    unread_count +1
+  The snippet only moves forward (`last_message_id` guard), so two messages
+  committing out of order can't leave the older one on top.
+  `chat_conversations.last_message_at` moves with them.
+- Opening a thread (`mark_read`) flips the other side's messages to read and
+  takes exactly that many off the reader's count, so a message arriving in
+  between stays unread.
+
+The inbox is one range scan over (user, last_message_at, id). Threads are
+keyset-paginated backwards from the newest message over
+idx_messages_conv_created. After raw SQL imports, run
+`python manage.py rebuild_inbox`.
+"""
+
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Case, Count, F, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import Conversation, InboxEntry, Message
+
+
+INBOX_SIZE = 100
+THREAD_PAGE_SIZE = 30
+
+
+def snippet(message):
+    text = message.message_text[:InboxEntry.SNIPPET_LENGTH]
+    return text or message.get_message_type_display()
+
+
+def _entries(conversation, last_message=None, unread=None):
+    """Unsaved rows for both participants (one when a seller messages their own listing)"""
+    customer_id, seller_user_id = conversation.participant_user_ids()
+    pairs = {customer_id: seller_user_id, seller_user_id: customer_id}
+    unread = unread or {}
+    return [
+        InboxEntry(
+            user_id=user_id,
+            other_user_id=other_id,
+            conversation=conversation,
+            product_id=conversation.product_id,
+            last_message_id=last_message.pk if last_message else None,
+            last_message_text=snippet(last_message) if last_message else '',
+            last_sender_id=last_message.sender_id if last_message else None,
+            last_message_at=last_message.created_at if last_message else conversation.created_at,
+            unread_count=sum(count for sender_id, count in unread.items() if sender_id != user_id),
+        )
+        for user_id, other_id in pairs.items()
+    ]
+
+
+def open_conversation(conversation):
+    """Create the participants' inbox rows for a new conversation"""
+    InboxEntry.objects.bulk_create(_entries(conversation), ignore_conflicts=True)
+
+
+def record_message(message):
+    """Move both participants' rows to a newly written message"""
+    conversation = message.conversation
+    newer = Q(last_message_id__isnull=True) | Q(last_message_id__lt=message.pk)
+
+    def if_newer(column, value):
+        return Case(
+            When(newer, then=Value(value)), default=F(column), output_field=InboxEntry._meta.get_field(column),
+        )
+
+    changes = {
+        'last_message_id': if_newer('last_message_id', message.pk),
+        'last_message_text': if_newer('last_message_text', snippet(message)),
+        'last_sender_id': if_newer('last_sender_id', message.sender_id),
+        'last_message_at': if_newer('last_message_at', message.created_at),
+        'unread_count': Case(
+            When(~Q(user_id=message.sender_id), then=F('unread_count') + 1), default=F('unread_count'),
+        ),
+    }
+    with transaction.atomic():
+        rows = InboxEntry.objects.filter(conversation_id=conversation.pk)
+        if not rows.update(**changes):
+            open_conversation(conversation)
+            rows.update(**changes)
+        Conversation.objects.filter(
+            Q(last_message_at__isnull=True) | Q(last_message_at__lt=message.created_at), pk=conversation.pk,
+        ).update(last_message_at=message.created_at)
+
+
+def mark_read(entry):
+    """
+    Mark the other participant's messages in `entry`'s conversation read and
+    take that many off the reader's count. Returns the number marked.
+    """
+    if not entry.unread_count:
+        return 0
+    with transaction.atomic():
+        marked = (
+            Message.objects.filter(conversation_id=entry.conversation_id, is_read=False)
+            .exclude(sender_id=entry.user_id)
+            .update(is_read=True, read_at=timezone.now())
+        )
+        InboxEntry.objects.filter(pk=entry.pk).update(unread_count=Greatest(F('unread_count') - marked, Value(0)))
+    entry.unread_count = max(entry.unread_count - marked, 0)
+    return marked
+
+
+# =============================================================================
+# READING
+# =============================================================================
+
+def inbox_for(user, limit=INBOX_SIZE):
+    """The user's conversations, most recent first"""
+    return list(
+        InboxEntry.objects.filter(user=user)
+        .select_related('other_user', 'product__brand')
+        .order_by('-last_message_at', '-id')[:limit]
+    )
+
+
+def entry_for(user, conversation_id):
+    """The user's row for one conversation, or None if they aren't in it"""
+    return (
+        InboxEntry.objects.filter(user=user, conversation_id=conversation_id)
+        .select_related('other_user', 'product__brand')
+        .first()
+    )
+
+
+# =============================================================================
+# REBUILD
+# =============================================================================
+
+def rebuild(conversation_ids=None):
+    """
+    Recreate inbox rows from chat_conversations and messages: the latest
+    message per conversation and unread counts from one GROUP BY.
+    """
+    conversations = Conversation.objects.select_related('seller')
+    unread_messages = Message.objects.filter(is_read=False)
+    existing = InboxEntry.objects.all()
+    if conversation_ids is not None:
+        conversations = conversations.filter(pk__in=conversation_ids)
+        unread_messages = unread_messages.filter(conversation_id__in=conversation_ids)
+        existing = existing.filter(conversation_id__in=conversation_ids)
+
+    latest = Message.objects.filter(conversation=OuterRef('pk')).order_by('-id').values('id')[:1]
+    conversations = list(conversations.annotate(last_id=Subquery(latest)))
+    last_messages = Message.objects.in_bulk([c.last_id for c in conversations if c.last_id])
+    unread = defaultdict(Counter)
+    for row in unread_messages.values('conversation_id', 'sender_id').annotate(count=Count('id')).order_by():
+        unread[row['conversation_id']][row['sender_id']] = row['count']
+
+    entries = []
+    for conversation in conversations:
+        last_message = last_messages.get(conversation.last_id)
+        conversation.last_message_at = last_message.created_at if last_message else None
+        entries.extend(_entries(conversation, last_message, unread[conversation.pk]))
+
+    with transaction.atomic():
+        existing.delete()
+        InboxEntry.objects.bulk_create(entries, batch_size=1000, ignore_conflicts=True)
+        Conversation.objects.bulk_update(conversations, ['last_message_at'], batch_size=1000)
+    return len(entries)
@@ -0,0 +1,328 @@
+"""
+Bulk listing import from CSV or JSON Lines.
+========================================================================================
+
+HOW IT WORKS:
+-------------
+- The file is read one row at a time (csv.DictReader, or one JSON object per
+  line). Memory stays flat however many listings it holds.
+- Each row is checked against the `products` constraints before it gets near
+  the database: condition enum, year 1800..next year, 0 <= price with at most
+  12 digits, column lengths. Brands and categories resolve through name -> id
+  dicts loaded once per import.
+- Valid rows are collected into chunks of CHUNK_SIZE. Each chunk is written
+  with bulk_create in its own transaction, so an import of 10k listings is a
+  handful of INSERTs rather than 10k. If a chunk fails anyway, its rows are
+  retried one by one so only the bad rows are reported.
+- bulk_create skips model signals, so every chunk adds its own facet counts
+  (pages/catalog.py). The search index finds the new rows through its
+  `updated_at` watermark.
+- Errors are reported per row (line, column, message). A row with an error
+  is skipped and the others still import.
+
+Imported listings are ACTIVE and wait for approval, like listings created
+one at a time.
+
+COLUMNS (header names; the create-listing form's names work too):
+    model_name (model)  condition  price                            required
+    brand  category  reference_number (model_number)  year_manufactured (year)
+    original_price  currency  description  case_material  movement_type
+    case_diameter_mm (case_diameter)  water_resistance
+    has_box  has_papers  has_warranty  warranty_months
+
+USAGE:
+    python manage.py import_listings dealer.csv --store 12
+    result = listing_import.import_listings(uploaded_file, store)
+"""
+
+import csv
+import io
+import json
+import os
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+
+from . import catalog
+from .models import Brand, Product, ProductCategory
+
+
+CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 500
+MIN_YEAR = 1800
+MAX_PRICE = Decimal('9999999999.99')  # DECIMAL(12, 2)
+MAX_CASE_DIAMETER = Decimal('999.99')  # DECIMAL(5, 2)
+
+FORMATS = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl'}
+
+# Header aliases used by the create-listing form
+COLUMN_ALIASES = {
+    'model': 'model_name',
+    'model_number': 'reference_number',
+    'year': 'year_manufactured',
+    'case_diameter': 'case_diameter_mm',
+}
+TEXT_FIELDS = (
+    'model_name', 'reference_number', 'description', 'case_material',
+    'movement_type', 'water_resistance', 'currency',
+)
+BOOLEAN_FIELDS = ('has_box', 'has_papers', 'has_warranty')
+TRUE_VALUES = {'1', 'true', 'yes', 'y'}
+FALSE_VALUES = {'', '0', 'false', 'no', 'n'}
+
+
+class ImportFormatError(Exception):
+    """The file isn't CSV or JSON Lines we can read"""
+
+
+@dataclass
+class RowError:
+    line: int
+    column: str
+    message: str
+
+
+@dataclass
+class ImportResult:
+    rows: int = 0
+    imported: int = 0
+    rejected: int = 0
+    errors: list = field(default_factory=list)
+    seconds: float = 0.0
+    dry_run: bool = False
+
+    @property
+    def valid(self):
+        return self.rows - self.rejected
+
+    @property
+    def errors_truncated(self):
+        return len(self.errors) >= MAX_REPORTED_ERRORS
+
+    def reject(self, line, problems):
+        """Count a skipped row and keep (up to MAX_REPORTED_ERRORS of) its errors"""
+        self.rejected += 1
+        for column, message in problems:
+            if len(self.errors) < MAX_REPORTED_ERRORS:
+                self.errors.append(RowError(line, column, message))
+
+
+# =============================================================================
+# READING
+# =============================================================================
+
+def detect_format(filename):
+    file_format = FORMATS.get(os.path.splitext(filename or '')[1].lower())
+    if file_format is None:
+        raise ImportFormatError('Upload a .csv or .jsonl file.')
+    return file_format
+
+
+def _normalize(raw):
+    row = {}
+    for key, value in raw.items():
+        if key is None:
+            continue  # surplus CSV cells
+        key = str(key).strip().lower()
+        row[COLUMN_ALIASES.get(key, key)] = value
+    return row
+
+
+def read_rows(binary_file, file_format):
+    """
+    Yield (line number, row dict) one row at a time. A row that can't be
+    parsed yields (line number, error message) instead of a dict.
+    """
+    text = io.TextIOWrapper(binary_file, encoding='utf-8-sig', newline='')
+    try:
+        if file_format == 'csv':
+            reader = csv.DictReader(text)
+            if not reader.fieldnames:
+                raise ImportFormatError('The CSV file has no header row.')
+            for row in reader:
+                yield reader.line_num, _normalize(row)
+            return
+        for line, content in enumerate(text, start=1):
+            if not content.strip():
+                continue
+            try:
+                row = json.loads(content)
+            except ValueError:
+                yield line, 'Not valid JSON'
+                continue
+            yield (line, _normalize(row)) if isinstance(row, dict) else (line, 'Expected a JSON object')
+    except UnicodeDecodeError as exc:
+        raise ImportFormatError('The file is not UTF-8 text.') from exc
+    finally:
+        text.detach()  # leave the caller's file open
+
+
+# =============================================================================
+# VALIDATION
+# =============================================================================
+
+def _clean(value):
+    return '' if value is None else str(value).strip()
+
+
+class RowValidator:
+    """Turns row dicts into unsaved Products for one store"""
+
+    def __init__(self, store):
+        self.store = store
+        self.brands = {name.lower(): pk for pk, name in Brand.objects.values_list('pk', 'brand_name')}
+        self.categories = {
+            name.lower(): pk for pk, name in ProductCategory.objects.values_list('pk', 'category_name')
+        }
+        self.max_year = timezone.localdate().year + 1
+        self.conditions = {}
+        for value, label in Product.Condition.choices:
+            for name in (value, label, value.replace('_', ' '), value.replace('_', '-')):
+                self.conditions[name.lower()] = value
+        self.conditions['brand new'] = Product.Condition.NEW  # create-listing form label
+        self.max_lengths = {name: Product._meta.get_field(name).max_length for name in TEXT_FIELDS}
+
+    def _decimal(self, raw, column, problems, maximum=MAX_PRICE):
+        if raw == '':
+            return None
+        try:
+            value = Decimal(raw.replace(',', ''))
+        except InvalidOperation:
+            problems.append((column, f'"{raw}" is not a number'))
+            return None
+        if not value.is_finite() or value < 0:
+            problems.append((column, 'must be 0 or more'))
+        elif value > maximum or value != value.quantize(Decimal('0.01')):
+            problems.append((column, f'must be at most {maximum} with 2 decimal places'))
+        return value
+
+    def _integer(self, raw, column, problems):
+        if raw == '':
+            return None
+        try:
+            return int(raw)
+        except ValueError:
+            problems.append((column, f'"{raw}" is not a whole number'))
+            return None
+
+    def build(self, raw):
+        """(Product, []) for a valid row, or (None, [(column, message), ...])"""
+        row = {key: _clean(value) for key, value in raw.items()}
+        problems = []
+        values = {}
+
+        for name in TEXT_FIELDS:
+            value = row.get(name, '')
+            limit = self.max_lengths[name]
+            if limit and len(value) > limit:
+                problems.append((name, f'longer than {limit} characters'))
+            if value:
+                values[name] = value
+        if not values.get('model_name'):
+            problems.append(('model_name', 'is required'))
+
+        condition = row.get('condition', '')
+        values['condition'] = self.conditions.get(condition.lower())
+        if values['condition'] is None:
+            problems.append(('condition', f'"{condition}" is not one of {", ".join(Product.Condition.values)}'
+                             if condition else 'is required'))
+
+        values['price'] = self._decimal(row.get('price', ''), 'price', problems)
+        if values['price'] is None and not any(column == 'price' for column, _ in problems):
+            problems.append(('price', 'is required'))
+        values['original_price'] = self._decimal(row.get('original_price', ''), 'original_price', problems)
+        values['case_diameter_mm'] = self._decimal(
+            row.get('case_diameter_mm', ''), 'case_diameter_mm', problems, maximum=MAX_CASE_DIAMETER,
+        )
+
+        year = self._integer(row.get('year_manufactured', ''), 'year_manufactured', problems)
+        if year is not None and not MIN_YEAR <= year <= self.max_year:
+            problems.append(('year_manufactured', f'must be between {MIN_YEAR} and {self.max_year}'))
+        values['year_manufactured'] = year
+        values['warranty_months'] = self._integer(row.get('warranty_months', ''), 'warranty_months', problems)
+
+        for name in BOOLEAN_FIELDS:
+            flag = row.get(name, '').lower()
+            if flag in TRUE_VALUES:
+                values[name] = True
+            elif flag in FALSE_VALUES:
+                values[name] = False
+            else:
+                problems.append((name, f'"{row[name]}" is not yes/no'))
+
+        for column, lookup, target in (('brand', self.brands, 'brand_id'), ('category', self.categories, 'category_id')):
+            name = row.get(column, '')
+            if name:
+                values[target] = lookup.get(name.lower())
+                if values[target] is None:
+                    problems.append((column, f'unknown {column} "{name}"'))
+
+        if problems:
+            return None, problems
+        return Product(
+            seller_id=self.store.seller_id,
+            store_id=self.store.pk,
+            status=Product.Status.ACTIVE,
+            approval_status=Product.ApprovalStatus.PENDING,
+            **values,
+        ), []
+
+
+# =============================================================================
+# WRITING
+# =============================================================================
+
+def _insert(products):
+    with transaction.atomic():
+        Product.objects.bulk_create(products)
+        # bulk_create sends no post_save: count live listings into the facet index here
+        catalog.apply_deltas(Counter(
+            key for product in products for key in catalog.facet_keys(catalog.snapshot(product))
+        ))
+
+
+def _write_chunk(chunk, result):
+    try:
+        _insert([product for _, product in chunk])
+        result.imported += len(chunk)
+    except DatabaseError:
+        # Find the offending rows; the rest of the chunk still goes in
+        for line, product in chunk:
+            try:
+                _insert([product])
+                result.imported += 1
+            except DatabaseError as exc:
+                result.reject(line, [('', f'rejected by the database: {exc}')])
+
+
+def import_listings(source, store, file_format=None, dry_run=False, chunk_size=CHUNK_SIZE):
+    """
+    Import listings for `store` from a binary file object (an upload or an
+    open file). With `dry_run`, rows are validated but nothing is written.
+    """
+    started = time.perf_counter()
+    file_format = file_format or detect_format(getattr(source, 'name', ''))
+    validator = RowValidator(store)
+    result = ImportResult(dry_run=dry_run)
+    chunk = []
+    for line, row in read_rows(getattr(source, 'file', source), file_format):
+        result.rows += 1
+        if isinstance(row, str):
+            result.reject(line, [('', row)])
+            continue
+        product, problems = validator.build(row)
+        if problems:
+            result.reject(line, problems)
+        elif not dry_run:
+            chunk.append((line, product))
+            if len(chunk) >= chunk_size:
+                _write_chunk(chunk, result)
+                chunk = []
+    if chunk:
+        _write_chunk(chunk, result)
+    result.seconds = time.perf_counter() - started
+    return result
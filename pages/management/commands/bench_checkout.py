@@ -0,0 +1,179 @@
+"""
+Load tool for checkout: many buyers racing for the same few watches.
+
+Correctness (no double sale, idempotent replay, expiring reservations) is
+covered by CheckoutConcurrencyTests and ReservationExpiryTests in
+pages/tests.py; this command measures throughput and latency under
+contention, and checks the same invariants at a larger scale.
+
+USAGE:
+    python manage.py bench_checkout
+    python manage.py bench_checkout --threads 32 --buyers 200 --products 50 --attempts 5
+
+Runs against a throwaway test database (created and destroyed by the
+command), using whichever engine DATABASE_URL selects. On SQLite it is a file,
+not the usual in-memory database, so that each thread gets its own connection.
+
+--threads workers place orders for --buyers customers. Each checkout picks one
+or two watches from a hot set of --products, so most attempts collide. The
+command then:
+- retries one checkout from every thread at once with the same idempotency
+  key, and checks that exactly one set of orders exists;
+- checks that no watch sits on two live orders, and that every ordered watch
+  is RESERVED and off the catalog facet counts;
+- reports checkouts/s and p50/p95 latency.
+It fails on any double sale or unexpected database error.
+"""
+
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection
+from django.db.models import Count
+
+from pages import catalog, checkout
+from pages.cart import CartItem
+from pages.models import Brand, FacetCount, Order, OrderItem, Product, Seller, Store
+
+
+class Command(BaseCommand):
+    help = 'Race concurrent checkouts for the same listings and verify nothing is sold twice'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--buyers', type=int, default=64)
+        parser.add_argument('--products', type=int, default=20, help='Size of the contended set')
+        parser.add_argument('--attempts', type=int, default=4, help='Checkouts per buyer')
+        parser.add_argument('--stores', type=int, default=3)
+
+    def handle(self, *args, **options):
+        path = None
+        if connection.vendor == 'sqlite':
+            # Shared-cache in-memory databases fail instead of waiting on locks
+            handle, path = tempfile.mkstemp(suffix='.sqlite3')
+            os.close(handle)
+            connection.settings_dict.setdefault('TEST', {})['NAME'] = path
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            buyers, products = self._seed(options)
+            race = self._race(buyers, products, options)
+            replay = self._replay(buyers[0], products, options['threads'])
+            self._verify()
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            if path and os.path.exists(path):
+                os.unlink(path)
+
+        latencies = sorted(race['latencies'])
+        self.stdout.write(
+            f'{connection.vendor}: {len(latencies)} checkouts on {options["threads"]} threads in '
+            f'{race["seconds"]:.2f}s ({len(latencies) / race["seconds"]:,.0f}/s); '
+            f'{race["outcomes"]["placed"]} placed, {race["outcomes"]["unavailable"]} found the watch taken, '
+            f'{race["outcomes"]["error"]} database errors'
+        )
+        self.stdout.write(
+            f'latency p50 {statistics.median(latencies) * 1000:.1f}ms, '
+            f'p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:.1f}ms'
+        )
+        self.stdout.write(f'idempotent replay: {options["threads"]} concurrent submits -> {replay} order(s)')
+        if race['outcomes']['error']:
+            raise CommandError(f'{race["outcomes"]["error"]} checkouts failed with a database error: {race["errors"][0]}')
+        if replay != 1:
+            raise CommandError(f'Replaying one checkout key placed {replay} orders')
+        self.stdout.write(self.style.SUCCESS('No watch was sold twice'))
+
+    def _seed(self, options):
+        User = get_user_model()
+        brand = Brand.objects.create(brand_name='Bench')
+        stores = []
+        for i in range(options['stores']):
+            seller = Seller.objects.create(user=User.objects.create_user(f'bench-seller-{i}'), cnic=f'00000-000000{i}-0')
+            stores.append(Store.objects.create(seller=seller, store_name=f'Bench {i}', store_slug=f'bench-{i}'))
+        for i in range(options['products'] + 1):
+            store = stores[i % len(stores)]
+            Product.objects.create(
+                seller_id=store.seller_id, store=store, brand=brand, model_name=f'Contended {i}',
+                condition=Product.Condition.NEW, price=10_000 + i,
+                status=Product.Status.ACTIVE, approval_status=Product.ApprovalStatus.APPROVED,
+            )
+        User.objects.bulk_create([User(username=f'bench-buyer-{i}') for i in range(options['buyers'])])
+        buyers = list(User.objects.filter(username__startswith='bench-buyer-').order_by('pk'))
+        products = list(Product.objects.select_related('brand').order_by('pk'))
+        return buyers, products
+
+    def _checkout(self, buyer, products, key=None):
+        items = [CartItem(product, 1, product.price, 'delivery') for product in products]
+        try:
+            placed = checkout.place_order(buyer, items, key or checkout.new_key())
+            return 'placed' if placed.created else 'replayed', None
+        except checkout.CheckoutError:
+            return 'unavailable', None
+        except DatabaseError as error:
+            return 'error', error
+        finally:
+            connection.close()
+
+    def _race(self, buyers, products, options):
+        # The last product is kept for the replay test
+        hot = products[:-1]
+        jobs = []
+        rng = random.Random(7)
+        for _ in range(options['attempts']):
+            for buyer in buyers:
+                jobs.append((buyer, rng.sample(hot, rng.choice([1, 1, 2]))))
+
+        latencies, outcomes, errors = [], Counter(), []
+        lock = threading.Lock()
+
+        def run(job):
+            started = time.perf_counter()
+            outcome, error = self._checkout(*job)
+            with lock:
+                latencies.append(time.perf_counter() - started)
+                outcomes[outcome] += 1
+                if error is not None:
+                    errors.append(error)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            list(pool.map(run, jobs))
+        return {'seconds': time.perf_counter() - started, 'latencies': latencies, 'outcomes': outcomes, 'errors': errors}
+
+    def _replay(self, buyer, products, threads):
+        key = checkout.new_key()
+        barrier = threading.Barrier(threads)
+
+        def submit(_):
+            barrier.wait()
+            return self._checkout(buyer, products[-1:], key)
+
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            results = list(pool.map(submit, range(threads)))
+        failed = [error for outcome, error in results if outcome == 'error']
+        if failed:
+            raise CommandError(f'Replayed checkout failed with a database error: {failed[0]}')
+        return Order.objects.filter(customer=buyer, checkout_key=key).count()
+
+    def _verify(self):
+        live_orders = OrderItem.objects.exclude(order__order_status=Order.Status.CANCELLED)
+        oversold = list(
+            live_orders.values('product_id').annotate(orders=Count('order_id')).filter(orders__gt=1)
+            .values_list('product_id', flat=True)
+        )
+        if oversold:
+            raise CommandError(f'Sold twice: products {oversold}')
+        ordered = set(live_orders.values_list('product_id', flat=True))
+        reserved = set(Product.objects.filter(status=Product.Status.RESERVED).values_list('pk', flat=True))
+        if ordered != reserved:
+            raise CommandError(f'Ordered {sorted(ordered)} but reserved {sorted(reserved)}')
+        indexed = FacetCount.objects.filter(facet='total', value='all').values_list('count', flat=True).first() or 0
+        if indexed != catalog.live_products().count():
+            raise CommandError(f'Facet total {indexed} != {catalog.live_products().count()} live listings')
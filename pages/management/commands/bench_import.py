@@ -0,0 +1,113 @@
+"""
+Benchmark the bulk listing import.
+
+USAGE:
+    python manage.py bench_import
+    python manage.py bench_import --rows 50000 --format jsonl --invalid 0.02
+
+Runs against a throwaway test database (created and destroyed by the
+command), using whichever engine DATABASE_URL selects (SQLite or PostgreSQL).
+Writes a synthetic dealer file with --rows listings (a share of them
+deliberately invalid), then times parsing, validation and insertion through
+pages/listing_import.py. Fails if the import takes longer than --target-s.
+"""
+
+import csv
+import json
+import os
+import random
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from pages import listing_import
+from pages.models import Brand, Product, ProductCategory, Seller, Store
+
+
+BRANDS = ['Rolex', 'Omega', 'TAG Heuer', 'Cartier', 'Seiko', 'Citizen', 'Casio', 'Tissot', 'Tudor', 'Longines']
+CATEGORIES = ['Luxury', 'Sports', 'Dress', 'Dive', 'Aviation', 'Chronograph', 'Vintage']
+CONDITIONS = ['New', 'Like New', 'EXCELLENT', 'good', 'Fair']
+MOVEMENTS = ['Automatic', 'Quartz', 'Manual']
+COLUMNS = [
+    'brand', 'category', 'model', 'model_number', 'year', 'condition', 'price',
+    'movement_type', 'case_material', 'case_diameter', 'has_box', 'has_papers', 'description',
+]
+
+
+def _row(rng, i, invalid):
+    row = {
+        'brand': rng.choice(BRANDS),
+        'category': rng.choice(CATEGORIES),
+        'model': f'Model {i}',
+        'model_number': f'REF-{i:06d}',
+        'year': str(rng.randint(1960, 2025)),
+        'condition': rng.choice(CONDITIONS),
+        'price': f'{rng.randint(5_000, 5_000_000)}.00',
+        'movement_type': rng.choice(MOVEMENTS),
+        'case_material': 'Stainless Steel',
+        'case_diameter': str(rng.choice([36, 39, 40, 41, 42, 44])),
+        'has_box': rng.choice(['yes', 'no']),
+        'has_papers': rng.choice(['yes', 'no']),
+        'description': 'Serviced, keeps time well. ' * rng.randint(1, 4),
+    }
+    if invalid:
+        broken = rng.choice(['condition', 'price', 'year', 'brand'])
+        row[broken] = {'condition': 'Mint', 'price': '-5', 'year': '1700', 'brand': 'Unknown Brand'}[broken]
+    return row
+
+
+class Command(BaseCommand):
+    help = 'Time a bulk listing import of N rows into a throwaway database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10_000)
+        parser.add_argument('--format', choices=['csv', 'jsonl'], default='csv')
+        parser.add_argument('--invalid', type=float, default=0.01, help='Share of deliberately bad rows')
+        parser.add_argument('--chunk-size', type=int, default=listing_import.CHUNK_SIZE)
+        parser.add_argument('--target-s', type=float, default=30.0, help='Fail above this import time')
+
+    def handle(self, *args, **options):
+        path = self._write_file(options)
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            store = self._seed()
+            with open(path, 'rb') as source:
+                result = listing_import.import_listings(source, store, chunk_size=options['chunk_size'])
+            stored = Product.objects.count()
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            os.unlink(path)
+
+        self.stdout.write(
+            f'{connection.vendor}: {result.rows} {options["format"]} rows in {result.seconds:.2f}s '
+            f'({result.rows / result.seconds:,.0f} rows/s); imported {result.imported}, rejected {result.rejected}'
+        )
+        if stored != result.imported:
+            raise CommandError(f'{stored} products stored but {result.imported} reported imported')
+        if result.seconds > options['target_s']:
+            raise CommandError(f'Import took {result.seconds:.1f}s, over the {options["target_s"]}s target')
+        self.stdout.write(self.style.SUCCESS('Within target'))
+
+    def _write_file(self, options):
+        rng = random.Random(42)
+        suffix = '.csv' if options['format'] == 'csv' else '.jsonl'
+        with tempfile.NamedTemporaryFile('w', suffix=suffix, delete=False, newline='', encoding='utf-8') as out:
+            if options['format'] == 'csv':
+                writer = csv.DictWriter(out, fieldnames=COLUMNS)
+                writer.writeheader()
+                for i in range(options['rows']):
+                    writer.writerow(_row(rng, i, rng.random() < options['invalid']))
+            else:
+                for i in range(options['rows']):
+                    out.write(json.dumps(_row(rng, i, rng.random() < options['invalid'])) + '\n')
+        return out.name
+
+    def _seed(self):
+        user = get_user_model().objects.create_user('bench-dealer')
+        seller = Seller.objects.create(user=user, cnic='00000-0000000-0')
+        store = Store.objects.create(seller=seller, store_name='Bench Dealer', store_slug='bench-dealer')
+        Brand.objects.bulk_create([Brand(brand_name=name) for name in BRANDS])
+        ProductCategory.objects.bulk_create([ProductCategory(category_name=name) for name in CATEGORIES])
+        return store
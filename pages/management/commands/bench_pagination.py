@@ -0,0 +1,98 @@
+"""
+Benchmark OFFSET vs keyset (cursor) pagination as page depth grows.
+
+USAGE:
+    python manage.py bench_pagination
+    python manage.py bench_pagination --rows 200000 --depths 1 50 500 2000
+
+Runs against a throwaway test database (created and destroyed by the
+command), so your development data is never touched.
+"""
+
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from pages.models import Brand, Product, Seller, Store
+from pages.pagination import CursorPaginator
+
+
+class Command(BaseCommand):
+    help = 'Compare OFFSET and cursor pagination latency at increasing page depths'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100_000)
+        parser.add_argument('--per-page', type=int, default=24)
+        parser.add_argument('--depths', type=int, nargs='+', default=[1, 10, 100, 500, 1000, 4000])
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--sort', default='price_low', choices=['price_low', 'newest'])
+
+    def handle(self, *args, **options):
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self._seed(options['rows'])
+            self._run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def _seed(self, rows):
+        user = get_user_model().objects.create_user('bench-seller')
+        seller = Seller.objects.create(user=user, cnic='00000-0000000-0')
+        store = Store.objects.create(seller=seller, store_name='Bench', store_slug='bench')
+        brand = Brand.objects.create(brand_name='Bench')
+        rng = random.Random(42)
+        batch = []
+        for i in range(rows):
+            batch.append(Product(
+                seller=seller, store=store, brand=brand, model_name=f'Model {i}',
+                condition=Product.Condition.GOOD, price=Decimal(rng.randint(5_000, 2_000_000)),
+                status=Product.Status.ACTIVE, approval_status=Product.ApprovalStatus.APPROVED,
+            ))
+            if len(batch) == 5000:
+                Product.objects.bulk_create(batch)
+                batch = []
+        Product.objects.bulk_create(batch)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE' if connection.vendor == 'sqlite' else 'ANALYZE products')
+        self.stdout.write(f'Seeded {rows} products')
+
+    def _time(self, fn, repeat):
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            samples.append((time.perf_counter() - start) * 1000)
+        return statistics.median(samples)
+
+    def _run(self, options):
+        per_page, repeat, sort = options['per_page'], options['repeat'], options['sort']
+        queryset = Product.objects.all()
+        paginator = CursorPaginator(queryset, sort, per_page=per_page)
+        ordering = paginator._ordering()
+        total = queryset.count()
+
+        self.stdout.write(f'{"page":>8} {"offset ms":>12} {"cursor ms":>12}')
+        for depth in options['depths']:
+            offset = (depth - 1) * per_page
+            if offset >= total:
+                break
+
+            def offset_page():
+                list(queryset.order_by(*ordering)[offset:offset + per_page])
+
+            token = None
+            if offset:
+                boundary = queryset.order_by(*ordering)[offset - 1]
+                token = paginator.encode(boundary, 'next', offset)
+
+            def cursor_page():
+                paginator.page(token)
+
+            offset_ms = self._time(offset_page, repeat)
+            cursor_ms = self._time(cursor_page, repeat)
+            self.stdout.write(f'{depth:>8} {offset_ms:>12.2f} {cursor_ms:>12.2f}')
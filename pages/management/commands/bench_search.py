@@ -0,0 +1,108 @@
+"""
+Benchmark autocomplete latency of the in-process search index.
+
+USAGE:
+    python manage.py bench_search
+    python manage.py bench_search --listings 100000 --queries 5000 --target-ms 10
+
+Builds a SearchIndex from synthetic listings (no database needed), then
+replays as-you-type prefixes, full queries and typos against it and prints
+p50/p95/p99 latency. Exits non-zero when p99 misses --target-ms.
+"""
+
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from pages.search import SearchIndex
+
+
+BRANDS = {
+    'Rolex': ['Submariner', 'Datejust', 'Daytona', 'GMT-Master II', 'Explorer', 'Oyster Perpetual', 'Yacht-Master'],
+    'Omega': ['Speedmaster', 'Seamaster', 'Constellation', 'De Ville', 'Aqua Terra'],
+    'Seiko': ['Presage', 'Prospex', 'Astron', 'SKX007', 'Cocktail Time', 'Alpinist'],
+    'Casio': ['G-Shock', 'Edifice', 'Pro Trek', 'Oceanus', 'Vintage'],
+    'Tag Heuer': ['Carrera', 'Monaco', 'Aquaracer', 'Formula 1', 'Autavia'],
+    'Tissot': ['PRX', 'Le Locle', 'Seastar', 'Gentleman', 'Visodate'],
+    'Citizen': ['Eco-Drive', 'Promaster', 'Tsuyosa', 'Chandler'],
+    'Patek Philippe': ['Nautilus', 'Aquanaut', 'Calatrava', 'Complications'],
+    'Audemars Piguet': ['Royal Oak', 'Royal Oak Offshore', 'Code 11.59'],
+    'Cartier': ['Santos', 'Tank', 'Ballon Bleu', 'Pasha'],
+    'Longines': ['Conquest', 'HydroConquest', 'Master Collection', 'Spirit'],
+    'Hublot': ['Big Bang', 'Classic Fusion', 'Spirit of Big Bang'],
+}
+WORDS = (
+    'automatic chronograph steel gold ceramic bezel sapphire crystal original box papers full set '
+    'serviced mint condition bracelet leather strap date dial blue black white green diver pilot '
+    'vintage limited edition warranty genuine lume rare collector'
+).split()
+
+
+def _typo(word, rng):
+    if len(word) < 5:
+        return word
+    i = rng.randrange(1, len(word) - 1)
+    return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+
+
+class Command(BaseCommand):
+    help = 'Measure p50/p95/p99 autocomplete latency of the search index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--listings', type=int, default=100_000)
+        parser.add_argument('--queries', type=int, default=5000)
+        parser.add_argument('--target-ms', type=float, default=10.0)
+        parser.add_argument('--seed', type=int, default=7)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        brands = list(BRANDS)
+        weights = [1 / (rank + 1) for rank in range(len(brands))]  # skewed brand popularity
+
+        index = SearchIndex()
+        started = time.perf_counter()
+        for doc_id in range(1, options['listings'] + 1):
+            brand = rng.choices(brands, weights)[0]
+            model = rng.choice(BRANDS[brand])
+            index.add({
+                'id': doc_id,
+                'brand': brand,
+                'model_name': model,
+                'reference_number': f'{rng.randint(1000, 999999)}{rng.choice(["", "LN", "LV", "BLRO"])}',
+                'description': ' '.join(rng.choices(WORDS, k=25)),
+                'price': str(rng.randint(10_000, 5_000_000)),
+                'popularity': rng.randint(0, 500),
+                'title': f'{brand} {model}',
+                'url': f'/watches/{doc_id}/',
+            })
+        build_s = time.perf_counter() - started
+        self.stdout.write(f'Indexed {len(index)} listings in {build_s:.1f}s '
+                          f'({len(index.postings)} terms, {len(index.prefixes)} prefixes)')
+
+        queries = []
+        for _ in range(options['queries']):
+            brand = rng.choice(brands)
+            phrase = f'{brand} {rng.choice(BRANDS[brand])}'.lower()
+            kind = rng.random()
+            if kind < 0.6:
+                queries.append(phrase[:rng.randint(2, len(phrase))])       # typing
+            elif kind < 0.8:
+                queries.append(' '.join(_typo(w, rng) for w in phrase.split()))  # typo
+            else:
+                queries.append(f'{phrase} {rng.choice(WORDS)}')            # full + description word
+
+        samples = []
+        for query in queries:
+            start = time.perf_counter()
+            index.autocomplete(query)
+            samples.append((time.perf_counter() - start) * 1000)
+        samples.sort()
+
+        def pct(p):
+            return samples[min(int(len(samples) * p / 100), len(samples) - 1)]
+
+        self.stdout.write(f'p50 {pct(50):.2f} ms   p95 {pct(95):.2f} ms   p99 {pct(99):.2f} ms   max {samples[-1]:.2f} ms')
+        if pct(99) > options['target_ms']:
+            raise CommandError(f'p99 {pct(99):.2f} ms is over the {options["target_ms"]} ms target')
+        self.stdout.write(self.style.SUCCESS(f'p99 within {options["target_ms"]} ms target'))
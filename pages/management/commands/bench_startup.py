@@ -0,0 +1,279 @@
+"""
+Measure worker startup: import time, warm-up and memory per gunicorn worker.
+
+USAGE:
+    python manage.py bench_startup
+    python manage.py bench_startup --workers 8 --requests 400 --scale medium
+
+Runs against a throwaway test database seeded by pages/synthetic.py. Linux
+only, because it reads /proc.
+
+1. IMPORTS. Each run starts a fresh interpreter and loads the app (settings,
+   URLconf, every view), taking the median of --repeat runs:
+       eager      Pillow and NumPy imported up front, the way every worker
+                  started before they were deferred
+       lazy       as shipped: they load on first use
+   It then times pages/warmup.run() in the lazy interpreter.
+
+2. WORKERS. Starts gunicorn with --workers sync workers on a free local
+   port in three layouts:
+       before     the old start.sh: each worker imports the app itself,
+                  eagerly, with no warm-up
+       no-preload config/gunicorn.conf.py with GUNICORN_PRELOAD=0
+       preload    config/gunicorn.conf.py: the master loads and warms the
+                  app, then forks the workers
+   It sends --requests GETs over a few pages and then reads every process's
+   memory from /proc/<pid>/smaps_rollup:
+       RSS        resident pages, counting shared pages in every process
+       PSS        shared pages split between the processes sharing them
+       USS        private pages: what one more worker costs
+   "total PSS" is the footprint of the whole server.
+"""
+
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+
+PATHS = ['/', '/watches/', '/api/search/autocomplete/?q=ro', '/about/', '/watches/?sort=price_low']
+
+# Run in a fresh interpreter: seconds and RSS to load the app, then to warm it up
+IMPORT_PROBE = """
+import json, os, sys, time
+def rss():
+    with open('/proc/self/status') as status:
+        return next(int(line.split()[1]) for line in status if line.startswith('VmRSS:')) / 1024
+started = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+from django.core.wsgi import get_wsgi_application
+get_wsgi_application()
+if sys.argv[1] == 'eager':
+    import pages.imaging, pages.similarity
+from django.urls import get_resolver
+get_resolver().url_patterns
+result = {'load_s': time.perf_counter() - started, 'rss_mb': rss(),
+          'numpy': 'numpy' in sys.modules, 'pillow': 'PIL.Image' in sys.modules}
+if sys.argv[2] == 'warm':
+    from pages import warmup
+    started = time.perf_counter()
+    result['steps'] = warmup.run()
+    result['warm_s'] = time.perf_counter() - started
+    result['warm_rss_mb'] = rss()
+print(json.dumps(result))
+"""
+
+
+def eager_application():
+    """The app as workers loaded it before: Pillow and NumPy imported up front (gunicorn factory)"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    from django.core.wsgi import get_wsgi_application
+
+    application = get_wsgi_application()
+    import pages.imaging, pages.similarity  # noqa: E401,F401
+    return application
+
+
+def _free_port():
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+
+def _memory(pid):
+    """(rss, pss, uss) in MB from /proc/<pid>/smaps_rollup"""
+    fields = {}
+    with open(f'/proc/{pid}/smaps_rollup') as rollup:
+        for line in rollup:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                fields[parts[0].rstrip(':')] = int(parts[1])
+    uss = fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)
+    return fields.get('Rss', 0) / 1024, fields.get('Pss', 0) / 1024, uss / 1024
+
+
+def _children(pid):
+    with open(f'/proc/{pid}/task/{pid}/children') as children:
+        return [int(child) for child in children.read().split()]
+
+
+def _get(url, timeout=10):
+    started = time.perf_counter()
+    request = urllib.request.Request(url, headers={'Connection': 'close'})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as exc:
+        status = exc.code
+    return status, (time.perf_counter() - started) * 1000
+
+
+class Command(BaseCommand):
+    help = 'Measure app import time, warm-up and per-worker memory under gunicorn (before/after preloading)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--requests', type=int, default=200, help='GETs sent to each layout before measuring')
+        parser.add_argument('--repeat', type=int, default=3, help='Fresh interpreters per import measurement')
+        parser.add_argument('--scale', default='small', help='pages/synthetic.py scale of the test database')
+        parser.add_argument('--timeout', type=float, default=120.0, help='Seconds to wait for a server to answer')
+        parser.add_argument(
+            '--layouts', nargs='+', default=['before', 'no-preload', 'preload'],
+            choices=['before', 'no-preload', 'preload'],
+        )
+
+    def handle(self, *args, **options):
+        if not os.path.exists('/proc/self/smaps_rollup'):
+            raise CommandError('bench_startup reads /proc/<pid>/smaps_rollup (Linux 4.14+)')
+        from pages import counters, synthetic
+
+        test_settings = connection.settings_dict['TEST']
+        if connection.vendor == 'sqlite':
+            # A file the gunicorn processes can open too
+            test_settings['NAME'] = os.path.join(tempfile.gettempdir(), 'bench-startup.sqlite3')
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self.stdout.write(f'Seeding the {options["scale"]} dataset...')
+            synthetic.seed(options['scale'], related=False)
+            counters.buffer.flush()
+            env = self._environment()
+            connection.close()
+            self._imports(env, options)
+            self._workers(env, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def _environment(self):
+        """Environment for child processes: this test database, production-like settings"""
+        database = connection.settings_dict
+        if connection.vendor == 'sqlite':
+            url = f'sqlite:///{database["NAME"]}'
+        elif connection.vendor == 'postgresql':
+            credentials = f'{quote(database["USER"] or "")}:{quote(database["PASSWORD"] or "")}@'
+            url = f'postgres://{credentials}{database["HOST"] or "localhost"}:{database["PORT"] or 5432}/{database["NAME"]}'
+        else:
+            raise CommandError(f'bench_startup supports SQLite and PostgreSQL, not {connection.vendor}')
+        return {
+            **os.environ, 'DATABASE_URL': url, 'DJANGO_DEBUG': '0', 'PROFILING': '0',
+            'ALLOWED_HOSTS': '127.0.0.1,localhost', 'DJANGO_SETTINGS_MODULE': 'config.settings',
+        }
+
+    # --- imports ----------------------------------------------------------------
+
+    def _probe(self, env, mode, warm):
+        result = subprocess.run(
+            [sys.executable, '-c', IMPORT_PROBE, mode, 'warm' if warm else 'cold'],
+            env=env, cwd=settings.BASE_DIR, capture_output=True, text=True,
+        )
+        if result.returncode:
+            raise CommandError(f'Import probe failed:\n{result.stderr[-2000:]}')
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+    def _imports(self, env, options):
+        self.stdout.write('\nImporting the app (fresh interpreter, median of %d)' % options['repeat'])
+        self.stdout.write(f'  {"mode":<8} {"load s":>8} {"RSS MB":>8}  numpy  Pillow')
+        for mode in ('eager', 'lazy'):
+            runs = [self._probe(env, mode, warm=False) for _ in range(max(1, options['repeat']))]
+            self.stdout.write(
+                f'  {mode:<8} {statistics.median(r["load_s"] for r in runs):>8.3f} '
+                f'{statistics.median(r["rss_mb"] for r in runs):>8.1f}  {"yes" if runs[0]["numpy"] else "no":<5}  '
+                f'{"yes" if runs[0]["pillow"] else "no"}'
+            )
+        warm = self._probe(env, 'lazy', warm=True)
+        steps = ', '.join(f'{name} {seconds:.2f}s' for name, seconds in warm['steps'].items())
+        self.stdout.write(
+            f'  warm-up  {warm["warm_s"]:>8.3f} {warm["warm_rss_mb"]:>8.1f}  ({steps})'
+        )
+
+    # --- workers ----------------------------------------------------------------
+
+    def _command(self, layout, port, options):
+        base = [sys.executable, '-m', 'gunicorn', '--workers', str(options['workers'])]
+        if layout == 'before':
+            # No config file: the old start.sh's plain gunicorn
+            return base + ['-c', os.devnull, '--bind', f'127.0.0.1:{port}',
+                           'pages.management.commands.bench_startup:eager_application()'], {}
+        return base + ['-c', os.path.join(settings.BASE_DIR, 'config', 'gunicorn.conf.py')], {
+            'PORT': str(port), 'SERVER_INTERFACE': 'wsgi', 'GUNICORN_PRELOAD': '1' if layout == 'preload' else '0',
+        }
+
+    def _workers(self, env, options):
+        self.stdout.write(f'\nServing with {options["workers"]} sync workers, {options["requests"]} requests each layout')
+        self.stdout.write(
+            f'  {"layout":<11} {"ready s":>7} {"cold ms":>8} {"p50 ms":>7} {"master":>8} '
+            f'{"worker RSS":>11} {"PSS":>7} {"USS":>7} {"total PSS":>10}   (MB)'
+        )
+        for layout in options['layouts']:
+            port = _free_port()
+            command, extra = self._command(layout, port, options)
+            with tempfile.TemporaryFile() as log:
+                started = time.perf_counter()
+                server = subprocess.Popen(command, env={**env, **extra}, cwd=settings.BASE_DIR, stdout=log, stderr=log)
+                try:
+                    row = self._measure(server, port, started, options)
+                except CommandError:
+                    log.seek(0)
+                    self.stderr.write(log.read().decode(errors='replace')[-3000:])
+                    raise
+                finally:
+                    server.terminate()
+                    try:
+                        server.wait(timeout=30)
+                    except subprocess.TimeoutExpired:
+                        server.kill()
+            self.stdout.write(
+                f'  {layout:<11} {row["ready"]:>7.2f} {row["cold"]:>8.1f} {row["p50"]:>7.1f} {row["master"]:>8.1f} '
+                f'{row["rss"]:>11.1f} {row["pss"]:>7.1f} {row["uss"]:>7.1f} {row["total_pss"]:>10.1f}'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            'Per worker: USS is what one more worker costs; total PSS is the whole server'
+        ))
+
+    def _measure(self, server, port, started, options):
+        base = f'http://127.0.0.1:{port}'
+        deadline = started + options['timeout']
+        # Ready: every worker forked and the home page answering
+        while True:
+            if server.poll() is not None:
+                raise CommandError(f'gunicorn exited with status {server.returncode}')
+            if time.perf_counter() > deadline:
+                raise CommandError(f'gunicorn did not answer within {options["timeout"]:.0f}s')
+            try:
+                if len(_children(server.pid)) >= options['workers']:
+                    status, cold = _get(base + '/')
+                    if status == 200:
+                        break
+                    raise CommandError(f'GET / answered {status}')
+            except OSError:
+                pass
+            time.sleep(0.05)
+        ready = time.perf_counter() - started
+
+        timings = []
+        for number in range(options['requests']):
+            status, elapsed = _get(base + PATHS[number % len(PATHS)])
+            if status != 200:
+                raise CommandError(f'GET {PATHS[number % len(PATHS)]} answered {status}')
+            timings.append(elapsed)
+
+        workers = [_memory(pid) for pid in _children(server.pid)]
+        master = _memory(server.pid)
+        return {
+            'ready': ready, 'cold': cold, 'p50': statistics.median(timings) if timings else 0.0,
+            'master': master[0],
+            'rss': statistics.mean(w[0] for w in workers), 'pss': statistics.mean(w[1] for w in workers),
+            'uss': statistics.mean(w[2] for w in workers),
+            'total_pss': master[1] + sum(w[1] for w in workers),
+        }
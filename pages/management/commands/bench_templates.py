@@ -0,0 +1,175 @@
+"""
+Measure template compile and render time, and response size, per loader setup.
+
+USAGE:
+    python manage.py bench_templates
+    python manage.py bench_templates --repeat 50 --top 40
+    python manage.py bench_templates --routes home watch_list watch_detail
+
+Runs against a throwaway test database seeded by pages/synthetic.py, with the
+page routes of `benchmark` (GET, HTML), through the Django test client.
+Each route is measured under three template setups:
+    stock       Django's implicit cached loader (APP_DIRS)
+    compiled    pages/templating.py: includes bound at compile time
+    stripped    compiled, plus TEMPLATE_STRIP_WHITESPACE
+For each setup it reports the time to compile every template (the warm-up
+step) and, per route, the median time spent rendering templates and the
+response size. The cache is cleared before every request, so pre-rendered
+sections and pages are rendered again and each request renders everything.
+It then lists the most expensive templates under `compiled`, by time per
+request, with the templates they include counted in.
+"""
+
+import os
+import statistics
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.template import engines
+from django.test import Client, override_settings
+
+from pages import counters, profiling, synthetic, warmup
+
+from .benchmark import HOST, ROUTES, Fixtures, _request
+
+
+INNER_LOADERS = ['django.template.loaders.filesystem.Loader', 'django.template.loaders.app_directories.Loader']
+
+
+def _templates(setup):
+    """settings.TEMPLATES for one setup, with render timing on"""
+    engine = {**settings.TEMPLATES[0], 'BACKEND': 'pages.profiling.ProfiledTemplates'}
+    options = {key: value for key, value in engine['OPTIONS'].items() if key != 'loaders'}
+    if setup == 'stock':
+        return [{**engine, 'APP_DIRS': True, 'OPTIONS': options}]
+    loaders = [('pages.templating.Loader', INNER_LOADERS, setup == 'stripped')]
+    return [{**engine, 'APP_DIRS': False, 'OPTIONS': {**options, 'loaders': loaders}}]
+
+
+SETUPS = ['stock', 'compiled', 'stripped']
+
+
+class Command(BaseCommand):
+    help = 'Compare template compile/render time and response size: stock cached loader, bound includes, stripped whitespace'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', default='small', choices=list(synthetic.SCALES))
+        parser.add_argument('--routes', nargs='+', help='Only these route names (or labels)')
+        parser.add_argument('--repeat', type=int, default=20, help='Timed requests per route and setup')
+        parser.add_argument('--top', type=int, default=25, help='Templates listed')
+
+    def handle(self, *args, **options):
+        settings.DEBUG = False
+        settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, HOST]
+        routes = [
+            route for route in ROUTES
+            if route.method == 'GET' and not route.pool and not route.fresh and not route.name.startswith('api_')
+            and (not options['routes'] or {route.name, route.key} & set(options['routes']))
+        ]
+        if not routes:
+            raise CommandError('No page routes selected')
+
+        path = None
+        if connection.vendor == 'sqlite':
+            # A file: view counts flush from a background thread, which an in-memory database locks out
+            handle, path = tempfile.mkstemp(suffix='.sqlite3')
+            os.close(handle)
+            connection.settings_dict.setdefault('TEST', {})['NAME'] = path
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            started = time.perf_counter()
+            synthetic.seed(options['scale'], related=False)
+            self.stdout.write(f'Seeded the {options["scale"]} dataset in {time.perf_counter() - started:.1f}s')
+            fx = Fixtures()
+            clients = {'anon': Client(raise_request_exception=False)}
+            for role, user in fx.users.items():
+                clients[role] = Client(raise_request_exception=False)
+                clients[role].force_login(user)
+            results = {setup: self._run(setup, routes, fx, clients, options) for setup in SETUPS}
+        finally:
+            counters.buffer.flush()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            if path and os.path.exists(path):
+                os.unlink(path)
+        self._print(routes, results, options)
+
+    def _run(self, setup, routes, fx, clients, options):
+        with override_settings(TEMPLATES=_templates(setup)):
+            compile_s = min(self._compile() for _ in range(3))
+
+            per_route, templates = {}, {}
+            for route in routes:
+                render_ms, sizes, statuses = [], [], set()
+                for i in range(options['repeat'] + 1):
+                    path, query, _body, _content_type = _request(route, fx, i)
+                    cache.clear()
+                    with profiling.collect() as profile:
+                        response = clients[route.role].get(path, QUERY_STRING=query)
+                    statuses.add(response.status_code)
+                    if i == 0:
+                        continue    # first render of the page in this setup
+                    render_ms.append(profile.template_time * 1000)
+                    sizes.append(len(response.content))
+                    for name, (renders, seconds) in profile.templates.items():
+                        entry = templates.setdefault(name, [0, 0.0])
+                        entry[0] += renders
+                        entry[1] += seconds
+                per_route[route.key] = {
+                    'render_ms': statistics.median(render_ms),
+                    'kb': statistics.fmean(sizes) / 1024,
+                    'ok': all(status < 500 for status in statuses),
+                }
+        return {'compile_s': compile_s, 'routes': per_route, 'templates': templates}
+
+    def _compile(self):
+        """Seconds to compile every template from an empty loader cache"""
+        for backend in engines.all():
+            for loader in backend.engine.template_loaders:
+                loader.reset()
+        started = time.perf_counter()
+        warmup.run(['templates'])
+        return time.perf_counter() - started
+
+    def _print(self, routes, results, options):
+        self.stdout.write('\nCompiling every template (best of 3): ' + ', '.join(
+            f'{setup} {results[setup]["compile_s"] * 1000:.0f}ms' for setup in SETUPS
+        ))
+        self.stdout.write(
+            f'\n{"route":<28} {"render ms (median)":>26}   {"response KB":>20}\n'
+            f'{"":<28} {"stock":>8} {"compiled":>8} {"stripped":>8}   {"compiled":>9} {"stripped":>10}'
+        )
+        totals = dict.fromkeys(SETUPS, 0.0)
+        kb = {'compiled': 0.0, 'stripped': 0.0}
+        keys = list(dict.fromkeys(route.key for route in routes))
+        for key in keys:
+            rows = {setup: results[setup]['routes'][key] for setup in SETUPS}
+            for setup in SETUPS:
+                totals[setup] += rows[setup]['render_ms']
+            for setup in kb:
+                kb[setup] += rows[setup]['kb']
+            line = (
+                f'{key:<28} {rows["stock"]["render_ms"]:>8.2f} {rows["compiled"]["render_ms"]:>8.2f} '
+                f'{rows["stripped"]["render_ms"]:>8.2f}   {rows["compiled"]["kb"]:>9.1f} {rows["stripped"]["kb"]:>10.1f}'
+            )
+            self.stdout.write(line if rows['compiled']['ok'] else self.style.WARNING(f'{line}  (server error)'))
+        self.stdout.write(
+            f'{"total":<28} {totals["stock"]:>8.2f} {totals["compiled"]:>8.2f} {totals["stripped"]:>8.2f}   '
+            f'{kb["compiled"]:>9.1f} {kb["stripped"]:>10.1f}'
+        )
+
+        templates = results['compiled']['templates']
+        requests = options['repeat'] * len(routes)
+        self.stdout.write(f'\n{"template (compiled, includes counted in)":<48} {"renders":>8} {"ms/render":>10} {"ms/request":>11}')
+        for name, (renders, seconds) in sorted(templates.items(), key=lambda item: -item[1][1])[:options['top']]:
+            self.stdout.write(
+                f'{name:<48} {renders:>8} {seconds * 1000 / renders:>10.3f} {seconds * 1000 / requests:>11.3f}'
+            )
+        saved = 1 - kb['stripped'] / kb['compiled'] if kb['compiled'] else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'\nRender time over {len(keys)} routes: stock {totals["stock"]:.1f}ms, compiled {totals["compiled"]:.1f}ms, '
+            f'stripped {totals["stripped"]:.1f}ms; whitespace stripping saves {saved:.0%} of the HTML'
+        ))
@@ -0,0 +1,616 @@
+"""
+Benchmark every route in config/urls.py against a synthetic dataset.
+
+USAGE:
+    python manage.py benchmark
+    python manage.py benchmark --scale full --keepdb --concurrency 16 --duration 30
+    python manage.py benchmark --save-baseline           # record this machine's numbers
+    python manage.py benchmark --interface asgi --routes home watch_list watch_detail
+
+Runs against a throwaway test database seeded by pages/synthetic.py (--scale,
+--seed). With --keepdb the seeded database is kept and reused by the next
+run, which saves the seeding time at the larger scales (writes made by the
+previous run stay, so pools of pending offers/listings/orders shrink).
+
+Two passes:
+- Client pass: every route in ROUTES through the Django test client, as the
+  role it needs (anonymous, buyer, seller, staff). Each route gets --warmup
+  untimed requests, then --repeat timed ones. Records latency p50/p95/p99,
+  queries per request, response size and status codes. Routes that write
+  (offers, moderation, order transitions, ...) take a fresh row from a pool
+  on every request, so each one does real work.
+- Load pass: the read-only routes with a weight, mixed by weight, driven for
+  --duration seconds by --concurrency workers calling the WSGI application
+  (threads) or the ASGI application (asyncio tasks) in process. Records
+  requests/s and latency percentiles per route.
+
+The command fails if a named URL has no entry in ROUTES (or SKIPPED), so new
+pages get benchmarked. With a stored baseline (--baseline, written by
+--save-baseline) it also fails on regressions: more queries than the
+baseline, p95 latency or throughput worse by more than --tolerance (and by
+more than --noise-ms), or a route that used to answer and now errors.
+Baselines are per machine: record one on the box you compare on.
+--save-baseline refuses a run in which any route answered with a server error.
+pages/tests.py (BenchmarkRoutesTests) runs the client pass once per route on
+the tiny dataset, so a route that breaks fails the test suite too.
+DEBUG is turned off for the run, so error pages and query logging don't
+skew the numbers.
+"""
+
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from io import BytesIO
+from pathlib import Path
+from urllib.parse import urlencode
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.urls import URLPattern, get_resolver, reverse
+
+from pages import audit, counters, synthetic
+from pages.models import Conversation, Notification, Offer, Order, Product
+
+
+HOST = 'testserver'
+
+
+# =============================================================================
+# ROUTES
+# =============================================================================
+
+@dataclass(frozen=True)
+class Route:
+    """One request shape: `args`, `query` and `data` take (fixtures, iteration)"""
+
+    name: str
+    role: str = 'anon'                  # anon | buyer | seller | staff
+    method: str = 'GET'
+    args: object = None
+    query: object = None
+    data: object = None
+    json: bool = False
+    pool: str = ''                      # Fixtures list each request consumes one item of
+    weight: int = 0                     # share of the load mix; 0 keeps it out of the load pass
+    fresh: bool = False                 # new client per request (logins and logouts)
+    label: str = ''                     # report key when one URL name is benchmarked twice
+
+    @property
+    def key(self):
+        return self.label or self.name
+
+
+def _nth(attr):
+    return lambda fx, i: [getattr(fx, attr)[i % len(getattr(fx, attr))]]
+
+
+def _one(attr):
+    return lambda fx, i: [getattr(fx, attr)]
+
+
+ROUTES = [
+    # Public pages
+    Route('home', weight=20),
+    Route('about', weight=1),
+    Route('faq', weight=1),
+    Route('how_it_works', weight=1),
+    Route('contact', weight=1),
+    Route('terms', weight=1),
+    Route('privacy', weight=1),
+    Route('watch_list', weight=20),
+    Route('watch_list', query=lambda fx, i: {'q': fx.terms[i % len(fx.terms)]}, weight=8, label='watch_list:search'),
+    Route('watch_list', query=lambda fx, i: {'brand': fx.brand_id, 'sort': 'price_low'}, weight=5, label='watch_list:filtered'),
+    Route('watch_detail', args=_nth('products'), weight=30),
+    Route('seller_profile', args=lambda fx, i: [fx.seller_ids[i % len(fx.seller_ids)]], weight=4),
+    Route('api_search_autocomplete', query=lambda fx, i: {'q': fx.terms[i % len(fx.terms)][:3]}, weight=10),
+    Route('login'),
+    Route('signup'),
+    Route('password_reset'),
+    Route('password_reset_done'),
+    Route('password_reset_confirm', args=lambda fx, i: ['MQ', 'set-password']),
+    Route('password_reset_complete'),
+    Route('cart', role='buyer', weight=3),
+    Route('checkout', role='buyer', weight=2),
+    # Signed-in pages
+    Route('my_orders', role='buyer', weight=2),
+    Route('order_detail', role='buyer', args=_one('order_id'), weight=1),
+    Route('my_offers', role='buyer', weight=2),
+    Route('wishlist', role='buyer', weight=2),
+    Route('buyer_dashboard', role='buyer', weight=2),
+    Route('account_settings', role='buyer'),
+    Route('messages', role='buyer', weight=3),
+    Route('messages', role='buyer', query=lambda fx, i: {'conversation': fx.conversation_id}, weight=3,
+          label='messages:conversation'),
+    Route('notifications', role='buyer', weight=2),
+    Route('notification_settings', role='buyer'),
+    Route('events_poll', role='buyer', weight=2),
+    Route('seller_register', role='buyer'),
+    Route('start_conversation', role='buyer', args=_one('seller_user_id')),
+    Route('seller_dashboard', role='seller', weight=2),
+    Route('offers_received', role='seller', weight=2),
+    Route('my_listings', role='seller', weight=1),
+    Route('watch_create', role='seller'),
+    Route('watch_edit', role='seller', args=_one('own_product_id')),
+    Route('watch_import', role='seller'),
+    Route('admin_dashboard', role='staff', weight=1),
+    Route('admin_seller_onboarding', role='staff'),
+    Route('admin_listings_approval', role='staff', weight=1),
+    Route('admin_delivery_management', role='staff', weight=1),
+    Route('performance_stats', role='staff'),
+    Route('admin:index', role='staff'),
+    # Writes
+    Route('newsletter_signup', method='POST', data=lambda fx, i: {'email': f'bench{i}@example.com'}),
+    Route('add_to_cart', role='buyer', method='POST', args=_nth('products'), data=lambda fx, i: {'transaction_method': 'delivery'}),
+    Route('cart_remove', role='buyer', method='POST', args=_nth('products')),
+    Route('wishlist_toggle', role='buyer', method='POST', args=_nth('products')),
+    Route('make_offer', role='buyer', method='POST', pool='offer_targets', args=lambda fx, i: [fx.offer_targets[i][0]],
+          data=lambda fx, i: {'amount': str(fx.offer_targets[i][1] * 9 // 10), 'transaction_method': 'meeting'}),
+    Route('offer_action', role='seller', method='POST', pool='pending_offers', args=lambda fx, i: [fx.pending_offers[i], 'decline']),
+    Route('api_mark_notification_read', role='buyer', method='POST', args=_nth('notification_ids')),
+    Route('api_mark_all_notifications_read', role='buyer', method='POST', json=True, data=lambda fx, i: {}),
+    Route('api_moderate_listings', role='staff', method='POST', json=True, pool='pending_listings',
+          data=lambda fx, i: {'ids': [fx.pending_listings[i]], 'action': 'approve'}),
+    Route('api_order_transition', role='staff', method='POST', json=True, pool='pending_orders',
+          args=lambda fx, i: [fx.pending_orders[i]], data=lambda fx, i: {'status': 'CONFIRMED'}),
+    Route('cart_clear', role='buyer', method='POST'),
+    Route('login', method='POST', fresh=True, label='login:submit',
+          data=lambda fx, i: {'username': fx.users['buyer'].username, 'password': synthetic.PASSWORD}),
+    Route('logout', role='buyer', fresh=True),
+]
+
+# URL names not driven here, and why
+SKIPPED = {
+    'events_stream': 'an endless SSE stream; see loadtest_realtime',
+    'events_board': 'an endless SSE stream; see loadtest_realtime',
+}
+
+
+def uncovered_routes():
+    """Named URLs (config/urls.py) with no entry in ROUTES or SKIPPED"""
+    named = {pattern.name for pattern in get_resolver().url_patterns if isinstance(pattern, URLPattern) and pattern.name}
+    return sorted(named - {route.name for route in ROUTES} - SKIPPED.keys())
+
+
+# =============================================================================
+# FIXTURES
+# =============================================================================
+
+class Fixtures:
+    """The accounts and rows the routes point at, picked from the seeded data"""
+
+    def __init__(self):
+        User = get_user_model()
+        live = Product.objects.filter(status=Product.Status.ACTIVE, approval_status=Product.ApprovalStatus.APPROVED)
+        buyer_id = (
+            Order.objects.values('customer_id').annotate(n=Count('id')).order_by('-n', 'customer_id')
+            .values_list('customer_id', flat=True).first()
+        )
+        store_id = (
+            Offer.objects.filter(offer_status=Offer.Status.PENDING).values('store_id').annotate(n=Count('id'))
+            .order_by('-n', 'store_id').values_list('store_id', flat=True).first()
+        )
+        if buyer_id is None or store_id is None:
+            raise CommandError('The dataset has no orders or pending offers; use a larger --scale')
+        seller = User.objects.get(seller__store__pk=store_id)
+        self.users = {
+            'buyer': User.objects.get(pk=buyer_id),
+            'seller': seller,
+            'staff': User.objects.filter(is_staff=True).order_by('pk').first(),
+        }
+        self.products = list(live.order_by('-favorite_count', 'pk').values_list('pk', flat=True)[:500])
+        self.seller_ids = list(live.order_by('-favorite_count', 'pk').values_list('seller_id', flat=True)[:100])
+        self.brand_id = live.values('brand_id').annotate(n=Count('id')).order_by('-n')[0]['brand_id']
+        self.terms = [word.lower() for word in synthetic.MODEL_WORDS] + [name.lower() for name, _ in synthetic.BRANDS]
+        self.order_id = Order.objects.filter(customer_id=buyer_id).order_by('-pk').values_list('pk', flat=True)[0]
+        self.conversation_id = (
+            Conversation.objects.filter(customer_id=buyer_id).order_by('-last_message_at').values_list('pk', flat=True).first()
+            or Conversation.objects.order_by('pk').values_list('pk', flat=True)[0]
+        )
+        self.seller_user_id = seller.pk
+        self.own_product_id = Product.objects.filter(store_id=store_id).order_by('pk').values_list('pk', flat=True)[0]
+        self.notification_ids = list(Notification.objects.filter(user_id=buyer_id).values_list('pk', flat=True)[:50]) or [0]
+
+        # Pools: each request uses up one row
+        offered = Offer.objects.filter(buyer_id=buyer_id, offer_status__in=[Offer.Status.PENDING, Offer.Status.COUNTERED])
+        self.offer_targets = list(
+            live.exclude(pk__in=offered.values('product_id')).order_by('pk').values_list('pk', 'price')[:200]
+        )
+        self.offer_targets = [(pk, int(price)) for pk, price in self.offer_targets]
+        self.pending_offers = list(
+            Offer.objects.filter(store_id=store_id, offer_status=Offer.Status.PENDING).order_by('pk').values_list('pk', flat=True)
+        )
+        self.pending_listings = list(
+            Product.objects.filter(approval_status=Product.ApprovalStatus.PENDING).order_by('pk').values_list('pk', flat=True)[:200]
+        )
+        self.pending_orders = list(
+            Order.objects.filter(order_status=Order.Status.PENDING).order_by('pk').values_list('pk', flat=True)[:200]
+        )
+
+
+# =============================================================================
+# MEASURING
+# =============================================================================
+
+class _QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def _pct(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else 0
+
+
+def _latency(samples_ms):
+    ordered = sorted(samples_ms)
+    return {
+        'p50': round(_pct(ordered, 0.50), 2),
+        'p95': round(_pct(ordered, 0.95), 2),
+        'p99': round(_pct(ordered, 0.99), 2),
+    }
+
+
+def _request(route, fx, i):
+    """(path, query string, body bytes, content type)"""
+    path = reverse(route.name, args=route.args(fx, i) if route.args else None)
+    query = urlencode(route.query(fx, i) if callable(route.query) else route.query or {})
+    data = route.data(fx, i) if route.data else {}
+    if route.json:
+        return path, query, json.dumps(data).encode(), 'application/json'
+    return path, query, urlencode(data).encode(), 'application/x-www-form-urlencoded'
+
+
+class Command(BaseCommand):
+    help = 'Benchmark every route (test client + in-process WSGI/ASGI load) and compare with a stored baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', default='small', choices=list(synthetic.SCALES))
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--keepdb', action='store_true', help='Keep and reuse the seeded test database')
+        parser.add_argument('--routes', nargs='+', help='Only these route names (or labels)')
+        parser.add_argument('--repeat', type=int, default=20, help='Timed client requests per route')
+        parser.add_argument('--warmup', type=int, default=1, help='Untimed client requests per route')
+        parser.add_argument('--skip-load', action='store_true')
+        parser.add_argument('--interface', default='wsgi', choices=['wsgi', 'asgi'])
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds of load')
+        parser.add_argument('--baseline', default=str(Path(settings.BASE_DIR) / 'benchmarks' / 'baseline.json'))
+        parser.add_argument('--save-baseline', action='store_true')
+        parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed slowdown, as a fraction')
+        parser.add_argument('--noise-ms', type=float, default=2.0, help='Latency changes below this never count')
+
+    def handle(self, *args, **options):
+        uncovered = uncovered_routes()
+        if uncovered:
+            raise CommandError(f'No benchmark for {", ".join(uncovered)}: add them to ROUTES (or SKIPPED)')
+        settings.DEBUG = False
+        settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, HOST]
+
+        path = None
+        if connection.vendor == 'sqlite':
+            # A file, so the load workers' connections share it
+            if options['keepdb']:
+                path = os.path.join(tempfile.gettempdir(), f'benchmark-{options["scale"]}-{options["seed"]}.sqlite3')
+            else:
+                handle, path = tempfile.mkstemp(suffix='.sqlite3')
+                os.close(handle)
+            connection.settings_dict.setdefault('TEST', {})['NAME'] = path
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        try:
+            if not Product.objects.exists():
+                started = time.perf_counter()
+                synthetic.seed(options['scale'], seed=options['seed'])
+                self.stdout.write(f'Seeded the {options["scale"]} dataset in {time.perf_counter() - started:.1f}s')
+            cache.clear()
+            fx = Fixtures()
+            routes = [r for r in ROUTES if not options['routes'] or {r.name, r.key} & set(options['routes'])]
+            clients = self._clients(fx)
+            report = {'meta': self._meta(options), 'client': self._client_pass(routes, fx, clients, options)}
+            if not options['skip_load']:
+                report['load'] = self._load_pass(routes, fx, clients, options)
+        finally:
+            # Buffered view counts and audit rows belong in this database, not the next one
+            counters.buffer.flush()
+            audit.buffer.flush()
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+            if path and not options['keepdb'] and os.path.exists(path):
+                os.unlink(path)
+
+        self._print(report)
+        self._compare(report, options)
+
+    def _meta(self, options):
+        return {
+            'scale': options['scale'], 'seed': options['seed'], 'database': connection.vendor,
+            'interface': options['interface'], 'concurrency': options['concurrency'],
+            'profiling': settings.PROFILING,
+            'python': platform.python_version(), 'django': django.get_version(),
+            'machine': f'{platform.system()} {platform.machine()}, {os.cpu_count()} CPUs',
+            'recorded': time.strftime('%Y-%m-%d %H:%M:%S'),
+        }
+
+    def _clients(self, fx):
+        clients = {'anon': Client(raise_request_exception=False)}
+        for role, user in fx.users.items():
+            client = Client(raise_request_exception=False)
+            client.force_login(user)
+            clients[role] = client
+        # Something to revalidate on the cart and checkout pages
+        for product_id in fx.products[-3:]:
+            clients['buyer'].post(reverse('add_to_cart', args=[product_id]), {'transaction_method': 'delivery'})
+        return clients
+
+    # --- client pass ------------------------------------------------------------
+
+    def _client_request(self, route, fx, clients, i):
+        client = clients[route.role]
+        if route.fresh:
+            client = Client(raise_request_exception=False)
+            if route.role != 'anon':
+                client.force_login(fx.users[route.role])
+        path, query, body, content_type = _request(route, fx, i)
+        counter = _QueryCounter()
+        started = time.perf_counter()
+        with connection.execute_wrapper(counter):
+            if route.method == 'GET':
+                response = client.get(path, QUERY_STRING=query)
+            else:
+                response = client.generic(route.method, path, body, content_type, QUERY_STRING=query)
+        elapsed = (time.perf_counter() - started) * 1000
+        size = len(b''.join(response.streaming_content) if response.streaming else response.content)
+        return elapsed, counter.count, response.status_code, size
+
+    def _client_pass(self, routes, fx, clients, options):
+        results = {}
+        for route in routes:
+            runs = options['warmup'] + options['repeat']
+            if route.pool:
+                runs = min(runs, len(getattr(fx, route.pool)))
+            timings, queries, statuses, sizes = [], [], {}, []
+            for i in range(runs):
+                elapsed, count, status, size = self._client_request(route, fx, clients, i)
+                if i < options['warmup'] and runs > 1:
+                    continue
+                timings.append(elapsed)
+                queries.append(count)
+                sizes.append(size)
+                statuses[str(status)] = statuses.get(str(status), 0) + 1
+            results[route.key] = {
+                'requests': len(timings),
+                **_latency(timings),
+                'queries': max(queries, default=0),
+                'queries_p50': statistics.median(queries) if queries else 0,
+                'kb': round(statistics.fmean(sizes) / 1024, 1) if sizes else 0,
+                'statuses': statuses,
+                'errors': sum(n for status, n in statuses.items() if int(status) >= 500),
+            }
+        return results
+
+    # --- load pass --------------------------------------------------------------
+
+    def _load_pass(self, routes, fx, clients, options):
+        routes = [r for r in routes if r.weight and r.method == 'GET' and not r.pool and not r.fresh]
+        if not routes:
+            return {}
+        cookies = {
+            role: '; '.join(f'{morsel.key}={morsel.value}' for morsel in client.cookies.values())
+            for role, client in clients.items()
+        }
+        # Resolve every request up front so the workers only time the application
+        mixes = []
+        for worker in range(options['concurrency']):
+            rng = random.Random(options['seed'] * 1000 + worker)
+            mix = rng.choices(routes, weights=[r.weight for r in routes], k=2000)
+            mixes.append([(route.key, route.role, *_request(route, fx, i)[:2]) for i, route in enumerate(mix)])
+
+        run = self._load_wsgi if options['interface'] == 'wsgi' else self._load_asgi
+        samples, seconds = run(mixes, cookies, options)
+        by_route = {}
+        for key, elapsed, status in samples:
+            entry = by_route.setdefault(key, {'timings': [], 'errors': 0})
+            entry['timings'].append(elapsed)
+            entry['errors'] += status >= 500
+        return {
+            'seconds': round(seconds, 2),
+            'requests': len(samples),
+            'throughput': round(len(samples) / seconds, 1) if seconds else 0,
+            **_latency([elapsed for _, elapsed, _ in samples]),
+            'routes': {
+                key: {'requests': len(entry['timings']), **_latency(entry['timings']), 'errors': entry['errors']}
+                for key, entry in sorted(by_route.items())
+            },
+        }
+
+    def _load_wsgi(self, mixes, cookies, options):
+        from config.wsgi import application
+
+        deadline = time.perf_counter() + options['duration']
+        samples = []
+        lock = threading.Lock()
+
+        def environ(role, path, query):
+            return {
+                'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query, 'SCRIPT_NAME': '',
+                'SERVER_NAME': HOST, 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1', 'REMOTE_ADDR': '127.0.0.1',
+                'HTTP_HOST': HOST, 'HTTP_COOKIE': cookies[role],
+                'wsgi.version': (1, 0), 'wsgi.url_scheme': 'http', 'wsgi.input': BytesIO(b''),
+                'wsgi.errors': sys.stderr, 'wsgi.multithread': True, 'wsgi.multiprocess': False,
+                'wsgi.run_once': False,
+            }
+
+        def worker(mix):
+            local = []
+            statuses = []
+            try:
+                for n in range(sys.maxsize):
+                    key, role, path, query = mix[n % len(mix)]
+                    started = time.perf_counter()
+                    if started >= deadline:
+                        break
+                    body = application(environ(role, path, query), lambda status, headers, exc_info=None: statuses.append(status))
+                    try:
+                        for _ in body:
+                            pass
+                    finally:
+                        if hasattr(body, 'close'):
+                            body.close()
+                    local.append((key, (time.perf_counter() - started) * 1000, int(statuses[-1][:3])))
+            finally:
+                connection.close()
+                with lock:
+                    samples.extend(local)
+
+        threads = [threading.Thread(target=worker, args=(mix,)) for mix in mixes]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return samples, time.perf_counter() - started
+
+    def _load_asgi(self, mixes, cookies, options):
+        from config.asgi import application
+
+        async def request(role, path, query):
+            status = []
+            sent = []
+
+            async def receive():
+                if sent:
+                    # The client stays connected; Django cancels this wait once it has responded
+                    await asyncio.Event().wait()
+                sent.append(True)
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    status.append(message['status'])
+
+            scope = {
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+                'path': path, 'raw_path': path.encode(), 'query_string': query.encode(), 'root_path': '',
+                'headers': [(b'host', HOST.encode()), (b'cookie', cookies[role].encode())],
+                'client': ('127.0.0.1', 50000), 'server': (HOST, 80),
+            }
+            await application(scope, receive, send)
+            return status[0] if status else 500
+
+        async def worker(mix, deadline, samples):
+            for n in range(sys.maxsize):
+                key, role, path, query = mix[n % len(mix)]
+                started = time.perf_counter()
+                if started >= deadline:
+                    break
+                status = await request(role, path, query)
+                samples.append((key, (time.perf_counter() - started) * 1000, status))
+
+        async def run():
+            samples = []
+            deadline = time.perf_counter() + options['duration']
+            await asyncio.gather(*(worker(mix, deadline, samples) for mix in mixes))
+            return samples
+
+        started = time.perf_counter()
+        samples = asyncio.run(run())
+        return samples, time.perf_counter() - started
+
+    # --- reporting --------------------------------------------------------------
+
+    def _print(self, report):
+        meta = report['meta']
+        self.stdout.write(
+            f'{meta["scale"]} dataset (seed {meta["seed"]}) on {meta["database"]}; '
+            f'Python {meta["python"]}, Django {meta["django"]}, {meta["machine"]}'
+        )
+        self.stdout.write(f'\n{"client pass":<34} {"n":>4} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"queries":>8} {"KB":>7}  status')
+        for key, row in report['client'].items():
+            statuses = ' '.join(f'{status}x{n}' for status, n in sorted(row['statuses'].items()))
+            line = (
+                f'{key:<34} {row["requests"]:>4} {row["p50"]:>8.1f} {row["p95"]:>8.1f} {row["p99"]:>8.1f} '
+                f'{row["queries"]:>8} {row["kb"]:>7.1f}  {statuses}'
+            )
+            self.stdout.write(self.style.ERROR(line) if row['errors'] else line)
+        load = report.get('load')
+        if load:
+            self.stdout.write(
+                f'\nload pass ({meta["interface"]}, {meta["concurrency"]} workers, {load["seconds"]}s): '
+                f'{load["requests"]} requests, {load["throughput"]} req/s, '
+                f'p50 {load["p50"]} ms, p95 {load["p95"]} ms, p99 {load["p99"]} ms'
+            )
+            self.stdout.write(f'{"":<34} {"n":>6} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"errors":>7}')
+            for key, row in load['routes'].items():
+                self.stdout.write(
+                    f'{key:<34} {row["requests"]:>6} {row["p50"]:>8.1f} {row["p95"]:>8.1f} {row["p99"]:>8.1f} {row["errors"]:>7}'
+                )
+        failing = [key for key, row in report['client'].items() if row['errors']]
+        if failing:
+            self.stdout.write(self.style.WARNING(f'\n{len(failing)} route(s) answered with server errors: {", ".join(failing)}'))
+
+    def _compare(self, report, options):
+        path = Path(options['baseline'])
+        if options['save_baseline']:
+            failing = [key for key, row in report['client'].items() if row['errors']]
+            if failing:
+                raise CommandError(f'Not saving a baseline with server errors ({", ".join(failing)}); fix them first')
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps(report, indent=2, sort_keys=True) + '\n')
+            self.stdout.write(self.style.SUCCESS(f'Saved the baseline to {path}'))
+            return
+        if not path.exists():
+            self.stdout.write(f'No baseline at {path}; run with --save-baseline to record one')
+            return
+        baseline = json.loads(path.read_text())
+        for field in ('scale', 'seed', 'database', 'interface', 'concurrency', 'profiling'):
+            if baseline['meta'].get(field) != report['meta'][field]:
+                raise CommandError(
+                    f'The baseline was recorded with {field}={baseline["meta"].get(field)!r}, this run used '
+                    f'{report["meta"][field]!r}; rerun with matching options or --save-baseline'
+                )
+
+        tolerance, noise = options['tolerance'], options['noise_ms']
+
+        def slower(now, before):
+            return now > before * (1 + tolerance) and now - before > noise
+
+        regressions = []
+        for key, row in report['client'].items():
+            old = baseline['client'].get(key)
+            if old is None:
+                continue
+            if row['queries'] > old['queries']:
+                regressions.append(f'{key}: {row["queries"]} queries (baseline {old["queries"]})')
+            if slower(row['p95'], old['p95']):
+                regressions.append(f'{key}: p95 {row["p95"]} ms (baseline {old["p95"]} ms)')
+            if row['errors'] and not old['errors']:
+                regressions.append(f'{key}: {row["errors"]} server errors (baseline none)')
+        load, old_load = report.get('load'), baseline.get('load')
+        if load and old_load:
+            if load['throughput'] < old_load['throughput'] * (1 - tolerance):
+                regressions.append(f'load: {load["throughput"]} req/s (baseline {old_load["throughput"]})')
+            for key, row in load['routes'].items():
+                old = old_load['routes'].get(key)
+                if old and slower(row['p95'], old['p95']):
+                    regressions.append(f'load {key}: p95 {row["p95"]} ms (baseline {old["p95"]} ms)')
+
+        if regressions:
+            for line in regressions:
+                self.stdout.write(self.style.ERROR(line))
+            raise CommandError(f'{len(regressions)} regression(s) against {path} (recorded {baseline["meta"]["recorded"]})')
+        self.stdout.write(self.style.SUCCESS(f'No regressions against {path} (recorded {baseline["meta"]["recorded"]})'))
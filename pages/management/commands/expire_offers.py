@@ -0,0 +1,23 @@
+"""
+Expire open offers whose validity ran out.
+
+USAGE:
+    python manage.py expire_offers
+
+Run it from cron every few minutes. Offers are marked EXPIRED in batches of
+offers.SWEEP_BATCH (one UPDATE each, on idx_offers_expiry), and the offer
+books of the affected listings are invalidated. The book already hides an
+expired offer before the sweep gets to it (pages/offers.py).
+"""
+
+from django.core.management.base import BaseCommand
+
+from pages import offers
+
+
+class Command(BaseCommand):
+    help = 'Mark open offers past their expiry time as expired'
+
+    def handle(self, *args, **options):
+        expired = offers.expire()
+        self.stdout.write(self.style.SUCCESS(f'Expired {expired} offer(s)'))
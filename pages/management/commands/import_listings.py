@@ -0,0 +1,51 @@
+"""
+Import a dealer's listings from a CSV or JSON Lines file.
+
+USAGE:
+    python manage.py import_listings dealer.csv --store 12
+    python manage.py import_listings stock.jsonl --store 12 --dry-run
+
+Streams the file, validates every row (see pages/listing_import.py for the
+columns) and inserts valid rows in chunked bulk_create transactions.
+Prints a summary and the errors per row; rows with errors are skipped.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from pages import listing_import
+from pages.models import Store
+
+
+class Command(BaseCommand):
+    help = 'Bulk-import listings for one store from CSV or JSONL'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--store', type=int, required=True, help='Store id the listings belong to')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Default: from the file extension')
+        parser.add_argument('--dry-run', action='store_true', help='Validate only')
+        parser.add_argument('--chunk-size', type=int, default=listing_import.CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        store = Store.objects.filter(pk=options['store']).first()
+        if store is None:
+            raise CommandError(f'Store {options["store"]} does not exist')
+        try:
+            with open(options['path'], 'rb') as source:
+                result = listing_import.import_listings(
+                    source, store, file_format=options['format'],
+                    dry_run=options['dry_run'], chunk_size=options['chunk_size'],
+                )
+        except (OSError, listing_import.ImportFormatError) as exc:
+            raise CommandError(str(exc))
+
+        for error in result.errors:
+            column = f' [{error.column}]' if error.column else ''
+            self.stderr.write(f'line {error.line}{column}: {error.message}')
+        if result.errors_truncated:
+            self.stderr.write(f'... only the first {listing_import.MAX_REPORTED_ERRORS} errors are shown')
+        verb = 'would import' if result.dry_run else 'imported'
+        self.stdout.write(self.style.SUCCESS(
+            f'{result.rows} rows: {verb} {result.valid if result.dry_run else result.imported}, '
+            f'rejected {result.rejected} ({result.seconds:.1f}s)'
+        ))
@@ -0,0 +1,206 @@
+"""
+Load test the real-time event stream: many idle SSE connections in one worker.
+
+USAGE:
+    python manage.py loadtest_realtime
+    python manage.py loadtest_realtime --connections 5000 --users 500 --rounds 5
+
+Runs against a throwaway test database. Opens --connections concurrent
+/events/stream/ requests through the ASGI application (config/asgi.py) in a
+single event loop, as one worker would hold them, spread over --users
+logged-in users. Then it publishes one event per user from a separate
+thread (as a sync view or signal would) and measures how long each
+connection takes to receive it. Reports memory per idle connection and
+fan-out latency p50/p95/p99, then disconnects everything and checks that
+every subscription was released.
+"""
+
+import asyncio
+import resource
+import statistics
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from pages import realtime
+
+
+HOST = 'loadtest.local'
+
+
+def _rss_mb():
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Connection:
+    """One fake HTTP client speaking ASGI to the application"""
+
+    def __init__(self, application, session_key):
+        self.application = application
+        self.session_key = session_key
+        self.status = None
+        self.ready = asyncio.Event()
+        self.received = {}        # event id -> monotonic arrival time
+        self.disconnect = asyncio.Event()
+        self._sent_request = False
+
+    def scope(self):
+        return {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+            'method': 'GET', 'scheme': 'http', 'path': '/events/stream/', 'raw_path': b'/events/stream/',
+            'query_string': b'', 'root_path': '',
+            'headers': [
+                (b'host', HOST.encode()),
+                (b'accept', b'text/event-stream'),
+                (b'cookie', f'{settings.SESSION_COOKIE_NAME}={self.session_key}'.encode()),
+            ],
+            'client': ('127.0.0.1', 50000), 'server': (HOST, 80),
+        }
+
+    async def receive(self):
+        if not self._sent_request:
+            self._sent_request = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await self.disconnect.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(self, message):
+        if message['type'] == 'http.response.start':
+            self.status = message['status']
+            if self.status != 200:
+                self.ready.set()
+        elif message['type'] == 'http.response.body':
+            body = message.get('body', b'')
+            if body.startswith(b'retry:'):
+                self.ready.set()
+            for line in body.split(b'\n'):
+                if line.startswith(b'id: '):
+                    self.received[int(line[4:])] = time.monotonic()
+
+    async def run(self):
+        await self.application(self.scope(), self.receive, self.send)
+
+
+class Command(BaseCommand):
+    help = 'Hold thousands of idle SSE connections in one worker and measure fan-out latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, default=2000)
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--rounds', type=int, default=3, help='Publish rounds to time')
+        parser.add_argument('--target-ms', type=float, default=250.0, help='p99 fan-out target')
+
+    def handle(self, *args, **options):
+        if options['users'] > options['connections']:
+            raise CommandError('--users cannot exceed --connections')
+        settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, HOST]
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            sessions = self._sessions(options['users'])
+            asyncio.run(self._run(sessions, options))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def _sessions(self, count):
+        User = get_user_model()
+        User.objects.bulk_create([User(username=f'loadtest-{i}') for i in range(count)])
+        sessions = []
+        for user in User.objects.filter(username__startswith='loadtest-').order_by('pk'):
+            session = SessionStore()
+            session[SESSION_KEY] = str(user.pk)
+            session[BACKEND_SESSION_KEY] = 'django.contrib.auth.backends.ModelBackend'
+            session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+            session.create()
+            sessions.append((user.pk, session.session_key))
+        return sessions
+
+    async def _run(self, sessions, options):
+        from config.asgi import application
+
+        broker = realtime.get_broker()
+        total = options['connections']
+        rss_before = _rss_mb()
+
+        connections = []
+        tasks = []
+        started = time.perf_counter()
+        for i in range(total):
+            user_id, session_key = sessions[i % len(sessions)]
+            conn = Connection(application, session_key)
+            conn.user_id = user_id
+            connections.append(conn)
+            tasks.append(asyncio.create_task(conn.run()))
+        await asyncio.wait_for(asyncio.gather(*(conn.ready.wait() for conn in connections)), timeout=300)
+        opened_s = time.perf_counter() - started
+
+        failed = [conn.status for conn in connections if conn.status != 200]
+        if failed:
+            raise CommandError(f'{len(failed)} connections were refused (status {failed[0]})')
+        rss_after = _rss_mb()
+        self.stdout.write(
+            f'Opened {total} streams for {len(sessions)} users in {opened_s:.1f}s; '
+            f'{broker.subscriber_count()} subscriptions held'
+        )
+        self.stdout.write(
+            f'RSS {rss_before:.0f} MB -> {rss_after:.0f} MB '
+            f'(~{(rss_after - rss_before) * 1024 / total:.1f} KB per idle connection)'
+        )
+
+        latencies = []
+        user_ids = [user_id for user_id, _ in sessions]
+        for round_no in range(options['rounds']):
+            published = {}
+
+            def publish_all():
+                # From another thread, like a sync view or signal handler
+                for user_id in user_ids:
+                    event_id = realtime.publish(user_id, {'type': 'notification', 'title': f'round {round_no}'})
+                    published[user_id] = (event_id, time.monotonic())
+
+            thread = threading.Thread(target=publish_all)
+            thread.start()
+            await asyncio.to_thread(thread.join)
+            deadline = time.monotonic() + 10
+            while time.monotonic() < deadline:
+                if all(published[conn.user_id][0] in conn.received for conn in connections):
+                    break
+                await asyncio.sleep(0.005)
+            for conn in connections:
+                event_id, sent_at = published[conn.user_id]
+                arrived = conn.received.get(event_id)
+                latencies.append(float('inf') if arrived is None else (arrived - sent_at) * 1000)
+
+        for conn in connections:
+            conn.disconnect.set()
+        await asyncio.wait_for(asyncio.gather(*tasks, return_exceptions=True), timeout=60)
+        leaked = broker.subscriber_count()
+
+        latencies.sort()
+        missed = sum(1 for latency in latencies if latency == float('inf'))
+
+        def pct(p):
+            return latencies[min(int(len(latencies) * p / 100), len(latencies) - 1)]
+
+        self.stdout.write(
+            f'Fan-out over {len(latencies)} deliveries: p50 {pct(50):.1f} ms   p95 {pct(95):.1f} ms   '
+            f'p99 {pct(99):.1f} ms   mean {statistics.fmean(l for l in latencies if l != float("inf")):.1f} ms'
+        )
+        if missed:
+            raise CommandError(f'{missed} deliveries never arrived')
+        if leaked:
+            raise CommandError(f'{leaked} subscriptions still registered after disconnect')
+        if pct(99) > options['target_ms']:
+            raise CommandError(f'p99 {pct(99):.1f} ms is over the {options["target_ms"]} ms target')
+        self.stdout.write(self.style.SUCCESS('All connections released; p99 within target'))
@@ -0,0 +1,37 @@
+"""
+Render variants for listing photos the upload pipeline didn't finish.
+
+USAGE:
+    python manage.py process_images
+    python manage.py process_images --failed --workers 4
+
+Renders every PENDING image older than --min-age minutes (left behind by a
+restart, or never queued) in a process pool and records the result, as
+pages/images.py does after an upload. --failed retries FAILED images too.
+"""
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from pages import images
+from pages.models import Image
+
+
+class Command(BaseCommand):
+    help = 'Render responsive variants for pending (and optionally failed) images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--failed', action='store_true', help='Retry FAILED images as well')
+        parser.add_argument('--min-age', type=int, default=10,
+                            help='Skip images uploaded in the last N minutes (still queued)')
+        parser.add_argument('--workers', type=int, default=None)
+
+    def handle(self, *args, **options):
+        statuses = [Image.Status.PENDING] + ([Image.Status.FAILED] if options['failed'] else [])
+        pending = Image.objects.filter(
+            status__in=statuses, created_at__lte=timezone.now() - timedelta(minutes=options['min_age']),
+        ).exclude(storage_name='').only('id', 'storage_name')
+        ready, failed = images.process_batch(pending.iterator(chunk_size=500), workers=options['workers'])
+        self.stdout.write(self.style.SUCCESS(f'Rendered {ready} images ({failed} failed)'))
@@ -0,0 +1,21 @@
+"""
+Rebuild the catalog facet index from the products table.
+
+USAGE:
+    python manage.py rebuild_catalog_index
+
+Run this after raw SQL imports or any bulk change that bypassed
+pages.catalog.bulk_update_products().
+"""
+
+from django.core.management.base import BaseCommand
+
+from pages import catalog
+
+
+class Command(BaseCommand):
+    help = 'Recompute catalog facet counts (brand, condition, movement, price, box/papers)'
+
+    def handle(self, *args, **options):
+        rows = catalog.rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt catalog index: {rows} facet rows'))
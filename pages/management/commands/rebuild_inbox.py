@@ -0,0 +1,29 @@
+"""
+Rebuild the conversation inbox rows behind the messages page.
+
+USAGE:
+    python manage.py rebuild_inbox
+    python manage.py rebuild_inbox --conversation 12 --conversation 40
+
+Recreates chat_inbox from chat_conversations and messages: the latest
+message per conversation and each participant's unread count, and resets
+chat_conversations.last_message_at.
+
+Run this after raw SQL imports or any bulk change that bypassed model saves.
+"""
+
+from django.core.management.base import BaseCommand
+
+from pages import inbox
+
+
+class Command(BaseCommand):
+    help = 'Recompute chat_inbox rows from conversations and messages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--conversation', type=int, action='append', dest='conversations',
+                            help='Only rebuild this conversation id (repeatable)')
+
+    def handle(self, *args, **options):
+        rows = inbox.rebuild(options['conversations'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt inbox: {rows} rows'))
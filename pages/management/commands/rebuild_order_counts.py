@@ -0,0 +1,22 @@
+"""
+Recount the per-status order totals behind the delivery board.
+
+USAGE:
+    python manage.py rebuild_order_counts
+
+Rewrites order_status_counts from one GROUP BY over orders. Run this after
+raw SQL imports or any bulk change that bypassed model saves.
+"""
+
+from django.core.management.base import BaseCommand
+
+from pages import order_states
+
+
+class Command(BaseCommand):
+    help = 'Recompute order_status_counts from the orders table'
+
+    def handle(self, *args, **options):
+        counts = order_states.rebuild_counts()
+        summary = ', '.join(f'{status} {count}' for status, count in sorted(counts.items())) or 'no orders'
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt order status counts: {summary}'))
@@ -0,0 +1,30 @@
+"""
+Rebuild the per-store daily rollups behind the seller dashboard.
+
+USAGE:
+    python manage.py rebuild_store_rollups
+    python manage.py rebuild_store_rollups --store 12 --store 40
+
+Recomputes orders, revenue, reviews and offers per store and day from the
+orders, payments, reviews and offers tables (one GROUP BY each), rewrites
+store_daily_stats in bulk and resets stores.total_orders / total_sales.
+Views are event-only counts and are kept as they are.
+
+Run this after raw SQL imports or any bulk change that bypassed model saves.
+"""
+
+from django.core.management.base import BaseCommand
+
+from pages import rollups
+
+
+class Command(BaseCommand):
+    help = 'Recompute store_daily_stats and store sales totals from source tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--store', type=int, action='append', dest='stores',
+                            help='Only rebuild this store id (repeatable)')
+
+    def handle(self, *args, **options):
+        rows = rollups.rebuild(options['stores'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt store rollups: {rows} store-day rows'))
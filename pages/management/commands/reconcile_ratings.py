@@ -0,0 +1,34 @@
+"""
+Check stored rating aggregates against a full recompute and fix drift.
+
+USAGE:
+    python manage.py reconcile_ratings
+    python manage.py reconcile_ratings --dry-run
+
+Recomputes count, sum and star histogram per store and per product from
+the approved reviews (one GROUP BY each), reports every mismatch in
+rating_summaries and stores.store_rating / total_reviews, and rewrites the
+rows that drifted unless --dry-run is given.
+"""
+
+from django.core.management.base import BaseCommand
+
+from pages import ratings
+
+
+class Command(BaseCommand):
+    help = 'Verify rating summaries and store ratings against the reviews table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report drift without fixing it')
+
+    def handle(self, *args, **options):
+        drift = ratings.reconcile(fix=not options['dry_run'])
+        for subject, subject_id, column, stored, expected in drift:
+            self.stdout.write(f'{subject} {subject_id} {column}: stored {stored}, expected {expected}')
+        if not drift:
+            self.stdout.write(self.style.SUCCESS('Rating summaries match the reviews table'))
+        elif options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'{len(drift)} mismatches (not fixed)'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Fixed {len(drift)} mismatches'))
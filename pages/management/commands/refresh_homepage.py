@@ -0,0 +1,22 @@
+"""
+Rebuild the pre-rendered homepage sections.
+
+USAGE:
+    python manage.py refresh_homepage
+
+Run it from cron every few minutes (at most homepage.FRESH_FOR apart) so
+visitors are always served a fresh copy. Without it the sections are still
+refreshed in the background once they go stale (pages/homepage.py).
+"""
+
+from django.core.management.base import BaseCommand
+
+from pages import homepage
+
+
+class Command(BaseCommand):
+    help = 'Re-render the featured, new arrivals and brands sections of the homepage'
+
+    def handle(self, *args, **options):
+        entry = homepage.build()
+        self.stdout.write(self.style.SUCCESS(f'Homepage sections rebuilt (ETag {entry["etag"]})'))
@@ -0,0 +1,23 @@
+"""
+Cancel unpaid orders whose checkout reservation ran out.
+
+USAGE:
+    python manage.py release_reservations
+
+Run it from cron every minute. Each run cancels up to
+checkout.SWEEP_BATCH expired orders; cancelling puts their watches back on
+the catalog (pages/checkout.py). An order paid while the sweep runs is
+left alone.
+"""
+
+from django.core.management.base import BaseCommand
+
+from pages import checkout
+
+
+class Command(BaseCommand):
+    help = 'Cancel unpaid orders whose listing reservation has expired'
+
+    def handle(self, *args, **options):
+        cancelled = checkout.release_expired()
+        self.stdout.write(self.style.SUCCESS(f'Released {cancelled} expired reservation(s)'))
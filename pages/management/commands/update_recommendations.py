@@ -0,0 +1,35 @@
+"""
+Precompute the "related watches" shown on each watch page.
+
+USAGE:
+    python manage.py update_recommendations             # listings approved since the last run
+    python manage.py update_recommendations --full      # every live listing
+
+Run the default every few minutes and --full nightly. Neighbors are scored
+with NumPy in blocks of --block-rows listings against the whole live catalog
+and the top recommend.NEIGHBORS per listing are stored in product_neighbors
+(pages/recommend.py). An incremental run also moves new listings into the
+existing lists they now belong in.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from pages import recommend
+
+
+class Command(BaseCommand):
+    help = 'Compute related-watch neighbors for new listings (or all of them with --full)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Recompute every live listing')
+        parser.add_argument('--block-rows', type=int, default=recommend.BLOCK_ROWS)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        result = recommend.update(full=options['full'], block_rows=max(1, options['block_rows']))
+        self.stdout.write(self.style.SUCCESS(
+            f'Scored {result.scored} listing(s), updated {result.joined} existing list(s), '
+            f'wrote {result.neighbors} neighbor row(s) in {time.perf_counter() - started:.1f}s'
+        ))
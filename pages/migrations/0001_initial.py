@@ -0,0 +1,136 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:26
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Brand',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('brand_name', models.CharField(max_length=100, unique=True)),
+                ('brand_description', models.TextField(blank=True)),
+                ('brand_logo_url', models.CharField(blank=True, max_length=500)),
+                ('country_of_origin', models.CharField(blank=True, max_length=100)),
+            ],
+            options={
+                'db_table': 'brands',
+            },
+        ),
+        migrations.CreateModel(
+            name='FacetCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('facet', models.CharField(max_length=32)),
+                ('value', models.CharField(max_length=128)),
+                ('label', models.CharField(blank=True, max_length=255)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'catalog_facet_counts',
+                'constraints': [models.UniqueConstraint(fields=('facet', 'value'), name='uniq_catalog_facet_value')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductCategory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category_name', models.CharField(max_length=100, unique=True)),
+                ('category_description', models.TextField(blank=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('parent_category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='pages.productcategory')),
+            ],
+            options={
+                'verbose_name_plural': 'product categories',
+                'db_table': 'product_categories',
+            },
+        ),
+        migrations.CreateModel(
+            name='Seller',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cnic', models.CharField(max_length=15, unique=True)),
+                ('verification_status', models.CharField(choices=[('PENDING', 'Pending'), ('VERIFIED', 'Verified'), ('REJECTED', 'Rejected')], default='PENDING', max_length=20)),
+                ('verification_date', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='seller', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'sellers',
+            },
+        ),
+        migrations.CreateModel(
+            name='Store',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('store_name', models.CharField(max_length=255, unique=True)),
+                ('store_slug', models.SlugField(max_length=255, unique=True)),
+                ('store_bio', models.TextField(blank=True)),
+                ('store_logo_url', models.CharField(blank=True, max_length=500)),
+                ('store_banner_url', models.CharField(blank=True, max_length=500)),
+                ('store_contact', models.CharField(blank=True, max_length=20)),
+                ('store_email', models.EmailField(blank=True, max_length=255)),
+                ('store_rating', models.DecimalField(decimal_places=2, default=0, max_digits=3)),
+                ('total_reviews', models.IntegerField(default=0)),
+                ('total_sales', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('total_orders', models.IntegerField(default=0)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('seller', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='store', to='pages.seller')),
+            ],
+            options={
+                'db_table': 'stores',
+            },
+        ),
+        migrations.CreateModel(
+            name='Product',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_name', models.CharField(max_length=255)),
+                ('reference_number', models.CharField(blank=True, max_length=100)),
+                ('year_manufactured', models.IntegerField(blank=True, null=True)),
+                ('condition', models.CharField(choices=[('NEW', 'New'), ('LIKE_NEW', 'Like New'), ('EXCELLENT', 'Excellent'), ('GOOD', 'Good'), ('FAIR', 'Fair'), ('PARTS_ONLY', 'Parts Only')], max_length=20)),
+                ('has_box', models.BooleanField(default=False)),
+                ('has_papers', models.BooleanField(default=False)),
+                ('has_warranty', models.BooleanField(default=False)),
+                ('warranty_months', models.IntegerField(blank=True, null=True)),
+                ('pieces', models.IntegerField(blank=True, null=True)),
+                ('price', models.DecimalField(db_index=True, decimal_places=2, max_digits=12)),
+                ('original_price', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('currency', models.CharField(default='PKR', max_length=3)),
+                ('status', models.CharField(choices=[('DRAFT', 'Draft'), ('ACTIVE', 'Active'), ('SOLD', 'Sold'), ('RESERVED', 'Reserved'), ('INACTIVE', 'Inactive')], db_index=True, default='DRAFT', max_length=20)),
+                ('approval_status', models.CharField(choices=[('PENDING', 'Pending'), ('APPROVED', 'Approved'), ('REJECTED', 'Rejected'), ('REQUIRES_CHANGES', 'Requires Changes')], db_index=True, default='PENDING', max_length=20)),
+                ('approved_at', models.DateTimeField(blank=True, null=True)),
+                ('rejection_reason', models.TextField(blank=True)),
+                ('specifications', models.JSONField(blank=True, null=True)),
+                ('description', models.TextField(blank=True)),
+                ('case_material', models.CharField(blank=True, max_length=100)),
+                ('movement_type', models.CharField(blank=True, max_length=100)),
+                ('case_diameter_mm', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('water_resistance', models.CharField(blank=True, max_length=50)),
+                ('view_count', models.IntegerField(default=0)),
+                ('favorite_count', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('approved_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('brand', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='products', to='pages.brand')),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='products', to='pages.productcategory')),
+                ('seller', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='products', to='pages.seller')),
+                ('store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='products', to='pages.store')),
+            ],
+            options={
+                'db_table': 'products',
+            },
+        ),
+    ]
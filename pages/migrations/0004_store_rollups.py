@@ -0,0 +1,84 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:41
+
+import django.db.models.deletion
+import pages.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0003_favorites'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Payment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('payment_tier', models.CharField(blank=True, choices=[('STANDARD', 'Standard'), ('EXPRESS', 'Express'), ('PREMIUM', 'Premium')], max_length=20)),
+                ('payment_status', models.CharField(choices=[('PENDING', 'Pending'), ('PROCESSING', 'Processing'), ('COMPLETED', 'Completed'), ('FAILED', 'Failed'), ('REFUNDED', 'Refunded'), ('CANCELLED', 'Cancelled')], default='PENDING', max_length=20)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('currency', models.CharField(default='PKR', max_length=3)),
+                ('transaction_id', models.CharField(blank=True, max_length=255, null=True, unique=True)),
+                ('payment_gateway', models.CharField(blank=True, max_length=50)),
+                ('gateway_response', models.JSONField(blank=True, null=True)),
+                ('payment_initiated_at', models.DateTimeField(auto_now_add=True)),
+                ('payment_completed_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payments', to='pages.order')),
+            ],
+            options={
+                'db_table': 'payments',
+            },
+            bases=(pages.models.LoadedValuesMixin, models.Model),
+        ),
+        migrations.CreateModel(
+            name='Review',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rating', models.DecimalField(decimal_places=1, max_digits=2)),
+                ('title', models.CharField(blank=True, max_length=255)),
+                ('description', models.TextField(blank=True)),
+                ('helpful_count', models.IntegerField(default=0)),
+                ('not_helpful_count', models.IntegerField(default=0)),
+                ('is_verified_purchase', models.BooleanField(default=False)),
+                ('is_approved', models.BooleanField(default=True)),
+                ('is_featured', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reviews', to=settings.AUTH_USER_MODEL)),
+                ('order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reviews', to='pages.order')),
+                ('product', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reviews', to='pages.product')),
+                ('store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reviews', to='pages.store')),
+            ],
+            options={
+                'db_table': 'reviews',
+                'constraints': [models.UniqueConstraint(fields=('customer', 'order'), name='uniq_review_customer_order'), models.CheckConstraint(condition=models.Q(('rating__gte', 1), ('rating__lte', 5)), name='review_rating_range')],
+            },
+            bases=(pages.models.LoadedValuesMixin, models.Model),
+        ),
+        migrations.CreateModel(
+            name='StoreDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('orders', models.IntegerField(default=0)),
+                ('cancelled_orders', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('views', models.IntegerField(default=0)),
+                ('reviews', models.IntegerField(default=0)),
+                ('rating_sum', models.DecimalField(decimal_places=1, default=0, max_digits=10)),
+                ('offers_received', models.IntegerField(default=0)),
+                ('offers_accepted', models.IntegerField(default=0)),
+                ('store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='pages.store')),
+            ],
+            options={
+                'db_table': 'store_daily_stats',
+                'constraints': [models.UniqueConstraint(fields=('store', 'day'), name='uniq_store_daily_stats')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0004_store_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RatingSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(choices=[('store', 'Store'), ('product', 'Product')], max_length=16)),
+                ('subject_id', models.IntegerField()),
+                ('review_count', models.IntegerField(default=0)),
+                ('rating_sum', models.DecimalField(decimal_places=1, default=0, max_digits=12)),
+                ('stars_1', models.IntegerField(default=0)),
+                ('stars_2', models.IntegerField(default=0)),
+                ('stars_3', models.IntegerField(default=0)),
+                ('stars_4', models.IntegerField(default=0)),
+                ('stars_5', models.IntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'rating_summaries',
+                'constraints': [models.UniqueConstraint(fields=('subject', 'subject_id'), name='uniq_rating_summary_subject')],
+            },
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:44
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('pages', '0005_rating_summaries'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='notification_counter', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('unread_count', models.IntegerField(default=0)),
+                ('read_up_to', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'notification_counters',
+            },
+        ),
+        migrations.CreateModel(
+            name='Notification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('notification_type', models.CharField(choices=[('OFFER', 'Offer'), ('ORDER', 'Order'), ('MESSAGE', 'Message'), ('SYSTEM', 'System'), ('ALERT', 'Alert')], max_length=50)),
+                ('title', models.CharField(max_length=255)),
+                ('message', models.TextField()),
+                ('link_url', models.CharField(blank=True, max_length=500)),
+                ('is_read', models.BooleanField(default=False)),
+                ('read_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'notifications',
+                'indexes': [models.Index(fields=['user', 'created_at', 'id'], name='idx_notifications_user_created'), models.Index(fields=['user', 'is_read', 'id'], name='idx_notifications_user_unread')],
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:52
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0007_messaging'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InboxEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_message_id', models.BigIntegerField(blank=True, null=True)),
+                ('last_message_text', models.CharField(blank=True, max_length=200)),
+                ('last_sender_id', models.IntegerField(blank=True, null=True)),
+                ('last_message_at', models.DateTimeField()),
+                ('unread_count', models.IntegerField(default=0)),
+                ('conversation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inbox_entries', to='pages.conversation')),
+                ('other_user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('product', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='pages.product')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inbox_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'chat_inbox',
+                'indexes': [models.Index(fields=['user', 'last_message_at', 'id'], name='idx_inbox_user_recent')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'conversation'), name='uniq_inbox_user_conversation')],
+            },
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:58
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0008_chat_inbox'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Image',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('image_url', models.CharField(max_length=500)),
+                ('thumbnail_url', models.CharField(blank=True, max_length=500)),
+                ('alt_text', models.CharField(blank=True, max_length=255)),
+                ('image_order', models.IntegerField(default=0)),
+                ('storage_name', models.CharField(blank=True, max_length=500)),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('READY', 'Ready'), ('FAILED', 'Failed')], db_index=True, default='PENDING', max_length=20)),
+                ('width', models.IntegerField(blank=True, null=True)),
+                ('height', models.IntegerField(blank=True, null=True)),
+                ('variants', models.JSONField(blank=True, default=list)),
+                ('placeholder', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('uploaded_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='images', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'images',
+                'ordering': ['image_order', 'id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductImage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('is_primary', models.BooleanField(default=False)),
+                ('display_order', models.IntegerField(default=0)),
+                ('image', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='product_links', to='pages.image')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='product_images', to='pages.product')),
+            ],
+            options={
+                'db_table': 'product_images',
+            },
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='images',
+            field=models.ManyToManyField(blank=True, related_name='products', through='pages.ProductImage', to='pages.image'),
+        ),
+        migrations.AddIndex(
+            model_name='productimage',
+            index=models.Index(fields=['product', 'is_primary'], name='idx_product_images_primary'),
+        ),
+        migrations.AddConstraint(
+            model_name='productimage',
+            constraint=models.UniqueConstraint(fields=('product', 'image'), name='uniq_product_image'),
+        ),
+    ]
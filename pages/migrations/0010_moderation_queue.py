@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:03
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0009_listing_images'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AdminActivityLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('action_type', models.CharField(max_length=50)),
+                ('entity_type', models.CharField(blank=True, max_length=50)),
+                ('entity_id', models.IntegerField(blank=True, null=True)),
+                ('description', models.TextField(blank=True)),
+                ('ip_address', models.GenericIPAddressField(blank=True, null=True)),
+                ('user_agent', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'admin_activity_log',
+            },
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='review_claimed_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='review_claimed_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['approval_status', 'created_at', 'id'], name='idx_products_review_queue'),
+        ),
+        migrations.AddField(
+            model_name='adminactivitylog',
+            name='admin',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='admin_activity', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='adminactivitylog',
+            index=models.Index(fields=['created_at'], name='idx_admin_activity_created'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:06
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0010_moderation_queue'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='adminactivitylog',
+            name='idx_admin_activity_created',
+        ),
+        migrations.AlterField(
+            model_name='adminactivitylog',
+            name='admin',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='admin_activity', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='adminactivitylog',
+            index=models.Index(fields=['created_at', 'id'], name='idx_admin_activity_created'),
+        ),
+        migrations.AddIndex(
+            model_name='adminactivitylog',
+            index=models.Index(fields=['admin', 'created_at'], name='idx_admin_activity_admin'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:17
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0013_checkout_reservations'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Offer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('message', models.TextField(blank=True)),
+                ('transaction_method', models.CharField(choices=[('meeting', 'Meeting'), ('delivery', 'Delivery')], default='meeting', max_length=20)),
+                ('offer_status', models.CharField(choices=[('PENDING', 'Pending'), ('COUNTERED', 'Countered'), ('ACCEPTED', 'Accepted'), ('DECLINED', 'Declined'), ('WITHDRAWN', 'Withdrawn'), ('EXPIRED', 'Expired'), ('SUPERSEDED', 'Superseded')], default='PENDING', max_length=20)),
+                ('counter_amount', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('counter_message', models.TextField(blank=True)),
+                ('expires_at', models.DateTimeField()),
+                ('responded_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('buyer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='offers', to=settings.AUTH_USER_MODEL)),
+                ('order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='pages.order')),
+                ('parent', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='pages.offer')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='offers', to='pages.product')),
+                ('store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='offers', to='pages.store')),
+            ],
+            options={
+                'db_table': 'offers',
+                'indexes': [models.Index(fields=['buyer', 'created_at', 'id'], name='idx_offers_buyer_created'), models.Index(fields=['store', 'created_at', 'id'], name='idx_offers_store_created'), models.Index(fields=['store', 'amount', 'id'], name='idx_offers_store_amount'), models.Index(fields=['product', 'offer_status', 'amount'], name='idx_offers_book'), models.Index(fields=['offer_status', 'expires_at'], name='idx_offers_expiry')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('offer_status__in', ['PENDING', 'COUNTERED'])), fields=('product', 'buyer'), name='uniq_offers_open_per_buyer')],
+            },
+        ),
+    ]
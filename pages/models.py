@@ -1,3 +1,1129 @@
+"""
+WatchBazar data model.
+========================================================================================
+
+These models follow Database_docs/SQLDraft1.sql. Table names match the draft
+(`db_table`) so the schema document stays the reference, while Django's
+built-in auth user stands in for the draft's `users` table.
+"""
+
+from datetime import timedelta
+from functools import cached_property
+
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
+from django.utils.text import slugify
+from django.utils.timesince import timesince
+
+
+class LoadedValuesMixin:
+    """
+    Keep the row as loaded so signal handlers can see what changed on save
+    without re-reading it (see pages/catalog.py and pages/rollups.py).
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def stored_values(self, fields):
+        """`fields` as they are in the database, or None for an unsaved row"""
+        if self._state.adding:
+            return None
+        loaded = getattr(self, '_loaded_values', None) or {}
+        if all(name in loaded for name in fields):
+            return {name: loaded[name] for name in fields}
+        # Loaded with only()/defer(): read the missing columns once
+        return type(self).objects.filter(pk=self.pk).values(*fields).first()
+
+
+# =============================================================================
+# SELLERS & STORES
+# =============================================================================
+
+class Seller(models.Model):
+    """A user who has registered to sell watches"""
+
+    class VerificationStatus(models.TextChoices):
+        PENDING = 'PENDING', 'Pending'
+        VERIFIED = 'VERIFIED', 'Verified'
+        REJECTED = 'REJECTED', 'Rejected'
+
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='seller')
+    cnic = models.CharField(max_length=15, unique=True)
+    verification_status = models.CharField(
+        max_length=20, choices=VerificationStatus.choices, default=VerificationStatus.PENDING
+    )
+    verification_date = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'sellers'
+
+    def __str__(self):
+        return self.user.get_username()
+
+    @property
+    def is_verified(self):
+        return self.verification_status == self.VerificationStatus.VERIFIED
+
+    # Names used by templates/watches/watch_detail.html (select_related 'store')
+    @property
+    def store_name(self):
+        return self.store.store_name
+
+
+class Store(models.Model):
+    """A seller's storefront"""
+
+    seller = models.OneToOneField(Seller, on_delete=models.CASCADE, related_name='store')
+    store_name = models.CharField(max_length=255, unique=True)
+    store_slug = models.SlugField(max_length=255, unique=True)
+    store_bio = models.TextField(blank=True)
+    store_logo_url = models.CharField(max_length=500, blank=True)
+    store_banner_url = models.CharField(max_length=500, blank=True)
+    store_contact = models.CharField(max_length=20, blank=True)
+    store_email = models.EmailField(max_length=255, blank=True)
+    store_rating = models.DecimalField(max_digits=3, decimal_places=2, default=0)
+    total_reviews = models.IntegerField(default=0)
+    total_sales = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total_orders = models.IntegerField(default=0)
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'stores'
+
+    def __str__(self):
+        return self.store_name
+
+    # Names used by templates/components/seller_card.html
+    @property
+    def rating(self):
+        return self.store_rating
+
+    @property
+    def review_count(self):
+        return self.total_reviews
+
+    @property
+    def sales_count(self):
+        return self.total_orders
+
+    @property
+    def is_verified(self):
+        return self.seller.is_verified
+
+
+# =============================================================================
+# PRODUCT CATALOG
+# =============================================================================
+
+class ProductCategory(models.Model):
+    """Watch category (Luxury, Sports, Dress, ...)"""
+
+    category_name = models.CharField(max_length=100, unique=True)
+    category_description = models.TextField(blank=True)
+    parent_category = models.ForeignKey('self', null=True, blank=True, on_delete=models.SET_NULL)
+    is_active = models.BooleanField(default=True)
+
+    class Meta:
+        db_table = 'product_categories'
+        verbose_name_plural = 'product categories'
+
+    def __str__(self):
+        return self.category_name
+
+    @property
+    def slug(self):
+        return slugify(self.category_name)
+
+
+class Brand(models.Model):
+    """Watch manufacturer"""
+
+    brand_name = models.CharField(max_length=100, unique=True)
+    brand_description = models.TextField(blank=True)
+    brand_logo_url = models.CharField(max_length=500, blank=True)
+    country_of_origin = models.CharField(max_length=100, blank=True)
+
+    class Meta:
+        db_table = 'brands'
+
+    def __str__(self):
+        return self.brand_name
+
+
+class Product(LoadedValuesMixin, models.Model):
+    """A watch listing"""
+
+    class Condition(models.TextChoices):
+        NEW = 'NEW', 'New'
+        LIKE_NEW = 'LIKE_NEW', 'Like New'
+        EXCELLENT = 'EXCELLENT', 'Excellent'
+        GOOD = 'GOOD', 'Good'
+        FAIR = 'FAIR', 'Fair'
+        PARTS_ONLY = 'PARTS_ONLY', 'Parts Only'
+
+    class Status(models.TextChoices):
+        DRAFT = 'DRAFT', 'Draft'
+        ACTIVE = 'ACTIVE', 'Active'
+        SOLD = 'SOLD', 'Sold'
+        RESERVED = 'RESERVED', 'Reserved'
+        INACTIVE = 'INACTIVE', 'Inactive'
+
+    class ApprovalStatus(models.TextChoices):
+        PENDING = 'PENDING', 'Pending'
+        APPROVED = 'APPROVED', 'Approved'
+        REJECTED = 'REJECTED', 'Rejected'
+        REQUIRES_CHANGES = 'REQUIRES_CHANGES', 'Requires Changes'
+
+    seller = models.ForeignKey(Seller, on_delete=models.CASCADE, related_name='products')
+    store = models.ForeignKey(Store, on_delete=models.CASCADE, related_name='products')
+    brand = models.ForeignKey(Brand, null=True, blank=True, on_delete=models.SET_NULL, related_name='products')
+    category = models.ForeignKey(
+        ProductCategory, null=True, blank=True, on_delete=models.SET_NULL, related_name='products'
+    )
+
+    # Basic Information
+    model_name = models.CharField(max_length=255)
+    reference_number = models.CharField(max_length=100, blank=True)
+    year_manufactured = models.IntegerField(null=True, blank=True)
+
+    # Condition and Authentication
+    condition = models.CharField(max_length=20, choices=Condition.choices)
+    has_box = models.BooleanField(default=False)
+    has_papers = models.BooleanField(default=False)
+    has_warranty = models.BooleanField(default=False)
+    warranty_months = models.IntegerField(null=True, blank=True)
+    pieces = models.IntegerField(null=True, blank=True)
+
+    # Pricing
+    price = models.DecimalField(max_digits=12, decimal_places=2, db_index=True)
+    original_price = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    currency = models.CharField(max_length=3, default='PKR')
+
+    # Status
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.DRAFT, db_index=True)
+    approval_status = models.CharField(
+        max_length=20, choices=ApprovalStatus.choices, default=ApprovalStatus.PENDING, db_index=True
+    )
+    approved_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL, related_name='+'
+    )
+    approved_at = models.DateTimeField(null=True, blank=True)
+    rejection_reason = models.TextField(blank=True)
+    # Moderation lease (pages/moderation.py): who is reviewing it, until when
+    review_claimed_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL, related_name='+'
+    )
+    review_claimed_until = models.DateTimeField(null=True, blank=True)
+    # Checkout hold (pages/checkout.py): RESERVED until then, or until the order is settled if null
+    reserved_until = models.DateTimeField(null=True, blank=True)
+
+    # Additional Details
+    specifications = models.JSONField(null=True, blank=True)
+    description = models.TextField(blank=True)
+    case_material = models.CharField(max_length=100, blank=True)
+    movement_type = models.CharField(max_length=100, blank=True)
+    case_diameter_mm = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
+    water_resistance = models.CharField(max_length=50, blank=True)
+
+    images = models.ManyToManyField('Image', through='ProductImage', related_name='products', blank=True)
+
+    # Metrics
+    view_count = models.IntegerField(default=0)
+    favorite_count = models.IntegerField(default=0)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'products'
+        indexes = [
+            # Keyset pagination: sort column + primary key tie-breaker
+            models.Index(fields=['created_at', 'id'], name='idx_products_created_id'),
+            models.Index(fields=['price', 'id'], name='idx_products_price_id'),
+            models.Index(fields=['favorite_count', 'id'], name='idx_products_favorites_id'),
+            models.Index(fields=['seller', 'created_at', 'id'], name='idx_products_seller_created'),
+            # Moderation queue: pending listings, longest-waiting first
+            models.Index(fields=['approval_status', 'created_at', 'id'], name='idx_products_review_queue'),
+        ]
+
+    def __str__(self):
+        return f'{self.brand} {self.model_name}' if self.brand_id else self.model_name
+
+    @property
+    def is_live(self):
+        """Listed on the public catalog"""
+        return self.status == self.Status.ACTIVE and self.approval_status == self.ApprovalStatus.APPROVED
+
+    # Names used by templates/components/watch_card.html
+    @property
+    def model(self):
+        return self.model_name
+
+    @property
+    def is_fixed_price(self):
+        return False
+
+    @property
+    def allow_negotiations(self):
+        return not self.is_fixed_price
+
+    @property
+    def model_number(self):
+        return self.reference_number
+
+    @property
+    def year(self):
+        return self.year_manufactured
+
+    @property
+    def case_diameter(self):
+        return self.case_diameter_mm
+
+    @cached_property
+    def primary_image(self):
+        """The listing's primary Image (grids prefetch it, see images.primary_image_prefetch())"""
+        links = getattr(self, 'primary_image_links', None)
+        if links is None:
+            links = self.product_images.filter(is_primary=True).select_related('image')[:1]
+        return links[0].image if links else None
+
+
+class Favorite(models.Model):
+    """A watch on a user's wishlist"""
+
+    customer = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='favorites')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='favorites')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'favorites'
+        constraints = [
+            models.UniqueConstraint(fields=['customer', 'product'], name='uniq_favorite_customer_product'),
+        ]
+
+    def __str__(self):
+        return f'{self.customer_id} -> {self.product_id}'
+
+
+# =============================================================================
+# IMAGES
+# =============================================================================
+
+class Image(models.Model):
+    """
+    An uploaded photo plus the responsive variants rendered from it
+    (pages/images.py). `variants` holds {format, width, height, url} entries.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = 'PENDING', 'Pending'
+        READY = 'READY', 'Ready'
+        FAILED = 'FAILED', 'Failed'
+
+    image_url = models.CharField(max_length=500)
+    thumbnail_url = models.CharField(max_length=500, blank=True)
+    alt_text = models.CharField(max_length=255, blank=True)
+    image_order = models.IntegerField(default=0)
+    uploaded_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='images')
+
+    storage_name = models.CharField(max_length=500, blank=True)
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING, db_index=True)
+    width = models.IntegerField(null=True, blank=True)
+    height = models.IntegerField(null=True, blank=True)
+    variants = models.JSONField(default=list, blank=True)
+    placeholder = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'images'
+        ordering = ['image_order', 'id']
+
+    def __str__(self):
+        return self.image_url
+
+    def srcset(self, image_format):
+        return ', '.join(
+            f"{variant['url']} {variant['width']}w" for variant in self.variants if variant['format'] == image_format
+        )
+
+    @property
+    def webp_srcset(self):
+        return self.srcset('webp')
+
+    @property
+    def jpeg_srcset(self):
+        return self.srcset('jpeg')
+
+    @property
+    def display_url(self):
+        """Largest JPEG variant up to 1024px wide, or the original until variants exist"""
+        widths = [v for v in self.variants if v['format'] == 'jpeg' and v['width'] <= 1024]
+        return max(widths, key=lambda v: v['width'])['url'] if widths else self.image_url
+
+    # Names used by templates
+    @property
+    def url(self):
+        return self.image_url
+
+    @property
+    def card_url(self):
+        return self.thumbnail_url or self.image_url
+
+
+class ProductImage(models.Model):
+    """A listing's photo and its position in the gallery"""
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='product_images')
+    image = models.ForeignKey(Image, on_delete=models.CASCADE, related_name='product_links')
+    is_primary = models.BooleanField(default=False)
+    display_order = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'product_images'
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'image'], name='uniq_product_image'),
+        ]
+        indexes = [
+            models.Index(fields=['product', 'is_primary'], name='idx_product_images_primary'),
+        ]
+
+    def __str__(self):
+        return f'{self.product_id}: image {self.image_id}'
+
+
+# =============================================================================
+# ORDER MANAGEMENT
+# =============================================================================
+
+class Order(LoadedValuesMixin, models.Model):
+    """A purchase from one store"""
+
+    class Status(models.TextChoices):
+        PENDING = 'PENDING', 'Pending'
+        CONFIRMED = 'CONFIRMED', 'Confirmed'
+        PROCESSING = 'PROCESSING', 'Processing'
+        SHIPPED = 'SHIPPED', 'Shipped'
+        DELIVERED = 'DELIVERED', 'Delivered'
+        CANCELLED = 'CANCELLED', 'Cancelled'
+        REFUNDED = 'REFUNDED', 'Refunded'
+
+    customer = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.PROTECT, related_name='orders')
+    store = models.ForeignKey(Store, on_delete=models.PROTECT, related_name='orders')
+
+    # Order Details
+    order_number = models.CharField(max_length=50, unique=True)
+    # Client idempotency key of the checkout that placed it (pages/checkout.py)
+    checkout_key = models.CharField(max_length=64, blank=True)
+    # Changed through pages/order_states.py; indexed by idx_orders_status_board
+    order_status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING)
+    status_changed_at = models.DateTimeField(default=timezone.now)
+
+    # Pricing
+    subtotal = models.DecimalField(max_digits=12, decimal_places=2)
+    advance_payment = models.BooleanField(null=True, blank=True)
+    advance_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    tax_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    shipping_cost = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total_amount = models.DecimalField(max_digits=12, decimal_places=2)
+    currency = models.CharField(max_length=3, default='PKR')
+
+    # Tracking
+    tracking_number = models.CharField(max_length=100, blank=True)
+    carrier = models.CharField(max_length=100, blank=True)
+    expected_delivery_date = models.DateField(null=True, blank=True)
+    actual_delivery_date = models.DateField(null=True, blank=True)
+
+    # Notes
+    customer_notes = models.TextField(blank=True)
+    admin_notes = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'orders'
+        indexes = [
+            models.Index(fields=['customer', 'created_at', 'id'], name='idx_orders_customer_created'),
+            models.Index(fields=['store', 'created_at', 'id'], name='idx_orders_store_created'),
+            # Delivery board: one range scan per status column, most recent change first
+            models.Index(fields=['order_status', 'status_changed_at', 'id'], name='idx_orders_status_board'),
+        ]
+        constraints = [
+            # A retried checkout finds the orders it already placed instead of placing them again
+            models.UniqueConstraint(
+                fields=['customer', 'checkout_key', 'store'], condition=~models.Q(checkout_key=''),
+                name='uniq_orders_checkout_key',
+            ),
+        ]
+
+    def __str__(self):
+        return self.order_number
+
+    # Names used by templates/orders/*.html
+    @property
+    def total(self):
+        return self.total_amount
+
+    @property
+    def status(self):
+        return self.order_status.lower()
+
+    @property
+    def watch(self):
+        """First ordered product (prefetch `items__product` to avoid a query per order)"""
+        items = list(self.items.all())
+        return items[0].product if items else None
+
+    @property
+    def customer_name(self):
+        return self.customer.get_full_name() or self.customer.get_username()
+
+    # Names used by templates/admin_panel/delivery_management.html
+    @property
+    def courier(self):
+        return self.carrier.lower()
+
+    @property
+    def estimated_delivery(self):
+        return self.expected_delivery_date
+
+    @property
+    def delivered_at(self):
+        return self.actual_delivery_date
+
+
+class OrderStatusChange(models.Model):
+    """One order status transition; rows are only ever appended (pages/order_states.py)"""
+
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='status_changes')
+    from_status = models.CharField(max_length=20, blank=True)  # '' when the order is placed
+    to_status = models.CharField(max_length=20, choices=Order.Status.choices)
+    changed_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL, related_name='+'
+    )
+    note = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'order_status_history'
+        indexes = [
+            models.Index(fields=['order', 'created_at', 'id'], name='idx_order_history_order'),
+            models.Index(fields=['to_status', 'created_at'], name='idx_order_history_to_status'),
+        ]
+
+    def __str__(self):
+        return f'{self.order_id}: {self.from_status or "-"} -> {self.to_status}'
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError('Order status history is append-only')
+        super().save(*args, **kwargs)
+
+
+class OrderStatusCount(models.Model):
+    """Number of orders in each status, moved by pages/order_states.py on every change"""
+
+    status = models.CharField(max_length=20, choices=Order.Status.choices, primary_key=True)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'order_status_counts'
+
+    def __str__(self):
+        return f'{self.status}: {self.count}'
+
+
+class OrderItem(models.Model):
+    """A product on an order, with its name and price as purchased"""
+
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
+    product = models.ForeignKey(Product, on_delete=models.PROTECT, related_name='order_items')
+
+    # Item Details (snapshot at time of purchase)
+    product_name = models.CharField(max_length=255)
+    product_price = models.DecimalField(max_digits=12, decimal_places=2)
+    quantity = models.PositiveIntegerField(default=1)
+    subtotal = models.DecimalField(max_digits=12, decimal_places=2)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'order_items'
+
+    def __str__(self):
+        return f'{self.product_name} x{self.quantity}'
+
+    # Name used by templates/dashboard/*.html
+    @property
+    def watch(self):
+        return self.product
+
+
+class Payment(LoadedValuesMixin, models.Model):
+    """A payment attempt against an order"""
+
+    class Tier(models.TextChoices):
+        STANDARD = 'STANDARD', 'Standard'
+        EXPRESS = 'EXPRESS', 'Express'
+        PREMIUM = 'PREMIUM', 'Premium'
+
+    class Status(models.TextChoices):
+        PENDING = 'PENDING', 'Pending'
+        PROCESSING = 'PROCESSING', 'Processing'
+        COMPLETED = 'COMPLETED', 'Completed'
+        FAILED = 'FAILED', 'Failed'
+        REFUNDED = 'REFUNDED', 'Refunded'
+        CANCELLED = 'CANCELLED', 'Cancelled'
+
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='payments')
+    payment_tier = models.CharField(max_length=20, choices=Tier.choices, blank=True)
+    payment_status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING)
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    currency = models.CharField(max_length=3, default='PKR')
+
+    # Transaction Details
+    transaction_id = models.CharField(max_length=255, unique=True, null=True, blank=True)
+    payment_gateway = models.CharField(max_length=50, blank=True)
+    gateway_response = models.JSONField(null=True, blank=True)
+
+    # Timestamps
+    payment_initiated_at = models.DateTimeField(auto_now_add=True)
+    payment_completed_at = models.DateTimeField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'payments'
+
+    def __str__(self):
+        return f'{self.order_id}: {self.amount} {self.payment_status}'
+
+
+class SavedCart(models.Model):
+    """
+    A logged-in user's cart, as pages/cart.py stores it: a list of
+    [product id, quantity, price seen, method]. Changes go to the shared
+    cache first and are saved here in batches (cart.CartBuffer).
+    """
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name='saved_cart'
+    )
+    lines = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'saved_carts'
+
+    def __str__(self):
+        return f'{self.user_id}: {len(self.lines)} items'
+
+
+# =============================================================================
+# OFFERS
+# =============================================================================
+
+class Offer(models.Model):
+    """
+    A buyer's price offer on a listing (pages/offers.py). A buyer's reply to a
+    counter-offer is a new Offer whose `parent` is the countered one.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = 'PENDING', 'Pending'
+        COUNTERED = 'COUNTERED', 'Countered'
+        ACCEPTED = 'ACCEPTED', 'Accepted'
+        DECLINED = 'DECLINED', 'Declined'
+        WITHDRAWN = 'WITHDRAWN', 'Withdrawn'
+        EXPIRED = 'EXPIRED', 'Expired'
+        SUPERSEDED = 'SUPERSEDED', 'Superseded'
+
+    class Method(models.TextChoices):
+        MEETING = 'meeting', 'Meeting'
+        DELIVERY = 'delivery', 'Delivery'
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='offers')
+    # Denormalized from product.store for the seller's offer list
+    store = models.ForeignKey(Store, on_delete=models.CASCADE, related_name='offers')
+    buyer = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='offers')
+    parent = models.ForeignKey('self', null=True, blank=True, on_delete=models.SET_NULL, related_name='+')
+
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    message = models.TextField(blank=True)
+    transaction_method = models.CharField(max_length=20, choices=Method.choices, default=Method.MEETING)
+    offer_status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING)
+
+    # Seller's counter-offer
+    counter_amount = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    counter_message = models.TextField(blank=True)
+
+    # Order placed when the offer was accepted
+    order = models.ForeignKey(Order, null=True, blank=True, on_delete=models.SET_NULL, related_name='+')
+
+    expires_at = models.DateTimeField()
+    responded_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'offers'
+        indexes = [
+            models.Index(fields=['buyer', 'created_at', 'id'], name='idx_offers_buyer_created'),
+            models.Index(fields=['store', 'created_at', 'id'], name='idx_offers_store_created'),
+            models.Index(fields=['store', 'amount', 'id'], name='idx_offers_store_amount'),
+            # Offer book: a listing's open offers, best first
+            models.Index(fields=['product', 'offer_status', 'amount'], name='idx_offers_book'),
+            # Expiry sweep
+            models.Index(fields=['offer_status', 'expires_at'], name='idx_offers_expiry'),
+        ]
+        constraints = [
+            # One open offer per buyer and listing
+            models.UniqueConstraint(
+                fields=['product', 'buyer'], condition=models.Q(offer_status__in=['PENDING', 'COUNTERED']),
+                name='uniq_offers_open_per_buyer',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.buyer_id} -> {self.product_id}: {self.amount}'
+
+    @property
+    def is_open(self):
+        return self.offer_status in (self.Status.PENDING, self.Status.COUNTERED) and self.expires_at > timezone.now()
+
+    # Names used by templates/offers/*.html and the seller dashboard
+    @property
+    def status(self):
+        return self.offer_status.lower()
+
+    @property
+    def watch(self):
+        return self.product
+
+    @property
+    def percentage_of_asking(self):
+        price = self.product.price
+        return round(self.amount * 100 / price) if price else 0
+
+    @property
+    def expires_soon(self):
+        return self.is_open and self.expires_at - timezone.now() < timedelta(hours=12)
+
+    @property
+    def time_remaining(self):
+        return timesince(timezone.now(), self.expires_at)
+
+
+# =============================================================================
+# REVIEWS
+# =============================================================================
+
+class Review(LoadedValuesMixin, models.Model):
+    """A customer's rating of a store, optionally for one product and order"""
+
+    store = models.ForeignKey(Store, on_delete=models.CASCADE, related_name='reviews')
+    customer = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='reviews')
+    order = models.ForeignKey(Order, null=True, blank=True, on_delete=models.SET_NULL, related_name='reviews')
+    product = models.ForeignKey(Product, null=True, blank=True, on_delete=models.SET_NULL, related_name='reviews')
+
+    rating = models.DecimalField(max_digits=2, decimal_places=1)
+    title = models.CharField(max_length=255, blank=True)
+    description = models.TextField(blank=True)
+
+    # Helpful votes
+    helpful_count = models.IntegerField(default=0)
+    not_helpful_count = models.IntegerField(default=0)
+
+    # Status
+    is_verified_purchase = models.BooleanField(default=False)
+    is_approved = models.BooleanField(default=True)
+    is_featured = models.BooleanField(default=False)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'reviews'
+        constraints = [
+            models.UniqueConstraint(fields=['customer', 'order'], name='uniq_review_customer_order'),
+            models.CheckConstraint(condition=models.Q(rating__gte=1, rating__lte=5), name='review_rating_range'),
+        ]
+
+    def __str__(self):
+        return f'{self.store} {self.rating}'
+
+
+# =============================================================================
+# CATALOG INDEX
+# =============================================================================
+
+class FacetCount(models.Model):
+    """
+    Maintained facet counts for live listings.
+
+    One row per (facet, value), e.g. ('brand', '12') or ('price', '50k-100k').
+    Rows are adjusted by pages/catalog.py whenever a listing enters, leaves
+    or changes inside the live catalog, so browse pages never run GROUP BY.
+    """
+
+    facet = models.CharField(max_length=32)
+    value = models.CharField(max_length=128)
+    label = models.CharField(max_length=255, blank=True)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'catalog_facet_counts'
+        constraints = [
+            models.UniqueConstraint(fields=['facet', 'value'], name='uniq_catalog_facet_value'),
+        ]
+
+    def __str__(self):
+        return f'{self.facet}={self.value} ({self.count})'
+
+
+class ProductNeighbor(models.Model):
+    """
+    One precomputed "related watch" of a listing, written by pages/recommend.py.
+
+    A listing's neighbors are ranked 0..K-1 by similarity, so the watch page
+    reads them in rank order off the (product, rank) unique index.
+    """
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    neighbor = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='neighbor_of')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'product_neighbors'
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'rank'], name='uniq_product_neighbor_rank'),
+        ]
+
+    def __str__(self):
+        return f'{self.product_id} ~ {self.neighbor_id} ({self.score:.3f})'
+
+
+# =============================================================================
+# STORE ROLLUPS
+# =============================================================================
+
+class StoreDailyStats(models.Model):
+    """
+    One store's activity for one day, maintained by pages/rollups.py.
+
+    The seller dashboard sums at most a month of these rows instead of
+    scanning orders, payments and reviews on every page load.
+    """
+
+    store = models.ForeignKey(Store, on_delete=models.CASCADE, related_name='daily_stats')
+    day = models.DateField()
+
+    orders = models.IntegerField(default=0)             # placed and not cancelled
+    cancelled_orders = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)  # completed payments
+    views = models.IntegerField(default=0)
+    reviews = models.IntegerField(default=0)            # approved
+    rating_sum = models.DecimalField(max_digits=10, decimal_places=1, default=0)
+    offers_received = models.IntegerField(default=0)
+    offers_accepted = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'store_daily_stats'
+        constraints = [
+            models.UniqueConstraint(fields=['store', 'day'], name='uniq_store_daily_stats'),
+        ]
+
+    def __str__(self):
+        return f'{self.store_id} {self.day}'
+
+
+# =============================================================================
+# RATINGS
+# =============================================================================
+
+class RatingSummary(models.Model):
+    """
+    Approved-review aggregates for one store or product, maintained by
+    pages/ratings.py: count, sum and a 1-5 star histogram.
+    """
+
+    class Subject(models.TextChoices):
+        STORE = 'store', 'Store'
+        PRODUCT = 'product', 'Product'
+
+    subject = models.CharField(max_length=16, choices=Subject.choices)
+    subject_id = models.IntegerField()
+    review_count = models.IntegerField(default=0)
+    rating_sum = models.DecimalField(max_digits=12, decimal_places=1, default=0)
+    stars_1 = models.IntegerField(default=0)
+    stars_2 = models.IntegerField(default=0)
+    stars_3 = models.IntegerField(default=0)
+    stars_4 = models.IntegerField(default=0)
+    stars_5 = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'rating_summaries'
+        constraints = [
+            models.UniqueConstraint(fields=['subject', 'subject_id'], name='uniq_rating_summary_subject'),
+        ]
+
+    def __str__(self):
+        return f'{self.subject}:{self.subject_id} {self.mean} ({self.review_count})'
+
+    @property
+    def mean(self):
+        if not self.review_count:
+            return 0
+        return round(self.rating_sum / self.review_count, 2)
+
+    @property
+    def histogram(self):
+        """[{'stars': 5, 'count': n, 'percent': p}, ...] from 5 stars down"""
+        rows = []
+        for stars in range(5, 0, -1):
+            count = getattr(self, f'stars_{stars}')
+            percent = round(100 * count / self.review_count) if self.review_count else 0
+            rows.append({'stars': stars, 'count': count, 'percent': percent})
+        return rows
+
+
+# =============================================================================
+# MESSAGING
+# =============================================================================
+
+class Conversation(models.Model):
+    """A chat between a customer and a seller, optionally about one listing"""
+
+    class Status(models.TextChoices):
+        ACTIVE = 'ACTIVE', 'Active'
+        CLOSED = 'CLOSED', 'Closed'
+        ARCHIVED = 'ARCHIVED', 'Archived'
+
+    customer = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='conversations')
+    seller = models.ForeignKey(Seller, on_delete=models.CASCADE, related_name='conversations')
+    product = models.ForeignKey(Product, null=True, blank=True, on_delete=models.SET_NULL, related_name='conversations')
+
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.ACTIVE)
+    last_message_at = models.DateTimeField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'chat_conversations'
+        constraints = [
+            models.UniqueConstraint(fields=['customer', 'seller', 'product'], name='uniq_conversation_participants'),
+        ]
+
+    def __str__(self):
+        return f'{self.customer_id} <-> {self.seller_id}'
+
+    def participant_user_ids(self):
+        """User ids of both sides (select_related `seller` to avoid a query)"""
+        return [self.customer_id, self.seller.user_id]
+
+
+class Message(models.Model):
+    """One chat message"""
+
+    class Type(models.TextChoices):
+        TEXT = 'TEXT', 'Text'
+        IMAGE = 'IMAGE', 'Image'
+        SYSTEM = 'SYSTEM', 'System'
+
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='messages')
+    sender = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='sent_messages')
+
+    message_text = models.TextField()
+    message_type = models.CharField(max_length=20, choices=Type.choices, default=Type.TEXT)
+    attachment_url = models.CharField(max_length=500, blank=True)
+
+    is_read = models.BooleanField(default=False)
+    read_at = models.DateTimeField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'messages'
+        indexes = [
+            models.Index(fields=['conversation', 'created_at', 'id'], name='idx_messages_conv_created'),
+        ]
+
+    def __str__(self):
+        return self.message_text[:50]
+
+    # Names used by templates/misc/messages.html
+    @property
+    def content(self):
+        return self.message_text
+
+
+class InboxEntry(models.Model):
+    """
+    One participant's row for a conversation, maintained by pages/inbox.py:
+    the latest message, when it was sent and how many are unread.
+    """
+
+    SNIPPET_LENGTH = 200
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='inbox_entries')
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='inbox_entries')
+    other_user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    product = models.ForeignKey(Product, null=True, blank=True, on_delete=models.SET_NULL, related_name='+')
+
+    last_message_id = models.BigIntegerField(null=True, blank=True)
+    last_message_text = models.CharField(max_length=SNIPPET_LENGTH, blank=True)
+    last_sender_id = models.IntegerField(null=True, blank=True)
+    last_message_at = models.DateTimeField()
+    unread_count = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'chat_inbox'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'conversation'], name='uniq_inbox_user_conversation'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'last_message_at', 'id'], name='idx_inbox_user_recent'),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id}: conversation {self.conversation_id}'
+
+    # Names used by templates/misc/messages.html
+    @property
+    def watch(self):
+        return self.product
+
+
+# =============================================================================
+# NOTIFICATIONS
+# =============================================================================
+
+class Notification(models.Model):
+    """An in-app notification for one user"""
+
+    class Type(models.TextChoices):
+        OFFER = 'OFFER', 'Offer'
+        ORDER = 'ORDER', 'Order'
+        MESSAGE = 'MESSAGE', 'Message'
+        SYSTEM = 'SYSTEM', 'System'
+        ALERT = 'ALERT', 'Alert'
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='notifications')
+    notification_type = models.CharField(max_length=50, choices=Type.choices)
+    title = models.CharField(max_length=255)
+    message = models.TextField()
+    link_url = models.CharField(max_length=500, blank=True)
+    is_read = models.BooleanField(default=False)
+    read_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'notifications'
+        indexes = [
+            models.Index(fields=['user', 'created_at', 'id'], name='idx_notifications_user_created'),
+            models.Index(fields=['user', 'is_read', 'id'], name='idx_notifications_user_unread'),
+        ]
+
+    def __str__(self):
+        return self.title
+
+    # Names used by templates/misc/notifications.html
+    @property
+    def type(self):
+        return self.notification_type.lower()
+
+    @property
+    def action_url(self):
+        return self.link_url
+
+
+class NotificationCounter(models.Model):
+    """
+    Denormalized unread count per user, maintained by pages/notify.py.
+
+    `read_up_to` is the newest notification id covered by the last
+    "mark all as read".
+    """
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name='notification_counter'
+    )
+    unread_count = models.IntegerField(default=0)
+    read_up_to = models.BigIntegerField(default=0)
+
+    class Meta:
+        db_table = 'notification_counters'
+
+    def __str__(self):
+        return f'{self.user_id}: {self.unread_count} unread'
+
+
+# =============================================================================
+# ADMIN ACTIVITY LOG
+# =============================================================================
+
+class AdminActivityLog(models.Model):
+    """One admin action (approve a listing, verify a seller, ...) for the audit trail"""
+
+    # Indexed through idx_admin_activity_admin
+    admin = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='admin_activity', db_index=False
+    )
+    action_type = models.CharField(max_length=50)
+    entity_type = models.CharField(max_length=50, blank=True)
+    entity_id = models.IntegerField(null=True, blank=True)
+    description = models.TextField(blank=True)
+    ip_address = models.GenericIPAddressField(null=True, blank=True)
+    user_agent = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'admin_activity_log'
+        indexes = [
+            # Audit queries are always time-ranged (pages/audit.py)
+            models.Index(fields=['created_at', 'id'], name='idx_admin_activity_created'),
+            models.Index(fields=['admin', 'created_at'], name='idx_admin_activity_admin'),
+        ]
+
+    def __str__(self):
+        return f'{self.admin_id} {self.action_type} {self.entity_type}:{self.entity_id}'
+
+    # Names used by templates/admin_panel/dashboard.html (recent activity)
+    @property
+    def message(self):
+        action = self.action_type.replace('_', ' ')
+        subject = f' {self.entity_type} #{self.entity_id}' if self.entity_id is not None else ''
+        return f'{self.admin.get_username()}: {action}{subject}'
+
+    @property
+    def time(self):
+        return self.created_at
+
+    @property
+    def icon(self):
+        if self.action_type.endswith('approve'):
+            return 'check-circle'
+        if self.action_type.endswith('reject'):
+            return 'x-circle'
+        return 'edit-3'
 
-# Create your models here.
+    @property
+    def color(self):
+        if self.action_type.endswith('approve'):
+            return '#28a745'
+        if self.action_type.endswith('reject'):
+            return '#dc3545'
+        return 'var(--wb-primary)'
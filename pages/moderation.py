@@ -0,0 +1,185 @@
+"""
+Listing moderation queue.
+========================================================================================
+
+HOW IT WORKS:
+-------------
+- The queue is every PENDING listing, longest-waiting first
+  (`idx_products_review_queue` on approval_status, created_at, id).
+- `claim()` leases the next BATCH_SIZE listings to one admin for LEASE by
+  stamping `review_claimed_by` / `review_claimed_until`. The stamp is a single
+  conditional UPDATE ("... WHERE pk IN (...) AND the lease is free, expired or
+  already ours"), so when two admins pick the same candidates the row lock
+  decides and the loser's UPDATE skips them. Each admin then reads back only
+  the rows stamped with their own lease. Reloading the page renews the lease
+  on the admin's current batch before topping it up.
+- `moderate()` applies approve / reject / requires-changes to many listings
+  in one transaction: one UPDATE through catalog.bulk_update_products (which
+  moves facet counts, bumps `updated_at` for the search index and drops the
+  cached detail pages) plus one bulk INSERT into `admin_activity_log`.
+  Listings leased to another admin, or no longer pending, are skipped.
+- A lease that runs out (admin closed the tab) puts the listing back in the
+  queue for everyone; `release()` hands it back sooner.
+
+USAGE:
+    listings = moderation.claim(request.user)
+    done = moderation.moderate(request.user, [12, 13, 14], 'approve', request=request)
+"""
+
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Avg, Count, DurationField, F, Q
+from django.utils import timezone
+
+from . import audit, catalog, images
+from .models import AdminActivityLog, Product
+
+
+BATCH_SIZE = 24
+LEASE = timedelta(minutes=15)
+
+# action -> approval status it sets
+ACTIONS = {
+    'approve': Product.ApprovalStatus.APPROVED,
+    'reject': Product.ApprovalStatus.REJECTED,
+    'requires_changes': Product.ApprovalStatus.REQUIRES_CHANGES,
+}
+QUEUE_ORDER = ('created_at', 'id')
+
+
+def pending():
+    """The moderation queue, in priority order"""
+    return Product.objects.filter(approval_status=Product.ApprovalStatus.PENDING).order_by(*QUEUE_ORDER)
+
+
+def _claimable(admin, now):
+    return (
+        Q(review_claimed_until__isnull=True)
+        | Q(review_claimed_until__lte=now)
+        | Q(review_claimed_by=admin)
+    )
+
+
+def _for_review(queryset):
+    return (
+        queryset.select_related('brand', 'store', 'seller')
+        .prefetch_related(images.primary_image_prefetch())
+        .annotate(image_count=Count('product_images'))
+    )
+
+
+# =============================================================================
+# LEASES
+# =============================================================================
+
+def claim(admin, limit=BATCH_SIZE, brand_id=None):
+    """
+    Lease up to `limit` pending listings to `admin` and return them in queue
+    order. Listings the admin already holds come first and keep their lease.
+    """
+    now = timezone.now()
+    until = now + LEASE
+    queue = pending()
+    if brand_id is not None:
+        queue = queue.filter(brand_id=brand_id)
+
+    held = list(queue.filter(review_claimed_by=admin, review_claimed_until__gt=now).values_list('pk', flat=True)[:limit])
+    wanted = held
+    if len(held) < limit:
+        wanted = held + list(
+            queue.filter(_claimable(admin, now)).exclude(pk__in=held).values_list('pk', flat=True)[:limit - len(held)]
+        )
+    if wanted:
+        Product.objects.filter(pk__in=wanted, approval_status=Product.ApprovalStatus.PENDING).filter(
+            _claimable(admin, now)
+        ).update(review_claimed_by=admin, review_claimed_until=until)
+    # Only rows carrying this lease: candidates another admin won are left out
+    return list(_for_review(queue.filter(review_claimed_by=admin, review_claimed_until=until)))
+
+
+def release(admin, product_ids=None):
+    """Give `admin`'s leased listings (all, or `product_ids`) back to the queue"""
+    leased = Product.objects.filter(review_claimed_by=admin)
+    if product_ids is not None:
+        leased = leased.filter(pk__in=product_ids)
+    return leased.update(review_claimed_by=None, review_claimed_until=None)
+
+
+# =============================================================================
+# DECISIONS
+# =============================================================================
+
+def moderate(admin, product_ids, action, reason='', request=None):
+    """
+    Apply `action` ('approve', 'reject' or 'requires_changes') to the listings
+    in `product_ids` that are still pending and not leased to someone else.
+    Returns the ids that were moderated.
+    """
+    if action not in ACTIONS:
+        raise ValueError(f'Unknown moderation action {action!r}')
+    now = timezone.now()
+    changes = {
+        'approval_status': ACTIONS[action],
+        'rejection_reason': '' if action == 'approve' else reason,
+        'review_claimed_by': None,
+        'review_claimed_until': None,
+    }
+    if action == 'approve':
+        changes.update(approved_by=admin, approved_at=now)
+
+    with transaction.atomic():
+        ids = list(
+            pending().filter(pk__in=product_ids).filter(_claimable(admin, now))
+            .select_for_update().values_list('pk', flat=True)
+        )
+        if not ids:
+            return []
+        catalog.bulk_update_products(Product.objects.filter(pk__in=ids), **changes)
+        # Committed with the decision itself, not through the write-behind buffer
+        AdminActivityLog.objects.bulk_create([
+            audit.entry(admin, f'listing_{action}', 'product', pk, reason, request=request, at=now)
+            for pk in ids
+        ])
+    return ids
+
+
+# =============================================================================
+# REVIEWER PAGE
+# =============================================================================
+
+def recently_reviewed(approval_status=None, limit=BATCH_SIZE):
+    """Latest decided listings, for the page's non-pending filters"""
+    reviewed = Product.objects.exclude(approval_status=Product.ApprovalStatus.PENDING)
+    if approval_status:
+        reviewed = reviewed.filter(approval_status=approval_status)
+    return list(_for_review(reviewed.order_by('-updated_at', '-id'))[:limit])
+
+
+def _duration_label(duration):
+    if duration is None:
+        return '—'
+    minutes = int(duration.total_seconds() // 60)
+    if minutes < 60:
+        return f'{minutes}m'
+    hours, minutes = divmod(minutes, 60)
+    return f'{hours}h {minutes}m' if hours < 48 else f'{hours // 24}d'
+
+
+def queue_stats():
+    """Header figures: queue length, today's decisions, average wait of today's approvals"""
+    midnight = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+    decided = dict(
+        AdminActivityLog.objects.filter(
+            created_at__gte=midnight, action_type__in=['listing_approve', 'listing_reject'],
+        ).values_list('action_type').annotate(count=Count('id'))
+    )
+    wait = Product.objects.filter(approved_at__gte=midnight).aggregate(
+        wait=Avg(F('approved_at') - F('created_at'), output_field=DurationField())
+    )['wait']
+    return {
+        'pending_count': pending().count(),
+        'approved_today': decided.get('listing_approve', 0),
+        'rejected_today': decided.get('listing_reject', 0),
+        'avg_review_time': _duration_label(wait),
+    }
@@ -0,0 +1,117 @@
+"""
+Notifications and per-user unread counts without COUNT(*).
+========================================================================================
+
+HOW IT WORKS:
+-------------
+- `notification_counters.unread_count` is the stored count. It only ever
+  moves by the number of rows that actually changed:
+    new unread notification   +1, in the same transaction as the INSERT
+                              (post_save signal, pages/signals.py)
+    mark_read()               UPDATE ... WHERE id = ? AND NOT is_read; -1 if it flipped
+    mark_all_read()           UPDATE ... WHERE user = ? AND NOT is_read AND id <= read_up_to;
+                              -rowcount, and the watermark moves up
+  A notification created while "mark all" runs either has an id above the
+  watermark or isn't visible to its UPDATE yet, so it stays unread and its +1
+  stands. No code path sets the count from a separate read.
+- The navbar badge is served from the shared cache (`notifications:unread:<user id>`),
+  so pages don't query for it. After commit, deltas are applied with
+  cache.incr/decr. A missing key is refilled from the column on the next read,
+  and entries expire after UNREAD_CACHE_TIMEOUT so a lost update is short-lived.
+
+USAGE:
+    notify.send(user, Notification.Type.ORDER, 'Order shipped', '...', link_url='/orders/12/')
+    notify.unread_count(user.pk)
+"""
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Max, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import Notification, NotificationCounter
+
+
+UNREAD_CACHE_TIMEOUT = 5 * 60
+
+
+def _cache_key(user_id):
+    return f'notifications:unread:{user_id}'
+
+
+def _adjust_cached(user_id, delta):
+    if not delta:
+        return
+    try:
+        if delta > 0:
+            cache.incr(_cache_key(user_id), delta)
+        else:
+            cache.decr(_cache_key(user_id), -delta)
+    except ValueError:
+        pass  # not cached: the next read loads the column
+
+
+def adjust_unread(user_id, delta):
+    """Move the stored count by `delta` (and the cached copy after commit)"""
+    if not delta:
+        return
+    with transaction.atomic():
+        rows = NotificationCounter.objects.filter(user_id=user_id)
+        if not rows.update(unread_count=Greatest(F('unread_count') + delta, Value(0))):
+            NotificationCounter.objects.get_or_create(user_id=user_id)
+            rows.update(unread_count=Greatest(F('unread_count') + delta, Value(0)))
+        transaction.on_commit(lambda: _adjust_cached(user_id, delta))
+
+
+def unread_count(user_id):
+    """Cached unread count; one primary-key read on a cache miss"""
+    count = cache.get(_cache_key(user_id))
+    if count is None:
+        count = (
+            NotificationCounter.objects.filter(user_id=user_id).values_list('unread_count', flat=True).first() or 0
+        )
+        # add(): don't overwrite a value another request just adjusted
+        cache.add(_cache_key(user_id), count, UNREAD_CACHE_TIMEOUT)
+    return count
+
+
+def send(user, notification_type, title, message, link_url=''):
+    return Notification.objects.create(
+        user=user, notification_type=notification_type, title=title, message=message, link_url=link_url,
+    )
+
+
+def mark_read(user, notification_id):
+    """Mark one notification read; returns True if it was unread"""
+    with transaction.atomic():
+        flipped = Notification.objects.filter(pk=notification_id, user=user, is_read=False).update(
+            is_read=True, read_at=timezone.now(),
+        )
+        adjust_unread(user.pk, -flipped)
+    return bool(flipped)
+
+
+def mark_all_read(user, read_up_to=None):
+    """
+    Mark every unread notification with id <= `read_up_to` read in one
+    UPDATE. Pass the newest id the user has seen, so notifications that
+    arrive after the page was rendered stay unread; defaults to the newest
+    one stored. Returns the number of rows marked.
+    """
+    with transaction.atomic():
+        if read_up_to is None:
+            read_up_to = Notification.objects.filter(user=user).aggregate(newest=Max('id'))['newest'] or 0
+        marked = Notification.objects.filter(user=user, is_read=False, id__lte=read_up_to).update(
+            is_read=True, read_at=timezone.now(),
+        )
+        changes = {
+            'unread_count': Greatest(F('unread_count') - marked, Value(0)),
+            'read_up_to': Greatest(F('read_up_to'), Value(read_up_to)),
+        }
+        rows = NotificationCounter.objects.filter(user_id=user.pk)
+        if not rows.update(**changes):
+            NotificationCounter.objects.get_or_create(user_id=user.pk)
+            rows.update(**changes)
+        transaction.on_commit(lambda: _adjust_cached(user.pk, -marked))
+    return marked
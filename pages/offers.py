@@ -0,0 +1,468 @@
+"""
+Offer negotiation and the per-listing offer book.
+========================================================================================
+
+HOW IT WORKS:
+-------------
+- An offer is PENDING until the seller accepts, declines or counters it. A
+  COUNTERED offer waits for the buyer, who can accept the counter, decline
+  it, or reply with a new amount. The reply is a new offer whose `parent` is
+  the countered one, which becomes SUPERSEDED, so the whole chain stays
+  readable. A buyer has at most one open offer per listing (partial unique
+  index).
+- Offers run out at `expires_at`. `expire()` (python manage.py expire_offers,
+  from cron) flips them to EXPIRED with one UPDATE per batch of SWEEP_BATCH
+  rows, found through `idx_offers_expiry`.
+- `accept()` runs in one transaction. It locks the offer and places the
+  buyer's order at the agreed price through pages/checkout.py, which
+  reserves the watch or fails if it was taken. It then declines every
+  competing open offer on the listing and counts the acceptance in the
+  store rollups.
+- The offer book (`book()`) is a listing's open offers, best first, read
+  with one query on `idx_offers_book` and kept in the two-tier cache
+  (pages/render_cache.py). The per-listing version token lives in the
+  shared cache. Every change drops the token after commit, so all workers
+  reload the book on their next read. Expiry is checked when the book is
+  read, so an offer past its deadline drops out before the sweep reaches it.
+- Buyer and seller lists are keyset-paginated range scans of
+  (buyer | store, created_at, id). Their listings come with a fixed number
+  of prefetch queries, never `offers.all()` per listing.
+
+USAGE:
+    offer = offers.make_offer(request.user, product, Decimal('250000'), method='meeting')
+    offers.counter(offer, seller_user, Decimal('270000'), 'Best I can do')
+    offers.accept(offer, buyer)
+    offers.book(product.pk).best
+"""
+
+import uuid
+from collections import Counter
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Prefetch, Q
+from django.urls import reverse
+from django.utils import timezone
+
+from . import catalog, checkout, images, notify, rollups
+from .cart import CartItem
+from .models import Notification, Offer, Product
+from .render_cache import TwoTierCache
+
+
+S = Offer.Status
+OPEN = (S.PENDING, S.COUNTERED)
+VALIDITY_HOURS = (24, 48, 72, 168)
+DEFAULT_VALIDITY_HOURS = 48
+COUNTER_VALIDITY = timedelta(hours=48)
+SWEEP_BATCH = 1000
+BOOK_TIMEOUT = 60 * 60
+
+books = TwoTierCache(timeout=BOOK_TIMEOUT)
+
+
+class OfferError(Exception):
+    """An offer action that isn't possible in the offer's current state"""
+
+
+# =============================================================================
+# OFFER BOOK
+# =============================================================================
+
+@dataclass(frozen=True)
+class BookEntry:
+    """One open offer as kept in the book"""
+
+    id: int
+    buyer_id: int
+    amount: object
+    counter_amount: object
+    transaction_method: str
+    offer_status: str
+    created_at: object
+    expires_at: object
+
+    # Names used by the offers tab of templates/watches/watch_detail.html
+    @property
+    def status(self):
+        return self.offer_status.lower()
+
+
+class OfferBook:
+    """A listing's open offers, highest amount first"""
+
+    def __init__(self, product_id, entries):
+        self.product_id = product_id
+        self.entries = entries
+
+    @property
+    def open(self):
+        now = timezone.now()
+        return [entry for entry in self.entries if entry.expires_at > now]
+
+    @property
+    def best(self):
+        """Highest open offer amount, or None"""
+        offers = self.open
+        return offers[0].amount if offers else None
+
+    def for_buyer(self, buyer_id):
+        return next((entry for entry in self.open if entry.buyer_id == buyer_id), None)
+
+    def __len__(self):
+        return len(self.open)
+
+
+def _version_key(product_id):
+    return f'offers:book:v:{product_id}'
+
+
+def _load_book(product_id):
+    rows = (
+        Offer.objects.filter(product_id=product_id, offer_status__in=OPEN)
+        .order_by('-amount', 'created_at')
+        .values_list(
+            'id', 'buyer_id', 'amount', 'counter_amount', 'transaction_method', 'offer_status',
+            'created_at', 'expires_at',
+        )
+    )
+    return OfferBook(product_id, [BookEntry(*row) for row in rows])
+
+
+def book(product_id):
+    """The offer book for a listing (usually no query; see the module docstring)"""
+    shared = books.shared
+    version = shared.get(_version_key(product_id))
+    if version is None:
+        version = uuid.uuid4().hex[:12]
+        # add(): if another worker raced us, use its token
+        if not shared.add(_version_key(product_id), version, BOOK_TIMEOUT):
+            version = shared.get(_version_key(product_id)) or version
+    key = f'offers:book:{product_id}:{version}'
+    cached = books.get(key)
+    if cached is None:
+        cached = _load_book(product_id)
+        books.set(key, cached)
+    return cached
+
+
+def _changed(*product_ids):
+    """Drop the books of `product_ids` once the transaction commits"""
+    keys = [_version_key(pk) for pk in set(product_ids)]
+    transaction.on_commit(lambda: books.shared.delete_many(keys))
+
+
+# =============================================================================
+# NEGOTIATION
+# =============================================================================
+
+def _locked(offer):
+    return (
+        Offer.objects.select_for_update(of=('self',))
+        .select_related('product__brand', 'store__seller__user', 'buyer')
+        .get(pk=offer.pk)
+    )
+
+
+def _check_open(offer, *statuses):
+    if offer.offer_status not in statuses:
+        raise OfferError(f'This offer is {offer.status}; that action is not available')
+    if offer.expires_at <= timezone.now():
+        raise OfferError('This offer has expired')
+
+
+def _check_amount(amount, product):
+    if amount is None or amount <= 0:
+        raise OfferError('Enter an amount greater than zero')
+    if amount > product.price:
+        raise OfferError('An offer cannot be higher than the asking price')
+
+
+def is_seller(user, offer):
+    return offer.store.seller.user_id == user.pk
+
+
+def make_offer(buyer, product, amount, method=Offer.Method.MEETING, message='', validity_hours=DEFAULT_VALIDITY_HOURS):
+    """
+    Offer `amount` on a live listing. A buyer who already has an open offer
+    on it revises that one instead.
+    """
+    if not product.is_live:
+        raise OfferError('This watch is no longer available')
+    if product.seller.user_id == buyer.pk:
+        raise OfferError('You cannot make an offer on your own listing')
+    _check_amount(amount, product)
+    if method not in Offer.Method.values:
+        method = Offer.Method.MEETING
+    if validity_hours not in VALIDITY_HOURS:
+        validity_hours = DEFAULT_VALIDITY_HOURS
+
+    existing = Offer.objects.filter(product=product, buyer=buyer, offer_status__in=OPEN).first()
+    if existing is not None:
+        if existing.expires_at > timezone.now():
+            return revise(existing, buyer, amount)
+        # Ran out but not swept yet: retire it so a fresh offer can open
+        Offer.objects.filter(pk=existing.pk, offer_status__in=OPEN).update(offer_status=S.EXPIRED)
+    try:
+        with transaction.atomic():
+            offer = Offer.objects.create(
+                product=product, store_id=product.store_id, buyer=buyer, amount=amount, message=message[:2000],
+                transaction_method=method, expires_at=timezone.now() + timedelta(hours=validity_hours),
+            )
+            rollups.record_offer(product.store_id, received=1)
+            notify.send(
+                product.seller.user, Notification.Type.OFFER, 'New offer',
+                f'Rs. {amount:,.0f} offered on {product}', link_url=reverse('offers_received'),
+            )
+            _changed(product.pk)
+    except IntegrityError:
+        # A concurrent request from the same buyer opened one first
+        raise OfferError('You already have an open offer on this watch')
+    return offer
+
+
+def revise(offer, buyer, amount):
+    """
+    Buyer changes their offer. A pending offer is updated in place; a reply
+    to a counter-offer starts a new offer in the chain.
+    """
+    with transaction.atomic():
+        offer = _locked(offer)
+        if offer.buyer_id != buyer.pk:
+            raise OfferError('This is not your offer')
+        _check_open(offer, *OPEN)
+        _check_amount(amount, offer.product)
+        if offer.offer_status == S.PENDING:
+            offer.amount = amount
+            offer.save(update_fields=['amount', 'updated_at'])
+            revised = offer
+        else:
+            offer.offer_status = S.SUPERSEDED
+            offer.responded_at = timezone.now()
+            offer.save(update_fields=['offer_status', 'responded_at', 'updated_at'])
+            revised = Offer.objects.create(
+                product=offer.product, store_id=offer.store_id, buyer=buyer, parent=offer, amount=amount,
+                transaction_method=offer.transaction_method, expires_at=timezone.now() + COUNTER_VALIDITY,
+            )
+            notify.send(
+                offer.store.seller.user, Notification.Type.OFFER, 'New offer',
+                f'Rs. {amount:,.0f} offered on {offer.product} in reply to your counter-offer',
+                link_url=reverse('offers_received'),
+            )
+        _changed(offer.product_id)
+    return revised
+
+
+def counter(offer, seller_user, amount, message=''):
+    """Seller answers a pending offer with their own price"""
+    with transaction.atomic():
+        offer = _locked(offer)
+        if not is_seller(seller_user, offer):
+            raise OfferError('This offer is not on your listing')
+        _check_open(offer, S.PENDING)
+        _check_amount(amount, offer.product)
+        if amount <= offer.amount:
+            raise OfferError('A counter-offer must be higher than the offer; accept it instead')
+        now = timezone.now()
+        offer.offer_status = S.COUNTERED
+        offer.counter_amount = amount
+        offer.counter_message = message[:2000]
+        offer.responded_at = now
+        offer.expires_at = now + COUNTER_VALIDITY
+        offer.save(update_fields=[
+            'offer_status', 'counter_amount', 'counter_message', 'responded_at', 'expires_at', 'updated_at',
+        ])
+        notify.send(
+            offer.buyer, Notification.Type.OFFER, 'Counter-offer',
+            f'The seller countered with Rs. {amount:,.0f} for {offer.product}', link_url=reverse('my_offers'),
+        )
+        _changed(offer.product_id)
+    return offer
+
+
+def decline(offer, user):
+    """Seller declines a pending offer, or buyer declines a counter-offer"""
+    with transaction.atomic():
+        offer = _locked(offer)
+        if is_seller(user, offer):
+            _check_open(offer, S.PENDING)
+            recipient, link = offer.buyer, reverse('my_offers')
+        elif offer.buyer_id == user.pk:
+            _check_open(offer, S.COUNTERED)
+            recipient, link = offer.store.seller.user, reverse('offers_received')
+        else:
+            raise OfferError('This is not your offer')
+        offer.offer_status = S.DECLINED
+        offer.responded_at = timezone.now()
+        offer.save(update_fields=['offer_status', 'responded_at', 'updated_at'])
+        notify.send(recipient, Notification.Type.OFFER, 'Offer declined', f'The offer on {offer.product} was declined', link)
+        _changed(offer.product_id)
+    return offer
+
+
+def withdraw(offer, buyer):
+    with transaction.atomic():
+        offer = _locked(offer)
+        if offer.buyer_id != buyer.pk:
+            raise OfferError('This is not your offer')
+        _check_open(offer, *OPEN)
+        offer.offer_status = S.WITHDRAWN
+        offer.save(update_fields=['offer_status', 'updated_at'])
+        _changed(offer.product_id)
+    return offer
+
+
+def accept(offer, user):
+    """
+    Seller accepts a pending offer, or buyer accepts a counter-offer. Places
+    the buyer's order at the agreed price (reserving the watch), declines the
+    competing offers and returns the accepted offer. Raises OfferError when
+    the watch was sold or reserved meanwhile.
+    """
+    with transaction.atomic():
+        offer = _locked(offer)
+        if is_seller(user, offer):
+            _check_open(offer, S.PENDING)
+            price = offer.amount
+        elif offer.buyer_id == user.pk:
+            _check_open(offer, S.COUNTERED)
+            price = offer.counter_amount
+        else:
+            raise OfferError('This is not your offer')
+
+        product = offer.product
+        item = CartItem(product, 1, product.price, offer.transaction_method)
+        try:
+            placed = checkout.place_order(
+                offer.buyer, [item], f'offer-{offer.pk}', payment_method='cash',
+                notes=f'Accepted offer #{offer.pk}', agreed_prices={product.pk: price},
+            )
+        except checkout.CheckoutError:
+            raise OfferError('This watch has just been sold or reserved')
+
+        now = timezone.now()
+        offer.offer_status = S.ACCEPTED
+        offer.order = placed.orders[0]
+        offer.responded_at = now
+        offer.save(update_fields=['offer_status', 'order', 'responded_at', 'updated_at'])
+
+        competing = list(
+            Offer.objects.filter(product=product, offer_status__in=OPEN).exclude(pk=offer.pk)
+            .select_related('buyer')
+        )
+        if competing:
+            Offer.objects.filter(pk__in=[other.pk for other in competing], offer_status__in=OPEN).update(
+                offer_status=S.DECLINED, responded_at=now, updated_at=now,
+            )
+            for other in competing:
+                notify.send(
+                    other.buyer, Notification.Type.OFFER, 'Offer declined',
+                    f'{product} has been sold to another buyer', link_url=reverse('my_offers'),
+                )
+        rollups.record_offer(offer.store_id, accepted=1)
+        accepted_by = offer.store.seller.user if offer.buyer_id == user.pk else offer.buyer
+        notify.send(
+            accepted_by, Notification.Type.OFFER, 'Offer accepted',
+            f'Rs. {price:,.0f} for {product} was accepted', link_url=reverse('my_orders'),
+        )
+        _changed(product.pk)
+    return offer
+
+
+# =============================================================================
+# EXPIRY
+# =============================================================================
+
+def expire(now=None, batch=SWEEP_BATCH):
+    """Mark open offers past `expires_at` EXPIRED, one UPDATE per batch; returns how many"""
+    now = now or timezone.now()
+    total = 0
+    while True:
+        rows = list(
+            Offer.objects.filter(offer_status__in=OPEN, expires_at__lte=now)
+            .values_list('pk', 'product_id')[:batch]
+        )
+        if not rows:
+            return total
+        with transaction.atomic():
+            total += Offer.objects.filter(
+                pk__in=[pk for pk, _product_id in rows], offer_status__in=OPEN, expires_at__lte=now,
+            ).update(offer_status=S.EXPIRED, updated_at=now)
+            _changed(*(product_id for _pk, product_id in rows))
+        if len(rows) < batch:
+            return total
+
+
+# =============================================================================
+# LISTS
+# =============================================================================
+
+def with_listings(queryset):
+    """Offers with their listing, brand, store and primary photo (three queries per page)"""
+    return queryset.prefetch_related(Prefetch(
+        'product',
+        queryset=Product.objects.select_related('brand', 'store').prefetch_related(images.primary_image_prefetch()),
+    ))
+
+
+def buyer_offers(buyer, history_size=50):
+    """Context for the buyer's offers page"""
+    mine = Offer.objects.filter(buyer=buyer)
+    now = timezone.now()
+    open_offers = list(with_listings(
+        mine.filter(offer_status__in=OPEN, expires_at__gt=now).order_by('-created_at', '-id')
+    ))
+    history = list(with_listings(
+        mine.exclude(offer_status__in=OPEN, expires_at__gt=now).order_by('-created_at', '-id')[:history_size]
+    ))
+    counts = mine.aggregate(
+        total=Count('id'),
+        accepted=Count('id', filter=Q(offer_status=S.ACCEPTED)),
+    )
+    active = [offer for offer in open_offers if offer.offer_status == S.PENDING]
+    countered = [offer for offer in open_offers if offer.offer_status == S.COUNTERED]
+    return {
+        'active_offers': active,
+        'counter_offers': countered,
+        'history_offers': history,
+        'total_count': counts['total'],
+        'pending_count': len(active),
+        'accepted_count': counts['accepted'],
+        'counter_count': len(countered),
+    }
+
+
+# seller list ?sort= -> pages.pagination.SORT_KEYS key
+STORE_SORTS = {'newest': 'newest', 'oldest': 'oldest', 'highest': 'amount_high', 'lowest': 'amount_low'}
+
+
+def store_offers(store, status=None, product_id=None):
+    """A store's received offers, for keyset pagination"""
+    received = Offer.objects.filter(store=store)
+    if status and status.upper() in S.values:
+        received = received.filter(offer_status=status.upper())
+    if product_id:
+        received = received.filter(product_id=product_id)
+    return with_listings(received)
+
+
+def store_counts(store):
+    """{status: count} over a store's offers (one GROUP BY on the store index)"""
+    counts = Counter(dict(
+        Offer.objects.filter(store=store).values_list('offer_status').annotate(count=Count('id')).order_by()
+    ))
+    return {status.lower(): counts[status] for status in S.values}
+
+
+def pending_for_store(store, limit=5):
+    """Newest offers waiting for the seller, for the dashboard"""
+    return list(with_listings(
+        Offer.objects.filter(store=store, offer_status=S.PENDING, expires_at__gt=timezone.now())
+        .order_by('-created_at', '-id')[:limit]
+    ))
+
+
+def live_offer_products(store):
+    """The store's live listings, for the offer list's listing filter"""
+    return catalog.live_products().filter(store=store).select_related('brand').order_by('model_name')
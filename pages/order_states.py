@@ -0,0 +1,209 @@
+"""
+Order state machine and delivery board.
+========================================================================================
+
+HOW IT WORKS:
+-------------
+- TRANSITIONS lists the legal `order_status` moves. `transition()` locks the
+  order row, checks the move, saves it and appends an `order_status_history`
+  row (who, when, note) in one transaction. Any other save that changes the
+  status goes through the same check (pre_save signal, pages/signals.py), so
+  an illegal move raises InvalidTransition wherever it comes from.
+- `order_status_counts` holds one row per status. Signal handlers move it by
+  -1/+1 when an order is placed, changes status or is deleted, so board
+  totals are a read of at most seven rows, never a COUNT over `orders`.
+- Each board column is one query on `idx_orders_status_board`
+  (order_status, status_changed_at, id): newest change first, BOARD_SIZE rows.
+- After commit every change is published to the `board:delivery` channel
+  (pages/realtime.py). Open boards receive it over SSE and update their
+  counters, and the order's customer gets it on their own channel.
+
+After raw SQL imports, run `python manage.py rebuild_order_counts`.
+
+USAGE:
+    order_states.transition(order, Order.Status.SHIPPED, by=request.user, carrier='TCS', tracking_number='...')
+    order_states.status_counts()
+"""
+
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F, Prefetch
+from django.utils import timezone
+
+from . import images, realtime
+from .models import Order, OrderStatusChange, OrderStatusCount, Product
+
+
+S = Order.Status
+
+# status -> statuses it may move to
+TRANSITIONS = {
+    S.PENDING: {S.CONFIRMED, S.CANCELLED},
+    S.CONFIRMED: {S.PROCESSING, S.SHIPPED, S.CANCELLED},
+    S.PROCESSING: {S.SHIPPED, S.CANCELLED},
+    S.SHIPPED: {S.DELIVERED},
+    S.DELIVERED: {S.REFUNDED},
+    S.CANCELLED: {S.REFUNDED},
+    S.REFUNDED: set(),
+}
+
+# Delivery board column -> statuses shown in it
+BOARD_COLUMNS = {
+    'pending_orders': (S.CONFIRMED, S.PROCESSING),
+    'transit_orders': (S.SHIPPED,),
+    'delivered_orders': (S.DELIVERED,),
+}
+BOARD_SIZE = 50
+
+# Order fields a transition may set alongside the status
+TRANSITION_FIELDS = ('carrier', 'tracking_number', 'expected_delivery_date', 'actual_delivery_date', 'admin_notes')
+
+
+class InvalidTransition(Exception):
+    """An order_status change TRANSITIONS doesn't allow"""
+
+
+def check(from_status, to_status):
+    if to_status not in TRANSITIONS.get(from_status, ()):
+        raise InvalidTransition(f'An order cannot go from {from_status} to {to_status}')
+
+
+def allowed(order):
+    """Statuses `order` can move to next"""
+    return sorted(TRANSITIONS.get(order.order_status, ()))
+
+
+# =============================================================================
+# TRANSITIONS
+# =============================================================================
+
+def transition(order, to_status, by=None, note='', **fields):
+    """
+    Move `order` to `to_status` and record it. `fields` may set the tracking
+    columns in TRANSITION_FIELDS in the same save. Returns the updated order;
+    raises InvalidTransition if the move isn't allowed from the current
+    (locked, freshly read) status.
+    """
+    unknown = set(fields) - set(TRANSITION_FIELDS)
+    if unknown:
+        raise ValueError(f'Cannot set {", ".join(sorted(unknown))} in a transition')
+    with transaction.atomic():
+        locked = Order.objects.select_for_update().get(pk=order.pk)
+        check(locked.order_status, to_status)
+        if to_status == S.DELIVERED and not fields.get('actual_delivery_date'):
+            fields['actual_delivery_date'] = timezone.localdate()
+        for name, value in fields.items():
+            setattr(locked, name, value)
+        locked.order_status = to_status
+        # Picked up by the post_save handler for the history row
+        locked._status_change = {'changed_by': by, 'note': note}
+        locked.save(update_fields=['order_status', 'status_changed_at', 'updated_at', *fields])
+    return locked
+
+
+def status_changing(order):
+    """
+    pre_save hook: (old status, new status) if this save changes the status,
+    else None. Checks the move and stamps `status_changed_at`.
+    """
+    stored = order.stored_values(['order_status'])
+    before = stored['order_status'] if stored else None
+    if before == order.order_status:
+        return None
+    if before is not None:
+        check(before, order.order_status)
+    order.status_changed_at = timezone.now()
+    return before, order.order_status
+
+
+def status_changed(order, change):
+    """post_save hook: history row, bucket counts, push to boards"""
+    before, after = change
+    extra = getattr(order, '_status_change', None) or {}
+    order._status_change = None
+    order._loaded_values = {**getattr(order, '_loaded_values', {}), 'order_status': after}
+    OrderStatusChange.objects.create(
+        order=order, from_status=before or '', to_status=after,
+        changed_by=extra.get('changed_by'), note=extra.get('note', ''), created_at=order.status_changed_at,
+    )
+    deltas = Counter({after: 1})
+    if before:
+        deltas[before] -= 1
+    apply_deltas(deltas)
+    event = {
+        'type': 'order_status', 'order_id': order.pk, 'order_number': order.order_number,
+        'from': before or '', 'to': after,
+    }
+    customer_id = order.customer_id
+    transaction.on_commit(lambda: _publish(customer_id, event))
+
+
+def _publish(customer_id, event):
+    realtime.get_broker().publish(realtime.BOARD_CHANNEL, event)
+    realtime.publish(customer_id, event)
+
+
+# =============================================================================
+# BUCKET COUNTS
+# =============================================================================
+
+def apply_deltas(deltas):
+    """Add a Counter of {status: delta} to `order_status_counts`"""
+    with transaction.atomic():
+        for status, delta in sorted(deltas.items()):
+            if not delta:
+                continue
+            rows = OrderStatusCount.objects.filter(status=status)
+            if not rows.update(count=F('count') + delta):
+                OrderStatusCount.objects.get_or_create(status=status)
+                rows.update(count=F('count') + delta)
+
+
+def status_counts():
+    """{status: number of orders} for every status (one read of at most seven rows)"""
+    counts = dict.fromkeys(S.values, 0)
+    counts.update(OrderStatusCount.objects.values_list('status', 'count'))
+    return counts
+
+
+def rebuild_counts():
+    """Recount `order_status_counts` from `orders`"""
+    actual = dict(Order.objects.values_list('order_status').annotate(count=Count('id')).order_by())
+    with transaction.atomic():
+        OrderStatusCount.objects.all().delete()
+        OrderStatusCount.objects.bulk_create(
+            [OrderStatusCount(status=status, count=count) for status, count in actual.items()]
+        )
+    return actual
+
+
+# =============================================================================
+# DELIVERY BOARD
+# =============================================================================
+
+def board_column(statuses, limit=BOARD_SIZE):
+    """Latest orders in `statuses`, most recent status change first"""
+    return list(
+        Order.objects.filter(order_status__in=statuses)
+        .order_by('-status_changed_at', '-id')
+        .select_related('customer')
+        .prefetch_related(Prefetch(
+            'items__product',
+            queryset=Product.objects.select_related('brand').prefetch_related(images.primary_image_prefetch()),
+        ))[:limit]
+    )
+
+
+def board():
+    """Context for the delivery board: each column plus its counts"""
+    counts = status_counts()
+    midnight = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+    context = {name: board_column(statuses) for name, statuses in BOARD_COLUMNS.items()}
+    context.update(
+        pending_dispatch=sum(counts[status] for status in BOARD_COLUMNS['pending_orders']),
+        in_transit=counts[S.SHIPPED],
+        delivered_today=OrderStatusChange.objects.filter(to_status=S.DELIVERED, created_at__gte=midnight).count(),
+        status_counts=counts,
+    )
+    return context
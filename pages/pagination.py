@@ -0,0 +1,187 @@
+"""
+Keyset (cursor) pagination shared by browse, seller listings and order history.
+========================================================================================
+
+WHY NOT ?page=N:
+----------------
+OFFSET pagination makes the database walk and throw away every row before the
+page it returns, so page 500 costs ~500x page 1. Keyset pagination remembers
+the sort value and primary key of the last row shown and asks for rows
+"after" it, which is a single index range scan no matter how deep you go.
+
+HOW IT WORKS:
+-------------
+- Each sort key is one indexed column plus the primary key as a tie-breaker
+  (see SORT_KEYS and the composite indexes on Product/Order).
+- Page boundaries travel as opaque, signed tokens (`?cursor=...`), so clients
+  can't craft cursors that skip filters or forge positions.
+- Tokens also carry the row offset, used only to print "Showing 481-504".
+
+USAGE:
+    paginator = CursorPaginator(queryset, 'newest', per_page=24)
+    page = paginator.page(request.GET.get('cursor'))
+    page.object_list, page.next_cursor, page.previous_cursor
+"""
+
+from django.core import signing
+from django.db.models import Q
+
+
+# sort name -> (column, descending)
+SORT_KEYS = {
+    'newest': ('created_at', True),
+    'oldest': ('created_at', False),
+    'price_low': ('price', False),
+    'price_high': ('price', True),
+    'popular': ('favorite_count', True),
+    'amount_high': ('amount', True),
+    'amount_low': ('amount', False),
+}
+
+TOKEN_SALT = 'pages.pagination.cursor'
+
+
+class InvalidCursor(Exception):
+    """Raised for tampered, expired or mismatched cursor tokens"""
+
+
+class CursorPage:
+    """One page of results plus the tokens for its neighbours"""
+
+    def __init__(self, object_list, paginator, offset, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.offset = offset
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def start_index(self):
+        return self.offset + 1 if self.object_list else 0
+
+    def end_index(self):
+        return self.offset + len(self.object_list)
+
+
+class CursorPaginator:
+    """Paginate `queryset` by SORT_KEYS[sort] with opaque next/prev tokens"""
+
+    def __init__(self, queryset, sort, per_page=24, count=None):
+        if sort not in SORT_KEYS:
+            raise ValueError(f'Unknown sort key: {sort}')
+        self.queryset = queryset
+        self.sort = sort
+        self.per_page = per_page
+        self.column, self.descending = SORT_KEYS[sort]
+        self._count = count
+
+    @property
+    def count(self):
+        """Total rows; pass `count=` when it is known (e.g. from the facet index)"""
+        if self._count is None:
+            self._count = self.queryset.count()
+        return self._count
+
+    # -------------------------------------------------------------------------
+    # Tokens
+    # -------------------------------------------------------------------------
+
+    def _field(self):
+        return self.queryset.model._meta.get_field(self.column)
+
+    def encode(self, row, direction, offset):
+        value = self._field().value_to_string(row)
+        return signing.dumps(
+            {'s': self.sort, 'd': direction, 'v': value, 'pk': row.pk, 'o': offset},
+            salt=TOKEN_SALT, compress=True,
+        )
+
+    def decode(self, token):
+        try:
+            data = signing.loads(token, salt=TOKEN_SALT)
+        except signing.BadSignature as exc:
+            raise InvalidCursor('Bad cursor') from exc
+        if data.get('s') != self.sort or data.get('d') not in ('next', 'prev'):
+            raise InvalidCursor('Cursor does not match this listing')
+        return data['d'], self._field().to_python(data['v']), data['pk'], data.get('o', 0)
+
+    # -------------------------------------------------------------------------
+    # Querying
+    # -------------------------------------------------------------------------
+
+    def _ordering(self, reverse=False):
+        descending = self.descending != reverse
+        prefix = '-' if descending else ''
+        return [f'{prefix}{self.column}', f'{prefix}pk']
+
+    def _after(self, value, pk, reverse=False):
+        """Rows strictly after (value, pk) in the (possibly reversed) sort order"""
+        op = 'lt' if self.descending != reverse else 'gt'
+        # The leading inclusive bound lets the planner seek into the
+        # (column, pk) index instead of scanning for the OR branch.
+        return Q(**{f'{self.column}__{op}e': value}) & (
+            Q(**{f'{self.column}__{op}': value}) | Q(**{f'pk__{op}': pk})
+        )
+
+    def page(self, token=None):
+        """The page following/preceding `token`; the first page when it's empty"""
+        if not token:
+            rows = list(self.queryset.order_by(*self._ordering())[:self.per_page + 1])
+            has_more = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            return self._build(rows, offset=0, has_next=has_more, has_previous=False)
+
+        direction, value, pk, offset = self.decode(token)
+        if direction == 'next':
+            qs = self.queryset.filter(self._after(value, pk)).order_by(*self._ordering())
+            rows = list(qs[:self.per_page + 1])
+            has_more = len(rows) > self.per_page
+            return self._build(rows[:self.per_page], offset, has_next=has_more, has_previous=True)
+
+        qs = self.queryset.filter(self._after(value, pk, reverse=True)).order_by(*self._ordering(reverse=True))
+        rows = list(qs[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page][::-1]
+        return self._build(rows, max(offset - len(rows), 0), has_next=True, has_previous=has_more)
+
+    def _build(self, rows, offset, has_next, has_previous):
+        next_cursor = self.encode(rows[-1], 'next', offset + len(rows)) if rows and has_next else None
+        previous_cursor = self.encode(rows[0], 'prev', offset) if rows and has_previous else None
+        return CursorPage(rows, self, offset, next_cursor, previous_cursor)
+
+
+def paginate(request, queryset, sort, per_page=24, count=None):
+    """
+    Cursor page for a view, falling back to the first page on a bad token
+    (old bookmarks, a token from another sort order, ...).
+    """
+    paginator = CursorPaginator(queryset, sort, per_page=per_page, count=count)
+    try:
+        return paginator.page(request.GET.get('cursor'))
+    except InvalidCursor:
+        return paginator.page()
+
+
+def query_params_without_cursor(request):
+    """Current query string minus cursor/page, for building next/prev links"""
+    params = request.GET.copy()
+    params.pop('cursor', None)
+    params.pop('page', None)
+    return params.urlencode()
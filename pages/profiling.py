@@ -0,0 +1,419 @@
+"""
+Per-request performance instrumentation.
+========================================================================================
+
+HOW IT WORKS:
+-------------
+ProfilingMiddleware (first in MIDDLEWARE, active when settings.PROFILING is
+on) records for every request:
+    wall time           the whole middleware stack and the view
+    queries             count and time, through a database execute wrapper
+    duplicates          the same SQL with the same parameters run again
+    N+1 suspects        one statement shape run NPLUSONE_REPEATS+ times
+    template time       top-level template renders (ProfiledTemplates backend)
+    per template        renders and time per template name, top-level and
+                        bound includes (pages/templating.py)
+    cache hits/misses   get/get_many on the default cache
+Statement shapes ("fingerprints") are the SQL with literals and IN lists
+collapsed, so `WHERE id = 3` and `WHERE id = 4` count as the same statement.
+
+Samples are kept per URL name (config/urls.py) in a ring of the last
+WINDOW requests, and per template name across all URLs. Histograms,
+percentiles and hit rates are computed from those rings when read, so the
+numbers roll with traffic. A template's time includes the templates it
+includes. The stats live in the worker's memory; `/panel/performance/`
+(staff only) returns this worker's JSON.
+
+QUERY BUDGETS:
+--------------
+QUERY_BUDGETS caps the queries a view may run. A request over budget is
+logged and counted (server errors excepted). With settings.PROFILING_ENFORCE_BUDGETS it raises
+QueryBudgetExceeded instead, which the test client re-raises, so:
+    PROFILING=1 PROFILING_ENFORCE_BUDGETS=1 python manage.py test
+
+USAGE:
+    profiling.snapshot()            # {'routes': {url name: stats}, 'templates': {name: stats}, ...}
+    profiling.reset()
+    with profiling.collect() as profile:    # profile code outside a request (commands)
+        ...
+"""
+
+import bisect
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.backends.django import DjangoTemplates
+
+
+logger = logging.getLogger(__name__)
+
+WINDOW = 1000                  # samples kept per URL name
+NPLUSONE_REPEATS = 3
+TOP_STATEMENTS = 5
+WALL_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+QUERY_BUCKETS = (0, 1, 2, 4, 8, 16, 32, 64)
+
+# URL name -> most queries one request may run. These cover the request that
+# finds its caches cold (homepage sections, offer book, related watches, ...);
+# warm requests run far fewer, which the p50s show.
+QUERY_BUDGETS = {
+    'home': 8,
+    'watch_list': 6,
+    'watch_detail': 12,
+    'cart': 4,
+    'checkout': 6,
+    'my_orders': 4,
+    'order_detail': 6,
+    'my_offers': 8,
+    'offers_received': 8,
+    'wishlist': 3,
+    'buyer_dashboard': 3,
+    'seller_dashboard': 12,
+    'my_listings': 5,
+    'seller_profile': 6,
+    'messages': 4,
+    'notifications': 4,
+    'admin_dashboard': 5,
+    'admin_delivery_management': 8,
+    'api_search_autocomplete': 2,
+}
+
+_current = ContextVar('request_profile', default=None)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """A view ran more queries than QUERY_BUDGETS allows (raised only when enforcing)"""
+
+
+# =============================================================================
+# PER-REQUEST PROFILE
+# =============================================================================
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r'\bIN\s*\((?:\s*(?:%s|\?)\s*,?)+\)', re.IGNORECASE)
+
+
+def fingerprint(sql):
+    """The statement's shape: literals and IN lists collapsed"""
+    return _IN_LISTS.sub('IN (...)', _LITERALS.sub('?', sql))
+
+
+class RequestProfile:
+    """What one request spent, filled in by the hooks below"""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.templates = defaultdict(lambda: [0, 0.0])     # template name -> [renders, seconds]
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.statements = Counter()     # fingerprint -> runs
+        self.exact = Counter()          # (sql, params) -> runs
+
+    def record_query(self, sql, params, elapsed):
+        self.queries += 1
+        self.db_time += elapsed
+        self.statements[fingerprint(sql)] += 1
+        try:
+            self.exact[(sql, repr(params))] += 1
+        except Exception:       # unrepresentable parameters: skip duplicate detection
+            pass
+
+    def record_template(self, name, elapsed):
+        entry = self.templates[name or '<string>']
+        entry[0] += 1
+        entry[1] += elapsed
+
+    def duplicates(self):
+        return sum(runs - 1 for runs in self.exact.values() if runs > 1)
+
+    def repeated_statements(self):
+        return {sql: runs for sql, runs in self.statements.items() if runs >= NPLUSONE_REPEATS}
+
+
+def current():
+    """The RequestProfile being filled in for this request (thread/task), or None"""
+    return _current.get()
+
+
+@contextmanager
+def collect():
+    """Profile the queries and template renders inside the block; yields the RequestProfile"""
+    profile = RequestProfile()
+    token = _current.set(profile)
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(_query_wrapper))
+            yield profile
+    finally:
+        _current.reset(token)
+
+
+def _query_wrapper(execute, sql, params, many, context):
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.record_query(sql, params, time.perf_counter() - started)
+
+
+_MISSING = object()
+
+
+def _instrument_cache(cache):
+    """Count hits/misses of this (per-thread) cache instance; idempotent"""
+    if getattr(cache, '_profiled', False):
+        return
+    get, get_many = cache.get, cache.get_many
+
+    def profiled_get(key, default=None, version=None):
+        value = get(key, _MISSING, version=version)
+        profile = _current.get()
+        if profile is not None:
+            if value is _MISSING:
+                profile.cache_misses += 1
+            else:
+                profile.cache_hits += 1
+        return default if value is _MISSING else value
+
+    def profiled_get_many(keys, version=None):
+        keys = list(keys)
+        found = get_many(keys, version=version)
+        profile = _current.get()
+        if profile is not None:
+            profile.cache_hits += len(found)
+            profile.cache_misses += len(keys) - len(found)
+        return found
+
+    cache.get, cache.get_many, cache._profiled = profiled_get, profiled_get_many, True
+
+
+class ProfiledTemplates(DjangoTemplates):
+    """DjangoTemplates backend that times top-level renders for the current request profile"""
+
+    def get_template(self, template_name):
+        return _TimedTemplate(super().get_template(template_name))
+
+    def from_string(self, template_code):
+        return _TimedTemplate(super().from_string(template_code))
+
+
+class _TimedTemplate:
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        profile = _current.get()
+        if profile is None:
+            return self.template.render(context, request)
+        started = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            elapsed = time.perf_counter() - started
+            profile.template_time += elapsed
+            profile.record_template(self.template.template.name, elapsed)
+
+
+# =============================================================================
+# ROLLING STATS
+# =============================================================================
+
+class RouteStats:
+    """The last WINDOW requests of one URL name, plus lifetime totals"""
+
+    def __init__(self):
+        # (wall ms, queries, db ms, template ms, cache hits, cache misses, duplicates)
+        self.samples = deque(maxlen=WINDOW)
+        self.requests = 0
+        self.over_budget = 0
+        self.statements = Counter()     # repeated statement -> requests it was repeated in
+
+    def add(self, wall, profile, over_budget):
+        self.samples.append((
+            wall * 1000, profile.queries, profile.db_time * 1000, profile.template_time * 1000,
+            profile.cache_hits, profile.cache_misses, profile.duplicates(),
+        ))
+        self.requests += 1
+        self.over_budget += over_budget
+        self.statements.update(profile.repeated_statements().keys())
+        if len(self.statements) > TOP_STATEMENTS * 20:
+            self.statements = Counter(dict(self.statements.most_common(TOP_STATEMENTS * 10)))
+
+
+def _percentile(ordered, fraction):
+    if not ordered:
+        return 0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def _histogram(values, edges):
+    counts = [0] * (len(edges) + 1)
+    for value in values:
+        counts[bisect.bisect_left(edges, value)] += 1
+    labels = [f'<={edge}' for edge in edges] + [f'>{edges[-1]}']
+    return dict(zip(labels, counts))
+
+
+def _summary(values, edges=None):
+    ordered = sorted(values)
+    summary = {
+        'mean': round(sum(ordered) / len(ordered), 2) if ordered else 0,
+        'p50': round(_percentile(ordered, 0.50), 2),
+        'p95': round(_percentile(ordered, 0.95), 2),
+        'p99': round(_percentile(ordered, 0.99), 2),
+        'max': round(ordered[-1], 2) if ordered else 0,
+    }
+    if edges:
+        summary['histogram'] = _histogram(ordered, edges)
+    return summary
+
+
+class TemplateStats:
+    """One template's renders: per-request time of the last WINDOW requests that rendered it, plus totals"""
+
+    def __init__(self):
+        self.samples = deque(maxlen=WINDOW)     # ms per request
+        self.renders = 0
+        self.seconds = 0.0
+
+    def add(self, renders, seconds):
+        self.samples.append(seconds * 1000)
+        self.renders += renders
+        self.seconds += seconds
+
+
+class Recorder:
+    """Thread-safe per-worker store of RouteStats and TemplateStats"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = defaultdict(RouteStats)
+        self._templates = defaultdict(TemplateStats)
+        self.started = time.time()
+
+    def add(self, route, wall, profile, over_budget):
+        with self._lock:
+            self._routes[route].add(wall, profile, over_budget)
+            for name, (renders, seconds) in profile.templates.items():
+                self._templates[name].add(renders, seconds)
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+            self._templates.clear()
+            self.started = time.time()
+
+    def snapshot(self):
+        with self._lock:
+            routes = {
+                name: (list(stats.samples), stats.requests, stats.over_budget, stats.statements.most_common(TOP_STATEMENTS))
+                for name, stats in self._routes.items()
+            }
+            templates = {
+                name: (list(stats.samples), stats.renders, stats.seconds) for name, stats in self._templates.items()
+            }
+        return {
+            'pid': os.getpid(),
+            'since': self.started,
+            'window': WINDOW,
+            'routes': {name: _route_summary(name, *data) for name, data in sorted(routes.items())},
+            # Most total time first
+            'templates': {
+                name: _template_summary(*data)
+                for name, data in sorted(templates.items(), key=lambda item: -item[1][2])
+            },
+        }
+
+
+def _route_summary(name, samples, requests, over_budget, statements):
+    wall, queries, db, template, hits, misses, duplicates = zip(*samples) if samples else ((),) * 7
+    lookups = sum(hits) + sum(misses)
+    return {
+        'requests': requests,
+        'wall_ms': _summary(wall, WALL_BUCKETS_MS),
+        'queries': {**_summary(queries, QUERY_BUCKETS), 'budget': QUERY_BUDGETS.get(name), 'over_budget': over_budget},
+        'db_ms': _summary(db),
+        'template_ms': _summary(template),
+        'cache': {'hits': sum(hits), 'misses': sum(misses), 'hit_rate': round(sum(hits) / lookups, 3) if lookups else None},
+        'duplicate_queries': sum(duplicates),
+        'repeated_statements': [{'sql': sql, 'requests': count} for sql, count in statements],
+    }
+
+
+def _template_summary(samples, renders, seconds):
+    return {
+        'renders': renders,
+        'total_ms': round(seconds * 1000, 2),
+        'ms_per_render': round(seconds * 1000 / renders, 3) if renders else 0,
+        'ms_per_request': _summary(samples),
+    }
+
+
+recorder = Recorder()
+
+
+def snapshot():
+    return recorder.snapshot()
+
+
+def reset():
+    recorder.reset()
+
+
+# =============================================================================
+# MIDDLEWARE
+# =============================================================================
+
+def _route(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return '<unresolved>'
+    return match.url_name or match.view_name
+
+
+class ProfilingMiddleware:
+    """Profile every request (see module docstring); off unless settings.PROFILING"""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PROFILING', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.enforce = getattr(settings, 'PROFILING_ENFORCE_BUDGETS', False)
+
+    def __call__(self, request):
+        _instrument_cache(caches['default'])
+        started = time.perf_counter()
+        with collect() as profile:
+            response = self.get_response(request)
+        wall = time.perf_counter() - started
+
+        route = _route(request)
+        budget = QUERY_BUDGETS.get(route)
+        # A 500's queries are partly the error page's (DEBUG renders the context); not the view's budget
+        over = budget is not None and profile.queries > budget and response.status_code < 500
+        recorder.add(route, wall, profile, over)
+        if over:
+            message = f'{route} ran {profile.queries} queries (budget {budget}): {request.get_full_path()}'
+            if self.enforce:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
@@ -0,0 +1,185 @@
+"""
+Rating aggregates per store and per product.
+========================================================================================
+
+HOW IT WORKS:
+-------------
+- RatingSummary keeps, per store and per product, the number of approved
+  reviews, the sum of their ratings and a 1-5 star histogram. Decimal
+  ratings go to the nearest star (4.5 counts as 5).
+- Review saves and deletes (pages/signals.py) apply the difference between
+  the review's contribution before and after as F() updates. Insert, edit,
+  delete and approval flips each cost a fixed number of single-row updates,
+  however many reviews the store has.
+- `stores.store_rating` and `stores.total_reviews` are copied from the
+  store's summary row in the same transaction.
+
+Pages read one summary row instead of running AVG()/COUNT() over reviews.
+`python manage.py reconcile_ratings` compares everything against a full
+recompute and fixes any drift.
+"""
+
+from collections import Counter, defaultdict
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+
+from .models import RatingSummary, Review, Store
+
+
+TRACKED_FIELDS = ('store_id', 'product_id', 'is_approved', 'rating')
+STAR_COLUMNS = tuple(f'stars_{stars}' for stars in range(1, 6))
+SUMMARY_COLUMNS = ('review_count', 'rating_sum') + STAR_COLUMNS
+
+STORE = RatingSummary.Subject.STORE
+PRODUCT = RatingSummary.Subject.PRODUCT
+
+
+def star_bucket(rating):
+    rating = rating if isinstance(rating, Decimal) else Decimal(str(rating))
+    return min(max(int(rating.quantize(Decimal('1'), rounding=ROUND_HALF_UP)), 1), 5)
+
+
+def snapshot(review):
+    return {name: getattr(review, name) for name in TRACKED_FIELDS}
+
+
+def contribution(values):
+    """Counter of {(subject, subject id, column): amount} for one review"""
+    deltas = Counter()
+    if values is None or not values['is_approved']:
+        return deltas
+    rating = values['rating'] if isinstance(values['rating'], Decimal) else Decimal(str(values['rating']))
+    star_column = f'stars_{star_bucket(rating)}'
+    subjects = [(STORE, values['store_id'])]
+    if values['product_id'] is not None:
+        subjects.append((PRODUCT, values['product_id']))
+    for subject, subject_id in subjects:
+        deltas[(subject, subject_id, 'review_count')] += 1
+        deltas[(subject, subject_id, 'rating_sum')] += rating
+        deltas[(subject, subject_id, star_column)] += 1
+    return deltas
+
+
+def review_change(before, after):
+    deltas = contribution(after)
+    deltas.subtract(contribution(before))
+    return deltas
+
+
+def _sync_store(store_id):
+    """Copy the store's summary onto stores.store_rating / total_reviews"""
+    summary = RatingSummary.objects.filter(subject=STORE, subject_id=store_id).first()
+    count = summary.review_count if summary else 0
+    rating = Decimal(summary.mean).quantize(Decimal('0.01')) if count else Decimal('0')
+    # update(), not save(): a store save invalidates its cached watch pages
+    Store.objects.filter(pk=store_id).update(store_rating=rating, total_reviews=count)
+
+
+def apply_deltas(deltas):
+    """
+    Add {(subject, id, column): delta} to the summary rows; returns the
+    (subject, id) pairs that changed.
+    """
+    by_row = defaultdict(dict)
+    for (subject, subject_id, column), delta in deltas.items():
+        if delta:
+            by_row[(subject, subject_id)][column] = delta
+    if not by_row:
+        return []
+    with transaction.atomic():
+        for (subject, subject_id), columns in sorted(by_row.items()):
+            changes = {column: F(column) + delta for column, delta in columns.items()}
+            rows = RatingSummary.objects.filter(subject=subject, subject_id=subject_id)
+            if not rows.update(**changes):
+                RatingSummary.objects.get_or_create(subject=subject, subject_id=subject_id)
+                rows.update(**changes)
+        for subject, subject_id in by_row:
+            if subject == STORE:
+                _sync_store(subject_id)
+    return list(by_row)
+
+
+# =============================================================================
+# READING
+# =============================================================================
+
+def summary_for(subject, subject_id):
+    """The subject's RatingSummary (an empty, unsaved one when it has no reviews)"""
+    summary = RatingSummary.objects.filter(subject=subject, subject_id=subject_id).first()
+    return summary or RatingSummary(subject=subject, subject_id=subject_id)
+
+
+# =============================================================================
+# RECONCILIATION
+# =============================================================================
+
+def recompute():
+    """{(subject, id): {column: value}} from a full scan of approved reviews"""
+    star_counts = {
+        column: Count('id', filter=Q(rating__gte=Decimal(stars) - Decimal('0.5'), rating__lt=Decimal(stars) + Decimal('0.5')))
+        for stars, column in enumerate(STAR_COLUMNS, start=1)
+    }
+    # Clamp the open ends like star_bucket() does
+    star_counts['stars_1'] = Count('id', filter=Q(rating__lt=Decimal('1.5')))
+    star_counts['stars_5'] = Count('id', filter=Q(rating__gte=Decimal('4.5')))
+
+    approved = Review.objects.filter(is_approved=True)
+    expected = {}
+    for subject, column in ((STORE, 'store_id'), (PRODUCT, 'product_id')):
+        rows = (
+            approved.exclude(**{f'{column}__isnull': True})
+            .values(column)
+            .annotate(review_count=Count('id'), rating_sum=Sum('rating'), **star_counts)
+            .order_by()
+        )
+        for row in rows:
+            expected[(subject, row.pop(column))] = row
+    return expected
+
+
+def reconcile(fix=True):
+    """
+    Compare the summaries (and store columns) with a full recompute.
+
+    Returns a list of (subject, id, column, stored, expected) mismatches and,
+    when `fix` is set, rewrites the drifted rows.
+    """
+    expected = recompute()
+    stored = {
+        (row.pop('subject'), row.pop('subject_id')): row
+        for row in RatingSummary.objects.values('subject', 'subject_id', *SUMMARY_COLUMNS).iterator(chunk_size=2000)
+    }
+    empty = dict.fromkeys(SUMMARY_COLUMNS, 0)
+    drift = []
+    drifted_keys = []
+    for key in expected.keys() | stored.keys():
+        want = expected.get(key, empty)
+        have = stored.get(key, empty)
+        mismatched = [c for c in SUMMARY_COLUMNS if Decimal(have[c] or 0) != Decimal(want[c] or 0)]
+        for column in mismatched:
+            drift.append((*key, column, have[column], want[column]))
+        if mismatched:
+            drifted_keys.append(key)
+
+    # Store columns can drift on their own (raw SQL, admin edits)
+    for store_id, rating, count in Store.objects.values_list('pk', 'store_rating', 'total_reviews').iterator(chunk_size=2000):
+        want = expected.get((STORE, store_id), empty)
+        want_rating = (Decimal(want['rating_sum'] or 0) / want['review_count']).quantize(Decimal('0.01')) if want['review_count'] else Decimal('0')
+        if count != want['review_count'] or Decimal(rating) != want_rating:
+            drift.append((STORE, store_id, 'stores', (rating, count), (want_rating, want['review_count'])))
+            if (STORE, store_id) not in drifted_keys:
+                drifted_keys.append((STORE, store_id))
+
+    if fix and drifted_keys:
+        with transaction.atomic():
+            for subject, subject_id in drifted_keys:
+                values = expected.get((subject, subject_id))
+                if values is None:
+                    RatingSummary.objects.filter(subject=subject, subject_id=subject_id).delete()
+                else:
+                    RatingSummary.objects.update_or_create(subject=subject, subject_id=subject_id, defaults=values)
+                if subject == STORE:
+                    _sync_store(subject_id)
+    return drift
@@ -0,0 +1,337 @@
+"""
+Real-time push for chat messages and notifications.
+========================================================================================
+
+WHY:
+----
+Polling from every open tab turns idle users into steady request load. A
+pushed event costs nothing until something actually happens.
+
+HOW IT WORKS:
+-------------
+- Each logged-in tab opens one Server-Sent Events stream (`/events/stream/`).
+  Under ASGI, `EventsApp` (mounted in config/asgi.py) answers these paths
+  itself after one session lookup. An idle connection therefore holds a
+  coroutine and a small queue, not a worker thread or a pass through the
+  middleware stack. Under WSGI/runserver the async views in pages/views.py
+  serve the same endpoints.
+- Clients without EventSource, or behind proxies that buffer streams, use the
+  long-poll endpoint (`/events/poll/?since=<id>`). It answers as soon as an
+  event arrives, or with an empty list after POLL_TIMEOUT.
+- After commit, signal handlers (pages/signals.py) publish to the per-user
+  channel `user:<id>`: new `messages` rows to both participants, new
+  notifications to their owner.
+- Staff delivery boards stream the shared `board:delivery` channel
+  (`/events/board/`): order status changes from pages/order_states.py.
+- Each channel keeps its last BACKLOG_SIZE events. Event ids increase, so a
+  reconnecting stream (Last-Event-ID) or the next poll (`since`) catches up
+  on what it missed.
+
+BROKER:
+-------
+InProcessBroker fans out events published in the same process. With several
+workers, a shared broker (e.g. Redis pub/sub) implements the same methods
+(publish / subscribe / unsubscribe / since / last_id) and is selected with
+settings.REALTIME_BROKER.
+"""
+
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import suppress
+from importlib import import_module
+from types import SimpleNamespace
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import auth
+from django.http.cookie import parse_cookie
+from django.urls import reverse
+from django.utils.module_loading import import_string
+
+
+BACKLOG_SIZE = 50
+MAX_CHANNELS = 10_000
+QUEUE_SIZE = 100
+HEARTBEAT_INTERVAL = 15.0
+POLL_TIMEOUT = 25.0
+RETRY_MS = 3000
+
+
+# Staff-only channel behind the delivery board (pages/order_states.py)
+BOARD_CHANNEL = 'board:delivery'
+
+
+def user_channel(user_id):
+    return f'user:{user_id}'
+
+
+class Subscription:
+    """One connection's inbox; events may be delivered from any thread"""
+
+    def __init__(self, broker, channel, maxsize=QUEUE_SIZE):
+        self.broker = broker
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize)
+        self.overflowed = False
+
+    def deliver(self, event_id, event):
+        try:
+            self.loop.call_soon_threadsafe(self._put, (event_id, event))
+        except RuntimeError:
+            pass  # event loop already closed
+
+    def _put(self, item):
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            # Slow consumer: end the stream; the client reconnects with Last-Event-ID
+            self.overflowed = True
+
+    async def get(self, timeout):
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+    def drain(self):
+        items = []
+        while not self.queue.empty():
+            items.append(self.queue.get_nowait())
+        return items
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InProcessBroker:
+    """Pub/sub within one process, with a short replay backlog per channel"""
+
+    def __init__(self, backlog_size=BACKLOG_SIZE, max_channels=MAX_CHANNELS):
+        self.backlog_size = backlog_size
+        self.max_channels = max_channels
+        self._lock = threading.Lock()
+        self._subscribers = {}          # channel -> set of Subscription
+        self._backlog = OrderedDict()   # channel -> deque of (id, event), LRU
+        self._last_id = 0
+
+    def _next_id(self):
+        # Microsecond timestamps: ids keep increasing across restarts, so a
+        # client's Last-Event-ID from before a deploy doesn't replay anything.
+        self._last_id = max(self._last_id + 1, time.time_ns() // 1000)
+        return self._last_id
+
+    def publish(self, channel, event):
+        with self._lock:
+            event_id = self._next_id()
+            backlog = self._backlog.get(channel)
+            if backlog is None:
+                backlog = self._backlog[channel] = deque(maxlen=self.backlog_size)
+                while len(self._backlog) > self.max_channels:
+                    self._backlog.popitem(last=False)
+            else:
+                self._backlog.move_to_end(channel)
+            backlog.append((event_id, event))
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            subscription.deliver(event_id, event)
+        return event_id
+
+    def subscribe(self, channel):
+        subscription = Subscription(self, channel)
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.channel]
+
+    def since(self, channel, last_id):
+        """Backlogged events newer than `last_id`"""
+        with self._lock:
+            return [(event_id, event) for event_id, event in self._backlog.get(channel, ()) if event_id > last_id]
+
+    def last_id(self, channel):
+        with self._lock:
+            backlog = self._backlog.get(channel)
+            return backlog[-1][0] if backlog else self._last_id
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = import_string(getattr(settings, 'REALTIME_BROKER', 'pages.realtime.InProcessBroker'))()
+    return _broker
+
+
+def publish(user_id, event):
+    """Push `event` (a JSON-serialisable dict with a 'type') to a user's connections"""
+    return get_broker().publish(user_channel(user_id), event)
+
+
+# =============================================================================
+# TRANSPORTS
+# =============================================================================
+
+def _parse_id(raw):
+    try:
+        return int(raw)
+    except (TypeError, ValueError):
+        return None
+
+
+def format_sse(event_id, event):
+    return f'id: {event_id}\nevent: {event.get("type", "message")}\ndata: {json.dumps(event)}\n\n'
+
+
+async def sse_stream(channel, last_event_id=None, heartbeat=HEARTBEAT_INTERVAL):
+    """Async iterator of SSE frames (for EventsApp or a StreamingHttpResponse)"""
+    broker = get_broker()
+    # Subscribe before reading the backlog so nothing falls in between
+    subscription = broker.subscribe(channel)
+    try:
+        yield f'retry: {RETRY_MS}\n\n'
+        last = _parse_id(last_event_id)
+        if last is not None:
+            for event_id, event in broker.since(channel, last):
+                yield format_sse(event_id, event)
+                last = event_id
+        while not subscription.overflowed:
+            try:
+                event_id, event = await subscription.get(heartbeat)
+            except asyncio.TimeoutError:
+                yield ': ping\n\n'  # keeps proxies from closing an idle stream
+                continue
+            if last is not None and event_id <= last:
+                continue
+            yield format_sse(event_id, event)
+            last = event_id
+    finally:
+        subscription.close()
+
+
+async def long_poll(channel, since=None, timeout=POLL_TIMEOUT):
+    """
+    (events, last id) for one long-poll request. Without `since` it returns
+    straight away with the id to poll from next.
+    """
+    broker = get_broker()
+    since = _parse_id(since)
+    if since is None:
+        return [], broker.last_id(channel)
+    subscription = broker.subscribe(channel)
+    try:
+        events = broker.since(channel, since)
+        if not events:
+            try:
+                events = [await subscription.get(timeout)]
+            except asyncio.TimeoutError:
+                return [], since
+            events += subscription.drain()
+        events = [(event_id, event) for event_id, event in events if event_id > since]
+        return events, (events[-1][0] if events else since)
+    finally:
+        subscription.close()
+
+
+# =============================================================================
+# ASGI FRONT
+# =============================================================================
+
+def _user_for_session(session_key):
+    """(user id, is staff) for a session, or (None, False)"""
+    engine = import_module(settings.SESSION_ENGINE)
+    user = auth.get_user(SimpleNamespace(session=engine.SessionStore(session_key)))
+    return (user.pk, user.is_staff) if user.is_authenticated else (None, False)
+
+
+class EventsApp:
+    """
+    ASGI app serving the event endpoints directly and passing every other
+    request to Django. Long-lived connections then skip the middleware
+    stack, URL resolving and response machinery.
+    """
+
+    def __init__(self, django_application):
+        self.django_application = django_application
+        self._paths = None
+
+    def paths(self):
+        # path -> (handler, staff-only channel or None for the user's own)
+        if self._paths is None:
+            self._paths = {
+                reverse('events_stream'): (self.stream, None),
+                reverse('events_poll'): (self.poll, None),
+                reverse('events_board'): (self.stream, BOARD_CHANNEL),
+            }
+        return self._paths
+
+    async def __call__(self, scope, receive, send):
+        route = self.paths().get(scope['path']) if scope['type'] == 'http' else None
+        if route is None or scope['method'] != 'GET':
+            return await self.django_application(scope, receive, send)
+        handler, staff_channel = route
+        headers = {name.decode('latin-1'): value.decode('latin-1') for name, value in scope['headers']}
+        session_key = parse_cookie(headers.get('cookie', '')).get(settings.SESSION_COOKIE_NAME)
+        user_id, is_staff = await sync_to_async(_user_for_session)(session_key) if session_key else (None, False)
+        if user_id is None:
+            return await self._respond(send, 403, b'{"error": "Authentication required"}')
+        if staff_channel and not is_staff:
+            return await self._respond(send, 403, b'{"error": "Staff only"}')
+        query = {key: values[-1] for key, values in parse_qs(scope['query_string'].decode('latin-1')).items()}
+        await handler(receive, send, staff_channel or user_channel(user_id), headers, query)
+
+    async def _respond(self, send, status, body, content_type=b'application/json'):
+        await send({'type': 'http.response.start', 'status': status, 'headers': [(b'content-type', content_type)]})
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def stream(self, receive, send, channel, headers, query):
+        await send({'type': 'http.response.start', 'status': 200, 'headers': [
+            (b'content-type', b'text/event-stream'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ]})
+        frames = sse_stream(channel, headers.get('last-event-id') or query.get('last_event_id'))
+
+        async def pump():
+            async for frame in frames:
+                await send({'type': 'http.response.body', 'body': frame.encode(), 'more_body': True})
+
+        async def wait_for_disconnect():
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+
+        pumping = asyncio.ensure_future(pump())
+        listening = asyncio.ensure_future(wait_for_disconnect())
+        try:
+            await asyncio.wait({pumping, listening}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in (pumping, listening):
+                task.cancel()
+                with suppress(asyncio.CancelledError, OSError):
+                    await task
+            await frames.aclose()
+        if not listening.cancelled() and listening.done():
+            return  # client went away
+        await send({'type': 'http.response.body', 'body': b''})
+
+    async def poll(self, receive, send, channel, headers, query):
+        events, last_id = await long_poll(channel, query.get('since'))
+        body = json.dumps({'events': [{**event, 'id': event_id} for event_id, event in events], 'last_id': last_id})
+        await self._respond(send, 200, body.encode())
@@ -0,0 +1,195 @@
+"""
+Related watches, precomputed offline.
+========================================================================================
+
+HOW IT WORKS:
+-------------
+`python manage.py update_recommendations` scores live listings against each
+other and stores the NEIGHBORS best per listing in `product_neighbors`. The
+watch page then reads a listing's neighbors with one query on the
+(product, rank) index, skipping any that have since sold.
+
+The similarity of two listings is a weighted sum of attribute matches,
+scaled to 0..1:
+    brand, movement, condition   same value (blank never matches)
+    case diameter                1 at the same size, 0 at DIAMETER_SPAN mm apart
+    price                        1 at the same price, 0 at PRICE_SPAN times dearer
+It also adds INTEREST_WEIGHT times the cosine similarity of the two
+listings' audiences. The audience of a listing is the users who favorited
+it or made an offer on it.
+
+Scores are computed with NumPy (pages/similarity.py, where the weights and
+spans live), BLOCK_ROWS listings at a time against the whole live catalog,
+so memory stays at BLOCK_ROWS x N floats. The top NEIGHBORS of each row come
+from argpartition, not a full sort. NumPy is imported by `update()` only;
+web workers serving `related()` never load it.
+
+INCREMENTAL RUNS:
+-----------------
+By default only listings without neighbors are scored. These are the ones
+approved since the last run. Similarity is symmetric, so the same scores
+show which existing lists a newcomer beats the last entry of, and only
+those lists are rewritten. Run it every few minutes.
+
+`--full` (nightly) recomputes every list. This drops sold listings for good
+and picks up new favorites and offers.
+
+Listings that have no neighbors yet fall back to live watches of the same
+brand.
+
+USAGE:
+    recommend.related(watch)
+    recommend.update()              # new listings only
+    recommend.update(full=True)
+"""
+
+from dataclasses import dataclass
+from itertools import chain, islice
+
+from django.db import transaction
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from . import catalog, images, render_cache
+from .models import ProductNeighbor
+
+
+NEIGHBORS = 12          # stored per listing; the page shows the first live RELATED_SIZE
+RELATED_SIZE = 4
+MIN_SCORE = 0.2
+BLOCK_ROWS = 128
+WRITE_BATCH = 5000
+
+
+# =============================================================================
+# READING
+# =============================================================================
+
+def related(product, limit=RELATED_SIZE):
+    """Live neighbors of `product`, best first (one query plus the photo prefetch)"""
+    listings = (
+        catalog.live_products()
+        .select_related('brand', 'seller', 'store')
+        .prefetch_related(images.primary_image_prefetch())
+    )
+    found = list(listings.filter(neighbor_of__product_id=product.pk).order_by('neighbor_of__rank')[:limit])
+    if found or not product.brand_id:
+        return found
+    # Not scored yet
+    return list(listings.filter(brand_id=product.brand_id).exclude(pk=product.pk).order_by('-favorite_count', '-id')[:limit])
+
+
+# =============================================================================
+# UPDATING
+# =============================================================================
+
+@dataclass
+class Update:
+    scored: int          # listings whose neighbors were computed
+    joined: int          # existing lists a new listing moved into
+    neighbors: int       # rows written
+
+
+def _ranked_rows(computed, now):
+    """ProductNeighbor rows from per-block (product ids, neighbor ids, scores), already best first"""
+    for product_ids, neighbor_ids, scores in computed:
+        for product_id, row_neighbors, row_scores in zip(product_ids.tolist(), neighbor_ids.tolist(), scores.tolist()):
+            for rank, (neighbor_id, score) in enumerate(zip(row_neighbors, row_scores)):
+                if score < MIN_SCORE:
+                    break
+                yield ProductNeighbor(product_id=product_id, neighbor_id=neighbor_id, rank=rank, score=score, computed_at=now)
+
+
+def _write(rows, replace):
+    """Insert `rows` in batches after deleting the lists of `replace` (product ids, or 'all'); returns the count"""
+    written = 0
+    with transaction.atomic():
+        if replace == 'all':
+            ProductNeighbor.objects.all().delete()
+        else:
+            for start in range(0, len(replace), WRITE_BATCH):
+                ProductNeighbor.objects.filter(product_id__in=replace[start:start + WRITE_BATCH]).delete()
+        rows = iter(rows)
+        while batch := list(islice(rows, WRITE_BATCH)):
+            ProductNeighbor.objects.bulk_create(batch)
+            written += len(batch)
+    return written
+
+
+def update(full=False, block_rows=BLOCK_ROWS):
+    """Compute neighbors for new listings (or, with `full`, for every live listing)"""
+    # NumPy loads here, in the job, never in a web worker that only reads neighbors
+    import numpy as np
+    from . import similarity
+
+    features = similarity.load_features()
+    ids = features.ids
+    if full:
+        targets, has_list, threshold = np.arange(len(features)), None, None
+    else:
+        has_list, threshold = _current_lists(features)
+        targets = np.flatnonzero(~has_list)
+    if len(features) < 2 or not len(targets):
+        written = _write([], replace='all') if full else 0
+        return Update(0, 0, written)
+    interest = similarity.load_interest(features)
+
+    # Scores first, writes after: the write transaction doesn't wait on NumPy
+    computed, joins = [], {}
+    for start in range(0, len(targets), block_rows):
+        block = targets[start:start + block_rows]
+        scores = similarity.score_rows(features, interest, block)
+        columns, best = similarity.top_neighbors(scores, NEIGHBORS)
+        computed.append((ids[block], ids[columns], best))
+        if has_list is not None:
+            # Scores are symmetric: the existing lists each new listing now belongs in
+            beats = (scores > threshold[None, :]) & has_list[None, :]
+            for row, column in zip(*np.nonzero(beats)):
+                joins.setdefault(int(ids[column]), []).append((float(scores[row, column]), int(ids[block[row]])))
+
+    now = timezone.now()
+    rows = chain(_ranked_rows(computed, now), _merged_lists(joins, now))
+    written = _write(rows, replace='all' if full else list(joins))
+    changed = ids[targets].tolist() + list(joins)
+    transaction.on_commit(lambda: render_cache.invalidate_pages(changed))
+    return Update(scored=len(targets), joined=len(joins), neighbors=written)
+
+
+def _current_lists(features):
+    """Per live listing: whether it has a stored list, and the score a newcomer must beat to enter it"""
+    import numpy as np
+
+    n = len(features)
+    position = dict(zip(features.ids.tolist(), range(n)))
+    has_list = np.zeros(n, dtype=bool)
+    threshold = np.full(n, np.inf, dtype=np.float32)
+    for product_id, lowest, size in (
+        ProductNeighbor.objects.values_list('product_id').annotate(lowest=Min('score'), size=Count('id')).order_by()
+    ):
+        row = position.get(product_id)
+        if row is not None:
+            has_list[row] = True
+            threshold[row] = lowest if size >= NEIGHBORS else MIN_SCORE
+    return has_list, threshold
+
+
+def _merged_lists(joins, now):
+    """Existing lists with the new listings that beat their last entry merged in"""
+    product_ids = list(joins)
+    current = {pk: {} for pk in product_ids}
+    for start in range(0, len(product_ids), WRITE_BATCH):
+        for product_id, neighbor_id, score in ProductNeighbor.objects.filter(
+            product_id__in=product_ids[start:start + WRITE_BATCH],
+        ).values_list('product_id', 'neighbor_id', 'score'):
+            current[product_id][neighbor_id] = score
+    merged = []
+    for product_id, candidates in joins.items():
+        neighbors = current[product_id]
+        for score, neighbor_id in candidates:
+            neighbors[neighbor_id] = max(score, neighbors.get(neighbor_id, score))
+        ranked = sorted(((score, pk) for pk, score in neighbors.items()), reverse=True)[:NEIGHBORS]
+        merged.extend(
+            ProductNeighbor(product_id=product_id, neighbor_id=pk, rank=rank, score=score, computed_at=now)
+            for rank, (score, pk) in enumerate(ranked)
+        )
+    return merged
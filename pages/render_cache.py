@@ -0,0 +1,190 @@
+"""
+Two-tier cache for rendered page fragments.
+========================================================================================
+
+TIERS:
+------
+1. A small per-process LRU (no network hop, no pickling).
+2. The shared Django cache (`CACHES['default']`): Redis/Memcached in
+   production, LocMem with a single worker (a version bump in a
+   per-process cache would only reach that worker).
+
+Keys are versioned, e.g. `watch:42:3f9c1e:content`. The version token is
+kept only in the shared cache, so bumping it invalidates every worker's LRU
+at once: old entries can no longer be reached and simply age out.
+
+WATCH DETAIL:
+-------------
+`watch_detail` reads one small "meta" record per request (version token,
+whether the listing is live, the owner's user id). When the rendered body for
+that version is cached, the product, its seller and related watches are never
+loaded. Per-user bits (wishlist heart, offer panels, CSRF token) are
+`{% nocache %}` holes filled in on every request (pages/templatetags/fragment_cache.py).
+
+Invalidation (pages/signals.py) drops exactly:
+- the listing that changed (edit, price change, approval, sale), and
+- the listings whose "related watches" strip shows it.
+Recomputed neighbor lists (pages/recommend.py) drop just their own pages.
+"""
+
+import threading
+import uuid
+from collections import OrderedDict
+
+from django.core.cache import caches
+
+
+FRAGMENT_TIMEOUT = 60 * 60
+LOCAL_MAX_ENTRIES = 512
+
+
+class LRUCache:
+    """Thread-safe, size-bounded in-process cache"""
+
+    def __init__(self, max_entries=LOCAL_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return default
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class TwoTierCache:
+    """Per-process LRU in front of a shared Django cache"""
+
+    def __init__(self, alias='default', max_entries=LOCAL_MAX_ENTRIES, timeout=FRAGMENT_TIMEOUT):
+        self.alias = alias
+        self.local = LRUCache(max_entries)
+        self.timeout = timeout
+
+    @property
+    def shared(self):
+        return caches[self.alias]
+
+    def get(self, key):
+        value = self.local.get(key)
+        if value is None:
+            value = self.shared.get(key)
+            if value is not None:
+                self.local.set(key, value)
+        return value
+
+    def set(self, key, value, timeout=None):
+        self.local.set(key, value)
+        self.shared.set(key, value, self.timeout if timeout is None else timeout)
+
+
+fragments = TwoTierCache()
+
+
+# =============================================================================
+# WATCH DETAIL
+# =============================================================================
+
+def _meta_key(product_id):
+    return f'watch:meta:{product_id}'
+
+
+def _deps_key(product_id):
+    return f'watch:deps:{product_id}'
+
+
+def watch_meta(product_id):
+    """
+    {'v': version token, 'live': bool, 'owner': seller user id} for a listing,
+    or None when it doesn't exist. One shared-cache read on the hot path.
+    """
+    from .models import Product
+
+    shared = fragments.shared
+    meta = shared.get(_meta_key(product_id))
+    if meta is None:
+        row = (
+            Product.objects.filter(pk=product_id)
+            .values('status', 'approval_status', 'seller__user_id')
+            .first()
+        )
+        if row is None:
+            return None
+        meta = {
+            'v': uuid.uuid4().hex[:12],
+            'live': (row['status'] == Product.Status.ACTIVE
+                     and row['approval_status'] == Product.ApprovalStatus.APPROVED),
+            'owner': row['seller__user_id'],
+        }
+        # add(): if another worker raced us, use its token
+        if not shared.add(_meta_key(product_id), meta, FRAGMENT_TIMEOUT):
+            meta = shared.get(_meta_key(product_id)) or meta
+    return meta
+
+
+class WatchFragments:
+    """Fragment store for one listing version, handed to the template"""
+
+    def __init__(self, product_id, version):
+        self.prefix = f'watch:{product_id}:{version}'
+
+    def get(self, name):
+        return fragments.get(f'{self.prefix}:{name}')
+
+    def set(self, name, html):
+        fragments.set(f'{self.prefix}:{name}', html)
+
+
+def record_related(product_id, related_ids):
+    """Remember that `product_id`'s page shows each of `related_ids`"""
+    shared = fragments.shared
+    keys = [_deps_key(related_id) for related_id in related_ids]
+    current = shared.get_many(keys)
+    updates = {}
+    for key in keys:
+        dependents = set(current.get(key, ()))
+        if product_id not in dependents:
+            dependents.add(product_id)
+            updates[key] = dependents
+    if updates:
+        shared.set_many(updates, FRAGMENT_TIMEOUT)
+
+
+def invalidate_watches(product_ids):
+    """Drop the cached pages of `product_ids` and of pages that show them"""
+    product_ids = set(product_ids)
+    if not product_ids:
+        return
+    shared = fragments.shared
+    deps = shared.get_many([_deps_key(pk) for pk in product_ids])
+    affected = set(product_ids)
+    for dependents in deps.values():
+        affected.update(dependents)
+    shared.delete_many([_meta_key(pk) for pk in affected] + list(deps))
+
+
+def invalidate_pages(product_ids, chunk=1000):
+    """Drop the cached pages of `product_ids` only (their related strip was recomputed)"""
+    keys = [_meta_key(pk) for pk in product_ids]
+    for start in range(0, len(keys), chunk):
+        fragments.shared.delete_many(keys[start:start + chunk])
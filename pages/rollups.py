@@ -0,0 +1,252 @@
+"""
+Per-store daily rollups behind the seller dashboard.
+========================================================================================
+
+HOW IT WORKS:
+-------------
+- Every order, payment and review row contributes to one StoreDailyStats
+  row (store, day):
+    order    -> orders +1, or cancelled_orders +1 once cancelled (day placed)
+    payment  -> revenue +amount while COMPLETED (day completed)
+    review   -> reviews +1 and rating_sum +rating while approved (day written)
+- On save/delete the signal handlers (pages/signals.py) apply the
+  difference between a row's contribution before and after, so a
+  cancellation or refund corrects the day it originally counted on.
+- Views arrive with each counter flush (pages/counters.py) and offers through
+  `record_offer()` (pages/offers.py). Views have no per-day source row, so
+  they are event-only; `rebuild()` recounts offers from the `offers` table
+  (first offer of a chain on the day made, acceptances on the day accepted).
+- `stores.total_orders` and `stores.total_sales` move with the same deltas.
+
+The dashboard sums at most a month of rows for one store. After raw SQL
+imports, run `python manage.py rebuild_store_rollups`.
+"""
+
+from collections import Counter, defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .models import Offer, Order, Payment, Product, Review, Store, StoreDailyStats
+
+
+# Columns whose change can move a row's contribution
+TRACKED_FIELDS = {
+    Order: ('store_id', 'created_at', 'order_status'),
+    Payment: ('order_id', 'payment_status', 'amount', 'payment_completed_at', 'created_at'),
+    Review: ('store_id', 'created_at', 'is_approved', 'rating'),
+}
+DASHBOARD_DAYS = 30
+
+
+def _day(value):
+    return timezone.localdate(value) if timezone.is_aware(value) else value.date()
+
+
+def _decimal(value):
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+
+# =============================================================================
+# CONTRIBUTIONS
+# =============================================================================
+
+def snapshot(instance):
+    """Tracked columns as they are on the instance"""
+    return {name: getattr(instance, name) for name in TRACKED_FIELDS[type(instance)]}
+
+
+def stored_snapshot(instance):
+    """Tracked columns as they are in the database (None for a new row)"""
+    return instance.stored_values(TRACKED_FIELDS[type(instance)])
+
+
+def contribution(model, values, store_id=None):
+    """Counter of {(store id, day, metric): amount} for one row's values"""
+    if values is None:
+        return Counter()
+    if model is Order:
+        metric = 'cancelled_orders' if values['order_status'] == Order.Status.CANCELLED else 'orders'
+        return Counter({(values['store_id'], _day(values['created_at']), metric): 1})
+    if model is Payment:
+        if values['payment_status'] != Payment.Status.COMPLETED:
+            return Counter()
+        if store_id is None:
+            store_id = Order.objects.filter(pk=values['order_id']).values_list('store_id', flat=True).first()
+        day = _day(values['payment_completed_at'] or values['created_at'])
+        return Counter({(store_id, day, 'revenue'): _decimal(values['amount'])})
+    if model is Review:
+        if not values['is_approved']:
+            return Counter()
+        day = _day(values['created_at'])
+        return Counter({
+            (values['store_id'], day, 'reviews'): 1,
+            (values['store_id'], day, 'rating_sum'): _decimal(values['rating']),
+        })
+    raise TypeError(f'{model.__name__} has no store rollup')
+
+
+def row_change(model, before, after, store_id=None):
+    """Deltas for a row going from `before` to `after` (either may be None)"""
+    deltas = contribution(model, after, store_id)
+    deltas.subtract(contribution(model, before, store_id))
+    return deltas
+
+
+# =============================================================================
+# WRITING
+# =============================================================================
+
+def apply_deltas(deltas):
+    """Add {(store id, day, metric): delta} to the rollup rows and store totals"""
+    by_row = defaultdict(dict)
+    for (store_id, day, metric), delta in deltas.items():
+        if delta and store_id is not None:
+            by_row[(store_id, day)][metric] = delta
+    if not by_row:
+        return
+    store_totals = defaultdict(dict)
+    with transaction.atomic():
+        for (store_id, day), metrics in sorted(by_row.items()):
+            changes = {metric: F(metric) + delta for metric, delta in metrics.items()}
+            rows = StoreDailyStats.objects.filter(store_id=store_id, day=day)
+            if not rows.update(**changes):
+                StoreDailyStats.objects.get_or_create(store_id=store_id, day=day)
+                rows.update(**changes)
+            totals = store_totals[store_id]
+            if metrics.get('orders'):
+                totals['total_orders'] = totals.get('total_orders', 0) + metrics['orders']
+            if metrics.get('revenue'):
+                totals['total_sales'] = totals.get('total_sales', 0) + metrics['revenue']
+        for store_id, totals in store_totals.items():
+            if totals:
+                # update(), not save(): a store save invalidates its cached watch pages
+                Store.objects.filter(pk=store_id).update(
+                    **{column: F(column) + delta for column, delta in totals.items()}
+                )
+
+
+def add_views(product_deltas):
+    """Credit buffered view counts ({product id: views}) to today's rows"""
+    product_deltas = {pk: delta for pk, delta in product_deltas.items() if delta}
+    if not product_deltas:
+        return
+    today = timezone.localdate()
+    deltas = Counter()
+    for product_id, store_id in Product.objects.filter(pk__in=product_deltas).values_list('id', 'store_id'):
+        deltas[(store_id, today, 'views')] += product_deltas[product_id]
+    apply_deltas(deltas)
+
+
+def record_offer(store_id, received=0, accepted=0):
+    """Count offers made on / accepted by a store today"""
+    today = timezone.localdate()
+    apply_deltas({
+        (store_id, today, 'offers_received'): received,
+        (store_id, today, 'offers_accepted'): accepted,
+    })
+
+
+def rebuild(store_ids=None):
+    """
+    Recompute orders, revenue, reviews and offers with one GROUP BY per
+    source table and rewrite the rollup rows in bulk. Views have no source
+    rows and are carried over as they are.
+    """
+    orders = Order.objects.all()
+    payments = Payment.objects.filter(payment_status=Payment.Status.COMPLETED)
+    reviews = Review.objects.filter(is_approved=True)
+    offers = Offer.objects.all()
+    existing = StoreDailyStats.objects.all()
+    if store_ids is not None:
+        orders = orders.filter(store_id__in=store_ids)
+        payments = payments.filter(order__store_id__in=store_ids)
+        reviews = reviews.filter(store_id__in=store_ids)
+        offers = offers.filter(store_id__in=store_ids)
+        existing = existing.filter(store_id__in=store_ids)
+
+    rows = defaultdict(dict)
+    for row in (
+        orders.annotate(day=TruncDate('created_at')).values('store_id', 'day')
+        .annotate(
+            placed=Count('id', filter=~Q(order_status=Order.Status.CANCELLED)),
+            cancelled=Count('id', filter=Q(order_status=Order.Status.CANCELLED)),
+        ).order_by()
+    ):
+        rows[(row['store_id'], row['day'])].update(orders=row['placed'], cancelled_orders=row['cancelled'])
+    for row in (
+        payments.annotate(day=TruncDate(Coalesce('payment_completed_at', 'created_at')))
+        .values('order__store_id', 'day').annotate(revenue=Sum('amount')).order_by()
+    ):
+        rows[(row['order__store_id'], row['day'])]['revenue'] = row['revenue']
+    for row in (
+        reviews.annotate(day=TruncDate('created_at')).values('store_id', 'day')
+        .annotate(reviews=Count('id'), rating_sum=Sum('rating')).order_by()
+    ):
+        rows[(row['store_id'], row['day'])].update(reviews=row['reviews'], rating_sum=row['rating_sum'])
+    # A reply to a counter-offer continues its chain; it isn't a new offer received
+    for row in (
+        offers.filter(parent__isnull=True).annotate(day=TruncDate('created_at')).values('store_id', 'day')
+        .annotate(received=Count('id')).order_by()
+    ):
+        rows[(row['store_id'], row['day'])]['offers_received'] = row['received']
+    for row in (
+        offers.filter(offer_status=Offer.Status.ACCEPTED).annotate(day=TruncDate('responded_at'))
+        .values('store_id', 'day').annotate(accepted=Count('id')).order_by()
+    ):
+        rows[(row['store_id'], row['day'])]['offers_accepted'] = row['accepted']
+
+    with transaction.atomic():
+        for row in existing.filter(views__gt=0).values('store_id', 'day', 'views'):
+            rows[(row['store_id'], row['day'])]['views'] = row['views']
+        existing.delete()
+        StoreDailyStats.objects.bulk_create(
+            [StoreDailyStats(store_id=store_id, day=day, **metrics) for (store_id, day), metrics in rows.items()],
+            batch_size=1000,
+        )
+
+        totals = defaultdict(lambda: {'total_orders': 0, 'total_sales': Decimal('0')})
+        for (store_id, _), metrics in rows.items():
+            totals[store_id]['total_orders'] += metrics.get('orders', 0)
+            totals[store_id]['total_sales'] += metrics.get('revenue') or 0
+        stores = Store.objects.all() if store_ids is None else Store.objects.filter(pk__in=store_ids)
+        updated = []
+        for store in stores.only('id', 'total_orders', 'total_sales').iterator(chunk_size=2000):
+            store.total_orders = totals[store.pk]['total_orders']
+            store.total_sales = totals[store.pk]['total_sales']
+            updated.append(store)
+        Store.objects.bulk_update(updated, ['total_orders', 'total_sales'], batch_size=1000)
+    return len(rows)
+
+
+# =============================================================================
+# READING
+# =============================================================================
+
+def _percent(part, whole):
+    return round(100 * part / whole, 1) if whole else 0
+
+
+def dashboard_stats(store, days=DASHBOARD_DAYS):
+    """Totals for the last `days` days from the rollup rows, plus lifetime totals"""
+    since = timezone.localdate() - timedelta(days=days - 1)
+    period = StoreDailyStats.objects.filter(store=store, day__gte=since).aggregate(
+        revenue=Coalesce(Sum('revenue'), Decimal('0')),
+        orders=Coalesce(Sum('orders'), 0),
+        views=Coalesce(Sum('views'), 0),
+        reviews=Coalesce(Sum('reviews'), 0),
+        offers_received=Coalesce(Sum('offers_received'), 0),
+        offers_accepted=Coalesce(Sum('offers_accepted'), 0),
+    )
+    return {
+        'days': days,
+        **period,
+        'conversion_rate': _percent(period['orders'], period['views']),
+        'offer_acceptance_rate': _percent(period['offers_accepted'], period['offers_received']),
+        'total_orders': store.total_orders,
+        'total_sales': store.total_sales,
+    }
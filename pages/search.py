@@ -0,0 +1,387 @@
+"""
+In-process full-text search for watch listings.
+========================================================================================
+
+No search server needed: each worker keeps its own index in memory.
+
+HOW IT WORKS:
+-------------
+- Inverted index: term -> set of product ids, built from brand name,
+  model_name, reference_number and description. Matching is set
+  intersection/union, which runs in C rather than Python loops.
+- Autocomplete: every title term is also registered under its prefixes
+  (edge n-grams), so "rolex subm" matches "Rolex Submariner" as you type.
+- Typo tolerance: a deletion index over the title vocabulary finds terms one
+  edit away ("omgea" -> "omega", "submarner" -> "submariner") when a query
+  term has no exact or prefix match.
+- Results rank by popularity (favorite_count). Broad prefixes walk a
+  popularity-ordered id list and stop after `limit` hits.
+- Every document carries the small payload the suggestion list needs, so
+  autocomplete answers without touching the database.
+
+KEEPING IT FRESH:
+-----------------
+- Listing saves/deletes in this process update the index immediately
+  (pages/signals.py).
+- Saves made by other workers are picked up by `sync()`, which re-reads
+  listings whose `updated_at` moved past the last watermark. It runs at most
+  every SYNC_INTERVAL seconds, on the next search.
+- Deletes made by other workers leave nothing to re-read, so `sync()` also
+  compares the count of live listings with the index and, when they differ,
+  drops the ids no longer live.
+- Request threads call `sync()` concurrently; one of them syncs while the
+  others go on searching the index as it is.
+"""
+
+import heapq
+import re
+import threading
+import time
+
+from django.urls import reverse
+from django.utils import timezone
+
+
+MIN_PREFIX = 2
+MAX_PREFIX = 20
+SYNC_INTERVAL = 5.0
+RERANK_INTERVAL = 30.0
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+
+def tokenize(text):
+    return TOKEN_RE.findall((text or '').lower())
+
+
+def _deletes(term):
+    """All strings one deletion away from `term`"""
+    return {term[:i] + term[i + 1:] for i in range(len(term))}
+
+
+def _within_one_edit(a, b):
+    """True when a and b differ by at most one insert, delete, substitution or swap"""
+    if a == b:
+        return True
+    la, lb = len(a), len(b)
+    if abs(la - lb) > 1:
+        return False
+    if la == lb:
+        diff = [i for i in range(la) if a[i] != b[i]]
+        if len(diff) == 1:
+            return True
+        return len(diff) == 2 and diff[1] == diff[0] + 1 and a[diff[0]] == b[diff[1]] and a[diff[1]] == b[diff[0]]
+    if la > lb:
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    return a[i:] == b[i + 1:]
+
+
+class SearchIndex:
+    """Inverted index with prefix and typo lookup over listing documents"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.docs = {}          # product id -> payload dict
+        self.popularity = {}    # product id -> favorite_count, for ranking
+        self.doc_terms = {}     # product id -> (all terms, title terms)
+        self.postings = {}      # term -> set of product ids
+        self.title_terms = {}   # title term -> document frequency
+        self.prefixes = {}      # prefix -> set of title terms
+        self.deletes = {}       # one-deletion variant -> set of title terms
+        self._by_popularity = []
+        self._rank_dirty = True
+        self._ranked_at = 0.0
+
+    def __len__(self):
+        return len(self.docs)
+
+    # -------------------------------------------------------------------------
+    # Documents
+    # -------------------------------------------------------------------------
+
+    @staticmethod
+    def document_terms(doc):
+        """(all terms, title terms) for a document dict (see `document_for`)"""
+        title = set(tokenize(doc.get('brand')) + tokenize(doc.get('model_name')))
+        reference = doc.get('reference_number') or ''
+        title.update(tokenize(reference))
+        compact = ''.join(tokenize(reference))
+        if compact:
+            title.add(compact)
+        return title | set(tokenize(doc.get('description'))), title
+
+    def add(self, doc):
+        """Insert or replace one document"""
+        terms, title = self.document_terms(doc)
+        with self._lock:
+            if doc['id'] in self.docs:
+                self._remove(doc['id'])
+            # Description is only searched, never shown: keep it out of memory
+            self.docs[doc['id']] = {k: v for k, v in doc.items() if k != 'description'}
+            self.popularity[doc['id']] = doc.get('popularity', 0)
+            self.doc_terms[doc['id']] = (terms, title)
+            for term in terms:
+                self.postings.setdefault(term, set()).add(doc['id'])
+            for term in title:
+                self._add_title_term(term)
+            self._rank_dirty = True
+
+    def remove(self, doc_id):
+        with self._lock:
+            self._remove(doc_id)
+
+    def _remove(self, doc_id):
+        if self.docs.pop(doc_id, None) is None:
+            return
+        self.popularity.pop(doc_id, None)
+        terms, title = self.doc_terms.pop(doc_id)
+        for term in terms:
+            posting = self.postings.get(term)
+            if posting is not None:
+                posting.discard(doc_id)
+                if not posting:
+                    del self.postings[term]
+        for term in title:
+            self._drop_title_term(term)
+        self._rank_dirty = True
+
+    def _add_title_term(self, term):
+        count = self.title_terms.get(term, 0)
+        self.title_terms[term] = count + 1
+        if count:
+            return
+        for n in range(MIN_PREFIX, min(len(term), MAX_PREFIX) + 1):
+            self.prefixes.setdefault(term[:n], set()).add(term)
+        if len(term) > 3:
+            for variant in _deletes(term):
+                self.deletes.setdefault(variant, set()).add(term)
+
+    def _drop_title_term(self, term):
+        count = self.title_terms.get(term, 0) - 1
+        if count > 0:
+            self.title_terms[term] = count
+            return
+        self.title_terms.pop(term, None)
+        for n in range(MIN_PREFIX, min(len(term), MAX_PREFIX) + 1):
+            bucket = self.prefixes.get(term[:n])
+            if bucket is not None:
+                bucket.discard(term)
+                if not bucket:
+                    del self.prefixes[term[:n]]
+        if len(term) > 3:
+            for variant in _deletes(term):
+                bucket = self.deletes.get(variant)
+                if bucket is not None:
+                    bucket.discard(term)
+                    if not bucket:
+                        del self.deletes[variant]
+
+    # -------------------------------------------------------------------------
+    # Lookup
+    # -------------------------------------------------------------------------
+
+    def _fuzzy_terms(self, token):
+        """Title terms within one edit of `token`"""
+        if len(token) <= 3:
+            return set()
+        candidates = set(self.deletes.get(token, ()))
+        for variant in _deletes(token):
+            if variant in self.title_terms:
+                candidates.add(variant)
+            candidates |= self.deletes.get(variant, set())
+        return {term for term in candidates if _within_one_edit(token, term)}
+
+    def _expand(self, token, prefix):
+        """Terms a query token stands for: exact, then prefix, then typo matches"""
+        terms = set()
+        if token in self.postings:
+            terms.add(token)
+        if prefix and len(token) >= MIN_PREFIX:
+            terms |= self.prefixes.get(token[:MAX_PREFIX], set())
+        if not terms:
+            terms = self._fuzzy_terms(token)
+        return terms
+
+    def _candidates(self, query, prefix_last):
+        """Ids of documents matching every query token"""
+        tokens = tokenize(query)
+        if prefix_last and len(tokens) > 1 and len(tokens[-1]) < MIN_PREFIX:
+            tokens.pop()  # "rolex s": wait for the next keystroke
+        if not tokens:
+            return set()
+        per_token = []
+        for i, token in enumerate(tokens):
+            terms = self._expand(token, prefix_last and i == len(tokens) - 1)
+            if not terms:
+                return set()
+            postings = [self.postings[term] for term in terms if term in self.postings]
+            per_token.append(postings[0] if len(postings) == 1 else set().union(*postings))
+        per_token.sort(key=len)
+        return per_token[0].intersection(*per_token[1:]) if len(per_token) > 1 else per_token[0]
+
+    def _popularity_order(self):
+        """
+        All ids, most popular first.
+
+        Re-sorted at most every RERANK_INTERVAL seconds after writes; until
+        then newly added listings only surface through narrower queries, and
+        removed ones are skipped because they are no longer candidates.
+        """
+        now = time.monotonic()
+        if self._rank_dirty and (not self._by_popularity or now - self._ranked_at >= RERANK_INTERVAL):
+            self._by_popularity = sorted(self.popularity, key=self.popularity.__getitem__, reverse=True)
+            self._rank_dirty = False
+            self._ranked_at = now
+        return self._by_popularity
+
+    def search(self, query, limit=None, prefix_last=False):
+        """Product ids matching every query term, most popular first"""
+        with self._lock:
+            candidates = self._candidates(query, prefix_last)
+            if not candidates:
+                return []
+            rank = self.popularity.__getitem__
+            if limit is None:
+                return sorted(candidates, key=rank, reverse=True)
+            if len(candidates) * len(candidates) > limit * len(self.docs):
+                # Broad match (e.g. "rolex"): walking the global popularity
+                # order touches ~limit * N / |candidates| ids before it has
+                # `limit` hits, far fewer than ranking every candidate.
+                hits = []
+                for doc_id in self._popularity_order():
+                    if doc_id in candidates:
+                        hits.append(doc_id)
+                        if len(hits) == limit:
+                            return hits
+            return heapq.nlargest(limit, candidates, key=rank)
+
+    def autocomplete(self, query, limit=8):
+        """Suggestion payloads for as-you-type search"""
+        with self._lock:
+            return [self.docs[doc_id] for doc_id in self.search(query, limit=limit, prefix_last=True)]
+
+
+# =============================================================================
+# PROCESS-WIDE INDEX
+# =============================================================================
+
+_index = None
+_index_lock = threading.Lock()
+_sync_lock = threading.Lock()
+_synced_at = None
+_last_sync_check = 0.0
+
+
+def document_for(product):
+    """Index document for a Product (brand should be select_related)"""
+    return {
+        'id': product.pk,
+        'brand': product.brand.brand_name if product.brand_id else '',
+        'model_name': product.model_name,
+        'reference_number': product.reference_number,
+        'description': product.description,
+        'price': str(product.price),
+        'popularity': product.favorite_count,
+        'title': f'{product.brand.brand_name} {product.model_name}' if product.brand_id else product.model_name,
+        'url': reverse('watch_detail', args=[product.pk]),
+    }
+
+
+def _live_queryset():
+    from . import catalog
+    return catalog.live_products().select_related('brand').only(
+        'id', 'model_name', 'reference_number', 'description', 'price', 'favorite_count', 'updated_at',
+        'brand__brand_name',
+    )
+
+
+def get_index():
+    """The process-wide index, built from the database on first use"""
+    global _index, _synced_at
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                started = timezone.now()
+                index = SearchIndex()
+                for product in _live_queryset().iterator(chunk_size=2000):
+                    index.add(document_for(product))
+                _synced_at = started
+                _index = index
+    else:
+        sync()
+    return _index
+
+
+def sync(force=False):
+    """Pull listings changed by other workers since the last sync (`force` waits for a running one)"""
+    global _last_sync_check
+    if _index is None:
+        return
+    now = time.monotonic()
+    if not force and now - _last_sync_check < SYNC_INTERVAL:
+        return
+    if not _sync_lock.acquire(blocking=force):
+        return  # another thread is syncing
+    try:
+        _last_sync_check = now
+        _pull_changes()
+    finally:
+        _sync_lock.release()
+
+
+def _pull_changes():
+    global _synced_at
+    from .models import Product
+    started = timezone.now()
+    changed = Product.objects.filter(updated_at__gte=_synced_at).select_related('brand').only(
+        'id', 'model_name', 'reference_number', 'description', 'price', 'favorite_count', 'updated_at',
+        'brand__brand_name', 'status', 'approval_status',
+    )
+    for product in changed:
+        update_product(product)
+    _synced_at = started
+    _prune()
+
+
+def _prune():
+    """
+    Drop listings deleted by other workers. Deleted rows leave no updated_at
+    to find them by, but they do leave the index holding more listings than
+    the database: a COUNT spots that, and only then is the set of live ids read
+    to find which ones.
+    """
+    live = _live_queryset()
+    if live.count() == len(_index.docs):
+        return
+    with _index._lock:
+        indexed = set(_index.docs)
+    gone = indexed - set(live.values_list('id', flat=True).iterator(chunk_size=10000))
+    for doc_id in gone:
+        _index.remove(doc_id)
+
+
+def update_product(product):
+    """Add, refresh or drop one listing in this process's index"""
+    if _index is None:
+        return
+    if product.is_live:
+        _index.add(document_for(product))
+    else:
+        _index.remove(product.pk)
+
+
+def remove_product(product_id):
+    if _index is not None:
+        _index.remove(product_id)
+
+
+def search_ids(query, limit=1000):
+    """Best-matching live product ids for the browse page"""
+    return get_index().search(query, limit=limit)
+
+
+def autocomplete(query, limit=8):
+    return get_index().autocomplete(query, limit=limit)
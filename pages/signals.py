@@ -0,0 +1,298 @@
+"""
+Signal handlers that keep denormalized data in step with the source tables.
+
+Connected in PagesConfig.ready().
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import catalog, checkout, homepage, inbox, notify, order_states, ratings, realtime, render_cache, rollups, search
+from .models import Brand, Conversation, Message, Notification, Order, Payment, Product, ProductCategory, Review, Seller, Store
+
+
+# =============================================================================
+# CATALOG FACET INDEX
+# =============================================================================
+
+@receiver(pre_save, sender=Product)
+def capture_indexed_fields(sender, instance, raw=False, **kwargs):
+    """Remember the facet-relevant columns as they are in the database"""
+    if raw or instance._state.adding:
+        instance._index_before = None
+        return
+    loaded = getattr(instance, '_loaded_values', None) or {}
+    if all(name in loaded for name in catalog.INDEXED_FIELDS):
+        instance._index_before = {name: loaded[name] for name in catalog.INDEXED_FIELDS}
+    else:
+        # Loaded with only()/defer(): read the missing columns once
+        instance._index_before = (
+            Product.objects.filter(pk=instance.pk).values(*catalog.INDEXED_FIELDS).first()
+        )
+
+
+@receiver(post_save, sender=Product)
+def update_catalog_index(sender, instance, raw=False, **kwargs):
+    """Listing approved, edited or sold: move its facet counts"""
+    if raw:
+        return
+    after = catalog.snapshot(instance)
+    catalog.index_change(getattr(instance, '_index_before', None), after, product=instance)
+    instance._loaded_values = {**getattr(instance, '_loaded_values', {}), **after}
+
+
+@receiver(post_delete, sender=Product)
+def remove_from_catalog_index(sender, instance, **kwargs):
+    loaded = getattr(instance, '_loaded_values', None) or {}
+    if all(name in loaded for name in catalog.INDEXED_FIELDS):
+        before = {name: loaded[name] for name in catalog.INDEXED_FIELDS}
+    else:
+        before = catalog.snapshot(instance)
+    catalog.index_change(before, None)
+
+
+@receiver(post_save, sender=Brand)
+def rename_brand_facet(sender, instance, created=False, raw=False, **kwargs):
+    if not (created or raw):
+        catalog.rename_facet_label('brand', instance.pk, instance.brand_name)
+
+
+@receiver(post_save, sender=ProductCategory)
+def rename_category_facet(sender, instance, created=False, raw=False, **kwargs):
+    if not (created or raw):
+        catalog.rename_facet_label('category', instance.pk, instance.category_name)
+
+
+# =============================================================================
+# SEARCH INDEX
+# =============================================================================
+
+@receiver(post_save, sender=Product)
+def update_search_index(sender, instance, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(lambda: search.update_product(instance))
+
+
+@receiver(post_delete, sender=Product)
+def remove_from_search_index(sender, instance, **kwargs):
+    product_id = instance.pk
+    transaction.on_commit(lambda: search.remove_product(product_id))
+
+
+# =============================================================================
+# WATCH DETAIL CACHE
+# =============================================================================
+
+def _invalidate_on_commit(product_ids):
+    product_ids = list(product_ids)
+    transaction.on_commit(lambda: render_cache.invalidate_watches(product_ids))
+    # Listing cards on the homepage show the same price, names and badges
+    transaction.on_commit(homepage.mark_stale)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_watch_page(sender, instance, raw=False, **kwargs):
+    """Edit, price change, approval change or sale"""
+    if not raw:
+        _invalidate_on_commit([instance.pk])
+
+
+@receiver(post_save, sender=Store)
+@receiver(post_save, sender=Seller)
+def invalidate_seller_watch_pages(sender, instance, created=False, raw=False, **kwargs):
+    """Store name, logo or verification shown on the seller's listings"""
+    if created or raw:
+        return
+    seller_id = instance.pk if sender is Seller else instance.seller_id
+    _invalidate_on_commit(Product.objects.filter(seller_id=seller_id).values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Brand)
+@receiver(post_save, sender=ProductCategory)
+def invalidate_labelled_watch_pages(sender, instance, created=False, raw=False, **kwargs):
+    if created or raw:
+        return
+    field = 'brand_id' if sender is Brand else 'category_id'
+    _invalidate_on_commit(Product.objects.filter(**{field: instance.pk}).values_list('pk', flat=True))
+
+
+# =============================================================================
+# STORE ROLLUPS
+# =============================================================================
+
+def _rollup_store_id(instance):
+    # Payments reach their store through the order
+    if isinstance(instance, Payment):
+        return instance.order.store_id
+    return None
+
+
+@receiver(pre_save, sender=Order)
+@receiver(pre_save, sender=Payment)
+@receiver(pre_save, sender=Review)
+def capture_rollup_fields(sender, instance, raw=False, **kwargs):
+    instance._rollup_before = None if raw else rollups.stored_snapshot(instance)
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_save, sender=Payment)
+@receiver(post_save, sender=Review)
+def update_store_rollups(sender, instance, raw=False, **kwargs):
+    """Order placed or cancelled, payment completed or refunded, review approved"""
+    if raw:
+        return
+    after = rollups.snapshot(instance)
+    before = getattr(instance, '_rollup_before', None)
+    if before != after:
+        rollups.apply_deltas(rollups.row_change(sender, before, after, _rollup_store_id(instance)))
+    instance._loaded_values = {**getattr(instance, '_loaded_values', {}), **after}
+
+
+@receiver(post_delete, sender=Order)
+@receiver(post_delete, sender=Payment)
+@receiver(post_delete, sender=Review)
+def remove_from_store_rollups(sender, instance, **kwargs):
+    loaded = getattr(instance, '_loaded_values', None) or {}
+    fields = rollups.TRACKED_FIELDS[sender]
+    before = {name: loaded[name] for name in fields} if all(name in loaded for name in fields) else rollups.snapshot(instance)
+    store_id = None
+    if sender is Payment:
+        store_id = Order.objects.filter(pk=instance.order_id).values_list('store_id', flat=True).first()
+    rollups.apply_deltas(rollups.row_change(sender, before, None, store_id))
+
+
+# =============================================================================
+# ORDER STATUS (state machine, history, bucket counts)
+# =============================================================================
+
+@receiver(pre_save, sender=Order)
+def check_order_status_change(sender, instance, raw=False, **kwargs):
+    """Raises order_states.InvalidTransition for an illegal move"""
+    instance._pending_status_change = None if raw else order_states.status_changing(instance)
+
+
+@receiver(post_save, sender=Order)
+def record_order_status_change(sender, instance, raw=False, **kwargs):
+    change = getattr(instance, '_pending_status_change', None)
+    if change and not raw:
+        instance._pending_status_change = None
+        order_states.status_changed(instance, change)
+        checkout.order_status_changed(instance, change)
+
+
+@receiver(post_delete, sender=Order)
+def remove_from_order_status_counts(sender, instance, **kwargs):
+    loaded = getattr(instance, '_loaded_values', None) or {}
+    order_states.apply_deltas({loaded.get('order_status', instance.order_status): -1})
+
+
+# =============================================================================
+# RATING SUMMARIES
+# =============================================================================
+
+@receiver(pre_save, sender=Review)
+def capture_rating_fields(sender, instance, raw=False, **kwargs):
+    instance._ratings_before = None if raw else instance.stored_values(ratings.TRACKED_FIELDS)
+
+
+@receiver(post_save, sender=Review)
+def update_rating_summaries(sender, instance, raw=False, **kwargs):
+    """Review written, edited or (un)approved"""
+    if raw:
+        return
+    after = ratings.snapshot(instance)
+    changed = ratings.apply_deltas(ratings.review_change(getattr(instance, '_ratings_before', None), after))
+    _invalidate_rated_watches(changed)
+    instance._loaded_values = {**getattr(instance, '_loaded_values', {}), **after}
+
+
+@receiver(post_delete, sender=Review)
+def remove_from_rating_summaries(sender, instance, **kwargs):
+    loaded = getattr(instance, '_loaded_values', None) or {}
+    fields = ratings.TRACKED_FIELDS
+    before = {name: loaded[name] for name in fields} if all(name in loaded for name in fields) else ratings.snapshot(instance)
+    _invalidate_rated_watches(ratings.apply_deltas(ratings.review_change(before, None)))
+
+
+def _invalidate_rated_watches(changed):
+    """Watch pages show their product's rating breakdown"""
+    product_ids = [subject_id for subject, subject_id in changed if subject == ratings.PRODUCT]
+    if product_ids:
+        _invalidate_on_commit(product_ids)
+
+
+# =============================================================================
+# UNREAD NOTIFICATION COUNTS
+# =============================================================================
+
+@receiver(post_save, sender=Notification)
+def count_new_notification(sender, instance, created=False, raw=False, **kwargs):
+    if created and not raw and not instance.is_read:
+        notify.adjust_unread(instance.user_id, 1)
+
+
+@receiver(post_delete, sender=Notification)
+def uncount_deleted_notification(sender, instance, **kwargs):
+    if not instance.is_read:
+        notify.adjust_unread(instance.user_id, -1)
+
+
+# =============================================================================
+# CONVERSATION INBOX
+# =============================================================================
+
+@receiver(post_save, sender=Conversation)
+def open_inbox_entries(sender, instance, created=False, raw=False, **kwargs):
+    if created and not raw:
+        inbox.open_conversation(instance)
+
+
+@receiver(post_save, sender=Message)
+def update_inbox_entries(sender, instance, created=False, raw=False, **kwargs):
+    if created and not raw:
+        inbox.record_message(instance)
+
+
+# =============================================================================
+# REAL-TIME PUSH
+# =============================================================================
+
+@receiver(post_save, sender=Message)
+def push_new_message(sender, instance, created=False, raw=False, **kwargs):
+    if not created or raw:
+        return
+    conversation = instance.conversation
+    user_ids = conversation.participant_user_ids()
+    event = {
+        'type': 'message',
+        'conversation_id': conversation.pk,
+        'message_id': instance.pk,
+        'sender_id': instance.sender_id,
+        'text': instance.message_text[:200],
+        'created_at': instance.created_at.isoformat(),
+    }
+
+    def publish():
+        for user_id in user_ids:
+            realtime.publish(user_id, event)
+    transaction.on_commit(publish)
+
+
+@receiver(post_save, sender=Notification)
+def push_new_notification(sender, instance, created=False, raw=False, **kwargs):
+    if not created or raw:
+        return
+    event = {
+        'type': 'notification',
+        'notification_id': instance.pk,
+        'notification_type': instance.notification_type.lower(),
+        'title': instance.title,
+        'message': instance.message[:200],
+        'link_url': instance.link_url,
+    }
+
+    def publish():
+        realtime.publish(instance.user_id, {**event, 'unread_count': notify.unread_count(instance.user_id)})
+    transaction.on_commit(publish)
@@ -0,0 +1,173 @@
+"""
+Listing similarity in NumPy, for the related-watches job (pages/recommend.py).
+========================================================================================
+
+The live catalog is read into column arrays (`load_features`) and listing
+audiences into sparse pair scores (`load_interest`). `score_rows` scores a
+block of listings against all of them, and `top_neighbors` keeps the best k
+per row.
+
+Only `recommend.update()` imports this module, so web workers, which just read
+the stored neighbors, never load NumPy.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from . import catalog
+from .models import Favorite, Offer, Product
+
+
+READ_CHUNK = 5000
+BLANK = 1e6
+
+WEIGHTS = {'brand': 3.0, 'movement': 1.0, 'condition': 0.5, 'diameter': 1.0, 'price': 2.0}
+DIAMETER_SPAN = 6.0
+PRICE_SPAN = 2.0
+INTEREST_WEIGHT = 0.5
+# Users interested in more listings than this say little about any pair of them
+MAX_USER_INTERESTS = 50
+
+
+# =============================================================================
+# FEATURES
+# =============================================================================
+
+@dataclass
+class Features:
+    """The live catalog as column arrays, one row per listing (ordered by id)"""
+
+    ids: np.ndarray
+    brand: np.ndarray           # integer codes, -1 when blank
+    movement: np.ndarray
+    condition: np.ndarray
+    diameter: np.ndarray        # mm, NaN when blank
+    log_price: np.ndarray       # log2(price)
+
+    def __len__(self):
+        return len(self.ids)
+
+
+def _codes(values):
+    codes = {}
+    return np.array([codes.setdefault(value, len(codes)) if value else -1 for value in values], dtype=np.int32)
+
+
+def load_features():
+    rows = list(
+        catalog.live_products().order_by('pk')
+        .values_list('pk', 'brand_id', 'movement_type', 'condition', 'case_diameter_mm', 'price')
+    )
+    pks, brands, movements, conditions, diameters, prices = zip(*rows) if rows else ((),) * 6
+    return Features(
+        ids=np.array(pks, dtype=np.int64),
+        brand=_codes(brands),
+        movement=_codes([(movement or '').strip().lower() for movement in movements]),
+        condition=_codes(conditions),
+        diameter=np.array([np.nan if d is None else float(d) for d in diameters], dtype=np.float32),
+        log_price=np.log2(np.maximum(np.array(prices, dtype=np.float64), 1)).astype(np.float32),
+    )
+
+
+@dataclass
+class Interest:
+    """Audience similarity for listing pairs with a shared user, keyed row * n + column (sorted)"""
+
+    keys: np.ndarray
+    scores: np.ndarray
+
+
+def load_interest(features):
+    """Cosine similarity of listing audiences (favorites and offers), vectorized over all users"""
+    n = len(features)
+    position = dict(zip(features.ids.tolist(), range(n)))
+    pairs = []
+    for user_ids in (
+        Favorite.objects.values_list('customer_id', 'product_id'),
+        Offer.objects.values_list('buyer_id', 'product_id'),
+    ):
+        for user_id, product_id in user_ids.filter(
+            product__status=Product.Status.ACTIVE, product__approval_status=Product.ApprovalStatus.APPROVED,
+        ).iterator(chunk_size=READ_CHUNK):
+            row = position.get(product_id)
+            if row is not None:     # went live after the features were read
+                pairs.append((user_id, row))
+    empty = Interest(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))
+    if not pairs:
+        return empty
+
+    # One row per (user, listing), grouped by user
+    pairs = np.unique(np.array(pairs, dtype=np.int64), axis=0)
+    _users, starts, sizes = np.unique(pairs[:, 0], return_index=True, return_counts=True)
+    kept = (sizes > 1) & (sizes <= MAX_USER_INTERESTS)
+    if not kept.any():
+        return empty
+    items = np.concatenate([pairs[start:start + size, 1] for start, size in zip(starts[kept], sizes[kept])])
+    sizes = sizes[kept]
+    starts = np.cumsum(sizes) - sizes
+
+    # Every ordered pair of listings within each user's group
+    per_entry = np.repeat(sizes, sizes)
+    left = np.repeat(items, per_entry)
+    offset = np.arange(per_entry.sum()) - np.repeat(np.cumsum(per_entry) - per_entry, per_entry)
+    right = items[np.repeat(np.repeat(starts, sizes), per_entry) + offset]
+    distinct = left != right
+    keys, shared = np.unique(left[distinct] * n + right[distinct], return_counts=True)
+
+    audience = np.bincount(items, minlength=n)
+    rows, columns = np.divmod(keys, n)
+    return Interest(keys, (shared / np.sqrt(audience[rows] * audience[columns])).astype(np.float32))
+
+
+# =============================================================================
+# SCORING
+# =============================================================================
+
+def _add_closeness(scores, values, rows, span, weight):
+    """scores += weight * max(0, 1 - |a - b| / span), with blanks scoring 0"""
+    # Blanks become far-apart sentinels (different for rows and columns), so no NaN pass is needed
+    mine = np.nan_to_num(values[rows], nan=BLANK)
+    theirs = np.nan_to_num(values, nan=-BLANK)
+    closeness = np.subtract(mine[:, None], theirs[None, :], dtype=np.float32)
+    np.abs(closeness, out=closeness)
+    closeness *= -weight / span
+    closeness += weight
+    np.maximum(closeness, 0, out=closeness)
+    scores += closeness
+
+
+def score_rows(features, interest, rows):
+    """Similarity of the listings at `rows` to every live listing, shape (len(rows), n)"""
+    n = len(features)
+    total = sum(WEIGHTS.values())
+    scores = np.zeros((len(rows), n), dtype=np.float32)
+    for name in ('brand', 'movement', 'condition'):
+        codes = getattr(features, name)
+        # Blank (-1) on the row side never equals blank (-2) on the column side
+        theirs = np.where(codes < 0, -2, codes)
+        np.add(scores, np.float32(WEIGHTS[name] / total), out=scores, where=codes[rows, None] == theirs[None, :])
+    _add_closeness(scores, features.diameter, rows, DIAMETER_SPAN, WEIGHTS['diameter'] / total)
+    _add_closeness(scores, features.log_price, rows, np.log2(PRICE_SPAN), WEIGHTS['price'] / total)
+
+    # Audience similarity: the slice of sorted keys that belongs to each row
+    low = np.searchsorted(interest.keys, rows * n)
+    high = np.searchsorted(interest.keys, (rows + 1) * n)
+    lengths = high - low
+    if lengths.any():
+        index = np.repeat(low - (np.cumsum(lengths) - lengths), lengths) + np.arange(lengths.sum())
+        scores[np.repeat(np.arange(len(rows)), lengths), interest.keys[index] % n] += (
+            INTEREST_WEIGHT * interest.scores[index]
+        )
+
+    scores[np.arange(len(rows)), rows] = -np.inf
+    return scores
+
+
+def top_neighbors(scores, k):
+    """(columns, scores) of the k best per row, best first"""
+    k = min(k, scores.shape[1])
+    best = np.argpartition(scores, -k, axis=1)[:, -k:]
+    best_scores = np.take_along_axis(scores, best, axis=1)
+    order = np.argsort(-best_scores, axis=1, kind='stable')
+    return np.take_along_axis(best, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
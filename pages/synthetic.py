@@ -0,0 +1,808 @@
+"""
+Synthetic marketplace data for benchmarks and local tuning.
+========================================================================================
+
+HOW IT WORKS:
+-------------
+- `seed()` fills an EMPTY database with a consistent dataset at one of the
+  SCALES: users, sellers and their stores, listings with a primary photo,
+  favorites, offers, orders with their items and payments, reviews,
+  conversations with messages, and notifications. 'huge' is about 10M rows.
+- Shaped like production, not uniform:
+    brands        Zipf popularity in BRANDS order (BRAND_SKEW), each with
+                  its own lognormal price around BRAND_PRICES
+    sellers       power-law store sizes (Pareto, SELLER_TAIL)
+    buyers        power-law activity (ACTIVITY_TAIL): who orders, offers,
+                  favorites, chats and gets notified
+    listings      power-law popularity (POPULARITY_TAIL): what is sold,
+                  favorited, offered on and asked about; view counts follow
+    threads       power-law conversation lengths (THREAD_TAIL)
+  Time runs forwards: sellers joined before listing, listings exist
+  before they are favorited, ordered or discussed.
+- Plan, then shards: `_Plan` decides from the seed, with numpy, everything
+  tables share (who sells what at which price, what was sold to whom,
+  how many favorites/offers/threads/messages/notifications each owner
+  has and so their id ranges). The rows themselves are generated in shards
+  of about SHARD_ROWS rows, each from its own seeded generator, so the
+  data depends on the seed alone - not on the number of workers.
+- Shards of one stage (STAGES, in foreign-key order) run in a process pool
+  of `workers` spawned processes, each with its own database connection
+  and one transaction per shard. The plan reaches them as memory-mapped
+  .npy files. SQLite takes one writer at a time, so there it loads in
+  this process.
+- Streamed, chunked inserts straight into the tables (no model instances):
+  COPY on PostgreSQL, executemany of CHUNK rows elsewhere. Columns a shard
+  doesn't generate get their model defaults.
+- No signals run, so the derived tables are rebuilt at the end the way
+  their maintenance commands do: favorite counts, catalog facets, inboxes,
+  order status counts, rating summaries, store rollups and (unless
+  `related=False`) related watches. Notification counters are written with
+  the notifications. Sequences are reset and the planner statistics
+  refreshed.
+
+Every account's password is PASSWORD. User 'staff' is a staff member.
+
+USAGE:
+    synthetic.seed('small', seed=42)
+    synthetic.seed('huge', seed=42, workers=8, related=False, log=print)
+    python manage.py generate_data --scale huge --workers 8
+"""
+
+import io
+import itertools
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from decimal import Decimal
+
+import django
+import numpy as np
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, models, transaction
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import (
+    Brand, Conversation, Favorite, Image, Message, Notification, NotificationCounter, Offer, Order, OrderItem,
+    Payment, Product, ProductCategory, ProductImage, Review, Seller, Store,
+)
+
+
+PASSWORD = 'synthetic'
+CHUNK = 5000                # rows per INSERT batch / COPY
+SHARD_ROWS = 50_000         # rows per unit of work (one transaction)
+HISTORY_DAYS = 365
+DAY = 24 * 60 * 60
+HOUR = 60 * 60
+
+BRAND_SKEW = 1.1            # Zipf exponent of brand popularity
+SELLER_TAIL = 1.6           # Pareto shape of store sizes (smaller = more skewed)
+ACTIVITY_TAIL = 1.8         # ... of buyer activity
+POPULARITY_TAIL = 1.8       # ... of listing popularity
+THREAD_TAIL = 1.8           # ... of conversation lengths
+PRICE_SPREAD = 0.5          # sigma of the lognormal price around the brand's median
+
+
+@dataclass(frozen=True)
+class Scale:
+    users: int
+    sellers: int
+    products: int
+    favorites: int
+    offers: int
+    orders: int
+    conversations: int
+    messages: int
+    notifications: int
+
+
+SCALES = {
+    'tiny': Scale(
+        users=200, sellers=20, products=300, favorites=1_000, offers=300, orders=100,
+        conversations=150, messages=1_500, notifications=1_000,
+    ),
+    'small': Scale(
+        users=2_000, sellers=200, products=3_000, favorites=10_000, offers=3_000, orders=1_000,
+        conversations=1_500, messages=15_000, notifications=10_000,
+    ),
+    'medium': Scale(
+        users=20_000, sellers=2_000, products=30_000, favorites=100_000, offers=30_000, orders=10_000,
+        conversations=15_000, messages=150_000, notifications=100_000,
+    ),
+    'full': Scale(
+        users=100_000, sellers=10_000, products=100_000, favorites=500_000, offers=100_000, orders=50_000,
+        conversations=100_000, messages=1_000_000, notifications=500_000,
+    ),
+    'huge': Scale(
+        users=400_000, sellers=20_000, products=500_000, favorites=2_500_000, offers=500_000, orders=250_000,
+        conversations=400_000, messages=3_500_000, notifications=1_500_000,
+    ),
+}
+
+# In popularity order (BRAND_SKEW)
+BRANDS = [
+    ('Rolex', 'Switzerland'), ('Omega', 'Switzerland'), ('Seiko', 'Japan'), ('Tag Heuer', 'Switzerland'),
+    ('Casio', 'Japan'), ('Tissot', 'Switzerland'), ('Citizen', 'Japan'), ('Patek Philippe', 'Switzerland'),
+    ('Audemars Piguet', 'Switzerland'), ('Cartier', 'France'), ('Breitling', 'Switzerland'),
+    ('IWC', 'Switzerland'), ('Hamilton', 'Switzerland'), ('Longines', 'Switzerland'), ('Tudor', 'Switzerland'),
+    ('Grand Seiko', 'Japan'), ('Orient', 'Japan'), ('Panerai', 'Italy'), ('Jaeger-LeCoultre', 'Switzerland'),
+    ('Zenith', 'Switzerland'), ('Oris', 'Switzerland'), ('Fossil', 'USA'), ('Bulova', 'USA'),
+    ('Hublot', 'Switzerland'), ('Vacheron Constantin', 'Switzerland'),
+]
+BRAND_PRICES = {
+    'Rolex': 3_000_000, 'Omega': 1_200_000, 'Seiko': 90_000, 'Tag Heuer': 650_000, 'Casio': 25_000,
+    'Tissot': 160_000, 'Citizen': 70_000, 'Patek Philippe': 12_000_000, 'Audemars Piguet': 10_000_000,
+    'Cartier': 2_000_000, 'Breitling': 1_400_000, 'IWC': 1_600_000, 'Hamilton': 200_000,
+    'Longines': 450_000, 'Tudor': 1_100_000, 'Grand Seiko': 1_500_000, 'Orient': 50_000, 'Panerai': 2_200_000,
+    'Jaeger-LeCoultre': 2_800_000, 'Zenith': 2_000_000, 'Oris': 450_000, 'Fossil': 40_000, 'Bulova': 80_000,
+    'Hublot': 4_000_000, 'Vacheron Constantin': 8_000_000,
+}
+CATEGORIES = ['Dress', 'Diver', 'Chronograph', 'Pilot', 'Field', 'GMT', 'Smartwatch', 'Vintage']
+MODEL_WORDS = [
+    'Submariner', 'Speedmaster', 'Seamaster', 'Presage', 'Carrera', 'Aquaracer', 'Navitimer', 'Prospex',
+    'Khaki', 'Pilot', 'Datejust', 'Royal Oak', 'Nautilus', 'Santos', 'Tank', 'Black Bay', 'Reverso',
+    'Chronomat', 'Aquanaut', 'Defy', 'Aquis', 'Heritage', 'Master', 'Explorer', 'Snowflake', 'Marine',
+]
+MATERIALS = ['Stainless Steel', 'Titanium', 'Gold', 'Ceramic', 'Bronze', 'Two-Tone']
+MOVEMENTS = ['Automatic', 'Manual', 'Quartz', 'Solar', 'Spring Drive']
+WATER_RESISTANCE = ['30m', '50m', '100m', '200m', '300m']
+PHRASES = [
+    'Is this still available?', 'Can you share more photos?', 'Would you take a lower price?',
+    'Does it come with the box and papers?', 'When was it last serviced?', 'Yes, still available.',
+    'Sure, sending them now.', 'I can meet this weekend.', 'Shipping is included.', 'Thanks!',
+]
+ORDER_STATUSES = [
+    Order.Status.DELIVERED, Order.Status.SHIPPED, Order.Status.CONFIRMED, Order.Status.PENDING, Order.Status.CANCELLED,
+]
+ORDER_WEIGHTS = [60, 10, 10, 10, 10]
+OFFER_STATUSES = [
+    Offer.Status.PENDING, Offer.Status.COUNTERED, Offer.Status.DECLINED, Offer.Status.ACCEPTED,
+    Offer.Status.EXPIRED, Offer.Status.WITHDRAWN,
+]
+OFFER_WEIGHTS = [45, 10, 20, 5, 15, 5]
+RATINGS = [1, 2, 3, 4, 5]
+RATING_WEIGHTS = [3, 4, 10, 33, 50]
+NOTIFICATIONS = [
+    (Notification.Type.OFFER, 'New offer', 'You received an offer on your listing'),
+    (Notification.Type.ORDER, 'Order update', 'Your order status changed'),
+    (Notification.Type.MESSAGE, 'New message', 'You have a new message'),
+    (Notification.Type.SYSTEM, 'Welcome', 'Thanks for joining'),
+]
+
+# Listing states in the plan
+LIVE, RESERVED, SOLD, AWAITING_APPROVAL, INACTIVE = range(5)
+
+
+# =============================================================================
+# SAMPLING
+# =============================================================================
+
+def _probabilities(weights):
+    weights = np.asarray(weights, dtype=np.float64)
+    return weights / weights.sum()
+
+
+def _draw(rng, cumulative, size):
+    """`size` weighted picks (with replacement) as indexes into the cumulative weights"""
+    picks = np.searchsorted(cumulative, rng.random(size) * cumulative[-1], side='right')
+    return np.minimum(picks, len(cumulative) - 1)
+
+
+def _sample(rng, weights, size):
+    """`size` distinct weighted picks (Efraimidis-Spirakis keys)"""
+    if size >= len(weights):
+        return np.arange(len(weights))
+    keys = rng.exponential(size=len(weights)) / weights
+    return np.sort(np.argpartition(keys, size)[:size])
+
+
+def _spread(rng, total, weights, cap=None):
+    """Split `total` rows over owners in proportion to their weights (at most `cap` each)"""
+    counts = rng.multinomial(total, _probabilities(weights)) if len(weights) else np.zeros(0, np.int64)
+    return counts if cap is None else np.minimum(counts, cap)
+
+
+def _distinct(rng, counts, cumulative, attempts=8):
+    """counts[i] distinct weighted picks for every owner i: (owner, pick) arrays, owner-major"""
+    owners = np.repeat(np.arange(len(counts)), counts)
+    picks = _draw(rng, cumulative, len(owners))
+    attempt = 0
+    while True:
+        order = np.lexsort((picks, owners))
+        owners, picks = owners[order], picks[order]
+        repeated = np.zeros(len(picks), dtype=bool)
+        repeated[1:] = (owners[1:] == owners[:-1]) & (picks[1:] == picks[:-1])
+        if not repeated.any():
+            return owners, picks
+        # The most popular picks keep colliding for busy owners; settle the rest uniformly
+        attempt += 1
+        if attempt < attempts:
+            picks[repeated] = _draw(rng, cumulative, int(repeated.sum()))
+        else:
+            picks[repeated] = rng.integers(0, len(cumulative), int(repeated.sum()))
+
+
+def _offsets(counts):
+    return np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+
+
+def _between(rng, since, until):
+    """A uniform moment in [since, until) for each pair (epoch seconds)"""
+    since = np.asarray(since, dtype=np.int64)
+    return since + (rng.random(len(since)) * np.maximum(1, until - since)).astype(np.int64)
+
+
+def _stamps(epochs):
+    """Epoch seconds -> 'YYYY-MM-DD HH:MM:SS' (UTC), the form Django stores"""
+    text = np.datetime_as_string(np.asarray(epochs, dtype='datetime64[s]'), unit='s')
+    return np.char.replace(text, 'T', ' ').tolist()
+
+
+def _where(flags, values):
+    return [value if flag else None for flag, value in zip(flags, values)]
+
+
+# =============================================================================
+# PLAN
+# =============================================================================
+
+class _Plan:
+    """What the shards share, decided up front from the seed; arrays are 0-based (id - 1)"""
+
+    ARRAYS = (
+        'joined', 'activity_cum', 'buyer_cum',
+        'product_seller', 'product_brand', 'product_created', 'product_price', 'product_state',
+        'product_views', 'popularity_cum', 'live', 'live_created',
+        'order_product', 'order_customer', 'order_status', 'order_placed',
+        'favorite_offsets', 'offer_offsets', 'conversation_offsets', 'message_counts', 'message_offsets',
+        'notification_offsets',
+    )
+
+    def __init__(self, scale, seed, now, password, arrays):
+        self.scale, self.seed, self.now, self.password = scale, seed, now, password
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+
+    @classmethod
+    def build(cls, scale, seed):
+        rng = np.random.default_rng([seed, 0])
+        now = int(time.time())
+        start = now - HISTORY_DAYS * DAY
+        users, sellers, products = scale.users, scale.sellers, scale.products
+        buyers = users - sellers
+
+        # Accounts: ids follow join time, so the sellers (users 1..sellers) joined first
+        joined = np.sort(rng.integers(start, now - DAY, users))
+        activity = rng.pareto(ACTIVITY_TAIL, users) + 1
+        store_size = rng.pareto(SELLER_TAIL, sellers) + 1
+
+        # Listings, numbered in the order they were listed
+        seller = _draw(rng, np.cumsum(store_size), products)
+        brand = _draw(rng, np.cumsum(1 / np.arange(1, len(BRANDS) + 1) ** BRAND_SKEW), products)
+        created = _between(rng, joined[seller], now - HOUR)
+        order = np.argsort(created, kind='stable')
+        seller, brand, created = seller[order], brand[order], created[order]
+        medians = np.array([BRAND_PRICES[name] for name, _ in BRANDS], dtype=np.float64)
+        price = np.maximum(5_000, np.round(medians[brand] * rng.lognormal(0, PRICE_SPREAD, products), -2))
+        popularity = rng.pareto(POPULARITY_TAIL, products) + 1
+
+        # Orders: popular listings sell; a pending order holds a reservation
+        ordered = _sample(rng, popularity, min(scale.orders, products))
+        status = rng.choice(len(ORDER_STATUSES), size=len(ordered), p=_probabilities(ORDER_WEIGHTS))
+        customer = sellers + _draw(rng, np.cumsum(activity[sellers:]), len(ordered))
+        since = np.maximum(created[ordered], joined[customer])
+        placed = _between(rng, since, now)
+        pending = status == ORDER_STATUSES.index(Order.Status.PENDING)
+        recent = now - rng.integers(HOUR, 20 * HOUR, len(ordered))
+        placed[pending] = np.maximum(since[pending], recent[pending])
+        by_time = np.argsort(placed, kind='stable')
+        ordered, status, customer, placed = ordered[by_time], status[by_time], customer[by_time], placed[by_time]
+
+        state = np.full(products, LIVE, dtype=np.int8)
+        roll = rng.random(products)
+        state[roll < 0.07] = INACTIVE
+        state[roll < 0.05] = AWAITING_APPROVAL
+        cancelled = status == ORDER_STATUSES.index(Order.Status.CANCELLED)
+        state[ordered[~cancelled]] = SOLD
+        state[ordered[pending]] = RESERVED
+        live = np.flatnonzero(state == LIVE)
+
+        # Rows per owner, and so each owner's id range
+        favorites = _spread(rng, scale.favorites, activity[sellers:], cap=products // 2)
+        offers = _spread(rng, scale.offers if buyers else 0, popularity[live], cap=buyers // 2)
+        conversations = _spread(rng, scale.conversations if buyers else 0, popularity[live], cap=buyers // 2)
+        threads = int(conversations.sum())
+        messages = 1 + _spread(rng, max(0, scale.messages - threads), rng.pareto(THREAD_TAIL, threads) + 1)
+        notifications = _spread(rng, scale.notifications, activity)
+
+        arrays = {
+            'joined': joined,
+            'activity_cum': np.cumsum(activity),
+            'buyer_cum': np.cumsum(activity[sellers:]),
+            'product_seller': seller.astype(np.int32),
+            'product_brand': brand.astype(np.int16),
+            'product_created': created,
+            'product_price': price.astype(np.int64),
+            'product_state': state,
+            'product_views': (popularity * 40).astype(np.int64) + rng.integers(0, 200, products),
+            'popularity_cum': np.cumsum(popularity),
+            'live': live,
+            'live_created': created[live],
+            'order_product': ordered,
+            'order_customer': customer,
+            'order_status': status.astype(np.int8),
+            'order_placed': placed,
+            'favorite_offsets': _offsets(favorites),
+            'offer_offsets': _offsets(offers),
+            'conversation_offsets': _offsets(conversations),
+            'message_counts': messages,
+            'message_offsets': _offsets(messages),
+            'notification_offsets': _offsets(notifications),
+        }
+        return cls(scale, seed, now, make_password(PASSWORD), arrays)
+
+    def shards(self, kind):
+        """(lo, hi) owner ranges of about SHARD_ROWS rows each"""
+        offsets = {
+            'favorites': self.favorite_offsets, 'offers': self.offer_offsets,
+            'conversations': self.message_offsets[self.conversation_offsets],
+            'notifications': self.notification_offsets,
+        }.get(kind)
+        owners = {
+            'users': self.scale.users, 'sellers': self.scale.sellers, 'products': self.scale.products,
+            'orders': len(self.order_product), 'favorites': self.scale.users - self.scale.sellers,
+            'offers': len(self.live), 'conversations': len(self.live), 'notifications': self.scale.users,
+        }[kind]
+        if offsets is None:
+            offsets = np.arange(owners + 1)
+        cuts = np.searchsorted(offsets, np.arange(SHARD_ROWS, offsets[-1], SHARD_ROWS))
+        bounds = sorted({0, owners, *cuts.tolist()})
+        return list(zip(bounds, bounds[1:]))
+
+    # --- handing the plan to worker processes ------------------------------------
+
+    def save(self, directory):
+        for name in self.ARRAYS:
+            np.save(os.path.join(directory, f'{name}.npy'), getattr(self, name))
+        with open(os.path.join(directory, 'plan.json'), 'w') as meta:
+            json.dump({
+                'scale': self.scale.__dict__, 'seed': self.seed, 'now': self.now, 'password': self.password,
+            }, meta)
+
+    @classmethod
+    def load(cls, directory):
+        with open(os.path.join(directory, 'plan.json')) as meta:
+            meta = json.load(meta)
+        arrays = {name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode='r') for name in cls.ARRAYS}
+        return cls(Scale(**meta['scale']), meta['seed'], meta['now'], meta['password'], arrays)
+
+
+# =============================================================================
+# SHARDS
+# =============================================================================
+# Each yields (model, {column: list of values or one value for every row}) in
+# foreign-key order. Ids come from the plan, so shards never overlap.
+
+def _users(plan, rng, lo, hi):
+    ids = np.arange(lo + 1, hi + 1)
+    names = [f'user{user_id:06d}' for user_id in ids.tolist()]
+    rows = {
+        'id': ids.tolist(), 'username': names, 'email': [f'{name}@example.com' for name in names],
+        'first_name': [f'User{user_id}' for user_id in ids.tolist()], 'password': plan.password,
+        'date_joined': _stamps(plan.joined[lo:hi]), 'is_staff': False,
+    }
+    yield get_user_model(), rows
+    if hi == plan.scale.users:
+        # The staff account comes after everyone
+        yield get_user_model(), {
+            'id': [hi + 1], 'username': ['staff'], 'email': ['staff@example.com'], 'password': plan.password,
+            'date_joined': _stamps(plan.joined[:1]), 'is_staff': True,
+        }
+
+
+def _sellers(plan, rng, lo, hi):
+    # Seller, store and user share an id
+    ids = np.arange(lo + 1, hi + 1).tolist()
+    joined = _stamps(plan.joined[lo:hi])
+    yield Seller, {
+        'id': ids, 'user_id': ids, 'cnic': [f'{i:05d}-{i:07d}-{i % 10}' for i in ids],
+        'verification_status': Seller.VerificationStatus.VERIFIED, 'verification_date': joined, 'created_at': joined,
+    }
+    yield Store, {
+        'id': ids, 'seller_id': ids, 'store_name': [f'Store {i}' for i in ids],
+        'store_slug': [f'store-{i}' for i in ids], 'store_bio': 'Pre-owned and new watches.',
+        'created_at': joined, 'updated_at': joined,
+    }
+
+
+def _products(plan, rng, lo, hi):
+    size = hi - lo
+    ids = np.arange(lo + 1, hi + 1).tolist()
+    sellers = (plan.product_seller[lo:hi] + 1).tolist()
+    state = np.asarray(plan.product_state[lo:hi])
+    created = _stamps(plan.product_created[lo:hi])
+    approved = state != AWAITING_APPROVAL
+    status = np.array([Product.Status.ACTIVE] * size, dtype=object)
+    status[state == RESERVED] = Product.Status.RESERVED
+    status[state == SOLD] = Product.Status.SOLD
+    status[state == INACTIVE] = Product.Status.INACTIVE
+    words = rng.integers(0, len(MODEL_WORDS), size).tolist()
+    numbers = rng.integers(100, 10_000, size).tolist()
+    yield Product, {
+        'id': ids, 'seller_id': sellers, 'store_id': sellers,
+        'brand_id': (plan.product_brand[lo:hi] + 1).tolist(),
+        'category_id': rng.integers(1, len(CATEGORIES) + 1, size).tolist(),
+        'model_name': [f'{MODEL_WORDS[word]} {number}' for word, number in zip(words, numbers)],
+        'reference_number': [f'REF-{i:07d}' for i in ids],
+        'year_manufactured': rng.integers(1970, 2026, size).tolist(),
+        'condition': np.array(Product.Condition.values, dtype=object)[rng.integers(0, len(Product.Condition.values), size)].tolist(),
+        'has_box': (rng.random(size) < 0.6).tolist(), 'has_papers': (rng.random(size) < 0.5).tolist(),
+        'price': plan.product_price[lo:hi].tolist(), 'status': status.tolist(),
+        'approval_status': np.where(approved, Product.ApprovalStatus.APPROVED, Product.ApprovalStatus.PENDING).tolist(),
+        'approved_at': _where(approved, created),
+        'reserved_until': _where(state == RESERVED, itertools.repeat(_stamps([plan.now + DAY])[0])),
+        'description': 'Well kept, keeps good time. Happy to answer questions.',
+        'case_material': np.array(MATERIALS, dtype=object)[rng.integers(0, len(MATERIALS), size)].tolist(),
+        'movement_type': np.array(MOVEMENTS, dtype=object)[rng.integers(0, len(MOVEMENTS), size)].tolist(),
+        'case_diameter_mm': [f'{mm / 10:.1f}' for mm in rng.integers(340, 461, size).tolist()],
+        'water_resistance': np.array(WATER_RESISTANCE, dtype=object)[rng.integers(0, len(WATER_RESISTANCE), size)].tolist(),
+        'view_count': plan.product_views[lo:hi].tolist(),
+        'created_at': created, 'updated_at': created,
+    }
+    # One primary photo per listing, sharing its id
+    yield Image, {
+        'id': ids, 'image_url': [f'/media/synthetic/{i % 50}.jpg' for i in ids], 'alt_text': 'Watch photo',
+        'uploaded_by_id': sellers, 'status': Image.Status.READY, 'width': 1200, 'height': 1200, 'created_at': created,
+    }
+    yield ProductImage, {'id': ids, 'product_id': ids, 'image_id': ids, 'is_primary': True}
+
+
+def _favorites(plan, rng, lo, hi):
+    sellers = plan.scale.sellers
+    offsets = plan.favorite_offsets[lo:hi + 1]
+    owners, products = _distinct(rng, np.diff(offsets), plan.popularity_cum)
+    customers = owners + lo + sellers
+    since = np.maximum(plan.product_created[products], plan.joined[customers])
+    yield Favorite, {
+        'id': np.arange(offsets[0] + 1, offsets[-1] + 1).tolist(), 'customer_id': (customers + 1).tolist(),
+        'product_id': (products + 1).tolist(), 'created_at': _stamps(_between(rng, since, plan.now)),
+    }
+
+
+def _orders(plan, rng, lo, hi):
+    size = hi - lo
+    ids = np.arange(lo + 1, hi + 1)
+    products = np.asarray(plan.order_product[lo:hi])
+    customers = np.asarray(plan.order_customer[lo:hi])
+    statuses = np.array(ORDER_STATUSES, dtype=object)[plan.order_status[lo:hi]]
+    placed = np.asarray(plan.order_placed[lo:hi])
+    at = _stamps(placed)
+    prices = plan.product_price[products].tolist()
+    stores = (plan.product_seller[products] + 1).tolist()
+    yield Order, {
+        'id': ids.tolist(), 'customer_id': (customers + 1).tolist(), 'store_id': stores,
+        'order_number': [f'SYN{i:09d}' for i in ids.tolist()], 'order_status': statuses.tolist(),
+        'status_changed_at': at, 'subtotal': prices, 'total_amount': prices, 'created_at': at, 'updated_at': at,
+    }
+    # Items, payments and reviews share their order's id
+    yield OrderItem, {
+        'id': ids.tolist(), 'order_id': ids.tolist(), 'product_id': (products + 1).tolist(),
+        'product_name': [f'Listing {p}' for p in (products + 1).tolist()], 'product_price': prices,
+        'subtotal': prices, 'created_at': at,
+    }
+    paid = statuses != Order.Status.CANCELLED
+    done = np.isin(statuses, [Order.Status.DELIVERED, Order.Status.SHIPPED])[paid]
+    yield Payment, {
+        'id': ids[paid].tolist(), 'order_id': ids[paid].tolist(), 'amount': np.array(prices)[paid].tolist(),
+        'payment_status': np.where(done, Payment.Status.COMPLETED, Payment.Status.PENDING).tolist(),
+        'transaction_id': [f'SYN-TXN-{i:09d}' for i in ids[paid].tolist()], 'payment_gateway': 'cash',
+        'payment_initiated_at': np.array(at, dtype=object)[paid].tolist(),
+        'payment_completed_at': _where(done, _stamps(placed[paid] + DAY)),
+        'created_at': np.array(at, dtype=object)[paid].tolist(), 'updated_at': np.array(at, dtype=object)[paid].tolist(),
+    }
+    reviewed = (statuses == Order.Status.DELIVERED) & (rng.random(size) < 0.5)
+    written = _stamps(np.minimum(placed[reviewed] + 7 * DAY, plan.now))
+    yield Review, {
+        'id': ids[reviewed].tolist(), 'order_id': ids[reviewed].tolist(),
+        'store_id': np.array(stores)[reviewed].tolist(), 'customer_id': (customers[reviewed] + 1).tolist(),
+        'product_id': (products[reviewed] + 1).tolist(),
+        'rating': rng.choice(RATINGS, size=int(reviewed.sum()), p=_probabilities(RATING_WEIGHTS)).tolist(),
+        'title': 'Great seller', 'description': 'Watch as described, fast delivery.',
+        'is_verified_purchase': True, 'created_at': written, 'updated_at': written,
+    }
+
+
+def _offers(plan, rng, lo, hi):
+    sellers = plan.scale.sellers
+    offsets = plan.offer_offsets[lo:hi + 1]
+    owners, buyers = _distinct(rng, np.diff(offsets), plan.buyer_cum)
+    products = np.asarray(plan.live[lo:hi])[owners]
+    buyers = buyers + sellers
+    size = len(owners)
+    statuses = np.array(OFFER_STATUSES, dtype=object)[rng.choice(len(OFFER_STATUSES), size=size, p=_probabilities(OFFER_WEIGHTS))]
+    # One open offer per listing and buyer: buyers are distinct per listing
+    is_open = np.isin(statuses, [Offer.Status.PENDING, Offer.Status.COUNTERED])
+    since = np.maximum(plan.product_created[products], plan.joined[buyers])
+    created = _between(rng, since, plan.now)
+    recent = plan.now - rng.integers(HOUR, 40 * HOUR, size)
+    created[is_open] = np.maximum(since[is_open], recent[is_open])
+    prices = plan.product_price[products]
+    countered = statuses == Offer.Status.COUNTERED
+    at = _stamps(created)
+    yield Offer, {
+        'id': np.arange(offsets[0] + 1, offsets[-1] + 1).tolist(), 'product_id': (products + 1).tolist(),
+        'store_id': (plan.product_seller[products] + 1).tolist(), 'buyer_id': (buyers + 1).tolist(),
+        'amount': np.round(prices * rng.uniform(0.7, 0.95, size)).astype(np.int64).tolist(),
+        'offer_status': statuses.tolist(),
+        'counter_amount': _where(countered, np.round(prices * 0.97).astype(np.int64).tolist()),
+        'expires_at': _stamps(created + 48 * HOUR),
+        'responded_at': _where(statuses != Offer.Status.PENDING, _stamps(created + 2 * HOUR)),
+        'created_at': at, 'updated_at': at,
+    }
+
+
+def _conversations(plan, rng, lo, hi):
+    sellers = plan.scale.sellers
+    offsets = plan.conversation_offsets[lo:hi + 1]
+    owners, customers = _distinct(rng, np.diff(offsets), plan.buyer_cum)
+    products = np.asarray(plan.live[lo:hi])[owners]
+    customers = customers + sellers
+    threads = np.arange(offsets[0], offsets[-1])
+    counts = np.asarray(plan.message_counts[offsets[0]:offsets[-1]])
+    started = _between(rng, np.maximum(plan.live_created[lo:hi][owners], plan.joined[customers]), plan.now - HOUR)
+
+    # Messages alternate customer/seller, minutes to hours apart
+    thread = np.repeat(np.arange(len(threads)), counts)
+    first = _offsets(counts)[:-1]
+    position = np.arange(len(thread)) - first[thread]
+    gaps = rng.integers(60, 10 * HOUR, len(thread))
+    elapsed = np.cumsum(gaps)
+    elapsed -= np.repeat(elapsed[first] - gaps[first], counts)
+    sent = np.minimum(started[thread] + elapsed, plan.now)
+    last = sent[first + counts - 1]
+    seller_ids = plan.product_seller[products] + 1
+    last_at = _stamps(last)
+
+    yield Conversation, {
+        'id': (threads + 1).tolist(), 'customer_id': (customers + 1).tolist(), 'seller_id': seller_ids.tolist(),
+        'product_id': (products + 1).tolist(), 'last_message_at': last_at,
+        'created_at': _stamps(started), 'updated_at': last_at,
+    }
+    is_read = (position < counts[thread] - 2) | (rng.random(len(thread)) < 0.5)
+    at = _stamps(sent)
+    yield Message, {
+        'id': np.arange(plan.message_offsets[offsets[0]] + 1, plan.message_offsets[offsets[-1]] + 1).tolist(),
+        'conversation_id': (threads[thread] + 1).tolist(),
+        'sender_id': np.where(position % 2 == 0, customers[thread] + 1, seller_ids[thread]).tolist(),
+        'message_text': np.array(PHRASES, dtype=object)[rng.integers(0, len(PHRASES), len(thread))].tolist(),
+        'is_read': is_read.tolist(), 'read_at': _where(is_read, at), 'created_at': at,
+    }
+
+
+def _notifications(plan, rng, lo, hi):
+    offsets = plan.notification_offsets[lo:hi + 1]
+    counts = np.diff(offsets)
+    users = np.repeat(np.arange(lo, hi), counts)
+    kinds = rng.integers(0, len(NOTIFICATIONS), len(users))
+    is_read = rng.random(len(users)) < 0.7
+    at = _stamps(_between(rng, plan.joined[users], plan.now))
+    yield Notification, {
+        'id': np.arange(offsets[0] + 1, offsets[-1] + 1).tolist(), 'user_id': (users + 1).tolist(),
+        'notification_type': [NOTIFICATIONS[k][0] for k in kinds.tolist()],
+        'title': [NOTIFICATIONS[k][1] for k in kinds.tolist()],
+        'message': [NOTIFICATIONS[k][2] for k in kinds.tolist()],
+        'is_read': is_read.tolist(), 'read_at': _where(is_read, at), 'created_at': at,
+    }
+    unread = np.bincount(users[~is_read] - lo, minlength=hi - lo)
+    holders = np.flatnonzero(unread)
+    yield NotificationCounter, {'user_id': (holders + lo + 1).tolist(), 'unread_count': unread[holders].tolist()}
+
+
+SHARDS = {
+    'users': _users, 'sellers': _sellers, 'products': _products, 'favorites': _favorites, 'orders': _orders,
+    'offers': _offers, 'conversations': _conversations, 'notifications': _notifications,
+}
+# Foreign-key order; the shards of one stage run side by side
+STAGES = [
+    ['users'],
+    ['sellers', 'notifications'],
+    ['products'],
+    ['favorites', 'orders', 'offers', 'conversations'],
+]
+
+
+# =============================================================================
+# WRITING
+# =============================================================================
+
+def _default(field):
+    value = field.get_default()
+    if value is None and not field.null:
+        raise ValueError(f'{field.model._meta.db_table}.{field.column} needs a value')
+    if isinstance(field, models.JSONField) and value is not None:
+        return json.dumps(value)
+    return str(value) if isinstance(value, Decimal) else value
+
+
+def _copy_text(value):
+    if value is None:
+        return '\\N'
+    if value is True or value is False:
+        return 't' if value else 'f'
+    if isinstance(value, str):
+        return value.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+    return str(value)
+
+
+def _write(model, values):
+    """Insert one shard's rows of `model`: {column: list | value}; returns the row count"""
+    fields = model._meta.concrete_fields
+    size = next((len(v) for v in values.values() if isinstance(v, list)), 0)
+    if not size:
+        return 0
+    unknown = set(values) - {field.column for field in fields}
+    if unknown:
+        raise ValueError(f'{model._meta.db_table} has no column(s) {sorted(unknown)}')
+    columns = [
+        values[field.column] if isinstance(values.get(field.column), list)
+        else itertools.repeat(values[field.column] if field.column in values else _default(field), size)
+        for field in fields
+    ]
+    rows = zip(*columns)
+    table = connection.ops.quote_name(model._meta.db_table)
+    names = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            sql = f'COPY {table} ({names}) FROM STDIN'
+            raw = cursor.cursor
+            if hasattr(raw, 'copy_expert'):         # psycopg2
+                while chunk := list(itertools.islice(rows, CHUNK)):
+                    buffer = io.StringIO(''.join('\t'.join(map(_copy_text, row)) + '\n' for row in chunk))
+                    raw.copy_expert(sql, buffer)
+            else:                                   # psycopg 3
+                with raw.copy(sql) as copy:
+                    for row in rows:
+                        copy.write_row(row)
+        else:
+            sql = f'INSERT INTO {table} ({names}) VALUES ({", ".join(["%s"] * len(fields))})'
+            while chunk := list(itertools.islice(rows, CHUNK)):
+                cursor.executemany(sql, chunk)
+    return size
+
+
+_plans = {}
+
+
+def _run_shard(kind, lo, hi, plan, database=None):
+    """Generate and insert one shard in one transaction; returns {table: rows}"""
+    if isinstance(plan, str):                       # in a worker: the plan's directory
+        plan = _plans.get(plan) or _plans.setdefault(plan, _Plan.load(plan))
+    if database and connection.settings_dict['NAME'] != database:
+        connection.close()
+        connection.settings_dict['NAME'] = database
+    if connection.vendor == 'sqlite' and not connection.in_atomic_block:     # can't change inside a transaction
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous = OFF')   # throwaway data: no fsync per transaction
+    rng = np.random.default_rng([plan.seed, list(SHARDS).index(kind) + 1, lo])
+    written = {}
+    with transaction.atomic():
+        for model, values in SHARDS[kind](plan, rng, lo, hi):
+            table = model._meta.db_table
+            written[table] = written.get(table, 0) + _write(model, values)
+    return written
+
+
+def _load(plan, workers, log):
+    """Run every stage's shards, in a process pool when workers > 1; returns {table: rows}"""
+    totals = {}
+    directory = pool = None
+    if workers > 1:
+        directory = tempfile.mkdtemp(prefix='synthetic-plan-')
+        plan.save(directory)
+        pool = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context('spawn'), initializer=django.setup,
+        )
+    try:
+        for stage in STAGES:
+            started = time.perf_counter()
+            jobs = [(kind, lo, hi) for kind in stage for lo, hi in plan.shards(kind)]
+            if pool:
+                database = connection.settings_dict['NAME']
+                futures = [pool.submit(_run_shard, kind, lo, hi, directory, database) for kind, lo, hi in jobs]
+                results = (future.result() for future in futures)
+            else:
+                results = (_run_shard(kind, lo, hi, plan) for kind, lo, hi in jobs)
+            written = {}
+            for result in results:
+                for table, rows in result.items():
+                    written[table] = written.get(table, 0) + rows
+            elapsed = time.perf_counter() - started
+            for table, rows in written.items():
+                totals[table] = totals.get(table, 0) + rows
+            if log:
+                rows = sum(written.values())
+                tables = ', '.join(f'{table} {count}' for table, count in written.items())
+                log(f'{rows} rows in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):,.0f}/s): {tables}')
+    finally:
+        if pool:
+            pool.shutdown(cancel_futures=True)
+        if directory:
+            shutil.rmtree(directory, ignore_errors=True)
+    return totals
+
+
+def _reset_sequences():
+    """Explicit primary keys don't advance sequences (PostgreSQL); move them past the seeded rows"""
+    seeded = [get_user_model(), *apps.get_app_config('pages').get_models()]
+    statements = connection.ops.sequence_reset_sql(no_style(), seeded)
+    if statements:
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+
+# =============================================================================
+# ENTRY POINT
+# =============================================================================
+
+def _favorite_counts():
+    favorites = Favorite.objects.filter(product=OuterRef('pk')).order_by().values('product').annotate(n=Count('pk'))
+    Product.objects.update(favorite_count=Coalesce(Subquery(favorites.values('n')), Value(0)))
+
+
+def derive(log=None, related=True):
+    """Rebuild the tables the signal handlers would have kept up to date"""
+    from . import catalog, inbox, order_states, ratings, recommend, rollups
+
+    steps = [
+        ('favorite counts', _favorite_counts),
+        ('catalog facets', catalog.rebuild_index),
+        ('inboxes', inbox.rebuild),
+        ('order status counts', order_states.rebuild_counts),
+        ('rating summaries', ratings.reconcile),
+        ('store rollups', rollups.rebuild),
+    ]
+    if related:
+        steps.append(('related watches', lambda: recommend.update(full=True)))
+    for name, step in steps:
+        started = time.perf_counter()
+        step()
+        if log:
+            log(f'rebuilt {name} ({time.perf_counter() - started:.1f}s)')
+
+
+def seed(scale='small', seed=0, log=None, workers=1, related=True):
+    """Fill an empty database with the `scale` dataset (a SCALES key or a Scale); returns {table: rows}"""
+    if isinstance(scale, str):
+        scale = SCALES[scale]
+    if not 0 < scale.sellers < scale.users:
+        raise ValueError('A scale needs sellers, and more users than sellers')
+    if Product.objects.exists() or get_user_model().objects.exists():
+        raise ValueError('synthetic.seed() needs an empty database')
+    if workers > 1 and connection.vendor == 'sqlite':
+        workers = 1             # one writer at a time
+        if log:
+            log('SQLite: loading in one process')
+
+    plan = _Plan.build(scale, seed)
+    Brand.objects.bulk_create([
+        Brand(id=brand_id, brand_name=name, country_of_origin=country) for brand_id, (name, country) in enumerate(BRANDS, 1)
+    ])
+    ProductCategory.objects.bulk_create([
+        ProductCategory(id=category_id, category_name=name) for category_id, name in enumerate(CATEGORIES, 1)
+    ])
+    written = _load(plan, workers, log)
+    _reset_sequences()
+    derive(log, related=related)
+    if connection.vendor in ('postgresql', 'sqlite'):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+    return written
@@ -0,0 +1,86 @@
+"""
+Template tags for cached page fragments with per-request holes.
+
+USAGE:
+    {% load fragment_cache %}
+    {% cachedfragment 'content' %}
+        ... expensive, shared markup ...
+        {% nocache %}{{ csrf_token }}{% endnocache %}
+    {% endcachedfragment %}
+
+`cachedfragment` looks for a `fragment_cache` object in the context (anything
+with get(name)/set(name, html), see pages.render_cache.WatchFragments). When it
+is absent the block renders normally, so templates work with or without it.
+
+`nocache` holes are re-rendered on every request with the top-level context;
+they must not depend on loop variables from inside the cached block.
+"""
+
+import hashlib
+
+from django import template
+from django.conf import settings
+
+
+register = template.Library()
+
+# Hole markers include a secret-derived token so listing text can't forge one
+_TOKEN = hashlib.sha256(f'fragment-hole:{settings.SECRET_KEY}'.encode()).hexdigest()[:16]
+_PASS_FLAG = '_fragment_cache_pass'
+
+
+def _marker(index):
+    return f'<!--hole:{_TOKEN}:{index}-->'
+
+
+class NoCacheNode(template.Node):
+    def __init__(self, nodelist):
+        self.nodelist = nodelist
+        self.index = None
+
+    def render(self, context):
+        if context.get(_PASS_FLAG) and self.index is not None:
+            return _marker(self.index)
+        return self.nodelist.render(context)
+
+
+class CachedFragmentNode(template.Node):
+    def __init__(self, name, nodelist):
+        self.name = name
+        self.nodelist = nodelist
+        self.holes = nodelist.get_nodes_by_type(NoCacheNode)
+        for index, hole in enumerate(self.holes):
+            hole.index = index
+
+    def render(self, context):
+        store = context.get('fragment_cache')
+        if store is None:
+            return self.nodelist.render(context)
+        name = self.name.resolve(context)
+        html = store.get(name)
+        if html is None:
+            with context.push({_PASS_FLAG: True}):
+                html = self.nodelist.render(context)
+            store.set(name, html)
+        for hole in self.holes:
+            marker = _marker(hole.index)
+            if marker in html:
+                html = html.replace(marker, hole.nodelist.render(context))
+        return html
+
+
+@register.tag
+def cachedfragment(parser, token):
+    bits = token.split_contents()
+    if len(bits) != 2:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' takes one argument: the fragment name")
+    nodelist = parser.parse(('endcachedfragment',))
+    parser.delete_first_token()
+    return CachedFragmentNode(parser.compile_filter(bits[1]), nodelist)
+
+
+@register.tag
+def nocache(parser, token):
+    nodelist = parser.parse(('endnocache',))
+    parser.delete_first_token()
+    return NoCacheNode(nodelist)
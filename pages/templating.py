@@ -0,0 +1,144 @@
+"""
+Template compilation: cached loader, bound includes, optional whitespace stripping.
+========================================================================================
+
+HOW IT WORKS:
+-------------
+settings.TEMPLATES uses `Loader` in place of Django's implicit cached
+loader, wrapping the same filesystem and app-directories loaders. Each
+template is read and parsed once per process. pages/warmup.py compiles all
+of them at startup, before gunicorn forks the workers. Once a template is
+parsed, the loader post-processes its node tree once:
+
+- Bound includes: an `{% include 'components/...' %}` with a literal name is
+  resolved at compile time, and the node is bound to the child's compiled
+  Template. Stock Django resolves the name again on every render: relative
+  path, select_template, the loader's cache key. Here it goes straight to
+  the child's render, which shows on pages that include a component per
+  row (watch_card in listing grids). Includes with a variable name, or
+  whose target is missing or broken, are left alone and fail at render
+  time as before. `with`/`only` behave as before, and the child keeps its
+  own origin for error pages. The bound child is the same cached Template
+  object, not a copy.
+- Whitespace (opt-in, settings.TEMPLATE_STRIP_WHITESPACE): in the literal
+  HTML of the template, every run of whitespace that contains a line break
+  becomes a single line break. Indentation is most of the bytes in these
+  templates. A line break is whitespace to HTML, CSS and inline JavaScript
+  (automatic semicolon insertion keeps working), so pages render the same.
+  `<pre>` and `<textarea>` contents are kept as written. This is done once
+  at compile time, not per response, and output of variables and tags is
+  not touched. Multi-line JavaScript template literals lose their
+  indentation, which is harmless for the HTML they build here.
+
+Render timing: bound includes report their render time to the current
+request profile (pages/profiling.py) under their template name. With
+ProfiledTemplates that makes a per-template breakdown of every page:
+    profiling.snapshot()['templates']
+    python manage.py bench_templates        # stock vs compiled vs stripped
+
+In DEBUG, Django's autoreloader empties this cache when a template file
+changes, as it does for the stock cached loader.
+
+USAGE (config/settings.py):
+    'loaders': [('pages.templating.Loader', [
+        'django.template.loaders.filesystem.Loader',
+        'django.template.loaders.app_directories.Loader',
+    ], TEMPLATE_STRIP_WHITESPACE)]
+"""
+
+import re
+import time
+
+from django.template import TemplateDoesNotExist, TemplateSyntaxError
+from django.template.base import TextNode
+from django.template.loader_tags import IncludeNode, construct_relative_path
+from django.template.loaders import cached
+
+from . import profiling
+
+
+# Whitespace runs containing a line break, and the tags whose content keeps its whitespace
+_BREAK = re.compile(r'[ \t\f\v\r]*\n\s*')
+_PRESERVE = re.compile(r'<(/?)(?:pre|textarea)\b', re.IGNORECASE)
+
+
+class Loader(cached.Loader):
+    """Django's cached loader, plus bound includes and optional whitespace stripping"""
+
+    def __init__(self, engine, loaders, strip_whitespace=False):
+        super().__init__(engine, loaders)
+        self.strip_whitespace = strip_whitespace
+
+    def get_template(self, template_name, skip=None):
+        template = super().get_template(template_name, skip)
+        if not getattr(template, '_compiled', False):
+            # Marked first: a template that includes itself finds it done
+            template._compiled = True
+            if self.strip_whitespace:
+                strip_whitespace(template.nodelist)
+            self.bind_includes(template)
+        return template
+
+    def bind_includes(self, template):
+        """Point every literal-name include at its compiled child; returns how many"""
+        bound = 0
+        for node in template.nodelist.get_nodes_by_type(IncludeNode):
+            expression = node.template
+            if isinstance(expression, BoundInclude) or expression.filters or not isinstance(expression.var, str):
+                continue
+            name = construct_relative_path(node.origin.template_name, str(expression.var))
+            try:
+                child = self.get_template(name)
+            except (TemplateDoesNotExist, TemplateSyntaxError):
+                continue
+            node.template = BoundInclude(name, child)
+            bound += 1
+        return bound
+
+
+class BoundInclude:
+    """Stands in for an include's template expression: resolves to itself, renders the child"""
+
+    def __init__(self, name, compiled):
+        self.name = name
+        self.compiled = compiled    # not `template`: IncludeNode would unwrap that
+
+    def __repr__(self):
+        return f'<BoundInclude: {self.name}>'
+
+    def resolve(self, context):
+        return self
+
+    def render(self, context):
+        profile = profiling.current()
+        if profile is None:
+            return self.compiled.render(context)
+        started = time.perf_counter()
+        try:
+            return self.compiled.render(context)
+        finally:
+            profile.record_template(self.name, time.perf_counter() - started)
+
+
+def _collapse(text, preserved):
+    """(text with line-break runs collapsed outside <pre>/<textarea>, still inside one after it)"""
+    pieces, position = [], 0
+    for match in _PRESERVE.finditer(text):
+        segment = text[position:match.start()]
+        pieces.append(segment if preserved else _BREAK.sub('\n', segment))
+        pieces.append(match.group(0))
+        preserved = not match.group(1)
+        position = match.end()
+    tail = text[position:]
+    pieces.append(tail if preserved else _BREAK.sub('\n', tail))
+    return ''.join(pieces), preserved
+
+
+def strip_whitespace(nodelist):
+    """Collapse indentation in a compiled template's literal text, in place; returns bytes saved"""
+    saved, preserved = 0, False
+    for node in nodelist.get_nodes_by_type(TextNode):
+        text, preserved = _collapse(node.s, preserved)
+        saved += len(node.s) - len(text)
+        node.s = text
+    return saved
@@ -1,3 +1,1433 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import re
+import runpy
+import subprocess
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, transaction
+from django.db.models import Avg, Count
+from django.http import HttpResponse, QueryDict
+from django.template import Context, Engine, engines
+from django.template.loader_tags import IncludeNode
+from django.test import RequestFactory, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import get_resolver, resolve, reverse
+from django.utils import timezone
+
+from . import (
+    audit, cart, catalog, checkout, counters, homepage, listing_import, moderation, notify, offers, order_states,
+    profiling, ratings, realtime, recommend, render_cache, search, synthetic, templating, warmup,
+)
+from .cart import CartItem
+from .management.commands import benchmark
+from .models import (
+    AdminActivityLog, Brand, FacetCount, Image, Notification, NotificationCounter, Offer, Order, OrderItem, Product,
+    RatingSummary, Review, SavedCart, Seller, Store,
+)
+from .pagination import CursorPaginator, InvalidCursor
+
+
+User = get_user_model()
+
+
+def make_store(name='Test Store'):
+    slug = name.lower().replace(' ', '-')
+    seller = Seller.objects.create(user=User.objects.create_user(f'{slug}-seller'), cnic=f'{slug[:13]}-1')
+    return Store.objects.create(seller=seller, store_name=name, store_slug=slug)
+
+
+def make_product(store, brand=None, **fields):
+    """An ACTIVE, APPROVED listing (catalog-visible) unless `fields` say otherwise"""
+    values = {
+        'model_name': 'Submariner', 'condition': Product.Condition.EXCELLENT, 'price': 100_000,
+        'status': Product.Status.ACTIVE, 'approval_status': Product.ApprovalStatus.APPROVED,
+        **fields,
+    }
+    return Product.objects.create(seller_id=store.seller_id, store=store, brand=brand, **values)
+
+
+class FlushBuffersMixin:
+    """Write buffered view counts, audit rows and carts (pages/writebehind.py) into this test's database"""
+
+    def tearDown(self):
+        counters.buffer.flush()
+        audit.buffer.flush()
+        cart.buffer.flush()
+        super().tearDown()
+
+
+# =============================================================================
+# CHECKOUT (pages/checkout.py)
+# =============================================================================
+
+class CheckoutConcurrencyTests(TransactionTestCase):
+    """
+    Real concurrent transactions: each thread checks out on its own
+    connection (on SQLite the test database is a file; config/settings.py).
+    """
+
+    THREADS = 6
+
+    def setUp(self):
+        self.store = make_store()
+        self.brand = Brand.objects.create(brand_name='Rolex')
+        self.buyers = [User.objects.create_user(f'buyer-{i}') for i in range(self.THREADS)]
+
+    def _race(self, jobs):
+        """Run `place_order(buyer, [product], key)` for every job at once; (outcome, placement) per job"""
+        barrier = threading.Barrier(len(jobs))
+
+        def run(job):
+            buyer, product, key = job
+            barrier.wait()
+            try:
+                return 'placed', checkout.place_order(buyer, [CartItem(product, 1, product.price, 'delivery')], key)
+            except checkout.CheckoutError as error:
+                return 'unavailable', error
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+            return list(pool.map(run, jobs))
+
+    def test_concurrent_buyers_never_share_a_watch(self):
+        product = make_product(self.store, self.brand)
+        results = self._race([(buyer, product, checkout.new_key()) for buyer in self.buyers])
+
+        outcomes = [outcome for outcome, _ in results]
+        self.assertEqual(outcomes.count('placed'), 1, results)
+        self.assertEqual(outcomes.count('unavailable'), self.THREADS - 1)
+        self.assertEqual(OrderItem.objects.filter(product=product).count(), 1)
+        self.assertEqual(Order.objects.count(), 1)
+        product.refresh_from_db()
+        self.assertEqual(product.status, Product.Status.RESERVED)
+
+    def test_replayed_key_places_one_order(self):
+        product = make_product(self.store, self.brand)
+        buyer, key = self.buyers[0], checkout.new_key()
+        results = self._race([(buyer, product, key)] * self.THREADS)
+
+        self.assertEqual([outcome for outcome, _ in results], ['placed'] * self.THREADS)
+        self.assertEqual(sum(placement.created for _, placement in results), 1)
+        order_ids = {tuple(order.pk for order in placement.orders) for _, placement in results}
+        self.assertEqual(len(order_ids), 1)
+        self.assertEqual(Order.objects.filter(customer=buyer, checkout_key=key).count(), 1)
+        self.assertEqual(OrderItem.objects.filter(product=product).count(), 1)
+
+
+class ReservationExpiryTests(TransactionTestCase):
+
+    def setUp(self):
+        self.store = make_store()
+        self.buyer = User.objects.create_user('buyer')
+
+    def _order(self, product, payment_method):
+        item = CartItem(product, 1, product.price, 'delivery')
+        return checkout.place_order(self.buyer, [item], checkout.new_key(), payment_method=payment_method).orders[0]
+
+    def test_release_expired_frees_unpaid_reservations(self):
+        wallet = make_product(self.store, model_name='Wallet')
+        cash = make_product(self.store, model_name='Cash')
+        wallet_order = self._order(wallet, 'jazzcash')
+        cash_order = self._order(cash, 'cash')
+
+        self.assertEqual(checkout.release_expired(), 0)
+        later = timezone.now() + checkout.PAYMENT_WINDOW['jazzcash'] + timedelta(minutes=1)
+        self.assertEqual(checkout.release_expired(now=later), 1)
+
+        wallet_order.refresh_from_db()
+        wallet.refresh_from_db()
+        self.assertEqual(wallet_order.order_status, Order.Status.CANCELLED)
+        self.assertEqual(wallet.status, Product.Status.ACTIVE)
+        self.assertIsNone(wallet.reserved_until)
+        # Cash holds have no deadline
+        cash_order.refresh_from_db()
+        cash.refresh_from_db()
+        self.assertEqual(cash_order.order_status, Order.Status.PENDING)
+        self.assertEqual(cash.status, Product.Status.RESERVED)
+
+        # The released watch can be bought again
+        self.assertEqual(self._order(wallet, 'bank').order_status, Order.Status.PENDING)
+
+    def test_paid_order_is_not_released(self):
+        product = make_product(self.store)
+        order = self._order(product, 'bank')
+        checkout.confirm_payment(order, transaction_id='FT1')
+
+        later = timezone.now() + checkout.PAYMENT_WINDOW['bank'] + timedelta(minutes=1)
+        self.assertEqual(checkout.release_expired(now=later), 0)
+        product.refresh_from_db()
+        self.assertEqual(product.status, Product.Status.SOLD)
+
+
+# =============================================================================
+# BENCHMARK ROUTES (pages/management/commands/benchmark.py)
+# =============================================================================
+
+class BenchmarkRoutesTests(FlushBuffersMixin, TransactionTestCase):
+    """Every named URL is benchmarked, and answers without a server error on a seeded dataset"""
+
+    def test_every_named_url_is_covered(self):
+        self.assertEqual(benchmark.uncovered_routes(), [])
+
+    def test_templates_reverse_only_routed_names(self):
+        # Nav entries for pages that don't exist yet are `href="#"` placeholders, not {% url %} tags
+        named = set(get_resolver().reverse_dict)
+        unrouted = set()
+        for path in Path(settings.BASE_DIR, 'templates').rglob('*.html'):
+            unrouted.update(set(re.findall(r"{% url '([\w:]+)'", path.read_text())) - named)
+        self.assertEqual(unrouted, set())
+
+    def test_every_route_answers(self):
+        synthetic.seed('tiny', seed=1)
+        fx = benchmark.Fixtures()
+        command = benchmark.Command()
+        results = command._client_pass(benchmark.ROUTES, fx, command._clients(fx), {'warmup': 0, 'repeat': 1})
+
+        self.assertEqual([key for key, row in results.items() if row['errors']], [])
+        self.assertEqual([key for key, row in results.items() if not row['requests']], [])
+
+    def test_baseline_comparison(self):
+        def report(queries, errors=0):
+            meta = dict.fromkeys(('scale', 'seed', 'database', 'interface', 'concurrency', 'profiling'), 'same')
+            row = {'queries': queries, 'p95': 5.0, 'errors': errors}
+            return {'meta': {**meta, 'recorded': 'now'}, 'client': {'home': row}}
+
+        with tempfile.TemporaryDirectory() as directory:
+            options = {'baseline': os.path.join(directory, 'baseline.json'), 'tolerance': 0.25, 'noise_ms': 2.0}
+            command = benchmark.Command(stdout=StringIO())
+            with self.assertRaisesMessage(CommandError, 'server errors'):
+                command._compare(report(3, errors=1), {**options, 'save_baseline': True})
+            command._compare(report(3), {**options, 'save_baseline': True})
+
+            command._compare(report(3), {**options, 'save_baseline': False})
+            with self.assertRaisesMessage(CommandError, '1 regression(s)'):
+                command._compare(report(4), {**options, 'save_baseline': False})
+
+
+# =============================================================================
+# FACET INDEX (pages/catalog.py)
+# =============================================================================
+
+class FacetIndexTests(TestCase):
+    """Signal-maintained facet counts match a full recount after every kind of change"""
+
+    def setUp(self):
+        self.store = make_store()
+        self.rolex = Brand.objects.create(brand_name='Rolex')
+        self.omega = Brand.objects.create(brand_name='Omega')
+
+    def counts(self):
+        return {
+            (facet, value): count
+            for facet, value, count in FacetCount.objects.filter(count__gt=0).values_list('facet', 'value', 'count')
+        }
+
+    def assertMatchesRecount(self):
+        maintained = self.counts()
+        catalog.rebuild_index()
+        self.assertEqual(maintained, self.counts())
+
+    def test_create(self):
+        make_product(self.store, self.rolex, price=60_000, movement_type='Automatic', has_box=True)
+        make_product(self.store, self.rolex, approval_status=Product.ApprovalStatus.PENDING)
+
+        counts = self.counts()
+        self.assertEqual(counts[('total', 'all')], 1)
+        self.assertEqual(counts[('brand', str(self.rolex.pk))], 1)
+        self.assertEqual(counts[('price', '50k-100k')], 1)
+        self.assertEqual(counts[('movement', 'automatic')], 1)
+        self.assertEqual(counts[('has_box', 'yes')], 1)
+        self.assertMatchesRecount()
+
+    def test_edit(self):
+        product = make_product(self.store, self.rolex, price=60_000)
+        product.brand, product.price = self.omega, 300_000
+        product.save()
+
+        counts = self.counts()
+        self.assertNotIn(('brand', str(self.rolex.pk)), counts)
+        self.assertNotIn(('price', '50k-100k'), counts)
+        self.assertEqual(counts[('brand', str(self.omega.pk))], 1)
+        self.assertEqual(counts[('price', '250k+')], 1)
+        self.assertMatchesRecount()
+
+    def test_leaving_and_entering_the_catalog(self):
+        product = make_product(self.store, self.rolex, approval_status=Product.ApprovalStatus.PENDING)
+        self.assertEqual(self.counts(), {})
+
+        product.approval_status = Product.ApprovalStatus.APPROVED
+        product.save()
+        self.assertEqual(self.counts()[('total', 'all')], 1)
+
+        catalog.bulk_update_products(Product.objects.filter(pk=product.pk), status=Product.Status.RESERVED)
+        self.assertEqual(self.counts(), {})
+        self.assertMatchesRecount()
+
+    def test_delete(self):
+        kept = make_product(self.store, self.rolex)
+        make_product(self.store, self.omega).delete()
+
+        counts = self.counts()
+        self.assertEqual(counts[('total', 'all')], 1)
+        self.assertNotIn(('brand', str(self.omega.pk)), counts)
+        kept.delete()
+        self.assertEqual(self.counts(), {})
+
+
+# =============================================================================
+# CURSOR PAGINATION (pages/pagination.py)
+# =============================================================================
+
+class CursorPaginationTests(FlushBuffersMixin, TestCase):
+
+    def setUp(self):
+        store = make_store()
+        self.products = [make_product(store, price=1_000 * (i + 1)) for i in range(7)]
+
+    def test_pages_are_stable_across_inserts(self):
+        paginator = CursorPaginator(Product.objects.all(), 'price_low', per_page=3)
+        first = paginator.page()
+        # New listings on both sides of the cursor: one before it, one after it
+        make_product(Store.objects.get(), price=500)
+        make_product(Store.objects.get(), price=3_500)
+        second = paginator.page(first.next_cursor)
+        third = paginator.page(second.next_cursor)
+
+        prices = [int(p.price) for page in (first, second, third) for p in page]
+        self.assertEqual(prices, [1_000, 2_000, 3_000, 3_500, 4_000, 5_000, 6_000, 7_000])
+        self.assertIsNone(third.next_cursor)
+        self.assertEqual(second.start_index(), 4)
+
+        back = paginator.page(second.previous_cursor)
+        self.assertEqual([int(p.price) for p in back], [1_000, 2_000, 3_000])
+
+    def test_ties_are_broken_by_primary_key(self):
+        Product.objects.update(price=10_000)
+        paginator = CursorPaginator(Product.objects.all(), 'price_low', per_page=2)
+        seen, token = [], None
+        while True:
+            page = paginator.page(token)
+            seen += [p.pk for p in page]
+            token = page.next_cursor
+            if token is None:
+                break
+        self.assertEqual(seen, sorted(p.pk for p in self.products))
+
+    def test_tampered_or_foreign_cursor_is_rejected(self):
+        paginator = CursorPaginator(Product.objects.all(), 'newest', per_page=3)
+        token = paginator.page().next_cursor
+        tampered = token[:-2] + ('AA' if not token.endswith('AA') else 'BB')
+        with self.assertRaises(InvalidCursor):
+            paginator.page(tampered)
+        with self.assertRaises(InvalidCursor):
+            CursorPaginator(Product.objects.all(), 'price_low', per_page=3).page(token)
+
+    def test_view_falls_back_to_the_first_page(self):
+        response = self.client.get(reverse('watch_list'), {'cursor': 'not-a-token'})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.context['page_obj'].has_previous())
+
+
+# =============================================================================
+# SEARCH INDEX (pages/search.py)
+# =============================================================================
+
+class SearchSyncTests(TestCase):
+    """
+    Changes made with on_commit hooks not run (TestCase) are what another
+    worker's changes look like to this process's index: only `sync()` sees them.
+    """
+
+    def setUp(self):
+        self.store = make_store()
+        self.omega = Brand.objects.create(brand_name='Omega')
+        self.speedmaster = make_product(self.store, self.omega, model_name='Speedmaster')
+        search._index = None
+        self.addCleanup(setattr, search, '_index', None)
+        search.get_index()
+
+    def ids(self, query):
+        search.sync(force=True)
+        return search.get_index().search(query)
+
+    def test_insert_and_update(self):
+        seamaster = make_product(self.store, self.omega, model_name='Seamaster')
+        self.assertEqual(self.ids('seamaster'), [seamaster.pk])
+
+        seamaster.model_name = 'Constellation'
+        seamaster.save()
+        self.assertEqual(self.ids('seamaster'), [])
+        self.assertEqual(self.ids('constellation'), [seamaster.pk])
+
+        # Leaving the catalog is an update too
+        Product.objects.filter(pk=self.speedmaster.pk).update(
+            status=Product.Status.SOLD, updated_at=timezone.now(),
+        )
+        self.assertEqual(self.ids('speedmaster'), [])
+
+    def test_delete_is_pruned(self):
+        self.assertEqual(self.ids('speedmaster'), [self.speedmaster.pk])
+        Product.objects.filter(pk=self.speedmaster.pk).delete()
+        self.assertEqual(self.ids('speedmaster'), [])
+        self.assertEqual(len(search.get_index()), 0)
+
+    def test_concurrent_sync_is_skipped(self):
+        make_product(self.store, self.omega, model_name='Seamaster')
+        search._last_sync_check = 0.0
+        with search._sync_lock:    # another request thread is syncing
+            with self.assertNumQueries(0):
+                search.sync()
+        self.assertEqual(self.ids('seamaster'), [Product.objects.get(model_name='Seamaster').pk])
+
+    def test_browse_takes_the_1000_most_popular_matches(self):
+        Product.objects.bulk_create([
+            Product(
+                seller_id=self.store.seller_id, store=self.store, brand=self.omega, model_name='Speedmaster',
+                condition=Product.Condition.EXCELLENT, price=5000, favorite_count=i + 1,
+                status=Product.Status.ACTIVE, approval_status=Product.ApprovalStatus.APPROVED,
+            )
+            for i in range(1000)
+        ])
+        search.sync(force=True)
+        ids = search.search_ids('speedmaster')
+        self.assertEqual(len(ids), 1000)
+        self.assertNotIn(self.speedmaster.pk, ids)    # favorite_count 0: the 1001st
+        self.assertEqual(catalog.browse(QueryDict('q=speedmaster')).paginator.count, 1000)
+
+
+# =============================================================================
+# BUFFERED COUNTERS (pages/counters.py)
+# =============================================================================
+
+class BufferedCounterTests(FlushBuffersMixin, TestCase):
+
+    def setUp(self):
+        cache.clear()
+        counters.buffer.flush()
+        self.store = make_store()
+        self.products = [make_product(self.store, view_count=10, favorite_count=1) for _ in range(3)]
+
+    def test_repeat_view_in_the_window_counts_once(self):
+        product = self.products[0]
+        url = reverse('watch_detail', args=[product.pk])
+        for _ in range(3):
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(counters.buffer.pending(product.pk, 'view_count'), 1)
+
+        self.client.force_login(User.objects.create_user('another-visitor'))
+        self.client.get(url)
+        self.assertEqual(counters.buffer.pending(product.pk, 'view_count'), 2)
+
+        counters.buffer.flush()
+        product.refresh_from_db()
+        self.assertEqual(product.view_count, 12)
+
+    def test_flush_is_one_case_update_per_column(self):
+        first, second, third = self.products
+        for _ in range(5):
+            counters.incr(first.pk, 'view_count')
+        counters.incr(second.pk, 'view_count', 2)
+        counters.incr(first.pk, 'favorite_count', 3)
+        counters.incr(third.pk, 'favorite_count', -4)    # never below 0
+
+        with CaptureQueriesContext(connection) as queries:
+            counters.buffer.flush()
+        updates = [q['sql'] for q in queries if q['sql'].startswith('UPDATE "products"')]
+        self.assertEqual(len(updates), 2)
+        self.assertTrue(all('CASE WHEN' in sql for sql in updates))
+
+        self.assertEqual(
+            list(Product.objects.order_by('pk').values_list('view_count', 'favorite_count')),
+            [(15, 4), (12, 1), (10, 0)],
+        )
+        self.assertEqual(counters.buffer.pending(first.pk, 'view_count'), 0)
+
+
+# =============================================================================
+# RATINGS (pages/ratings.py)
+# =============================================================================
+
+class RatingSummaryTests(TestCase):
+    """Summary rows kept by review signals match an Avg/Count recomputation"""
+
+    def setUp(self):
+        self.store = make_store()
+        self.product = make_product(self.store)
+        self.customers = [User.objects.create_user(f'reviewer-{i}') for i in range(4)]
+
+    def review(self, rating, customer=0, **fields):
+        return Review.objects.create(
+            store=self.store, product=self.product, customer=self.customers[customer], rating=rating, **fields,
+        )
+
+    def assertMatchesReviews(self):
+        approved = Review.objects.filter(is_approved=True)
+        for subject, subject_id, reviews in (
+            (ratings.STORE, self.store.pk, approved.filter(store=self.store)),
+            (ratings.PRODUCT, self.product.pk, approved.filter(product=self.product)),
+        ):
+            expected = reviews.aggregate(count=Count('id'), average=Avg('rating'))
+            summary = ratings.summary_for(subject, subject_id)
+            self.assertEqual(summary.review_count, expected['count'])
+            if expected['count']:
+                self.assertAlmostEqual(float(summary.rating_sum) / summary.review_count, float(expected['average']))
+            stars = [ratings.star_bucket(rating) for rating in reviews.values_list('rating', flat=True)]
+            self.assertEqual(
+                [getattr(summary, column) for column in ratings.STAR_COLUMNS], [stars.count(n) for n in range(1, 6)],
+            )
+        self.store.refresh_from_db()
+        self.assertEqual(self.store.total_reviews, approved.filter(store=self.store).count())
+
+    def test_create_edit_delete(self):
+        first = self.review(Decimal('5.0'))
+        self.review(Decimal('3.5'), customer=1)
+        hidden = self.review(Decimal('1.0'), customer=2, is_approved=False)
+        self.assertMatchesReviews()
+
+        first.rating = Decimal('2.0')
+        first.save()
+        hidden.is_approved = True
+        hidden.save()
+        self.assertMatchesReviews()
+
+        first.delete()
+        self.assertMatchesReviews()
+        self.assertEqual(self.store.store_rating, Decimal('2.25'))
+
+    def test_reconcile_command_repairs_drift(self):
+        self.review(Decimal('4.0'))
+        self.review(Decimal('2.0'), customer=1)
+        RatingSummary.objects.filter(subject=ratings.STORE).update(review_count=7, stars_4=0)
+        Store.objects.filter(pk=self.store.pk).update(total_reviews=9)
+
+        out = StringIO()
+        call_command('reconcile_ratings', '--dry-run', stdout=out)
+        self.assertIn('mismatches (not fixed)', out.getvalue())
+        self.assertEqual(ratings.summary_for(ratings.STORE, self.store.pk).review_count, 7)
+
+        call_command('reconcile_ratings', stdout=StringIO())
+        self.assertEqual(ratings.reconcile(fix=False), [])
+        self.assertMatchesReviews()
+
+
+# =============================================================================
+# NOTIFICATIONS (pages/notify.py)
+# =============================================================================
+
+class ReadWatermarkTests(FlushBuffersMixin, TestCase):
+    """"Mark all as read" covers what the user saw, never what arrived after"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('reader')
+
+    def send(self, title):
+        with self.captureOnCommitCallbacks(execute=True):
+            return notify.send(self.user, Notification.Type.ORDER, title, '')
+
+    def test_newer_notifications_stay_unread(self):
+        seen = [self.send('one'), self.send('two')]
+        arrived_later = self.send('three')
+        self.assertEqual(notify.unread_count(self.user.pk), 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            marked = notify.mark_all_read(self.user, read_up_to=seen[-1].pk)
+
+        self.assertEqual(marked, 2)
+        self.assertEqual(notify.unread_count(self.user.pk), 1)
+        self.assertEqual(list(Notification.objects.filter(user=self.user, is_read=False)), [arrived_later])
+        counter = NotificationCounter.objects.get(user=self.user)
+        self.assertEqual((counter.unread_count, counter.read_up_to), (1, seen[-1].pk))
+
+    def test_watermark_never_moves_back(self):
+        first, second = self.send('one'), self.send('two')
+        notify.mark_all_read(self.user, read_up_to=second.pk)
+        self.assertEqual(notify.mark_all_read(self.user, read_up_to=first.pk), 0)
+        self.assertEqual(NotificationCounter.objects.get(user=self.user).read_up_to, second.pk)
+
+    def test_mark_one_then_all_counts_each_once(self):
+        first, second = self.send('one'), self.send('two')
+        self.assertTrue(notify.mark_read(self.user, first.pk))
+        self.assertFalse(notify.mark_read(self.user, first.pk))
+        self.assertEqual(notify.mark_all_read(self.user), 1)
+        self.assertEqual(NotificationCounter.objects.get(user=self.user).unread_count, 0)
+
+    def test_endpoint(self):
+        first, second = self.send('one'), self.send('two')
+        self.client.force_login(self.user)
+        url = reverse('api_mark_all_notifications_read')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, {'read_up_to': first.pk}, content_type='application/json')
+        self.assertEqual(response.json()['marked'], 1)
+        self.assertEqual(notify.unread_count(self.user.pk), 1)
+        # Not an object: treated as {}, i.e. everything stored so far
+        self.assertEqual(self.client.post(url, '[1]', content_type='application/json').json()['marked'], 1)
+        self.assertEqual(self.client.post(url, {'read_up_to': 'x'}, content_type='application/json').status_code, 400)
+
+
+# =============================================================================
+# REAL-TIME PUSH (pages/realtime.py)
+# =============================================================================
+
+class RealtimeEventsTests(TransactionTestCase):
+    """
+    EventsApp (config/asgi.py) end to end. Transactional: the session is
+    looked up on another thread's connection.
+    """
+
+    def setUp(self):
+        realtime._broker = None
+        self.addCleanup(setattr, realtime, '_broker', None)
+        self.app = realtime.EventsApp(django_application=None)
+        self.member = User.objects.create_user('member')
+
+    def cookie_for(self, user):
+        self.client.force_login(user)
+        return f'{settings.SESSION_COOKIE_NAME}={self.client.cookies[settings.SESSION_COOKIE_NAME].value}'
+
+    def call(self, name, cookie='', query=''):
+        """(status, decoded JSON body) of one GET answered by EventsApp"""
+        sent = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {
+            'type': 'http', 'method': 'GET', 'path': reverse(name), 'query_string': query.encode(),
+            'headers': [(b'cookie', cookie.encode())] if cookie else [],
+        }
+        asyncio.run(self.app(scope, receive, send))
+        return sent[0]['status'], json.loads(b''.join(message.get('body', b'') for message in sent[1:]))
+
+    def test_streams_need_a_session_and_the_board_needs_staff(self):
+        self.assertEqual(self.call('events_stream')[0], 403)
+        self.assertEqual(self.call('events_poll', cookie='sessionid=forged')[0], 403)
+        self.assertEqual(self.call('events_board', cookie=self.cookie_for(self.member)), (403, {'error': 'Staff only'}))
+
+    def test_long_poll_catches_up_on_the_users_own_events(self):
+        cookie = self.cookie_for(self.member)
+        status, body = self.call('events_poll', cookie)
+        self.assertEqual((status, body['events']), (200, []))
+
+        system = Notification.Type.SYSTEM
+        other = User.objects.create_user('other')
+        Notification.objects.create(user=other, notification_type=system, title='Not yours', message='-')
+        Notification.objects.create(user=self.member, notification_type=system, title='Welcome', message='Hi')
+
+        status, body = self.call('events_poll', cookie, query=f'since={body["last_id"]}')
+        self.assertEqual(
+            [(event['type'], event['title'], event['unread_count']) for event in body['events']],
+            [('notification', 'Welcome', 1)],
+        )
+        # Nothing newer: the next poll waits out its timeout and answers empty from where it left off
+        channel = realtime.user_channel(self.member.pk)
+        self.assertEqual(asyncio.run(realtime.long_poll(channel, body['last_id'], timeout=0.05)), ([], body['last_id']))
+
+
+# =============================================================================
+# LISTING PHOTOS (pages/images.py, pages/imaging.py)
+# =============================================================================
+
+def png_upload(name, size, mode='RGBA'):
+    import PIL.Image
+
+    buffer = BytesIO()
+    PIL.Image.new(mode, size, (200, 30, 30, 128) if mode == 'RGBA' else (200, 30, 30)).save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+class ListingPhotoTests(FlushBuffersMixin, TestCase):
+    """Uploads through the create-listing form, rendered inline (IMAGE_WORKERS=0)"""
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name, IMAGE_WORKERS=0))
+        self.store = make_store()
+        self.client.force_login(self.store.seller.user)
+
+    def create(self, *photos):
+        data = {'model': 'Seamaster', 'condition': 'Excellent', 'price': '4500', 'images': list(photos)}
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse('watch_create'), data)
+
+    def test_upload_renders_variants_after_commit(self):
+        self.assertRedirects(
+            self.create(png_upload('front.png', (700, 400)), png_upload('back.png', (300, 200), mode='RGB')),
+            reverse('my_listings'), fetch_redirect_response=False,
+        )
+        product = Product.objects.get()
+        links = list(product.product_images.select_related('image').order_by('display_order'))
+        self.assertEqual([link.is_primary for link in links], [True, False])
+
+        front = links[0].image
+        self.assertEqual((front.status, front.width, front.height), (Image.Status.READY, 700, 400))
+        self.assertEqual(
+            [(variant['format'], variant['width']) for variant in front.variants],
+            [('jpeg', 320), ('jpeg', 640), ('jpeg', 700), ('webp', 320), ('webp', 640), ('webp', 700)],
+        )
+        for variant in front.variants:
+            self.assertTrue(default_storage.exists(variant['url'].removeprefix(settings.MEDIA_URL)))
+        self.assertTrue(front.thumbnail_url.endswith('-320.jpg'))
+        self.assertTrue(front.placeholder.startswith('data:image/jpeg;base64,'))
+        # Smaller than every requested width: rendered at its own width only
+        self.assertEqual({variant['width'] for variant in links[1].image.variants}, {300})
+
+    def test_non_image_is_rejected_before_anything_is_stored(self):
+        fake = SimpleUploadedFile('watch.png', b'not a png', content_type='image/png')
+        response = self.create(png_upload('ok.png', (400, 300)), fake)
+        self.assertContains(response, 'watch.png is not an image we can read.')
+        self.assertFalse(Product.objects.exists())
+        self.assertFalse(Image.objects.exists())
+
+
+# =============================================================================
+# BULK LISTING IMPORT (pages/listing_import.py)
+# =============================================================================
+
+class ListingImportTests(TestCase):
+
+    CSV = (
+        'model,brand,condition,price,year,case_diameter\n'
+        'Submariner,Rolex,Excellent,950000,2019,41\n'
+        'Speedmaster,Omega,brand new,0,,\n'
+        'Datejust,Rolex,Good,"1,200,000",1799,36\n'
+        'Daytona,Rolex,mint,,2020,1000\n'
+        'Seamaster,Omega,like-new,420000,2021,42.5\n'
+    )
+
+    def setUp(self):
+        self.store = make_store()
+        Brand.objects.create(brand_name='Rolex')
+        Brand.objects.create(brand_name='Omega')
+
+    def run_import(self, text, name='dealer.csv', **options):
+        upload = SimpleUploadedFile(name, text.encode())
+        return listing_import.import_listings(upload, self.store, chunk_size=2, **options)
+
+    def test_valid_rows_import_in_chunks_and_bad_rows_are_reported(self):
+        with CaptureQueriesContext(connection) as queries:
+            result = self.run_import(self.CSV)
+        self.assertEqual((result.rows, result.imported, result.rejected), (5, 3, 2))
+        self.assertEqual(
+            sorted((error.line, error.column) for error in result.errors),
+            [(4, 'year_manufactured'), (5, 'case_diameter_mm'), (5, 'condition'), (5, 'price')],
+        )
+        inserts = [q['sql'] for q in queries if q['sql'].startswith('INSERT INTO "products"')]
+        self.assertEqual(len(inserts), 2)    # 3 valid rows in chunks of 2
+
+        imported = {p.model_name: p for p in Product.objects.select_related('brand')}
+        self.assertEqual(sorted(imported), ['Seamaster', 'Speedmaster', 'Submariner'])
+        self.assertEqual(imported['Submariner'].brand.brand_name, 'Rolex')
+        self.assertEqual(imported['Speedmaster'].condition, Product.Condition.NEW)
+        self.assertEqual(imported['Seamaster'].case_diameter_mm, Decimal('42.5'))
+        self.assertEqual({p.approval_status for p in imported.values()}, {Product.ApprovalStatus.PENDING})
+
+    def test_dry_run_and_jsonl(self):
+        result = self.run_import(self.CSV, dry_run=True)
+        self.assertEqual((result.valid, result.imported), (3, 0))
+        self.assertFalse(Product.objects.exists())
+
+        jsonl = '{"model_name": "Aquanaut", "condition": "excellent", "price": "3500000"}\n{not json\n'
+        result = self.run_import(jsonl, name='dealer.jsonl')
+        self.assertEqual((result.imported, result.rejected, result.errors[0].line), (1, 1, 2))
+        self.assertTrue(Product.objects.filter(model_name='Aquanaut').exists())
+
+
+# =============================================================================
+# MODERATION QUEUE (pages/moderation.py)
+# =============================================================================
+
+class ModerationClaimRaceTests(TransactionTestCase):
+    """Admins claiming at the same moment, each on their own connection"""
+
+    def test_concurrent_claims_get_disjoint_batches(self):
+        store = make_store()
+        for i in range(30):
+            make_product(store, model_name=f'Pending {i}', approval_status=Product.ApprovalStatus.PENDING)
+        admins = [User.objects.create_user(f'moderator-{i}', is_staff=True) for i in range(4)]
+        barrier = threading.Barrier(len(admins))
+
+        def run(admin):
+            barrier.wait()
+            try:
+                return admin.pk, {product.pk for product in moderation.claim(admin, limit=10)}
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(len(admins)) as pool:
+            batches = dict(pool.map(run, admins))
+
+        claimed = [pk for batch in batches.values() for pk in batch]
+        self.assertEqual(len(claimed), len(set(claimed)))
+        self.assertTrue(claimed)
+        # What each admin was handed is what the database says they lease
+        for admin_id, batch in batches.items():
+            leased = Product.objects.filter(review_claimed_by=admin_id).values_list('pk', flat=True)
+            self.assertEqual(set(leased), batch)
+
+
+class ModerationLeaseTests(TestCase):
+
+    def setUp(self):
+        store = make_store()
+        self.listings = [
+            make_product(store, model_name=f'Pending {i}', approval_status=Product.ApprovalStatus.PENDING)
+            for i in range(5)
+        ]
+        self.alice = User.objects.create_user('alice', is_staff=True)
+        self.bob = User.objects.create_user('bob', is_staff=True)
+
+    def ids(self, products):
+        return sorted(product.pk for product in products)
+
+    def test_expired_lease_returns_to_the_queue(self):
+        self.assertEqual(self.ids(moderation.claim(self.alice, limit=3)), self.ids(self.listings[:3]))
+        self.assertEqual(self.ids(moderation.claim(self.bob, limit=3)), self.ids(self.listings[3:]))
+
+        Product.objects.filter(review_claimed_by=self.alice).update(
+            review_claimed_until=timezone.now() - timedelta(seconds=1),
+        )
+        self.assertEqual(self.ids(moderation.claim(self.bob, limit=5)), self.ids(self.listings))
+
+    def test_moderate_skips_other_leases_and_bulk_writes_the_audit(self):
+        moderation.claim(self.alice, limit=2)
+        ids = [product.pk for product in self.listings]
+
+        with CaptureQueriesContext(connection) as queries:
+            done = moderation.moderate(self.bob, ids, 'approve')
+        self.assertEqual(sorted(done), ids[2:])
+        inserts = [q['sql'] for q in queries if q['sql'].startswith('INSERT INTO "admin_activity_log"')]
+        self.assertEqual(len(inserts), 1)
+
+        logged = AdminActivityLog.objects.filter(admin=self.bob, action_type='listing_approve')
+        self.assertEqual(sorted(logged.values_list('entity_id', flat=True)), ids[2:])
+        statuses = dict(Product.objects.values_list('pk', 'approval_status'))
+        self.assertEqual(
+            [statuses[pk] for pk in ids],
+            [Product.ApprovalStatus.PENDING] * 2 + [Product.ApprovalStatus.APPROVED] * 3,
+        )
+
+        # The leaseholder can still decide theirs; decided listings are not moderated twice
+        self.assertEqual(sorted(moderation.moderate(self.alice, ids, 'reject', reason='Blurry photos')), ids[:2])
+
+
+# =============================================================================
+# ADMIN ACTIVITY LOG (pages/audit.py)
+# =============================================================================
+
+class AuditLogTests(FlushBuffersMixin, TestCase):
+
+    def setUp(self):
+        audit.buffer.flush()
+        self.staff = User.objects.create_user('auditor', is_staff=True)
+
+    def test_audited_records_staff_requests_only(self):
+        view = audit.audited('view_probe')(lambda request: HttpResponse('ok'))
+        factory = RequestFactory()
+        for user in (AnonymousUser(), User.objects.create_user('shopper'), self.staff):
+            request = factory.get('/panel/probe/?page=2', HTTP_USER_AGENT='probe-agent')
+            request.user = user
+            self.assertEqual(view(request).content, b'ok')
+        self.assertEqual(audit.buffer.pending(), 1)
+
+        with self.assertNumQueries(1):
+            audit.buffer.flush()
+        row = AdminActivityLog.objects.get()
+        self.assertEqual(
+            (row.admin, row.action_type, row.entity_type, row.description, row.user_agent),
+            (self.staff, 'view_probe', 'page', '/panel/probe/?page=2', 'probe-agent'),
+        )
+
+    def test_entries_clamp_the_range(self):
+        now = timezone.now()
+        for days in (200, 100, 50, 1):
+            AdminActivityLog.objects.create(
+                admin=self.staff, action_type=f'{days}_days_ago', created_at=now - timedelta(days=days),
+            )
+        self.assertEqual(
+            list(audit.entries(now - timedelta(days=365), now).values_list('action_type', flat=True)),
+            ['1_days_ago', '50_days_ago'],
+        )
+        # The cap counts back from `end`
+        rows = audit.entries(now - timedelta(days=365), now - timedelta(days=60))
+        self.assertEqual(list(rows.values_list('action_type', flat=True)), ['100_days_ago'])
+
+
+# =============================================================================
+# ORDER STATE MACHINE (pages/order_states.py)
+# =============================================================================
+
+class OrderTransitionTests(FlushBuffersMixin, TestCase):
+
+    def setUp(self):
+        self.store = make_store()
+        self.buyer = User.objects.create_user('buyer')
+        self.staff = User.objects.create_user('staff', is_staff=True)
+        self.order = Order.objects.create(
+            customer=self.buyer, store=self.store, order_number=checkout.order_number(),
+            subtotal=100_000, total_amount=100_000,
+        )
+
+    def test_invalid_moves_change_nothing(self):
+        counts = order_states.status_counts()
+        for status in (Order.Status.SHIPPED, Order.Status.DELIVERED, Order.Status.REFUNDED, Order.Status.PENDING):
+            with self.subTest(status=status), self.assertRaises(order_states.InvalidTransition):
+                order_states.transition(self.order, status, by=self.staff)
+
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.order_status, Order.Status.PENDING)
+        self.assertEqual(self.order.status_changes.count(), 1)    # placed
+        self.assertEqual(order_states.status_counts(), counts)
+
+    def test_plain_save_is_checked_too(self):
+        self.order.order_status = Order.Status.DELIVERED
+        with self.assertRaises(order_states.InvalidTransition):
+            self.order.save()
+
+    def test_terminal_status(self):
+        order_states.transition(self.order, Order.Status.CANCELLED)
+        order_states.transition(self.order, Order.Status.REFUNDED)
+        self.assertEqual(order_states.allowed(Order.objects.get(pk=self.order.pk)), [])
+        with self.assertRaises(order_states.InvalidTransition):
+            order_states.transition(self.order, Order.Status.CONFIRMED)
+
+    def test_endpoint(self):
+        url = reverse('api_order_transition', args=[self.order.pk])
+        self.client.force_login(self.buyer)
+        self.assertEqual(self.client.post(url, {'status': 'CONFIRMED'}, content_type='application/json').status_code, 403)
+
+        self.client.force_login(self.staff)
+        self.assertEqual(self.client.post(url, {'status': 'SHIPPED'}, content_type='application/json').status_code, 409)
+        self.assertEqual(self.client.post(url, {'status': 'nonsense'}, content_type='application/json').status_code, 409)
+        self.assertEqual(self.client.post(url, '["CONFIRMED"]', content_type='application/json').status_code, 400)
+        self.assertEqual(self.client.post(url, '{bad', content_type='application/json').status_code, 400)
+
+        response = self.client.post(url, {'status': 'CONFIRMED', 'note': 'paid'}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['allowed'], ['CANCELLED', 'PROCESSING', 'SHIPPED'])
+        change = self.order.status_changes.latest('pk')
+        self.assertEqual((change.from_status, change.to_status, change.changed_by, change.note),
+                         ('PENDING', 'CONFIRMED', self.staff, 'paid'))
+
+
+# =============================================================================
+# CART (pages/cart.py)
+# =============================================================================
+
+class CartPersistenceTests(FlushBuffersMixin, TestCase):
+    """Logged-in cart changes write the cache; SavedCart is written behind, in batches"""
+
+    def setUp(self):
+        cache.clear()
+        cart.buffer.flush()
+        store = make_store()
+        self.products = [make_product(store, model_name=f'Watch {i}') for i in range(3)]
+        self.user = User.objects.create_user('shopper')
+        self.client.force_login(self.user)
+
+    def add(self, product):
+        self.client.post(reverse('add_to_cart', args=[product.pk]), {'transaction_method': 'delivery'})
+
+    def test_changes_are_saved_in_one_batch(self):
+        for product in self.products:
+            self.add(product)
+        self.client.post(reverse('cart_remove', args=[self.products[0].pk]))
+        self.assertFalse(SavedCart.objects.exists())
+
+        with self.assertNumQueries(3):  # SAVEPOINT/RELEASE around one upsert
+            self.assertEqual(cart.buffer.flush(), 1)
+        saved = SavedCart.objects.get(user=self.user).lines
+        self.assertEqual([line[cart.PRODUCT] for line in saved], [p.pk for p in self.products[1:]])
+
+    def test_cart_survives_a_cache_flush(self):
+        self.add(self.products[0])
+        cache.clear()    # before the buffer was written: this worker's copy is used
+        self.assertEqual(self.client.get(reverse('cart')).context['cart_count'], 1)
+
+        cart.buffer.flush()
+        cache.clear()    # after: the SavedCart row is used
+        self.assertEqual(self.client.get(reverse('cart')).context['cart_count'], 1)
+
+    def test_emptied_cart_deletes_the_row(self):
+        self.add(self.products[0])
+        cart.buffer.flush()
+        self.client.post(reverse('cart_clear'))
+        cart.buffer.flush()
+        self.assertFalse(SavedCart.objects.exists())
+
+
+# =============================================================================
+# OFFERS (pages/offers.py)
+# =============================================================================
+
+class OfferBookTests(FlushBuffersMixin, TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.store = make_store()
+        self.seller = self.store.seller.user
+        self.product = make_product(self.store, price=300_000)
+        self.alice = User.objects.create_user('alice')
+        self.bob = User.objects.create_user('bob')
+
+    def offer(self, buyer, amount):
+        with self.captureOnCommitCallbacks(execute=True):
+            return offers.make_offer(buyer, self.product, Decimal(amount))
+
+    def act(self, action, offer, user, *args):
+        with self.captureOnCommitCallbacks(execute=True):
+            return action(offer, user, *args)
+
+    def test_book_is_best_first(self):
+        self.offer(self.alice, 250_000)
+        self.offer(self.bob, 270_000)
+        book = offers.book(self.product.pk)
+        self.assertEqual(book.best, Decimal(270_000))
+        self.assertEqual([entry.buyer_id for entry in book.open], [self.bob.pk, self.alice.pk])
+
+    def test_accept_places_the_order_and_declines_the_rest(self):
+        low = self.offer(self.alice, 250_000)
+        high = self.offer(self.bob, 270_000)
+        accepted = self.act(offers.accept, high, self.seller)
+
+        self.assertEqual(accepted.offer_status, Offer.Status.ACCEPTED)
+        item = OrderItem.objects.get(order=accepted.order)
+        self.assertEqual((item.product_id, item.product_price), (self.product.pk, Decimal(270_000)))
+        self.assertEqual(accepted.order.customer, self.bob)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.status, Product.Status.RESERVED)
+        low.refresh_from_db()
+        self.assertEqual(low.offer_status, Offer.Status.DECLINED)
+        self.assertEqual(len(offers.book(self.product.pk)), 0)
+
+        with self.assertRaises(offers.OfferError):
+            offers.accept(low, self.seller)
+
+    def test_only_the_right_side_can_accept(self):
+        offer = self.offer(self.alice, 250_000)
+        with self.assertRaises(offers.OfferError):
+            offers.accept(offer, self.alice)
+        with self.assertRaises(offers.OfferError):
+            offers.accept(offer, self.bob)
+
+    def test_decline(self):
+        offer = self.offer(self.alice, 250_000)
+        self.offer(self.bob, 240_000)
+        self.act(offers.decline, offer, self.seller)
+
+        offer.refresh_from_db()
+        self.assertEqual(offer.offer_status, Offer.Status.DECLINED)
+        self.assertEqual([entry.buyer_id for entry in offers.book(self.product.pk).open], [self.bob.pk])
+        self.assertTrue(Notification.objects.filter(user=self.alice, title='Offer declined').exists())
+        with self.assertRaises(offers.OfferError):
+            offers.accept(offer, self.seller)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.status, Product.Status.ACTIVE)
+
+    def test_counter_then_accept_at_the_counter_price(self):
+        offer = self.offer(self.alice, 250_000)
+        self.act(offers.counter, offer, self.seller, Decimal(280_000))
+        with self.assertRaises(offers.OfferError):
+            offers.accept(offer, self.seller)    # the buyer's turn now
+        accepted = self.act(offers.accept, offer, self.alice)
+        self.assertEqual(OrderItem.objects.get(order=accepted.order).product_price, Decimal(280_000))
+
+    def test_endpoint(self):
+        offer = self.offer(self.alice, 250_000)
+        self.client.force_login(self.alice)
+        response = self.client.post(reverse('offer_action', args=[offer.pk, 'accept']))
+        self.assertEqual(response.status_code, 409)
+
+        self.client.force_login(self.seller)
+        response = self.client.post(reverse('offer_action', args=[offer.pk, 'decline']))
+        self.assertEqual(response.status_code, 200)
+        offer.refresh_from_db()
+        self.assertEqual(offer.offer_status, Offer.Status.DECLINED)
+
+
+# =============================================================================
+# RELATED WATCHES (pages/recommend.py)
+# =============================================================================
+
+class RecommenderTests(FlushBuffersMixin, TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.store = make_store()
+        self.rolex = Brand.objects.create(brand_name='Rolex')
+        omega = Brand.objects.create(brand_name='Omega')
+        self.submariner = self.watch(self.rolex, 'Submariner', 100_000)
+        self.gmt = self.watch(self.rolex, 'GMT-Master', 105_000)
+        self.explorer = self.watch(self.rolex, 'Explorer', 90_000, case_diameter_mm=36, movement_type='Manual')
+        self.quartz = self.watch(omega, 'Constellation', 5_000, case_diameter_mm=28, movement_type='Quartz')
+
+    def watch(self, brand, model_name, price, **fields):
+        values = {'movement_type': 'Automatic', 'case_diameter_mm': 40, **fields}
+        return make_product(self.store, brand, model_name=model_name, price=price, **values)
+
+    def test_full_update_ranks_the_closest_first_and_skips_sold(self):
+        update = recommend.update(full=True)
+        self.assertEqual(update.scored, 4)
+        self.assertEqual([p.pk for p in recommend.related(self.submariner)], [self.gmt.pk, self.explorer.pk])
+        Product.objects.filter(pk=self.gmt.pk).update(status=Product.Status.SOLD)
+        self.assertEqual([p.pk for p in recommend.related(self.submariner)], [self.explorer.pk])
+
+    def test_new_listing_joins_existing_lists_and_drops_their_pages(self):
+        recommend.update(full=True)
+        self.client.get(reverse('watch_detail', args=[self.submariner.pk]))
+        page_key = render_cache._meta_key(self.submariner.pk)
+        self.assertIsNotNone(cache.get(page_key))
+
+        twin = self.watch(self.rolex, 'Submariner Date', 100_000)
+        with self.captureOnCommitCallbacks(execute=True):
+            update = recommend.update()
+        # Only listings without a list: the newcomer, and the Omega, which nothing scores MIN_SCORE against
+        self.assertEqual(update.scored, 2)
+        self.assertEqual(recommend.related(self.submariner)[0], twin)
+        self.assertEqual(recommend.related(twin)[0], self.submariner)
+        self.assertIsNone(cache.get(page_key))
+
+
+# =============================================================================
+# HOMEPAGE (pages/homepage.py)
+# =============================================================================
+
+class HomepageConditionalTests(FlushBuffersMixin, TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.store = make_store()
+        self.product = make_product(self.store)
+
+    def get(self, **headers):
+        return self.client.get(reverse('home'), headers=headers)
+
+    def visit(self):
+        """A visitor who already has their CSRF cookie (it is part of the ETag)"""
+        self.get()
+        return self.get()
+
+    def test_repeat_visit_gets_304(self):
+        first = self.visit()
+        self.assertEqual(first.status_code, 200)
+        self.assertTrue(first.has_header('ETag'))
+
+        again = self.get(if_none_match=first['ETag'])
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again.content, b'')
+
+    def test_no_last_modified(self):
+        # The page varies per visitor, which a date can't express: revalidation is by ETag only
+        response = self.visit()
+        self.assertFalse(response.has_header('Last-Modified'))
+        self.assertEqual(self.get(if_modified_since='Fri, 01 Jan 2100 00:00:00 GMT').status_code, 200)
+
+    def test_anonymous_homepage_costs_no_queries(self):
+        self.visit()    # builds the sections
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get().status_code, 200)
+
+    def test_new_sections_change_the_etag(self):
+        etag = self.visit()['ETag']
+        make_product(self.store, model_name='Speedmaster', favorite_count=10)
+        homepage.build()    # what the refresh after the catalog change does
+        response = self.get(if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertContains(response, 'Speedmaster')
+
+    def test_cart_badge_changes_the_etag(self):
+        etag = self.visit()['ETag']
+        # Followed, so the "added to your cart" message is shown (pending messages disable 304s)
+        self.client.post(
+            reverse('add_to_cart', args=[self.product.pk]), {'transaction_method': 'delivery'}, follow=True,
+        )
+        response = self.get(if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_logged_in_pages_are_always_rendered(self):
+        etag = self.visit()['ETag']
+        self.client.force_login(User.objects.create_user('member'))
+        response = self.get(if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('ETag'))
+
+
+# =============================================================================
+# PROFILING (pages/profiling.py)
+# =============================================================================
+
+@override_settings(PROFILING=True, PROFILING_ENFORCE_BUDGETS=False)
+class QueryBudgetTests(TestCase):
+    """ProfilingMiddleware around a stand-in view for the `cart` route (budget 4)"""
+
+    def setUp(self):
+        profiling.reset()
+        self.addCleanup(profiling.reset)
+
+    def run_view(self, queries, status=200):
+        def view(request):
+            for pk in range(queries):
+                User.objects.filter(pk=pk).exists()
+            return HttpResponse(status=status)
+
+        request = RequestFactory().get(reverse('cart'))
+        request.resolver_match = resolve(reverse('cart'))
+        return profiling.ProfilingMiddleware(view)(request)
+
+    def cart_stats(self):
+        return profiling.snapshot()['routes']['cart']
+
+    def test_over_budget_is_counted_and_logged(self):
+        self.run_view(profiling.QUERY_BUDGETS['cart'])
+        with self.assertLogs('pages.profiling', 'WARNING') as logs:
+            self.run_view(profiling.QUERY_BUDGETS['cart'] + 1)
+        self.assertIn('cart ran 5 queries (budget 4)', logs.output[0])
+        self.run_view(10, status=500)    # error pages are not the view's budget
+
+        stats = self.cart_stats()
+        self.assertEqual((stats['requests'], stats['queries']['over_budget']), (3, 1))
+        self.assertEqual(stats['queries']['max'], 10)
+        # Every request above ran one statement shape 3+ times: an N+1 suspect in each
+        self.assertEqual([row['requests'] for row in stats['repeated_statements']], [3])
+
+    @override_settings(PROFILING_ENFORCE_BUDGETS=True)
+    def test_enforced_budget_raises(self):
+        self.run_view(profiling.QUERY_BUDGETS['cart'])
+        with self.assertRaisesMessage(profiling.QueryBudgetExceeded, 'cart ran 5 queries'):
+            self.run_view(profiling.QUERY_BUDGETS['cart'] + 1)
+
+
+# =============================================================================
+# SYNTHETIC DATA (pages/synthetic.py)
+# =============================================================================
+
+class SyntheticDataTests(TestCase):
+    """The same seed gives the same rows, and the derived tables agree with them"""
+
+    SCALE = synthetic.Scale(
+        users=40, sellers=6, products=60, favorites=150, offers=40, orders=25,
+        conversations=20, messages=80, notifications=100,
+    )
+
+    def listings(self, seed):
+        """Seed, read the listings back, and roll the whole dataset away"""
+        class Rollback(Exception):
+            pass
+
+        try:
+            with transaction.atomic():
+                written = synthetic.seed(self.SCALE, seed=seed, related=False)
+                rows = list(Product.objects.order_by('pk').values_list('seller', 'brand', 'model_name', 'price'))
+                raise Rollback
+        except Rollback:
+            return written, rows
+
+    def test_seed_is_deterministic(self):
+        written, rows = self.listings(seed=3)
+        self.assertEqual(self.listings(seed=3), (written, rows))
+        self.assertNotEqual(self.listings(seed=4)[1], rows)
+        self.assertEqual(len(rows), self.SCALE.products)
+        self.assertFalse(Product.objects.exists())
+
+    def test_derived_tables_match_the_rows(self):
+        synthetic.seed(self.SCALE, seed=3, related=False)
+        self.assertEqual(User.objects.count(), self.SCALE.users + 1)     # the staff account comes after everyone
+        self.assertEqual(Order.objects.count(), self.SCALE.orders)
+        self.assertTrue(User.objects.filter(username='staff', is_staff=True).exists())
+
+        favorites = Product.objects.annotate(n=Count('favorites')).values_list('favorite_count', 'n')
+        self.assertTrue(all(stored == counted for stored, counted in favorites))
+        facets = set(FacetCount.objects.filter(count__gt=0).values_list('facet', 'value', 'count'))
+        catalog.rebuild_index()
+        self.assertEqual(set(FacetCount.objects.filter(count__gt=0).values_list('facet', 'value', 'count')), facets)
+
+        # Sequences moved past the seeded ids
+        self.assertGreater(make_product(make_store(), Brand.objects.first()).pk, self.SCALE.products)
+
+        with self.assertRaisesMessage(ValueError, 'needs an empty database'):
+            synthetic.seed(self.SCALE, seed=3)
+
+
+# =============================================================================
+# STARTUP WARM-UP (pages/warmup.py, config/gunicorn.conf.py)
+# =============================================================================
+
+class WarmupTests(TransactionTestCase):
+    """run() leaves the process with nothing left to build on its first requests"""
+
+    def setUp(self):
+        make_product(make_store(), Brand.objects.create(brand_name='Omega'), model_name='Speedmaster')
+        cache.clear()
+        search._index = None
+        self.addCleanup(setattr, search, '_index', None)
+        self.loader = engines['django'].engine.template_loaders[0]
+        self.loader.reset()
+
+    def test_run_warms_every_step(self):
+        timings = warmup.run()
+
+        self.assertEqual(list(timings), [name for name, _step in warmup.STEPS])
+        self.assertEqual(search._index.search('speedmaster'), list(Product.objects.values_list('pk', flat=True)))
+        self.assertIsNotNone(cache.get(homepage.ENTRY_KEY))
+        self.assertTrue(self.loader.get_template_cache['base.html']._compiled)
+
+    def test_failed_step_is_skipped(self):
+        def broken():
+            raise OSError('disk full')
+
+        with mock.patch.object(warmup, 'STEPS', [('broken', broken), *warmup.STEPS]):
+            with self.assertLogs('pages.warmup', 'WARNING') as logs:
+                timings = warmup.run(steps=['broken', 'search'])
+        self.assertEqual(list(timings), ['broken', 'search'])
+        self.assertIn('Warm-up step broken failed', logs.output[0])
+        self.assertIsNotNone(search._index)
+
+    def test_pillow_and_numpy_load_on_first_use(self):
+        script = (
+            'import json, sys\n'
+            'import config.wsgi\n'
+            'from pages import warmup\n'
+            "warmup.run(steps=['urls', 'templates'])\n"
+            "print(json.dumps(sorted({'PIL', 'numpy'} & set(sys.modules))))\n"
+        )
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': 'config.settings'}
+        result = subprocess.run(
+            [sys.executable, '-c', script], cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, check=True,
+        )
+        self.assertEqual(json.loads(result.stdout.splitlines()[-1]), [])
+
+
+class GunicornWorkersTests(TestCase):
+    """Worker defaults follow whether the cache and the push broker are shared between processes"""
+
+    def workers(self, **environ):
+        with mock.patch.dict(os.environ, environ):
+            if 'WEB_CONCURRENCY' not in environ:
+                os.environ.pop('WEB_CONCURRENCY', None)
+            return runpy.run_path(str(Path(settings.BASE_DIR, 'config', 'gunicorn.conf.py')))['workers']
+
+    def test_per_process_cache_means_one_worker(self):
+        self.assertEqual(self.workers(SERVER_INTERFACE='wsgi'), 1)
+        self.assertEqual(self.workers(SERVER_INTERFACE='asgi'), 1)
+        with self.assertRaisesMessage(RuntimeError, 'WEB_CONCURRENCY=1'):
+            self.workers(SERVER_INTERFACE='wsgi', WEB_CONCURRENCY='3')
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache'}})
+    def test_shared_cache(self):
+        self.assertEqual(self.workers(SERVER_INTERFACE='wsgi'), 4)
+        self.assertEqual(self.workers(SERVER_INTERFACE='asgi'), 1)       # the in-process broker still pins ASGI
+        with override_settings(REALTIME_BROKER='brokers.RedisPubSub'):      # only the name is read
+            self.assertEqual(self.workers(SERVER_INTERFACE='asgi'), 2)
+
+
+# =============================================================================
+# TEMPLATE LOADER (pages/templating.py)
+# =============================================================================
+
+class TemplateLoaderTests(TestCase):
+    """Bound includes and whitespace stripping render what stock Django renders"""
+
+    SOURCES = {
+        'page.html': (
+            '<ul>\n    {% for name in names %}\n        {% include "row.html" %}\n    {% endfor %}\n</ul>\n'
+            '<pre>\n    kept\n</pre>\n{% include partial %}'
+        ),
+        'row.html': '<li>\n    {{ name }}\n</li>',
+        'other.html': 'other',
+    }
+    CONTEXT = {'names': ['Omega', 'Tudor'], 'partial': 'other.html'}
+
+    def engine(self, compiled=True, strip=False):
+        locmem = ('django.template.loaders.locmem.Loader', self.SOURCES)
+        loader = ('pages.templating.Loader', [locmem], strip) if compiled else locmem
+        return Engine(loaders=[loader])
+
+    def render(self, engine):
+        return engine.get_template('page.html').render(Context(self.CONTEXT))
+
+    def test_literal_includes_are_bound(self):
+        engine = self.engine()
+        page = engine.get_template('page.html')
+        includes = page.nodelist.get_nodes_by_type(IncludeNode)
+        self.assertIsInstance(includes[0].template, templating.BoundInclude)
+        self.assertIs(includes[0].template.compiled, engine.get_template('row.html'))
+        self.assertNotIsInstance(includes[1].template, templating.BoundInclude)     # a variable name
+        self.assertEqual(self.render(engine), self.render(self.engine(compiled=False)))
+
+    def test_whitespace_is_collapsed_outside_pre(self):
+        stock = self.render(self.engine(compiled=False))
+        stripped = self.render(self.engine(strip=True))
+        # Each text node between tags collapses on its own
+        self.assertEqual(
+            stripped, '<ul>\n\n<li>\nOmega\n</li>\n\n<li>\nTudor\n</li>\n\n</ul>\n<pre>\n    kept\n</pre>\nother',
+        )
+        self.assertEqual(stripped.split(), stock.split())
+        self.assertEqual(self.render(self.engine()), stock)
+
+    def test_includes_are_timed_per_template(self):
+        engine = self.engine()
+        with profiling.collect() as profile:
+            self.render(engine)
+        self.assertEqual(profile.templates['row.html'][0], 2)
+        self.assertNotIn('other.html', profile.templates)       # only bound includes report
+
+
+# =============================================================================
+# CREATE-LISTING FORM (pages/views.py watch_create)
+# =============================================================================
+
+class CreateListingFormTests(FlushBuffersMixin, TestCase):
+
+    def setUp(self):
+        self.store = make_store()
+        self.client.force_login(self.store.seller.user)
+
+    def post(self, **fields):
+        data = {'model': 'Seamaster', 'condition': 'Excellent', 'price': '4500', **fields}
+        return self.client.post(reverse('watch_create'), data)
+
+    def test_valid_listing_is_saved(self):
+        response = self.post(price='0', year='1968', case_diameter='41.50')
+        self.assertRedirects(response, reverse('my_listings'), fetch_redirect_response=False)
+        product = Product.objects.get(model_name='Seamaster')
+        self.assertEqual(product.price, 0)
+        self.assertEqual((product.year_manufactured, product.case_diameter_mm), (1968, Decimal('41.50')))
+
+    def test_out_of_range_values_are_form_errors(self):
+        next_year = timezone.localdate().year + 1
+        for fields in (
+            {'case_diameter': '1000'}, {'case_diameter': '41.555'}, {'case_diameter': 'wide'},
+            {'year': '1799'}, {'year': str(next_year + 1)}, {'year': '19x8'},
+            {'price': '10000000000'}, {'price': '-1'},
+        ):
+            with self.subTest(**fields):
+                response = self.post(**fields)
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, 'Please fill in the model')
+        self.assertFalse(Product.objects.exists())
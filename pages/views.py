@@ -1,21 +1,40 @@
-from django.shortcuts import render, redirect
-from django.http import JsonResponse
+import json
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.shortcuts import get_object_or_404, render, redirect
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.contrib import messages
+from django.contrib.auth import get_user_model, login as auth_login
+from django.contrib.auth.forms import AuthenticationForm
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.http import require_POST
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Count, Q
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
+from django.utils.http import url_has_allowed_host_and_scheme
+from django.views.decorators.http import condition, require_POST
+
+from . import (
+    audit, cart, catalog, checkout, counters, homepage, images, inbox, listing_import, moderation, notify, offers,
+    order_states, profiling, ratings, realtime, recommend, render_cache, rollups, search,
+)
+from .models import (
+    Brand, Conversation, Favorite, Message, Notification, Offer, Order, Product, ProductCategory, Seller, Store,
+)
+from .pagination import paginate, query_params_without_cursor
 
 
 # =============================================================================
 # HOME / PUBLIC PAGES
 # =============================================================================
 
+@condition(etag_func=homepage.etag)
 def home(request):
-    """Homepage view"""
-    context = {
-        'featured_watches': [],  # Add your queryset here
-        'new_arrivals': [],
-        'popular_brands': [],
-    }
-    return render(request, 'home.html', context)
+    """Homepage (sections pre-rendered by pages/homepage.py; no queries for anonymous visitors)"""
+    return render(request, 'home.html', {'home_sections': homepage.sections(request)})
 
 
 def about(request):
@@ -61,10 +80,21 @@ def newsletter_signup(request):
 # =============================================================================
 
 def login_view(request):
-    """Login page"""
+    """Login page; the visitor's cart is merged into the account's cart"""
     if request.user.is_authenticated:
         return redirect('home')
-    return render(request, 'registration/login.html')
+    next_url = request.POST.get('next') or request.GET.get('next', '')
+    form = AuthenticationForm(request, data=request.POST or None)
+    if request.method == 'POST' and form.is_valid():
+        anonymous_cart = cart.session_lines(request)
+        auth_login(request, form.get_user())
+        cart.merge_after_login(request, anonymous_cart)
+        if not request.POST.get('remember'):
+            request.session.set_expiry(0)  # ends with the browser session
+        if not url_has_allowed_host_and_scheme(next_url, {request.get_host()}, request.is_secure()):
+            next_url = reverse('home')
+        return redirect(next_url)
+    return render(request, 'registration/login.html', {'form': form, 'next': next_url})
 
 
 def signup_view(request):
@@ -107,27 +137,156 @@ def password_reset_complete(request):
 
 def watch_list(request):
     """Browse watches page"""
+    result = catalog.browse(request.GET, request.GET.get('cursor'))
+    query, facets = result.query, result.facets
     context = {
-        'watches': [],  # Add your queryset with pagination
-        'brands': [],
-        'conditions': ['New', 'Like New', 'Excellent', 'Good', 'Fair'],
-        'movements': ['Automatic', 'Quartz', 'Manual'],
+        'watches': result.page.object_list,
+        'page_obj': result.page,
+        'paginator': result.paginator,
+        'is_paginated': result.page.has_other_pages(),
+        'query_params': query_params_without_cursor(request),
+        'brands': facets.get('brand', []),
+        'categories': facets.get('category', []),
+        'conditions': facets.get('condition', []),
+        'movements': facets.get('movement', []),
+        'price_buckets': facets.get('price', []),
+        'box_count': sum(fv.count for fv in facets.get('has_box', [])),
+        'papers_count': sum(fv.count for fv in facets.get('has_papers', [])),
+        'selected_brands': query.brands,
+        'selected_categories': query.categories,
+        'selected_condition': query.condition,
+        'search_query': query.q,
+        'price_min': query.price_min if query.price_min is not None else '',
+        'price_max': query.price_max if query.price_max is not None else '',
+        'sort': query.sort,
+        'sort_label': catalog.SORT_OPTIONS[query.sort][0],
+        'active_filters': query.active_filters(),
     }
     return render(request, 'watches/watch_list.html', context)
 
 
 def watch_detail(request, watch_id):
-    """Watch detail page"""
+    """Watch detail page (body cached per listing version, see pages/render_cache.py)"""
+    meta = render_cache.watch_meta(watch_id)
+    user = request.user
+    can_manage_offers = user.is_authenticated and (user.pk == meta['owner'] or user.is_staff) if meta else False
+    if meta is None or not (meta['live'] or can_manage_offers):
+        raise Http404('Watch not found')
+    counters.record_view(request, watch_id)
+
+    def load_watch():
+        return (
+            Product.objects.select_related('brand', 'category', 'seller__store')
+            .prefetch_related('images', images.primary_image_prefetch())
+            .get(pk=watch_id)
+        )
+
+    def load_related():
+        related = recommend.related(watch)
+        render_cache.record_related(watch_id, [p.pk for p in related])
+        return related
+
+    # Only evaluated when a fragment has to be rendered
+    watch = SimpleLazyObject(load_watch)
     context = {
-        'watch': None,  # Get watch by ID
-        'related_watches': [],
+        'watch': watch,
+        'related_watches': SimpleLazyObject(load_related),
+        'rating_summary': SimpleLazyObject(lambda: ratings.summary_for(ratings.PRODUCT, watch_id)),
+        # Read inside {% nocache %}, so a new offer shows without a new listing version
+        'offer_book': SimpleLazyObject(lambda: offers.book(watch_id)),
+        'fragment_cache': render_cache.WatchFragments(watch_id, meta['v']),
+        'can_manage_offers': can_manage_offers,
+        'is_wishlisted': user.is_authenticated and Favorite.objects.filter(customer=user, product_id=watch_id).exists(),
     }
     return render(request, 'watches/watch_detail.html', context)
 
 
+LISTING_CONDITIONS = {
+    'Brand New': Product.Condition.NEW,
+    'Like New': Product.Condition.LIKE_NEW,
+    'Excellent': Product.Condition.EXCELLENT,
+    'Good': Product.Condition.GOOD,
+    'Fair': Product.Condition.FAIR,
+}
+
+
+def _form_decimal(raw, maximum=listing_import.MAX_PRICE):
+    """Decimal in 0..maximum with at most 2 places (the column's shape), or None"""
+    try:
+        value = Decimal(raw)
+    except (InvalidOperation, TypeError, ValueError):
+        return None
+    if not value.is_finite() or not 0 <= value <= maximum or value != value.quantize(Decimal('0.01')):
+        return None
+    return value
+
+
+def _listing_from_post(data, store):
+    """Unsaved Product from the create-listing form, or None when a required field is missing or invalid"""
+    model_name = data.get('model', '').strip()
+    condition = LISTING_CONDITIONS.get(data.get('condition'))
+    raw_price = data.get('price')
+    if not (model_name and condition) or raw_price in (None, ''):
+        return None
+    # 0 is a valid price (e.g. a giveaway); only out-of-range or non-numeric input is rejected
+    price = _form_decimal(raw_price)
+    if price is None:
+        return None
+    # Optional, but out-of-range values are rejected rather than left for the database to refuse
+    raw_diameter = data.get('case_diameter', '').strip()
+    case_diameter = _form_decimal(raw_diameter, listing_import.MAX_CASE_DIAMETER) if raw_diameter else None
+    if raw_diameter and case_diameter is None:
+        return None
+    year = data.get('year', '').strip()
+    if year and not (year.isdigit() and listing_import.MIN_YEAR <= int(year) <= timezone.localdate().year + 1):
+        return None
+    return Product(
+        seller=store.seller,
+        store=store,
+        brand=Brand.objects.filter(brand_name__iexact=data.get('brand', '').strip()).first(),
+        category=ProductCategory.objects.filter(category_name__iexact=data.get('category', '').strip()).first(),
+        model_name=model_name[:255],
+        reference_number=data.get('model_number', '').strip()[:100],
+        year_manufactured=int(year) if year else None,
+        condition=condition,
+        price=price,
+        description=data.get('description', '').strip(),
+        case_material=data.get('case_material', '')[:100],
+        movement_type=data.get('movement_type', '')[:100],
+        case_diameter_mm=case_diameter,
+        water_resistance=data.get('water_resistance', '')[:50],
+        status=Product.Status.ACTIVE,
+    )
+
+
 @login_required
 def watch_create(request):
-    """Create new watch listing"""
+    """Create new watch listing; photos go through the upload pipeline (pages/images.py)"""
+    store = Store.objects.filter(seller__user=request.user).select_related('seller').first()
+    if store is None:
+        return redirect('seller_register')
+    if request.method == 'POST':
+        product = _listing_from_post(request.POST, store)
+        photos = request.FILES.getlist('images')
+        if product is None:
+            messages.error(
+                request,
+                'Please fill in the model, condition and a valid price. '
+                f'The year must be between {listing_import.MIN_YEAR} and next year, '
+                f'the case diameter at most {listing_import.MAX_CASE_DIAMETER} mm.',
+            )
+        elif len(photos) > images.MAX_IMAGES_PER_LISTING:
+            messages.error(request, f'Please upload at most {images.MAX_IMAGES_PER_LISTING} photos.')
+        else:
+            try:
+                with transaction.atomic():
+                    product.save()
+                    images.add_to_listing(product, photos, request.user)
+            except images.ImageRejected as exc:
+                messages.error(request, str(exc))
+            else:
+                messages.success(request, 'Your listing has been submitted for review.')
+                return redirect('my_listings')
     context = {
         'brands': [],
         'conditions': ['New', 'Like New', 'Excellent', 'Good', 'Fair'],
@@ -136,6 +295,30 @@ def watch_create(request):
     return render(request, 'watches/watch_create.html', context)
 
 
+@login_required
+def watch_import(request):
+    """Bulk listing import from a CSV/JSONL upload (pages/listing_import.py)"""
+    store = Store.objects.filter(seller__user=request.user).select_related('seller').first()
+    if store is None:
+        return redirect('seller_register')
+    result = None
+    if request.method == 'POST':
+        upload = request.FILES.get('file')
+        if upload is None:
+            messages.error(request, 'Choose a CSV or JSONL file to import.')
+        else:
+            try:
+                result = listing_import.import_listings(upload, store, dry_run=bool(request.POST.get('dry_run')))
+            except listing_import.ImportFormatError as exc:
+                messages.error(request, str(exc))
+    context = {
+        'store': store,
+        'result': result,
+        'max_reported_errors': listing_import.MAX_REPORTED_ERRORS,
+    }
+    return render(request, 'watches/watch_import.html', context)
+
+
 @login_required
 def watch_edit(request, watch_id):
     """Edit watch listing"""
@@ -151,40 +334,200 @@ def watch_edit(request, watch_id):
 
 @login_required
 def my_offers(request):
-    """Buyer's offers page"""
-    context = {
-        'offers': [],  # Add your queryset
-    }
-    return render(request, 'offers/my_offers.html', context)
+    """Buyer's offers page (pages/offers.py)"""
+    return render(request, 'offers/my_offers.html', offers.buyer_offers(request.user))
 
 
 @login_required
 def offers_received(request):
-    """Seller's received offers page"""
+    """Seller's received offers page, keyset-paginated"""
+    store = getattr(getattr(request.user, 'seller', None), 'store', None)
+    if store is None:
+        return redirect('seller_register')
+    status = request.GET.get('status', '')
+    listing = request.GET.get('listing', '')
+    sort = request.GET.get('sort', 'newest')
+    received = offers.store_offers(store, status, int(listing) if listing.isdigit() else None)
+    page = paginate(request, received, offers.STORE_SORTS.get(sort, 'newest'), per_page=20)
+    counts = offers.store_counts(store)
     context = {
-        'offers': [],  # Add your queryset
+        'offers': page.object_list,
+        'page_obj': page,
+        'query_params': query_params_without_cursor(request),
+        'user_watches': offers.live_offer_products(store),
+        'pending_count': counts['pending'],
+        'accepted_count': counts['accepted'],
+        'declined_count': counts['declined'],
+        'countered_count': counts['countered'],
     }
     return render(request, 'offers/offer_list.html', context)
 
 
+@login_required
+@require_POST
+def make_offer(request, watch_id):
+    """Offer modal (templates/components/offer_modal.html) posts here"""
+    product = get_object_or_404(Product.objects.select_related('brand', 'seller'), pk=watch_id)
+    try:
+        validity = int(request.POST.get('validity', offers.DEFAULT_VALIDITY_HOURS))
+    except ValueError:
+        validity = offers.DEFAULT_VALIDITY_HOURS
+    try:
+        offer = offers.make_offer(
+            request.user, product, _form_decimal(request.POST.get('amount')),
+            method=request.POST.get('transaction_method', ''), message=request.POST.get('message', '').strip(),
+            validity_hours=validity,
+        )
+    except offers.OfferError as error:
+        return JsonResponse({'success': False, 'message': str(error)}, status=400)
+    return JsonResponse({'success': True, 'offer_id': offer.pk})
+
+
+# URL action -> who may take it is checked in pages/offers.py
+OFFER_ACTIONS = {
+    'accept': lambda offer, user, data: offers.accept(offer, user),
+    'accept-counter': lambda offer, user, data: offers.accept(offer, user),
+    'decline': lambda offer, user, data: offers.decline(offer, user),
+    'decline-counter': lambda offer, user, data: offers.decline(offer, user),
+    'counter': lambda offer, user, data: offers.counter(
+        offer, user, _form_decimal(data.get('amount')), str(data.get('message', '')).strip(),
+    ),
+    'update': lambda offer, user, data: offers.revise(offer, user, _form_decimal(data.get('amount'))),
+    'withdraw': lambda offer, user, data: offers.withdraw(offer, user),
+}
+
+
+@login_required
+@require_POST
+def offer_action(request, offer_id, action):
+    """Buttons on the offer pages and the seller dashboard (JSON)"""
+    if action not in OFFER_ACTIONS:
+        raise Http404('Unknown offer action')
+    offer = get_object_or_404(Offer.objects.only('id'), pk=offer_id)
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        data = {}
+    if not isinstance(data, dict):
+        data = {}
+    try:
+        offer = OFFER_ACTIONS[action](offer, request.user, {key: str(value) for key, value in data.items()})
+    except offers.OfferError as error:
+        return JsonResponse({'success': False, 'message': str(error)}, status=409)
+    response = {'success': True, 'status': offer.status}
+    if offer.order_id and offer.buyer_id == request.user.pk:
+        response['redirect'] = reverse('my_orders')
+    return JsonResponse(response)
+
+
 # =============================================================================
 # CART & ORDERS
 # =============================================================================
 
-@login_required
-def cart(request):
-    """Shopping cart page"""
+def cart_view(request):
+    """Shopping cart page (pages/cart.py: one stored list, one query for the products)"""
+    items = cart.Cart(request).items()
     context = {
-        'cart_items': [],
+        'cart_items': items,
+        **cart.totals(items),
     }
     return render(request, 'orders/cart.html', context)
 
 
+@require_POST
+def add_to_cart(request, watch_id):
+    """Add a listing to the cart"""
+    product = get_object_or_404(catalog.live_products(), pk=watch_id)
+    if cart.Cart(request).add(product, method=request.POST.get('transaction_method', 'delivery')):
+        messages.success(request, f'{product} was added to your cart.')
+    else:
+        messages.error(request, f'Your cart is full ({cart.MAX_ITEMS} items).')
+    return redirect('cart')
+
+
+@require_POST
+def cart_remove(request, watch_id):
+    removed = cart.Cart(request).remove(watch_id)
+    return JsonResponse({'success': removed, 'message': '' if removed else 'Item is not in your cart'})
+
+
+@require_POST
+def cart_clear(request):
+    cart.Cart(request).clear()
+    return JsonResponse({'success': True})
+
+
+def _report_revalidation(request, changes):
+    for product_id, old_price, new_price in changes.repriced:
+        messages.warning(
+            request, f'A watch in your cart changed price from Rs. {old_price:,.0f} to Rs. {new_price:,.0f}.'
+        )
+    if changes.removed:
+        messages.warning(
+            request, f'{len(changes.removed)} item(s) in your cart are no longer available and were removed.'
+        )
+
+
+CHECKOUT_NOTE_FIELDS = (
+    ('full_name', 'Name'), ('phone', 'Phone'), ('email', 'Email'), ('address', 'Address'), ('city', 'City'),
+    ('postal_code', 'Postal code'), ('meeting_date', 'Meeting date'), ('meeting_time', 'Meeting time'),
+    ('notes', 'Notes'),
+)
+
+
+def _checkout_notes(data):
+    """Contact, delivery and meeting details from the checkout form, for the seller"""
+    lines = []
+    for name, label in CHECKOUT_NOTE_FIELDS:
+        value = data.get(name, '').strip()
+        if value:
+            lines.append(f'{label}: {value[:500]}')
+    return '\n'.join(lines)
+
+
 @login_required
-def checkout(request):
-    """Checkout page"""
+def checkout_view(request):
+    """
+    Checkout page: prices and availability are rechecked in one query first.
+    Placing the order goes through pages/checkout.py (row locks, idempotency key).
+    """
+    shopping_cart = cart.Cart(request)
+    changes = shopping_cart.revalidate()
+    if changes:
+        _report_revalidation(request, changes)
+        return redirect('cart')
+    items = shopping_cart.items()
+
+    if request.method == 'POST':
+        key = request.headers.get('Idempotency-Key') or request.POST.get('checkout_key', '')
+        payment_method = request.POST.get('payment_method', 'cash')
+        if payment_method not in checkout.PAYMENT_WINDOW:
+            payment_method = 'cash'
+        try:
+            placed = checkout.place_order(
+                request.user, items, key, payment_method=payment_method,
+                notes=_checkout_notes(request.POST), payment_reference=request.POST.get('transaction_ref', '').strip()[:100],
+            )
+        except checkout.CheckoutError as error:
+            if isinstance(error, checkout.Unavailable):
+                for product_id in error.product_ids:
+                    shopping_cart.remove(product_id)
+            messages.error(request, f'{error}. Please review your cart.' if items else str(error))
+            return redirect('cart')
+        shopping_cart.clear()
+        numbers = ', '.join(order.order_number for order in placed.orders)
+        messages.success(request, f'Order placed: {numbers}.')
+        return redirect('my_orders')
+
+    if not items:
+        return redirect('cart')
     context = {
-        'cart_items': [],
+        'cart_items': items,
+        'checkout_key': checkout.new_key(),
+        'has_delivery_items': any(item.transaction_method == 'delivery' for item in items),
+        'has_meeting_items': any(item.transaction_method == 'meeting' for item in items),
+        'min_meeting_date': (timezone.localdate() + timedelta(days=1)).isoformat(),
+        **cart.totals(items),
     }
     return render(request, 'orders/checkout.html', context)
 
@@ -192,8 +535,12 @@ def checkout(request):
 @login_required
 def my_orders(request):
     """User's orders page"""
+    orders = Order.objects.filter(customer=request.user).prefetch_related('items__product__brand')
+    page = paginate(request, orders, 'newest', per_page=20)
     context = {
-        'orders': [],
+        'orders': page.object_list,
+        'page_obj': page,
+        'query_params': query_params_without_cursor(request),
     }
     return render(request, 'orders/order_list.html', context)
 
@@ -220,6 +567,22 @@ def wishlist(request):
     return render(request, 'watches/wishlist.html', context)
 
 
+@login_required
+@require_POST
+def wishlist_toggle(request, watch_id):
+    """Add/remove a watch from the wishlist (favorite_count is buffered, see pages/counters.py)"""
+    watch = get_object_or_404(Product.objects.only('id', 'favorite_count'), pk=watch_id)
+    favorite, created = Favorite.objects.get_or_create(customer=request.user, product=watch)
+    if created:
+        counters.incr(watch.pk, 'favorite_count', 1)
+    elif favorite.delete()[0]:
+        counters.incr(watch.pk, 'favorite_count', -1)
+    return JsonResponse({
+        'wishlisted': created,
+        'favorite_count': counters.current(watch, 'favorite_count'),
+    })
+
+
 # =============================================================================
 # DASHBOARDS
 # =============================================================================
@@ -237,11 +600,44 @@ def buyer_dashboard(request):
 
 @login_required
 def seller_dashboard(request):
-    """Seller dashboard page"""
+    """Seller dashboard page (period stats come from pages/rollups.py)"""
+    seller = getattr(request.user, 'seller', None)
+    store = getattr(seller, 'store', None)
+    if store is None:
+        return redirect('seller_register')
+
+    stats = rollups.dashboard_stats(store)
+    listings = Product.objects.filter(store=store).aggregate(
+        active=Count('id', filter=Q(status=Product.Status.ACTIVE, approval_status=Product.ApprovalStatus.APPROVED)),
+        pending=Count('id', filter=Q(approval_status=Product.ApprovalStatus.PENDING)),
+        sold=Count('id', filter=Q(status=Product.Status.SOLD)),
+        inactive=Count('id', filter=Q(status=Product.Status.INACTIVE)),
+    )
+    recent_sales = list(
+        Order.objects.filter(store=store)
+        .select_related('customer')
+        .prefetch_related('items__product__brand')
+        .order_by('-created_at', '-id')[:5]
+    )
+    pending_offers = offers.pending_for_store(store)
     context = {
-        'stats': {},
-        'recent_sales': [],
-        'pending_offers': [],
+        'seller': store,
+        'stats': stats,
+        'recent_sales': recent_sales,
+        'pending_offers': pending_offers,
+        # Names used by templates/dashboard/seller_dashboard.html
+        'recent_orders': recent_sales,
+        'recent_offers': pending_offers,
+        'pending_offers_count': offers.store_counts(store)['pending'],
+        'active_listings_count': listings['active'],
+        'pending_listings_count': listings['pending'],
+        'sold_listings_count': listings['sold'],
+        'expired_listings_count': listings['inactive'],
+        'total_sales_count': stats['total_orders'],
+        'total_earnings': stats['total_sales'],
+        'monthly_earnings': stats['revenue'],
+        'monthly_views': stats['views'],
+        'monthly_offers': stats['offers_received'],
     }
     return render(request, 'dashboard/seller_dashboard.html', context)
 
@@ -249,8 +645,16 @@ def seller_dashboard(request):
 @login_required
 def my_listings(request):
     """Seller's listings page"""
+    listings = (
+        Product.objects.filter(seller__user=request.user)
+        .select_related('brand', 'seller')
+        .prefetch_related(images.primary_image_prefetch())
+    )
+    page = paginate(request, listings, 'newest', per_page=24)
     context = {
-        'listings': [],
+        'listings': page.object_list,
+        'page_obj': page,
+        'query_params': query_params_without_cursor(request),
     }
     return render(request, 'watches/my_listings.html', context)
 
@@ -267,22 +671,64 @@ def account_settings(request):
 
 @login_required
 def messages_view(request):
-    """Messages/chat page"""
-    conversation_id = request.GET.get('conversation')
+    """Messages/chat page: the inbox, plus the thread for ?conversation="""
+    conversations = inbox.inbox_for(request.user)
+    active = None
+    conversation_id = request.GET.get('conversation', '')
+    if conversation_id.isdigit():
+        active = next(
+            (entry for entry in conversations if entry.conversation_id == int(conversation_id)), None
+        ) or inbox.entry_for(request.user, conversation_id)
+        if active is None:
+            raise Http404('Conversation not found')
+
+    if active is not None and request.method == 'POST':
+        text = request.POST.get('content', '').strip()
+        if text:
+            Message.objects.create(conversation_id=active.conversation_id, sender=request.user, message_text=text)
+        return redirect(f"{reverse('messages')}?conversation={active.conversation_id}")
+
+    thread = None
+    if active is not None:
+        inbox.mark_read(active)
+        # Newest page first, shown oldest-to-newest; the next cursor loads earlier messages
+        thread = paginate(
+            request,
+            Message.objects.filter(conversation_id=active.conversation_id).select_related('sender'),
+            'newest', per_page=inbox.THREAD_PAGE_SIZE,
+        )
     context = {
-        'conversations': [],
-        'active_conversation': None,
-        'messages': [],
+        'conversations': conversations,
+        'active_conversation': active,
+        'messages': thread.object_list[::-1] if thread else [],
+        'earlier_messages_cursor': thread.next_cursor if thread else None,
     }
     return render(request, 'misc/messages.html', context)
 
 
+NOTIFICATION_FILTERS = {
+    'unread': {'is_read': False},
+    'offers': {'notification_type': Notification.Type.OFFER},
+    'orders': {'notification_type': Notification.Type.ORDER},
+    'system': {'notification_type': Notification.Type.SYSTEM},
+}
+
+
 @login_required
 def notifications(request):
     """Notifications page"""
+    active_filter = request.GET.get('filter', 'all')
+    queryset = Notification.objects.filter(user=request.user, **NOTIFICATION_FILTERS.get(active_filter, {}))
+    page = paginate(request, queryset, 'newest', per_page=20)
+    today = timezone.localdate()
     context = {
-        'notifications': [],
-        'unread_count': 0,
+        'notifications': page,
+        'page_obj': page,
+        'query_params': query_params_without_cursor(request),
+        'filter': active_filter,
+        'unread_count': notify.unread_count(request.user.pk),
+        'today': today.isoformat(),
+        'yesterday': (today - timedelta(days=1)).isoformat(),
     }
     return render(request, 'misc/notifications.html', context)
 
@@ -295,9 +741,18 @@ def notification_settings(request):
 
 @login_required
 def start_conversation(request, user_id):
-    """Start a new conversation"""
-    # Logic to create/get conversation
-    return redirect('messages')
+    """Open (or reuse) a conversation with a seller, or a seller's with a customer; ?watch= ties it to a listing"""
+    other = get_object_or_404(get_user_model(), pk=user_id)
+    seller = Seller.objects.filter(user=other).first()
+    customer = request.user
+    if seller is None or other == request.user:
+        seller, customer = Seller.objects.filter(user=request.user).first(), other
+    if seller is None or seller.user_id == customer.pk:
+        raise Http404('No conversation possible with this user')
+    watch_id = request.GET.get('watch', '')
+    product = Product.objects.filter(pk=watch_id, seller=seller).first() if watch_id.isdigit() else None
+    conversation, _ = Conversation.objects.get_or_create(customer=customer, seller=seller, product=product)
+    return redirect(f"{reverse('messages')}?conversation={conversation.pk}")
 
 
 # =============================================================================
@@ -306,9 +761,19 @@ def start_conversation(request, user_id):
 
 def seller_profile(request, seller_id):
     """Public seller profile page"""
+    store = get_object_or_404(Store.objects.select_related('seller'), seller_id=seller_id)
+    listings = (
+        catalog.live_products().filter(seller_id=seller_id)
+        .select_related('brand', 'seller')
+        .prefetch_related(images.primary_image_prefetch())
+    )
+    page = paginate(request, listings, 'newest', per_page=24)
     context = {
-        'seller': None,  # Get seller by ID
-        'listings': [],
+        'seller': store,
+        'rating_summary': ratings.summary_for(ratings.STORE, store.pk),
+        'listings': page.object_list,
+        'page_obj': page,
+        'query_params': query_params_without_cursor(request),
     }
     return render(request, 'seller/seller_profile.html', context)
 
@@ -323,17 +788,20 @@ def seller_register(request):
 # =============================================================================
 
 @login_required
+@audit.audited('view_dashboard')
 def admin_dashboard(request):
     """Admin dashboard page"""
     context = {
         'stats': {},
         'pending_listings': [],
         'pending_sellers': [],
+        'recent_activity': audit.recent_activity(),
     }
     return render(request, 'admin_panel/dashboard.html', context)
 
 
 @login_required
+@audit.audited('view_seller_onboarding')
 def admin_seller_onboarding(request):
     """Admin seller onboarding page"""
     context = {
@@ -342,29 +810,115 @@ def admin_seller_onboarding(request):
     return render(request, 'admin_panel/seller_onboarding.html', context)
 
 
+# ?status= on the approval page -> approval status listed
+REVIEW_FILTERS = {
+    'approved': Product.ApprovalStatus.APPROVED,
+    'rejected': Product.ApprovalStatus.REJECTED,
+    'requires_changes': Product.ApprovalStatus.REQUIRES_CHANGES,
+}
+
+
 @login_required
+@audit.audited('view_listings_approval')
 def admin_listings_approval(request):
-    """Admin listings approval page"""
+    """Admin listings approval page: leases the next batch of the moderation queue (pages/moderation.py)"""
+    if not request.user.is_staff:
+        raise Http404
+    status = request.GET.get('status', 'pending')
+    brand = Brand.objects.filter(brand_name=request.GET.get('brand')).first() if request.GET.get('brand') else None
+    if status == 'pending':
+        listings = moderation.claim(request.user, brand_id=brand.pk if brand else None)
+    else:
+        listings = moderation.recently_reviewed(REVIEW_FILTERS.get(status))
     context = {
-        'listings': [],
-        'brands': [],
+        'listings': listings,
+        'brands': Brand.objects.order_by('brand_name').values_list('brand_name', flat=True),
+        'status_filter': status,
+        'brand_filter': brand.brand_name if brand else '',
+        'lease_minutes': int(moderation.LEASE.total_seconds() // 60),
+        **moderation.queue_stats(),
     }
     return render(request, 'admin_panel/listings_approval.html', context)
 
 
 @login_required
+@require_POST
+def api_moderate_listings(request):
+    """Approve / reject / request changes on a batch of listings: {"ids": [...], "action": ..., "reason": ...}"""
+    if not request.user.is_staff:
+        return JsonResponse({'success': False, 'message': 'Not allowed'}, status=403)
+    try:
+        payload = json.loads(request.body or b'{}')
+        if not isinstance(payload, dict) or not isinstance(payload.get('ids', []), list):
+            raise ValueError('expected {"ids": [...], ...}')
+        product_ids = [int(pk) for pk in payload.get('ids', [])]
+    except (ValueError, TypeError):
+        return JsonResponse({'success': False, 'message': 'Invalid request'}, status=400)
+    action = payload.get('action')
+    if not isinstance(action, str) or action not in moderation.ACTIONS or not product_ids:
+        return JsonResponse({'success': False, 'message': 'Choose listings and an action'}, status=400)
+    reason = '\n\n'.join(
+        str(part) for part in (payload.get('reason'), payload.get('feedback')) if part not in (None, '')
+    )
+    done = moderation.moderate(request.user, product_ids, action, reason=reason, request=request)
+    return JsonResponse({
+        'success': bool(done),
+        'moderated': done,
+        'skipped': [pk for pk in product_ids if pk not in set(done)],
+        'message': '' if done else 'These listings were already reviewed or are held by another admin',
+    })
+
+
+@login_required
+@audit.audited('view_delivery_management')
 def admin_delivery_management(request):
-    """Admin delivery management page"""
+    """Delivery board: one indexed query per column, totals from order_status_counts"""
+    if not request.user.is_staff:
+        raise Http404
     context = {
-        'pending_orders': [],
-        'transit_orders': [],
-        'delivered_orders': [],
+        **order_states.board(),
         'meetings': [],
         'issues': [],
+        'pending_meetings': 0,
+        'delivery_issues': 0,
     }
     return render(request, 'admin_panel/delivery_management.html', context)
 
 
+@login_required
+@require_POST
+def api_order_transition(request, order_id):
+    """Move an order along the state machine: {"status": ..., "note": ..., "carrier": ..., ...}"""
+    if not request.user.is_staff:
+        return JsonResponse({'success': False, 'message': 'Not allowed'}, status=403)
+    order = get_object_or_404(Order, pk=order_id)
+    try:
+        payload = json.loads(request.body or b'{}')
+    except ValueError:
+        payload = None
+    if not isinstance(payload, dict):
+        return JsonResponse({'success': False, 'message': 'Invalid request'}, status=400)
+    fields = {name: payload[name] for name in order_states.TRANSITION_FIELDS if payload.get(name)}
+    try:
+        order = order_states.transition(
+            order, payload.get('status'), by=request.user, note=payload.get('note', ''), **fields,
+        )
+    except order_states.InvalidTransition as exc:
+        return JsonResponse({'success': False, 'message': str(exc)}, status=409)
+    except ValidationError as exc:
+        return JsonResponse({'success': False, 'message': ' '.join(exc.messages)}, status=400)
+    audit.record(request, f'order_{order.order_status.lower()}', 'order', order.pk, payload.get('note', ''))
+    return JsonResponse({'success': True, 'status': order.order_status, 'allowed': order_states.allowed(order)})
+
+
+@login_required
+def performance_stats(request):
+    """Per-URL timings, query counts and cache hit rates of this worker (pages/profiling.py)"""
+    if not request.user.is_staff:
+        return JsonResponse({'success': False, 'message': 'Not allowed'}, status=403)
+    return JsonResponse(profiling.snapshot())
+
+
 # =============================================================================
 # API ENDPOINTS (Placeholder for AJAX calls)
 # =============================================================================
@@ -373,11 +927,80 @@ def admin_delivery_management(request):
 @require_POST
 def api_mark_notification_read(request, notification_id):
     """Mark notification as read"""
-    return JsonResponse({'success': True})
+    notify.mark_read(request.user, notification_id)
+    return JsonResponse({'success': True, 'unread_count': notify.unread_count(request.user.pk)})
 
 
 @login_required
 @require_POST
 def api_mark_all_notifications_read(request):
-    """Mark all notifications as read"""
-    return JsonResponse({'success': True})
+    """Mark all notifications up to the `read_up_to` id as read (one UPDATE)"""
+    try:
+        payload = json.loads(request.body or b'{}')
+    except ValueError:
+        payload = {}
+    if not isinstance(payload, dict):
+        payload = {}
+    read_up_to = payload.get('read_up_to', request.POST.get('read_up_to'))
+    try:
+        read_up_to = int(read_up_to) if read_up_to not in (None, '') else None
+    except (TypeError, ValueError):
+        return JsonResponse({'success': False, 'error': 'Invalid read_up_to'}, status=400)
+    marked = notify.mark_all_read(request.user, read_up_to)
+    return JsonResponse({'success': True, 'marked': marked, 'unread_count': notify.unread_count(request.user.pk)})
+
+
+def api_search_autocomplete(request):
+    """As-you-type search suggestions for the browse page"""
+    query = request.GET.get('q', '').strip()
+    if len(query) < search.MIN_PREFIX:
+        return JsonResponse({'query': query, 'results': []})
+    results = [
+        {'id': doc['id'], 'title': doc['title'], 'price': doc['price'], 'url': doc['url']}
+        for doc in search.autocomplete(query)
+    ]
+    return JsonResponse({'query': query, 'results': results})
+
+
+# =============================================================================
+# REAL-TIME EVENTS (async; see pages/realtime.py)
+# =============================================================================
+
+@login_required
+async def events_stream(request):
+    """Server-Sent Events stream of the user's messages and notifications"""
+    user = await request.auser()
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    response = StreamingHttpResponse(
+        realtime.sse_stream(realtime.user_channel(user.pk), last_event_id),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # nginx: don't buffer the stream
+    return response
+
+
+@login_required
+async def events_board(request):
+    """SSE stream of order status changes for staff delivery boards"""
+    user = await request.auser()
+    if not user.is_staff:
+        raise Http404
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    response = StreamingHttpResponse(
+        realtime.sse_stream(realtime.BOARD_CHANNEL, last_event_id), content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@login_required
+async def events_poll(request):
+    """Long-poll fallback: waits for events newer than `since`"""
+    user = await request.auser()
+    events, last_id = await realtime.long_poll(realtime.user_channel(user.pk), request.GET.get('since'))
+    return JsonResponse({
+        'events': [{**event, 'id': event_id} for event_id, event in events],
+        'last_id': last_id,
+    })
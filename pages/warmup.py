@@ -0,0 +1,113 @@
+"""
+Get a process ready before it takes traffic.
+========================================================================================
+
+HOW IT WORKS:
+-------------
+`run()` does the work that would otherwise land on a worker's first
+requests:
+    urls         import the URLconf, and with it every view module
+    templates    compile every template into the cached template loader,
+                 includes bound (pages/templating.py)
+    search       build the in-process search index (pages/search.py)
+    homepage     build the homepage sections (pages/homepage.py) unless cached
+It then closes the database connections it opened, so processes forked
+afterwards don't share a socket. A failing step is logged and skipped:
+a cold cache is slower, not broken.
+
+config/gunicorn.conf.py runs it once in the master with preload_app.
+Every forked worker starts with the work done and shares that memory
+copy-on-write. Without preload, each worker runs it after loading the app.
+
+Pillow and NumPy are not part of it. They load on first use, in the
+processes that handle uploads (pages/images.py) or compute related watches
+(pages/recommend.py).
+
+USAGE:
+    warmup.run()                    # {step: seconds}
+    python manage.py bench_startup  # what it saves
+"""
+
+import logging
+import os
+import time
+
+from django.core.cache import cache
+from django.db import connections
+from django.template import TemplateDoesNotExist, TemplateSyntaxError, engines
+from django.template.backends.django import DjangoTemplates
+from django.urls import get_resolver
+
+
+logger = logging.getLogger(__name__)
+
+
+def template_names(engine):
+    """Every template file an engine's loaders can find, by template name"""
+    directories = []
+    for loader in engine.template_loaders:
+        if hasattr(loader, 'get_dirs'):
+            directories += [str(directory) for directory in loader.get_dirs() if str(directory) not in directories]
+    names = set()
+    for directory in directories:
+        for root, _dirs, files in os.walk(directory):
+            for name in files:
+                if not name.startswith('.'):
+                    names.add(os.path.relpath(os.path.join(root, name), directory).replace(os.sep, '/'))
+    return sorted(names)
+
+
+def _urls():
+    get_resolver().url_patterns
+
+
+def _templates():
+    """Compile every template; the cached loader keeps them for the life of the process"""
+    compiled = failed = 0
+    for backend in engines.all():
+        if not isinstance(backend, DjangoTemplates):
+            continue
+        for name in template_names(backend.engine):
+            try:
+                backend.engine.get_template(name)
+                compiled += 1
+            except (TemplateDoesNotExist, TemplateSyntaxError, UnicodeDecodeError):
+                failed += 1
+    logger.info('Compiled %d templates (%d skipped)', compiled, failed)
+
+
+def _search():
+    from . import search
+    search.get_index()
+
+
+def _homepage():
+    from . import homepage
+    if cache.get(homepage.ENTRY_KEY) is None:
+        homepage.build()
+
+
+STEPS = [
+    ('urls', _urls),
+    ('templates', _templates),
+    ('search', _search),
+    ('homepage', _homepage),
+]
+
+
+def run(steps=None):
+    """Run the warm-up steps (all by default); returns {step: seconds}"""
+    timings = {}
+    try:
+        for name, step in STEPS:
+            if steps is not None and name not in steps:
+                continue
+            started = time.perf_counter()
+            try:
+                step()
+            except Exception:
+                logger.warning('Warm-up step %s failed; it will happen on first use instead', name, exc_info=True)
+            timings[name] = round(time.perf_counter() - started, 3)
+    finally:
+        connections.close_all()
+    return timings
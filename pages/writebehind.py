@@ -0,0 +1,134 @@
+"""
+Per-worker write-behind buffer with a background flusher.
+========================================================================================
+
+HOW IT WORKS:
+-------------
+Subclasses say what a batch is and how to write it:
+    _empty()            a new, empty batch
+    _size(batch)        how many entries it holds (0 = nothing to write)
+    _write(batch)       write it to the database; returns rows written
+    _restore(batch)     put a failed batch back into self._pending
+                        (called with the lock held)
+and add entries to `self._pending` under `self._lock`, calling
+`_added(size)` afterwards.
+
+The base class takes care of the rest:
+- `flush()` swaps the pending batch out and writes it. If the write raises
+  anything, the batch goes back into the buffer for the next flush, so no
+  entries are lost to an unexpected error.
+- A daemon thread flushes every `interval` seconds, or sooner once
+  `max_size` entries are waiting. It survives a failing flush, and a dead
+  thread is replaced on the next add.
+- A forked worker starts with an empty buffer and its own thread: the
+  parent's entries are the parent's to flush.
+- `flush_at_exit()` (registered with atexit by each buffer's module)
+  flushes what is left at interpreter exit, e.g. gunicorn's graceful
+  shutdown.
+
+Used by pages/counters.py (view and favorite counts), pages/audit.py
+(admin activity log) and pages/cart.py (logged-in carts).
+"""
+
+import logging
+import os
+import threading
+
+from django.db import connection
+
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindBuffer:
+    """Base class: pending entries in this worker, written in batches by a background thread"""
+
+    thread_name = 'write-behind'
+
+    def __init__(self, interval, max_size):
+        self.interval = interval
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._pending = self._empty()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    # --- subclass hooks ---------------------------------------------------------
+
+    def _empty(self):
+        raise NotImplementedError
+
+    def _size(self, batch):
+        return len(batch)
+
+    def _write(self, batch):
+        raise NotImplementedError
+
+    def _restore(self, batch):
+        raise NotImplementedError
+
+    # --- buffer -----------------------------------------------------------------
+
+    def _added(self, size):
+        """Call after adding entries (outside the lock), with the pending size"""
+        if size >= self.max_size:
+            self._wakeup.set()
+
+    def flush(self):
+        """Write everything pending; returns the rows written (0 when the write failed)"""
+        with self._lock:
+            batch, self._pending = self._pending, self._empty()
+        size = self._size(batch)
+        if not size:
+            return 0
+        try:
+            return self._write(batch)
+        except Exception:
+            logger.exception('%s failed; keeping %d entries for the next attempt', self.thread_name, size)
+            with self._lock:
+                self._restore(batch)
+            return 0
+
+    def flush_at_exit(self):
+        if self._pid == os.getpid():
+            try:
+                self.flush()
+            except Exception:  # interpreter shutting down
+                logger.exception('%s at exit failed', self.thread_name)
+
+    # --- background flusher -----------------------------------------------------
+
+    def _running(self):
+        return self._pid == os.getpid() and self._thread is not None and self._thread.is_alive()
+
+    def _ensure_thread(self):
+        if self._running():
+            return
+        with self._lock:
+            if self._running():
+                return
+            pid = os.getpid()
+            if self._pid is not None and self._pid != pid:
+                # Forked worker: the parent's entries are the parent's to flush
+                self._pending = self._empty()
+            elif self._thread is not None:
+                logger.error('%s thread died; starting a new one', self.thread_name)
+            self._pid = pid
+            self._thread = threading.Thread(target=self._run, name=self.thread_name, daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('%s raised; the thread keeps running', self.thread_name)
+            finally:
+                # This thread owns its own connection; don't keep it open between flushes
+                try:
+                    connection.close()
+                except Exception:
+                    logger.exception('%s could not close its connection', self.thread_name)